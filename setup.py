@@ -53,6 +53,10 @@ setup(
             "flake8>=6.0",
             "mypy>=1.0",
         ],
+        "parquet": [
+            "pyarrow>=12.0",
+            "numpy>=1.24",
+        ],
     },
     entry_points={
         "console_scripts": [
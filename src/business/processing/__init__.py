@@ -1,3 +1,4 @@
 # src/business/processing/__init__.py
 """Processing package"""
-__all__ = ['distribution_engine', 'hash_calculator']
+__all__ = ['distribution_engine', 'hash_calculator', 'impact_replay', 'queue_worker', 'roi_simulation',
+           'watch_daemon']
@@ -1,9 +1,200 @@
 # src/distribution_engine.py
 
-def distribuir_faturas(lista_faturas, nomes_auditores):
+import heapq
+import time
+from bisect import bisect_left, insort
+
+# Pesos da estimativa de esforço de auditoria (em "pontos" de trabalho).
+# Os volumes vêm da importação (xml_parser.extrair_dados_fatura_xml).
+PESO_GUIA = 3.0
+PESO_PROCEDIMENTO = 1.0
+PESO_MEGABYTE = 0.5
+
+# Afinidade por Unimed: o auditor que já recebeu faturas da mesma Unimed é
+# preferido enquanto sua carga não exceder a menor carga em mais que esta
+# fração do esforço médio por fatura.
+TOLERANCIA_AFINIDADE = 0.5
+
+# Limites do refinamento por busca local (move/swap)
+MAX_ITERACOES_BUSCA_LOCAL = 5000
+TEMPO_LIMITE_BUSCA_LOCAL_S = 0.3
+# Diferença relativa entre maior e menor carga considerada equilibrada
+TOLERANCIA_EQUILIBRIO = 1e-4
+
+
+def _valor_numerico(fatura):
+    """Converte o valor total da fatura (string com vírgula) para float."""
+    valor_str = fatura.get('valor_total_documento') or "0.0"
+    try:
+        return float(str(valor_str).replace(',', '.'))
+    except ValueError:
+        return 0.0
+
+
+def estimar_esforco(fatura):
+    """
+    Estima o esforço de auditoria de uma fatura a partir da quantidade de
+    guias, de procedimentos e do tamanho do arquivo.
+
+    Faturas sem métricas de volume (ex.: importadas por versões antigas) usam
+    o valor monetário como esforço, preservando o critério anterior.
+    """
+    qtd_guias = fatura.get('qtd_guias')
+    qtd_procedimentos = fatura.get('qtd_procedimentos')
+    if qtd_guias is None and qtd_procedimentos is None:
+        return fatura.get('valor_numerico', _valor_numerico(fatura))
+
+    tamanho_mb = (fatura.get('tamanho_bytes') or 0) / (1024 * 1024)
+    return (PESO_GUIA * (qtd_guias or 0)
+            + PESO_PROCEDIMENTO * (qtd_procedimentos or 0)
+            + PESO_MEGABYTE * tamanho_mb)
+
+
+def _distribuir_lpt(esforcos, unimeds, qtd_auditores, usar_afinidade):
+    """
+    LPT (Longest Processing Time) com heap: cada fatura, da maior para a menor,
+    vai para o auditor de menor carga. O(n log m).
+
+    Returns:
+        (atribuicao, cargas): índice do auditor por fatura e carga por auditor
     """
-    Distribui as faturas processadas entre os auditores de forma equilibrada
-    por valor total, ordenando as faturas da mais cara para a mais barata.
+    n = len(esforcos)
+    atribuicao = [0] * n
+    cargas = [0.0] * qtd_auditores
+    versao = [0] * qtd_auditores
+    heap = [(0.0, idx, 0) for idx in range(qtd_auditores)]
+    ultimo_por_unimed = {}
+
+    tolerancia = TOLERANCIA_AFINIDADE * (sum(esforcos) / n if n else 0.0)
+    ordem = sorted(range(n), key=lambda i: esforcos[i], reverse=True)
+
+    for i in ordem:
+        # Descarta entradas obsoletas (heap com remoção preguiçosa)
+        while heap[0][2] != versao[heap[0][1]]:
+            heapq.heappop(heap)
+        carga_min, escolhido, _ = heap[0]
+
+        if usar_afinidade and unimeds[i]:
+            preferido = ultimo_por_unimed.get(unimeds[i])
+            if preferido is not None and cargas[preferido] <= carga_min + tolerancia:
+                escolhido = preferido
+
+        atribuicao[i] = escolhido
+        cargas[escolhido] += esforcos[i]
+        versao[escolhido] += 1
+        heapq.heappush(heap, (cargas[escolhido], escolhido, versao[escolhido]))
+        if unimeds[i]:
+            ultimo_por_unimed[unimeds[i]] = escolhido
+
+    return atribuicao, cargas
+
+
+def _refinar_busca_local(esforcos, atribuicao, cargas):
+    """
+    Refina a atribuição reduzindo o makespan (maior carga) com movimentos
+    de uma fatura (move) ou troca de duas faturas (swap) entre o auditor mais
+    carregado e os demais, do menos para o mais carregado.
+
+    Cada passo aceito reduz estritamente a maior carga do par envolvido,
+    então o processo termina; também é limitado por iterações e tempo.
+    """
+    qtd_auditores = len(cargas)
+    # Esforços de cada auditor ordenados para busca binária: (esforco, fatura)
+    itens = [[] for _ in range(qtd_auditores)]
+    for i, a in enumerate(atribuicao):
+        itens[a].append((esforcos[i], i))
+    for lista in itens:
+        lista.sort()
+
+    def _mais_proximo(lista, alvo, limite):
+        """Item com esforço mais próximo de `alvo` e estritamente entre 0 e `limite`."""
+        pos = bisect_left(lista, (alvo, -1))
+        melhor = None
+        for j in (pos - 1, pos):
+            if 0 <= j < len(lista) and 0 < lista[j][0] < limite:
+                if melhor is None or abs(lista[j][0] - alvo) < abs(melhor[0] - alvo):
+                    melhor = lista[j]
+        return melhor
+
+    inicio = time.perf_counter()
+    for _ in range(MAX_ITERACOES_BUSCA_LOCAL):
+        if time.perf_counter() - inicio > TEMPO_LIMITE_BUSCA_LOCAL_S:
+            break
+
+        origem = max(range(qtd_auditores), key=cargas.__getitem__)
+        if cargas[origem] - min(cargas) <= TOLERANCIA_EQUILIBRIO * cargas[origem]:
+            break
+        melhorou = False
+
+        for destino in sorted(range(qtd_auditores), key=cargas.__getitem__):
+            diferenca = cargas[origem] - cargas[destino]
+            if destino == origem or diferenca <= 0:
+                break
+
+            # Move: transferir esforço e, com 0 < e < diferença, ideal = diferença/2
+            melhor_move = _mais_proximo(itens[origem], diferenca / 2, diferenca)
+
+            # Swap: trocar a (origem) por b (destino) com 0 < ea - eb < diferença.
+            # Só é avaliado quando nenhum move é possível (varre o destino inteiro).
+            melhor_swap = None
+            for esforco_b, fatura_b in ([] if melhor_move else itens[destino]):
+                candidato = _mais_proximo(itens[origem], esforco_b + diferenca / 2, esforco_b + diferenca)
+                if candidato is None or candidato[0] <= esforco_b:
+                    continue
+                delta = candidato[0] - esforco_b
+                if melhor_swap is None or abs(delta - diferenca / 2) < abs(melhor_swap[0] - diferenca / 2):
+                    melhor_swap = (delta, candidato, (esforco_b, fatura_b))
+
+            delta_move = melhor_move[0] if melhor_move else None
+            usar_swap = melhor_swap is not None and (
+                delta_move is None or abs(melhor_swap[0] - diferenca / 2) < abs(delta_move - diferenca / 2)
+            )
+
+            if usar_swap:
+                delta, item_a, item_b = melhor_swap
+                itens[origem].remove(item_a)
+                itens[destino].remove(item_b)
+                insort(itens[destino], item_a)
+                insort(itens[origem], item_b)
+                atribuicao[item_a[1]] = destino
+                atribuicao[item_b[1]] = origem
+            elif melhor_move is not None:
+                delta = melhor_move[0]
+                itens[origem].remove(melhor_move)
+                insort(itens[destino], melhor_move)
+                atribuicao[melhor_move[1]] = destino
+            else:
+                continue
+
+            cargas[origem] -= delta
+            cargas[destino] += delta
+            melhorou = True
+            break
+
+        if not melhorou:
+            break
+
+    return atribuicao, cargas
+
+
+def distribuir_faturas(lista_faturas, nomes_auditores, refinar=True, usar_afinidade=True):
+    """
+    Distribui as faturas processadas entre os auditores minimizando a maior
+    carga de trabalho (makespan) do esforço estimado de auditoria.
+
+    1. LPT com heap: faturas da maior para a menor, cada uma para o auditor
+       menos carregado (respeitando afinidade por Unimed, se ativada).
+    2. Busca local opcional (move/swap) para reduzir a maior carga.
+
+    Args:
+        lista_faturas: Faturas importadas (dicts de extrair_dados_fatura_xml)
+        nomes_auditores: Lista de auditores
+        refinar: Aplica a busca local após o LPT
+        usar_afinidade: Agrupa faturas da mesma Unimed no mesmo auditor quando
+            isso não desequilibra a carga
+
+    Returns:
+        {auditor: {'faturas', 'total_valor', 'total_quantidade', 'total_esforco'}}
     """
     # 1. Preparação: Inicializa a estrutura para cada auditor.
     plano_distribuicao = {}
@@ -11,29 +202,35 @@ def distribuir_faturas(lista_faturas, nomes_auditores):
         plano_distribuicao[nome_auditor] = {
             'faturas': [],
             'total_valor': 0.0,
-            'total_quantidade': 0
+            'total_quantidade': 0,
+            'total_esforco': 0.0
         }
+    if not nomes_auditores or not lista_faturas:
+        return plano_distribuicao
 
-    # 2. Converte os valores de string para float para poder ordenar.
-    faturas_com_valor_numerico = []
+    # 2. Valor numérico e esforço estimado de cada fatura.
+    faturas = []
     for fatura in lista_faturas:
         fatura_copia = fatura.copy()
-        # Converte a string de valor para um número (float)
-        valor_str_corrigido = fatura.get('valor_total_documento', "0.0").replace(',', '.')
-        fatura_copia['valor_numerico'] = float(valor_str_corrigido)
-        faturas_com_valor_numerico.append(fatura_copia)
+        fatura_copia['valor_numerico'] = _valor_numerico(fatura)
+        fatura_copia['esforco_estimado'] = estimar_esforco(fatura_copia)
+        faturas.append(fatura_copia)
+
+    esforcos = [f['esforco_estimado'] for f in faturas]
+    unimeds = [f.get('codigo_unimed_destino') for f in faturas]
 
-    # 3. Ordena a lista de faturas da mais cara para a mais barata.
-    faturas_ordenadas = sorted(faturas_com_valor_numerico, key=lambda f: f['valor_numerico'], reverse=True)
+    # 3. Atribuição LPT + refinamento.
+    atribuicao, cargas = _distribuir_lpt(esforcos, unimeds, len(nomes_auditores), usar_afinidade)
+    if refinar and len(nomes_auditores) > 1:
+        atribuicao, cargas = _refinar_busca_local(esforcos, atribuicao, cargas)
 
-    # 4. Lógica de Distribuição: Atribui cada fatura ao auditor com o menor valor total acumulado.
-    for fatura_obj in faturas_ordenadas:
-        # Encontra o auditor com o menor total de valor acumulado no momento
-        auditor_escolhido = min(plano_distribuicao, key=lambda nome: plano_distribuicao[nome]['total_valor'])
+    # 4. Monta o plano (faturas de cada auditor da mais cara para a mais barata).
+    for i in sorted(range(len(faturas)), key=lambda i: faturas[i]['valor_numerico'], reverse=True):
+        dados = plano_distribuicao[nomes_auditores[atribuicao[i]]]
+        dados['faturas'].append(faturas[i])
+        dados['total_valor'] += faturas[i]['valor_numerico']
+        dados['total_quantidade'] += 1
+        dados['total_esforco'] += faturas[i]['esforco_estimado']
 
-        # Atribui a fatura ao auditor escolhido
-        plano_distribuicao[auditor_escolhido]['faturas'].append(fatura_obj)
-        plano_distribuicao[auditor_escolhido]['total_valor'] += fatura_obj['valor_numerico']
-        plano_distribuicao[auditor_escolhido]['total_quantidade'] += 1
+    return plano_distribuicao
 
-    return plano_distribuicao
\ No newline at end of file
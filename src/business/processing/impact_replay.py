@@ -0,0 +1,304 @@
+# src/business/processing/impact_replay.py
+
+"""
+Reexecução de impacto de uma alteração de regra (dry-run).
+
+Dada uma regra alterada, compara a versão anterior (AuditRuleHistory) com a
+atual e:
+1. Seleciona no índice de características (arquivo_features) apenas os
+   arquivos em que alguma das duas versões pode casar;
+2. Reaplica, em processos paralelos, o conjunto de regras com a versão antiga
+   e com a nova sobre o mesmo conteúdo em memória (nenhum arquivo é gravado);
+3. Gera um resumo por arquivo com as diferenças entre os dois resultados.
+
+Arquivos validados antes da existência do índice podem ser indexados com
+`indexar_pasta`.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.business.rules import feature_index
+from src.business.rules.rule_engine import RuleEngine
+from src.database import feature_repository
+from src.database.db_manager import get_session
+from src.database.models_rules import AuditRule, AuditRuleHistory
+from src.infrastructure.files import file_manager
+
+logger = logging.getLogger(__name__)
+
+# Diferenças detalhadas por arquivo no relatório (o total é sempre contado)
+MAX_DIFERENCAS_POR_ARQUIVO = 20
+
+# Motores do processo worker: (conjunto com a versão antiga, com a versão nova)
+_MOTORES: Optional[Tuple[RuleEngine, RuleEngine]] = None
+
+
+def _regra_da_versao(regra: AuditRule, dados_anteriores: Dict) -> Dict:
+    """Regra no formato rule_engine com os campos salvos no histórico."""
+    antiga = regra.to_dict()
+    antiga['ativo'] = dados_anteriores.get('ativo', True)
+    for campo in ('condicoes', 'acao'):
+        valor = dados_anteriores.get(campo)
+        antiga[campo] = json.loads(valor) if isinstance(valor, str) and valor else (valor or {})
+    return antiga
+
+
+def carregar_conjuntos(rule_id: str, versao: Optional[int] = None) -> Optional[Dict]:
+    """
+    Monta a versão antiga e a atual da regra e os dois conjuntos de regras ativas.
+
+    Args:
+        rule_id: ID da regra alterada
+        versao: Versão anterior a comparar (padrão: a última do histórico)
+
+    Returns:
+        Dicionário com regra_antiga, regra_nova, regras_antes, regras_depois,
+        versao_antiga e versao_atual; None se a regra ou a versão não existir.
+    """
+    session = get_session()
+    try:
+        regra = session.query(AuditRule).filter(AuditRule.id == rule_id).first()
+        if regra is None:
+            logger.error(f"Regra não encontrada: {rule_id}")
+            return None
+        query = session.query(AuditRuleHistory).filter(AuditRuleHistory.rule_id == rule_id)
+        if versao is not None:
+            query = query.filter(AuditRuleHistory.versao == versao)
+        historico = query.order_by(AuditRuleHistory.versao.desc(), AuditRuleHistory.id.desc()).first()
+        if historico is None:
+            logger.error(f"Sem versão anterior no histórico para {rule_id}"
+                         + (f" (v{versao})" if versao is not None else ""))
+            return None
+
+        dados_anteriores = json.loads(historico.dados_anteriores)
+        regra_nova = regra.to_dict()
+        regra_antiga = _regra_da_versao(regra, dados_anteriores)
+        prioridade_antiga = dados_anteriores.get('prioridade', regra.prioridade)
+
+        outras = [(r.prioridade, r.id, r.to_dict()) for r in session.query(AuditRule).filter(
+            AuditRule.ativo == True, AuditRule.id != rule_id
+        ).all()]
+
+        def conjunto(versao_regra, prioridade):
+            itens = list(outras)
+            if versao_regra.get('ativo'):
+                itens.append((prioridade, rule_id, versao_regra))
+            return [dados for _, _, dados in sorted(itens, key=lambda item: (item[0] or 0, item[1]))]
+
+        return {
+            'regra_antiga': regra_antiga,
+            'regra_nova': regra_nova,
+            'regras_antes': conjunto(regra_antiga, prioridade_antiga),
+            'regras_depois': conjunto(regra_nova, regra.prioridade),
+            'versao_antiga': historico.versao,
+            'versao_atual': regra.versao,
+        }
+    finally:
+        session.close()
+
+
+def selecionar_arquivos(regra_antiga: Optional[Dict], regra_nova: Optional[Dict],
+                        external_lists: Optional[Dict] = None) -> List[str]:
+    """Arquivos indexados em que a versão antiga ou a nova da regra pode casar."""
+    requisitos = (feature_index.requisitos_da_regra(regra_antiga, external_lists)
+                  + feature_index.requisitos_da_regra(regra_nova, external_lists))
+    if not requisitos:
+        return []
+    return feature_repository.buscar_candidatos(requisitos)
+
+
+def _criar_motores(regras_antes: List[Dict], regras_depois: List[Dict]) -> Tuple[RuleEngine, RuleEngine]:
+    """Dois motores com as mesmas listas externas e conjuntos de regras diferentes."""
+    antes = RuleEngine()
+    antes.load_all_rules(use_database=False)  # Listas externas vêm sempre do JSON
+    antes.loaded_rules = regras_antes
+    depois = RuleEngine()
+    depois.rules_config_master = antes.rules_config_master
+    depois.external_lists = antes.external_lists
+    depois.loaded_rules = regras_depois
+    return antes, depois
+
+
+def _iniciar_worker(regras_antes: List[Dict], regras_depois: List[Dict]):
+    global _MOTORES
+    logging.getLogger('src.business.rules.rule_engine').setLevel(logging.WARNING)
+    _MOTORES = _criar_motores(regras_antes, regras_depois)
+
+
+def _nome_local(elemento) -> str:
+    tag = elemento.tag
+    if not isinstance(tag, str):
+        return '#comentario'
+    return tag.rsplit('}', 1)[-1]
+
+
+def _diferencas(arvore_antes, arvore_depois) -> Tuple[int, bool, List[Dict]]:
+    """
+    Compara os dois resultados.
+
+    Returns:
+        (total de diferenças, estrutura alterada, detalhes limitados)
+    """
+    elementos_antes = list(arvore_antes.getroot().iter())
+    elementos_depois = list(arvore_depois.getroot().iter())
+    mesma_estrutura = len(elementos_antes) == len(elementos_depois) and all(
+        a.tag == b.tag for a, b in zip(elementos_antes, elementos_depois)
+    )
+
+    detalhes = []
+    total = 0
+    if mesma_estrutura:
+        for a, b in zip(elementos_antes, elementos_depois):
+            texto_antes = (a.text or '').strip()
+            texto_depois = (b.text or '').strip()
+            if texto_antes != texto_depois:
+                total += 1
+                if len(detalhes) < MAX_DIFERENCAS_POR_ARQUIVO:
+                    detalhes.append({'caminho': arvore_antes.getpath(a),
+                                     'antes': texto_antes, 'depois': texto_depois})
+        return total, False, detalhes
+
+    # Tags inseridas/removidas/reordenadas: resume pela contagem de cada tag
+    contagem_antes = Counter(_nome_local(e) for e in elementos_antes)
+    contagem_depois = Counter(_nome_local(e) for e in elementos_depois)
+    for tag in sorted(set(contagem_antes) | set(contagem_depois)):
+        if contagem_antes[tag] != contagem_depois[tag]:
+            total += 1
+            if len(detalhes) < MAX_DIFERENCAS_POR_ARQUIVO:
+                detalhes.append({'caminho': tag, 'antes': contagem_antes[tag],
+                                 'depois': contagem_depois[tag]})
+    if total == 0:
+        # Mesmas tags em outra ordem
+        total = 1
+        detalhes.append({'caminho': 'ordem dos elementos', 'antes': None, 'depois': None})
+    return total, True, detalhes
+
+
+def comparar_arquivo(caminho: str) -> Dict:
+    """Aplica os dois conjuntos ao mesmo arquivo (em memória) e resume as diferenças."""
+    antes, depois = _MOTORES
+    nome = os.path.basename(caminho)
+    inicio = time.perf_counter()
+    resultado = {'arquivo': nome, 'caminho': caminho, 'alterado': False, 'total_diferencas': 0,
+                 'estrutura_alterada': False, 'diferencas': [], 'erro': None}
+    try:
+        arvore_antes = antes.xml_reader.load_xml_tree(caminho)
+        arvore_depois = depois.xml_reader.load_xml_tree(caminho)
+        if arvore_antes is None or arvore_depois is None:
+            resultado['erro'] = 'Falha ao ler o XML'
+        else:
+            antes.apply_rules_to_xml(arvore_antes, file_name=nome)
+            depois.apply_rules_to_xml(arvore_depois, file_name=nome)
+            total, estrutura, detalhes = _diferencas(arvore_antes, arvore_depois)
+            resultado.update(alterado=total > 0, total_diferencas=total,
+                             estrutura_alterada=estrutura, diferencas=detalhes)
+    except Exception as e:
+        logger.error(f"Erro na reexecução de {nome}: {e}")
+        resultado['erro'] = str(e)[:200]
+    resultado['duracao'] = round(time.perf_counter() - inicio, 3)
+    return resultado
+
+
+def reexecutar_impacto(rule_id: str, versao: Optional[int] = None, max_workers: Optional[int] = None,
+                       log_callback: Optional[Callable[[str], None]] = None) -> Optional[Dict]:
+    """
+    Reexecuta em dry-run, nos arquivos afetados, a alteração de uma regra.
+
+    Args:
+        rule_id: ID da regra alterada
+        versao: Versão anterior a comparar (padrão: a última do histórico)
+        max_workers: Processos paralelos (padrão: núcleos disponíveis; 1 = no próprio processo)
+
+    Returns:
+        Resumo com contagens e o resultado por arquivo; None se não houver diff
+    """
+    log = log_callback or (lambda msg: logger.info(msg))
+    inicio = time.time()
+
+    conjuntos = carregar_conjuntos(rule_id, versao)
+    if conjuntos is None:
+        return None
+
+    motores_locais = _criar_motores(conjuntos['regras_antes'], conjuntos['regras_depois'])
+    candidatos = selecionar_arquivos(conjuntos['regra_antiga'], conjuntos['regra_nova'],
+                                     motores_locais[0].external_lists)
+    existentes = [c for c in candidatos if os.path.isfile(c)]
+    indexados = feature_repository.contar_indexados()
+    log(f"INFO: {rule_id} v{conjuntos['versao_antiga']} -> v{conjuntos['versao_atual']}: "
+        f"{len(existentes)} de {indexados} arquivo(s) indexados podem ser afetados.")
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(existentes) or 1))
+
+    if max_workers == 1:
+        global _MOTORES
+        _MOTORES = motores_locais
+        arquivos = [comparar_arquivo(caminho) for caminho in existentes]
+    else:
+        contexto = multiprocessing.get_context(
+            'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn')
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=contexto, initializer=_iniciar_worker,
+                                 initargs=(conjuntos['regras_antes'], conjuntos['regras_depois'])) as executor:
+            arquivos = list(executor.map(comparar_arquivo, existentes, chunksize=4))
+
+    for resultado in arquivos:
+        if resultado['erro']:
+            log(f"ERRO: {resultado['arquivo']}: {resultado['erro']}")
+        elif resultado['alterado']:
+            log(f"ALTERA: {resultado['arquivo']} ({resultado['total_diferencas']} diferença(s))")
+
+    resumo = {
+        'rule_id': rule_id,
+        'versao_antiga': conjuntos['versao_antiga'],
+        'versao_atual': conjuntos['versao_atual'],
+        'indexados': indexados,
+        'candidatos': len(candidatos),
+        'ausentes': len(candidatos) - len(existentes),
+        'analisados': len(arquivos),
+        'alterados': sum(1 for r in arquivos if r['alterado']),
+        'erros': sum(1 for r in arquivos if r['erro']),
+        'duracao': round(time.time() - inicio, 2),
+        'arquivos': arquivos,
+    }
+    log(f"SUCESSO: {resumo['alterados']} de {resumo['analisados']} arquivo(s) analisados mudariam "
+        f"({resumo['duracao']}s).")
+    return resumo
+
+
+def indexar_pasta(caminho_pasta: str, log_callback: Optional[Callable[[str], None]] = None) -> int:
+    """
+    Indexa os .051 de uma pasta sem validá-los (arquivos anteriores ao índice).
+
+    Returns:
+        Quantidade de arquivos indexados
+    """
+    from src.workflow_controller import calculate_file_hash
+
+    log = log_callback or (lambda msg: logger.info(msg))
+    indexados = 0
+    for caminho in sorted(file_manager.listar_arquivos_051(caminho_pasta)):
+        nome = os.path.basename(caminho)
+        try:
+            tipos, valores = feature_index.extrair_caracteristicas_arquivo(caminho)
+        except Exception as e:
+            log(f"AVISO: {nome} não indexado: {e}")
+            continue
+        if feature_repository.registrar_features(os.path.abspath(caminho), nome, calculate_file_hash(caminho),
+                                                 None, tipos, valores):
+            indexados += 1
+    log(f"INFO: {indexados} arquivo(s) indexados em {caminho_pasta}.")
+    return indexados
+
+
+def salvar_relatorio(resumo: Dict, caminho_saida: str):
+    """Grava o resumo da reexecução em JSON."""
+    with open(caminho_saida, 'w', encoding='utf-8') as f:
+        json.dump(resumo, f, indent=2, ensure_ascii=False)
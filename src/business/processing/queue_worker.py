@@ -0,0 +1,199 @@
+# src/business/processing/queue_worker.py
+
+"""
+Worker headless da fila distribuída de validação.
+
+Várias máquinas apontando para o mesmo PostgreSQL (DB_PROVIDER=postgresql)
+executam um worker cada; todos consomem os itens dos jobs FILA_VALIDACAO
+(ver src/database/fila_repository.py), aplicam o motor de regras e gravam o
+resultado, os alertas e o tracking de ROI de volta no banco.
+
+Uma thread de heartbeat renova a lease dos itens em mãos. Se o worker morrer,
+a lease vence e qualquer outro worker devolve o item à fila.
+"""
+
+import itertools
+import logging
+import os
+import socket
+import threading
+from typing import Callable, Dict, List, Optional
+
+from src.business.rules.rule_engine import RuleEngine
+from src.database import db_manager, fila_repository, job_repository
+from src.infrastructure.reports import report_generator
+from src.models.repositories.execution_repository import ExecutionRepository
+
+logger = logging.getLogger(__name__)
+
+
+class QueueWorker:
+    """
+    Consome a fila distribuída até ser parado (ou até esvaziá-la).
+
+    Args:
+        worker_id: Identificador único (padrão: host:pid)
+        lote: Itens reservados por consulta
+        lease_segundos: Validade da reserva; o heartbeat renova a cada 1/3 desse tempo
+        intervalo_ocioso: Espera entre consultas quando a fila está vazia
+    """
+
+    def __init__(self, worker_id: Optional[str] = None, lote: int = 1,
+                 lease_segundos: int = fila_repository.LEASE_PADRAO_SEGUNDOS,
+                 intervalo_ocioso: float = 5.0, user_id: Optional[int] = None,
+                 log_callback: Optional[Callable[[str], None]] = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lote = max(1, lote)
+        self.lease_segundos = lease_segundos
+        self.intervalo_ocioso = intervalo_ocioso
+        self.user_id = user_id
+        self.log_callback = log_callback
+
+        self._parar = threading.Event()
+        self._em_maos: set = set()
+        self._lock = threading.Lock()
+        self.estatisticas = {'processados': 0, 'modificados': 0, 'erros': 0, 'descartados': 0}
+
+    def _log(self, mensagem: str):
+        if self.log_callback:
+            self.log_callback(mensagem)
+        else:
+            logger.info(mensagem)
+
+    def parar(self):
+        """Pede a parada: o item atual é concluído e as reservas restantes são devolvidas."""
+        self._parar.set()
+
+    def _heartbeat(self):
+        while not self._parar.wait(self.lease_segundos / 3):
+            with self._lock:
+                ids = list(self._em_maos)
+            if ids:
+                renovados = fila_repository.renovar_lease(self.worker_id, ids, self.lease_segundos)
+                if renovados < len(ids):
+                    logger.warning(f"Worker {self.worker_id}: {len(ids) - renovados} reserva(s) perdida(s).")
+
+    def executar(self, max_itens: Optional[int] = None, sair_quando_vazio: bool = False) -> Dict[str, int]:
+        """
+        Laço principal do worker.
+
+        Args:
+            max_itens: Para após processar essa quantidade de itens (None = sem limite)
+            sair_quando_vazio: Encerra quando não houver itens pendentes
+
+        Returns:
+            Estatísticas: processados, modificados, erros, descartados
+        """
+        # Import tardio: o controller carrega os dados de Unimeds na inicialização
+        from src.workflow_controller import WorkflowController
+
+        engine = RuleEngine()
+        if not engine.load_all_rules():
+            self._log("ERRO CRÍTICO: Falha ao carregar as regras de validação.")
+            return self.estatisticas
+
+        controller = WorkflowController(user_id=self.user_id)
+        controller.current_execution_id = db_manager.log_execution_start(
+            operation_type='VALIDATION_WORKER', user_id=self.user_id)
+        exec_repo = ExecutionRepository()
+        self._log(f"INFO: Worker {self.worker_id} iniciado (execução {controller.current_execution_id}).")
+
+        self._parar.clear()
+        heartbeat = threading.Thread(target=self._heartbeat, name=f"heartbeat-{self.worker_id}", daemon=True)
+        heartbeat.start()
+        try:
+            while not self._parar.is_set():
+                _, concluidos = fila_repository.liberar_itens_expirados()
+                for job_id in concluidos:
+                    self._finalizar_job(job_id)
+                quantidade = self.lote
+                if max_itens is not None:
+                    quantidade = min(quantidade, max_itens - self.estatisticas['processados'])
+                itens = fila_repository.reservar_itens(self.worker_id, quantidade, self.lease_segundos)
+                if not itens:
+                    if sair_quando_vazio:
+                        break
+                    self._parar.wait(self.intervalo_ocioso)
+                    continue
+
+                with self._lock:
+                    self._em_maos.update(item['id'] for item in itens)
+                for item in itens:
+                    if self._parar.is_set():
+                        break
+                    self._processar_item(controller, engine, exec_repo, item)
+                    with self._lock:
+                        self._em_maos.discard(item['id'])
+                self._devolver_reservas()
+
+                if max_itens is not None and self.estatisticas['processados'] >= max_itens:
+                    break
+        finally:
+            self._parar.set()
+            heartbeat.join()
+            self._devolver_reservas()
+            exec_repo.session.close()
+            db_manager.log_execution_end(
+                execution_id=controller.current_execution_id,
+                status='COMPLETED',
+                success_count=self.estatisticas['modificados'],
+                error_count=self.estatisticas['erros']
+            )
+        self._log(f"INFO: Worker {self.worker_id} encerrado: {self.estatisticas}")
+        return self.estatisticas
+
+    def _devolver_reservas(self):
+        with self._lock:
+            ids: List[int] = list(self._em_maos)
+            self._em_maos.clear()
+        if ids:
+            fila_repository.devolver_itens(self.worker_id, ids)
+
+    def _processar_item(self, controller, engine: RuleEngine, exec_repo: ExecutionRepository, item: Dict):
+        """Valida um arquivo da fila e grava o resultado."""
+        caminho = item['caminho']
+        nome_arquivo = os.path.basename(caminho)
+        self._log(f"--- Validando (job {item['job_id']}): {nome_arquivo} ---")
+
+        engine.alertas.clear()
+        try:
+            status, modificado, mensagem, file_hash = controller.validar_arquivo(
+                engine, exec_repo, caminho, nome_arquivo, self._log)
+        except Exception as e:
+            logger.error(f"Erro ao validar '{caminho}': {e}")
+            status, modificado, mensagem, file_hash = 'ERRO', False, str(e)[:500], None
+        alertas = list(engine.alertas)
+        engine.alertas.clear()
+
+        resultado = fila_repository.concluir_item(item['id'], self.worker_id, status, alterado=modificado,
+                                                  mensagem=mensagem, file_hash=file_hash, alertas=alertas)
+        if not resultado['aceito']:
+            self.estatisticas['descartados'] += 1
+            return
+
+        self.estatisticas['processados'] += 1
+        if modificado:
+            self.estatisticas['modificados'] += 1
+        if status == 'ERRO':
+            self.estatisticas['erros'] += 1
+        if resultado['job_concluido']:
+            self._finalizar_job(resultado['job_id'])
+
+    def _finalizar_job(self, job_id: int):
+        """O worker que conclui o último item gera o relatório de alertas do lote."""
+        resumo = job_repository.resumo_job(job_id)
+        self._log(f"SUCESSO: Job {job_id} concluído. {resumo['alterados']} modificado(s), "
+                  f"{resumo['PULADO']} pulado(s), {resumo['ERRO']} com erro.")
+
+        alertas = fila_repository.alertas_do_job(job_id)
+        primeiro = next(alertas, None)
+        if primeiro is None:
+            alertas.close()
+            return
+        job = job_repository.obter_job(job_id)
+        sucesso, caminho = report_generator.gerar_relatorio_alertas(
+            itertools.chain([primeiro], alertas), job['parametros']['caminho_pasta'])
+        if sucesso:
+            self._log(f"⚠️ ALERTAS do job {job_id} - Relatório: {caminho}")
+        else:
+            self._log(f"AVISO: Erro ao gerar relatório de alertas do job {job_id}.")
@@ -0,0 +1,382 @@
+# src/business/processing/roi_simulation.py
+
+"""
+Simulação de ROI de regras candidatas (dry-run) sobre o acervo histórico.
+
+Antes de ativar uma regra de src/config/regras, aplica-a (junto com as regras
+já ativas, ou isoladamente) aos .051 de pastas antigas, em processos
+paralelos e sem gravar nada (nem arquivo, nem banco), e estima o impacto no
+mesmo formato do tracker de glosas evitadas (src/relatorio_glosas):
+
+- GLOSA_GUIA: guia inteira salva, pelo valor total dos procedimentos da guia;
+- GLOSA_ITEM: item corrigido, pelo vl_ServCobrado + tx_AdmServico do item;
+  itens de uma guia já salva não são contados (hierarquia GUIA > ITEM);
+- demais categorias (ou contabilizar=false): correções sem valor.
+
+Uma guia/item corrigido por mais de uma regra candidata entra uma única vez no
+total; no detalhamento por regra, cada regra recebe o valor integral do que
+corrigiu (o que ela protegeria sozinha).
+"""
+
+import copy
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+from src.business.rules.rule_engine import RuleEngine
+from src.business.rules.streaming_engine import TAGS_GUIA
+from src.infrastructure.parsers.xml_reader import NAMESPACES
+
+logger = logging.getLogger(__name__)
+
+CATEGORIAS_VALORADAS = ('GLOSA_GUIA', 'GLOSA_ITEM')
+
+# Progresso no log a cada N arquivos simulados
+INTERVALO_PROGRESSO = 500
+
+_PTU = f"{{{NAMESPACES['ptu']}}}"
+_TAGS_GUIA = frozenset(f"{_PTU}{tag}" for tag in TAGS_GUIA)
+_TAG_PROCEDIMENTO = f"{_PTU}procedimentosExecutados"
+
+# Motor e IDs das candidatas no processo worker
+_MOTOR: Optional[RuleEngine] = None
+_IDS_CANDIDATAS: frozenset = frozenset()
+
+
+def carregar_regras_candidatas(arquivos: Iterable[str], ids: Optional[Iterable[str]] = None) -> List[Dict]:
+    """
+    Lê as regras candidatas de arquivos JSON no formato de src/config/regras.
+
+    Args:
+        arquivos: Arquivos de regras (caminho, ou relativo a src/config, ex.: "regras/cnes.json")
+        ids: Se informado, apenas estas regras; senão, todas as dos arquivos
+
+    Returns:
+        Cópias das regras com ativo=True (na simulação toda candidata é aplicada)
+    """
+    config_dir = RuleEngine().config_dir
+    procurados = set(ids) if ids else None
+    regras = []
+    for arquivo in arquivos:
+        caminho = arquivo if os.path.isfile(arquivo) else os.path.join(config_dir, arquivo)
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                conteudo = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Erro ao ler regras candidatas de {arquivo}: {e}")
+            continue
+        if not isinstance(conteudo, list):
+            logger.error(f"Arquivo de regras sem lista de regras: {arquivo}")
+            continue
+        for regra in conteudo:
+            if not isinstance(regra, dict) or not regra.get('id'):
+                continue
+            if procurados is None or regra['id'] in procurados:
+                candidata = copy.deepcopy(regra)
+                candidata['ativo'] = True
+                regras.append(candidata)
+
+    if procurados:
+        ausentes = procurados - {regra['id'] for regra in regras}
+        if ausentes:
+            logger.warning(f"Regras candidatas não encontradas: {', '.join(sorted(ausentes))}")
+    return regras
+
+
+def listar_arquivos(pastas: Iterable[str], limite: Optional[int] = None) -> List[str]:
+    """Arquivos .051 das pastas (recursivo) ou informados diretamente, em ordem."""
+    arquivos = set()
+    for pasta in pastas:
+        if os.path.isfile(pasta):
+            arquivos.add(os.path.abspath(pasta))
+            continue
+        for raiz, _, nomes in os.walk(pasta):
+            arquivos.update(os.path.abspath(os.path.join(raiz, nome))
+                            for nome in nomes if nome.lower().endswith('.051'))
+    ordenados = sorted(arquivos)
+    return ordenados[:limite] if limite else ordenados
+
+
+def _criar_motor(candidatas: List[Dict], incluir_ativas: bool) -> RuleEngine:
+    """Motor com as listas externas do JSON e as candidatas após as regras ativas."""
+    motor = RuleEngine()
+    motor.load_all_rules(use_database=False)  # Sem banco: os workers não tocam no SQLite
+    ids = {regra['id'] for regra in candidatas}
+    ativas = [r for r in motor.loaded_rules if r.get('id') not in ids] if incluir_ativas else []
+    motor.loaded_rules = ativas + list(candidatas)
+    return motor
+
+
+def _iniciar_worker(candidatas: List[Dict], incluir_ativas: bool):
+    global _MOTOR, _IDS_CANDIDATAS
+    logging.getLogger('src.business.rules.rule_engine').setLevel(logging.WARNING)
+    _MOTOR = _criar_motor(candidatas, incluir_ativas)
+    _IDS_CANDIDATAS = frozenset(regra['id'] for regra in candidatas)
+
+
+def _numero(elemento, tag: str) -> float:
+    encontrado = elemento.find(f".//ptu:{tag}", namespaces=NAMESPACES)
+    if encontrado is None or not encontrado.text:
+        return 0.0
+    try:
+        return float(encontrado.text.strip().replace(',', '.'))
+    except ValueError:
+        return 0.0
+
+
+def _texto(elemento, caminho: str) -> Optional[str]:
+    encontrado = elemento.find(caminho, namespaces=NAMESPACES)
+    if encontrado is None or not encontrado.text:
+        return None
+    return encontrado.text.strip()
+
+
+def _ancestral(elemento, tags) -> Optional[object]:
+    """O próprio elemento ou o ancestral mais próximo com uma das tags."""
+    while elemento is not None:
+        if elemento.tag in tags:
+            return elemento
+        elemento = elemento.getparent()
+    return None
+
+
+def _valores_item(procedimento) -> Dict:
+    servico = _numero(procedimento, 'vl_ServCobrado')
+    taxa = _numero(procedimento, 'tx_AdmServico')
+    return {'valor_servico': servico, 'valor_taxa': taxa, 'valor_total': round(servico + taxa, 2)}
+
+
+class _ColetorCorrecoes:
+    """Observador do motor: agrupa as correções das candidatas por guia e por item."""
+
+    def __init__(self, ids_candidatas):
+        self.ids_candidatas = ids_candidatas
+        self.guias: Dict[str, Dict] = {}
+        self.itens: Dict[tuple, Dict] = {}
+        self.correcoes: Dict[str, int] = {}
+        self.sem_valor: Dict[str, int] = {}
+
+    def _id_guia(self, guia) -> str:
+        return _texto(guia, './/ptu:nr_GuiaTissPrestador') or guia.getroottree().getpath(guia)
+
+    def __call__(self, regra: Dict, elemento):
+        id_regra = regra.get('id', 'UNKNOWN')
+        if id_regra not in self.ids_candidatas:
+            return
+        self.correcoes[id_regra] = self.correcoes.get(id_regra, 0) + 1
+
+        metadata = regra.get('metadata_glosa', {}) or {}
+        categoria = metadata.get('categoria')
+        guia = _ancestral(elemento, _TAGS_GUIA)
+        procedimento = _ancestral(elemento, (_TAG_PROCEDIMENTO,))
+        valorada = categoria in CATEGORIAS_VALORADAS and metadata.get('contabilizar', True)
+        if not valorada or guia is None or (categoria == 'GLOSA_ITEM' and procedimento is None):
+            self.sem_valor[id_regra] = self.sem_valor.get(id_regra, 0) + 1
+            return
+
+        guia_id = self._id_guia(guia)
+        if categoria == 'GLOSA_GUIA':
+            registro = self.guias.get(guia_id)
+            if registro is None:
+                procedimentos = guia.findall('.//ptu:procedimentosExecutados', namespaces=NAMESPACES)
+                registro = self.guias[guia_id] = {
+                    'guia_id': guia_id,
+                    'valor_total_guia': round(sum(_valores_item(p)['valor_total'] for p in procedimentos), 2),
+                    'qtd_itens': len(procedimentos),
+                    'regras': [],
+                }
+        else:
+            seq_item = _texto(procedimento, './/ptu:seq_item') or procedimento.getroottree().getpath(procedimento)
+            registro = self.itens.get((guia_id, seq_item))
+            if registro is None:
+                registro = self.itens[(guia_id, seq_item)] = {
+                    'guia_id': guia_id,
+                    'seq_item': seq_item,
+                    'cd_servico': _texto(procedimento, './ptu:procedimentos/ptu:cd_Servico'),
+                    **_valores_item(procedimento),
+                    'regras': [],
+                }
+        if id_regra not in registro['regras']:
+            registro['regras'].append(id_regra)
+
+    def resultado(self) -> Dict:
+        """Guias salvas e itens contados, aplicando a hierarquia GUIA > ITEM."""
+        itens = [item for chave, item in self.itens.items() if chave[0] not in self.guias]
+        return {
+            'guias': list(self.guias.values()),
+            'itens': itens,
+            'itens_absorvidos': len(self.itens) - len(itens),
+            'correcoes': dict(self.correcoes),
+            'sem_valor': dict(self.sem_valor),
+        }
+
+
+def simular_arquivo(caminho: str) -> Dict:
+    """Aplica as regras ao arquivo em memória e coleta o impacto das candidatas."""
+    motor = _MOTOR
+    nome = os.path.basename(caminho)
+    inicio = time.perf_counter()
+    resultado = {'arquivo': nome, 'caminho': caminho, 'tamanho': 0, 'guias': [], 'itens': [],
+                 'itens_absorvidos': 0, 'correcoes': {}, 'sem_valor': {}, 'erro': None}
+    coletor = _ColetorCorrecoes(_IDS_CANDIDATAS)
+    try:
+        resultado['tamanho'] = os.path.getsize(caminho)
+        arvore = motor.xml_reader.load_xml_tree(caminho)
+        if arvore is None:
+            resultado['erro'] = 'Falha ao ler o XML'
+        else:
+            motor.observador_correcoes = coletor
+            try:
+                motor.apply_rules_to_xml(arvore, file_name=nome)
+            finally:
+                motor.observador_correcoes = None
+            resultado.update(coletor.resultado())
+    except Exception as e:
+        logger.error(f"Erro na simulação de {nome}: {e}")
+        resultado['erro'] = str(e)[:200]
+    resultado['duracao'] = round(time.perf_counter() - inicio, 4)
+    return resultado
+
+
+def _resumo_por_regra(candidatas: List[Dict]) -> Dict[str, Dict]:
+    por_regra = {}
+    for regra in candidatas:
+        metadata = regra.get('metadata_glosa', {}) or {}
+        por_regra[regra['id']] = {
+            'descricao': regra.get('descricao', ''),
+            'categoria': metadata.get('categoria'),
+            'correcoes': 0, 'sem_valor': 0, 'arquivos': 0,
+            'guias': 0, 'valor_guias': 0.0, 'itens': 0, 'valor_itens': 0.0, 'valor_total': 0.0,
+        }
+    return por_regra
+
+
+def _acumular(resumo: Dict, por_regra: Dict[str, Dict], resultado: Dict):
+    totais = resumo['totais']
+    totais['arquivos'] += 1
+    totais['bytes'] += resultado['tamanho']
+    if resultado['erro']:
+        totais['erros'] += 1
+        return
+    if resultado['correcoes']:
+        totais['arquivos_afetados'] += 1
+        resumo['arquivos'].append({
+            'arquivo': resultado['arquivo'], 'caminho': resultado['caminho'],
+            'guias': len(resultado['guias']), 'itens': len(resultado['itens']),
+            'valor': round(sum(g['valor_total_guia'] for g in resultado['guias'])
+                           + sum(i['valor_total'] for i in resultado['itens']), 2),
+            'correcoes': resultado['correcoes'],
+        })
+
+    totais['guias'] += len(resultado['guias'])
+    totais['itens'] += len(resultado['itens'])
+    totais['itens_absorvidos'] += resultado['itens_absorvidos']
+    for guia in resultado['guias']:
+        totais['valor_guias'] += guia['valor_total_guia']
+        for id_regra in guia['regras']:
+            por_regra[id_regra]['guias'] += 1
+            por_regra[id_regra]['valor_guias'] += guia['valor_total_guia']
+    for item in resultado['itens']:
+        totais['valor_itens'] += item['valor_total']
+        for id_regra in item['regras']:
+            por_regra[id_regra]['itens'] += 1
+            por_regra[id_regra]['valor_itens'] += item['valor_total']
+    for id_regra, quantidade in resultado['correcoes'].items():
+        por_regra[id_regra]['correcoes'] += quantidade
+        por_regra[id_regra]['arquivos'] += 1
+    for id_regra, quantidade in resultado['sem_valor'].items():
+        por_regra[id_regra]['sem_valor'] += quantidade
+
+
+def simular_roi(arquivos: List[str], candidatas: List[Dict], incluir_ativas: bool = True,
+                max_workers: Optional[int] = None,
+                log_callback: Optional[Callable[[str], None]] = None) -> Dict:
+    """
+    Simula, em dry-run, o impacto das regras candidatas nos arquivos.
+
+    Args:
+        arquivos: Arquivos .051 do acervo (ver listar_arquivos)
+        candidatas: Regras candidatas (ver carregar_regras_candidatas)
+        incluir_ativas: Se True, as candidatas rodam após as regras já ativas (JSON),
+            como rodariam em produção; se False, isoladamente
+        max_workers: Processos paralelos (padrão: núcleos disponíveis; 1 = no próprio processo)
+
+    Returns:
+        Resumo com totais, detalhamento por regra, arquivos afetados e vazão
+    """
+    log = log_callback or (lambda msg: logger.info(msg))
+    inicio = time.perf_counter()
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(arquivos) or 1))
+    log(f"INFO: Simulando {len(candidatas)} regra(s) candidata(s) em {len(arquivos)} arquivo(s) "
+        f"com {max_workers} processo(s).")
+
+    resumo = {
+        'regras': [regra['id'] for regra in candidatas],
+        'incluir_ativas': incluir_ativas,
+        'workers': max_workers,
+        'totais': {'arquivos': 0, 'arquivos_afetados': 0, 'erros': 0, 'bytes': 0,
+                   'guias': 0, 'valor_guias': 0.0, 'itens': 0, 'valor_itens': 0.0,
+                   'itens_absorvidos': 0},
+        'arquivos': [],
+    }
+    por_regra = _resumo_por_regra(candidatas)
+
+    def consumir(resultados):
+        for resultado in resultados:
+            _acumular(resumo, por_regra, resultado)
+            if resultado['erro']:
+                log(f"ERRO: {resultado['arquivo']}: {resultado['erro']}")
+            processados = resumo['totais']['arquivos']
+            if processados % INTERVALO_PROGRESSO == 0:
+                decorrido = time.perf_counter() - inicio
+                log(f"INFO: {processados}/{len(arquivos)} arquivo(s) "
+                    f"({processados / decorrido:.1f} arquivos/s).")
+
+    if max_workers == 1:
+        global _MOTOR, _IDS_CANDIDATAS
+        _MOTOR = _criar_motor(candidatas, incluir_ativas)
+        _IDS_CANDIDATAS = frozenset(regra['id'] for regra in candidatas)
+        consumir(simular_arquivo(caminho) for caminho in arquivos)
+    else:
+        contexto = multiprocessing.get_context(
+            'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn')
+        # Lotes grandes o bastante para amortizar o IPC, pequenos o bastante para balancear
+        chunksize = max(1, min(64, len(arquivos) // (max_workers * 8)))
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=contexto, initializer=_iniciar_worker,
+                                 initargs=(candidatas, incluir_ativas)) as executor:
+            consumir(executor.map(simular_arquivo, arquivos, chunksize=chunksize))
+
+    duracao = time.perf_counter() - inicio
+    totais = resumo['totais']
+    totais['valor_guias'] = round(totais['valor_guias'], 2)
+    totais['valor_itens'] = round(totais['valor_itens'], 2)
+    totais['valor_total'] = round(totais['valor_guias'] + totais['valor_itens'], 2)
+    for dados in por_regra.values():
+        dados['valor_guias'] = round(dados['valor_guias'], 2)
+        dados['valor_itens'] = round(dados['valor_itens'], 2)
+        dados['valor_total'] = round(dados['valor_guias'] + dados['valor_itens'], 2)
+    resumo['por_regra'] = por_regra
+    resumo['arquivos'].sort(key=lambda a: a['valor'], reverse=True)
+    resumo['vazao'] = {
+        'duracao': round(duracao, 2),
+        'arquivos_por_segundo': round(totais['arquivos'] / duracao, 1) if duracao else 0.0,
+        'mb_por_segundo': round(totais['bytes'] / 1024 / 1024 / duracao, 2) if duracao else 0.0,
+    }
+
+    log(f"SUCESSO: {totais['arquivos_afetados']} de {totais['arquivos']} arquivo(s) afetados; "
+        f"{totais['guias']} guia(s) e {totais['itens']} item(ns) salvos, R$ {totais['valor_total']:,.2f} "
+        f"({resumo['vazao']['arquivos_por_segundo']} arquivos/s).")
+    return resumo
+
+
+def salvar_relatorio(resumo: Dict, caminho_saida: str):
+    """Grava o resumo da simulação em JSON."""
+    with open(caminho_saida, 'w', encoding='utf-8') as f:
+        json.dump(resumo, f, indent=2, ensure_ascii=False)
@@ -3,23 +3,43 @@ Processamento seguro de lotes com error handling robusto.
 
 Garante que:
 - Erros em arquivos individuais não param o lote inteiro
-- Timeout de 30s por arquivo
+- Cada arquivo roda em um processo worker supervisionado, com timeout de
+  parede (30s por padrão) e limite de memória (RLIMIT_AS)
+- Arquivos que estouram tempo/memória ou derrubam o worker são tentados de
+  novo uma vez em um worker novo; se falharem de novo vão para a quarentena
 - Logging estruturado de todos os erros
-- Relatório detalhado ao final
+- Relatório detalhado ao final, com duração e pico de memória por arquivo
+- Alertas das regras e contagens de eventos gerados nos workers voltam ao
+  processo principal (engine.alertas e resumo do lote)
 """
 import logging
+import multiprocessing
+import os
 import time
-import signal
-from contextlib import contextmanager
+from collections import deque
+from multiprocessing.connection import wait
 from typing import Tuple, List, Dict, Any, Optional
 from pathlib import Path
 
 from src.business.rules.rule_engine import RuleEngine
+from src.infrastructure.files.alert_spool import AlertSpool
 from src.infrastructure.parsers.xml_reader import XMLReader
 from lxml import etree
 
+try:
+    import resource
+except ImportError:  # Windows: sem limite de memória, só timeout
+    resource = None
+
 logger = logging.getLogger(__name__)
 
+TIMEOUT_PADRAO = 30.0
+LIMITE_MEMORIA_MB_PADRAO = 2048
+TENTATIVAS_PADRAO = 2  # 1 execução + 1 nova tentativa em worker novo
+
+# Parser estrito: o XMLReader usa recover=True, que "conserta" XML truncado
+_PARSER_LOTE = etree.XMLParser(strip_cdata=False, resolve_entities=False, huge_tree=True)
+
 
 class ProcessingError(Exception):
     """Erro durante processamento que não deve parar o lote"""
@@ -29,175 +49,413 @@ class ProcessingError(Exception):
 def process_file_safe(
     file_path: str,
     rule_engine: RuleEngine,
-    xml_reader: XMLReader
+    xml_reader: Optional[XMLReader] = None
 ) -> Tuple[bool, Optional[Any], Optional[str]]:
     """
     Processa um arquivo com error handling completo.
-    
+
     Args:
         file_path: Caminho do arquivo XML
         rule_engine: Instância do RuleEngine
-        xml_reader: Instância do XMLReader
-        
+        xml_reader: Mantido por compatibilidade; o parse do lote é estrito
+
     Returns:
         Tupla (success, result, error):
             - success (bool): True se processou com sucesso
             - result: Resultado do processamento (se sucesso)
             - error (str): Mensagem de erro (se falha)
+
+    MemoryError é propagado: no worker ele indica estouro do limite de memória.
     """
     file_name = Path(file_path).name
-    
+
+    # 1. Parse XML
     try:
-        # 1. Parse XML
-        try:
-            tree = xml_reader.parse_xml_file(file_path)
-            if tree is None:
-                raise ProcessingError("parse_xml_file retornou None")
-        except Exception as e:
-            logger.error(f"Erro parseando {file_name}: {e}")
-            return (False, None, f"XML inválido: {str(e)[:100]}")
-        
-        # 2. Validar XSD (opcional, não bloqueia)
+        tree = etree.parse(file_path, _PARSER_LOTE)
+        if tree is None or tree.getroot() is None:
+            raise ProcessingError("XML sem elemento raiz")
+    except MemoryError:
+        raise
+    except Exception as e:
+        logger.error(f"Erro parseando {file_name}: {e}")
+        return (False, None, f"XML inválido: {str(e)[:100]}")
+
+    # 2. Aplicar regras
+    try:
+        modified = rule_engine.apply_rules_to_xml(tree)
+    except MemoryError:
+        raise
+    except Exception as e:
+        logger.error(f"Erro aplicando regras em {file_name}: {e}", exc_info=True)
+        return (False, None, f"Erro nas regras: {str(e)[:100]}")
+
+    result = {
+        'modified': modified,
+        'tree': tree,
+        'file_name': file_name
+    }
+    return (True, result, None)
+
+
+def _memoria_proc_mb(campo: str, pid: Optional[int] = None) -> Optional[float]:
+    """Lê um campo de memória (VmHWM, VmSize...) de /proc/<pid>/status, em MB."""
+    try:
+        with open(f"/proc/{pid or 'self'}/status", encoding="ascii") as status:
+            for linha in status:
+                if linha.startswith(campo + ":"):
+                    return int(linha.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _pico_memoria_mb() -> float:
+    """Pico de RSS do processo atual (desde o último _zerar_pico_memoria)."""
+    pico = _memoria_proc_mb("VmHWM")
+    if pico is None and resource is not None:
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return round(pico or 0.0, 1)
+
+
+def _zerar_pico_memoria():
+    """Reinicia o VmHWM (Linux >= 4.0) para medir o pico de cada arquivo."""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+
+
+def _aplicar_limite_memoria(limite_mb: Optional[float]):
+    """
+    Limita o espaço de endereçamento do worker. RLIMIT_RSS não é aplicado pelo
+    Linux; RLIMIT_AS é, e conta a memória herdada do fork, por isso o limite é
+    somado ao tamanho atual do processo.
+    """
+    if resource is None or not limite_mb:
+        return
+    base_mb = _memoria_proc_mb("VmSize") or 0.0
+    limite = int((base_mb + limite_mb) * 1024 * 1024)
+    try:
+        _, maximo = resource.getrlimit(resource.RLIMIT_AS)
+        if maximo != resource.RLIM_INFINITY:
+            limite = min(limite, maximo)
+        resource.setrlimit(resource.RLIMIT_AS, (limite, maximo))
+    except (ValueError, OSError) as e:
+        logger.warning(f"Não foi possível limitar a memória do worker: {e}")
+
+
+def _executar_worker(conexao, rule_engine: Optional[RuleEngine], memory_limit_mb: Optional[float]):
+    """
+    Laço do processo worker: recebe caminhos pela conexão e devolve
+    (success, payload, error, duration, peak_memory_mb). O payload leva o XML,
+    os alertas e as contagens de eventos do arquivo. Encerra ao receber None
+    ou após um MemoryError (o estado do processo deixa de ser confiável).
+    """
+    if rule_engine is None:
+        # spawn (sem fork): o RuleEngine não é serializável, cada worker carrega o seu
+        rule_engine = RuleEngine()
+        rule_engine.load_all_rules()
+    else:
+        # Conexões herdadas do pai não podem ser usadas pelo filho
+        from src.database import db_manager
+        db_manager.engine.dispose(close=False)
+    _aplicar_limite_memoria(memory_limit_mb)
+
+    while True:
         try:
-            # Se tiver validador XSD, usar aqui
-            # xml_reader.validate_xsd(tree)
-            pass
-        except Exception as e:
-            logger.warning(f"XSD inválido em {file_name}: {e}")
-            # Continua mesmo com erro XSD
-        
-        # 3. Aplicar regras
+            file_path = conexao.recv()
+        except (EOFError, OSError):
+            return
+        if file_path is None:
+            return
+
+        _zerar_pico_memoria()
+        inicio = time.perf_counter()
+        rule_engine.alertas.clear()
         try:
-            modified = rule_engine.apply_rules_to_xml(tree)
-            result = {
-                'modified': modified,
-                'tree': tree,
-                'file_name': file_name
-            }
-            return (True, result, None)
-        except Exception as e:
-            logger.error(f"Erro aplicando regras em {file_name}: {e}", exc_info=True)
-            return (False, None, f"Erro nas regras: {str(e)[:100]}")
-                
-    except Exception as e:
-        logger.exception(f"Erro inesperado em {file_name}")
-        return (False, None, f"Erro inesperado: {str(e)[:100]}")
+            success, result, error = process_file_safe(file_path, rule_engine)
+            payload = None
+            if success:
+                payload = {'modified': result['modified'], 'xml': etree.tostring(result['tree']),
+                           'alertas': list(rule_engine.alertas), 'eventos': rule_engine.eventos.ultimo_resumo}
+                del result
+            conexao.send((success, payload, error, time.perf_counter() - inicio, _pico_memoria_mb()))
+        except MemoryError:
+            conexao.send(('MEMORIA', None, f"Limite de memória ({memory_limit_mb} MB) excedido",
+                          time.perf_counter() - inicio, _pico_memoria_mb()))
+            return
+        finally:
+            rule_engine.alertas.clear()
+
+
+class _Worker:
+    """Processo worker supervisionado e o arquivo que ele está processando."""
+
+    def __init__(self, contexto, rule_engine: Optional[RuleEngine], memory_limit_mb: Optional[float]):
+        self.conexao, conexao_filho = contexto.Pipe()
+        self.processo = contexto.Process(target=_executar_worker,
+                                         args=(conexao_filho, rule_engine, memory_limit_mb), daemon=True)
+        self.processo.start()
+        conexao_filho.close()
+        self.tarefa: Optional[Tuple[int, str, int]] = None  # (índice, caminho, tentativa)
+        self.inicio = 0.0
+
+    def enviar(self, tarefa: Tuple[int, str, int]):
+        self.tarefa = tarefa
+        self.inicio = time.monotonic()
+        self.conexao.send(tarefa[1])
+
+    def encerrar(self, forcar: bool = False):
+        if not forcar and self.processo.is_alive():
+            try:
+                self.conexao.send(None)
+            except OSError:
+                pass
+            self.processo.join(5)
+        if self.processo.is_alive():
+            self.processo.kill()
+            self.processo.join()
+        self.conexao.close()
+
+
+def _contexto_multiprocessing():
+    """fork quando disponível (herda o RuleEngine já carregado); senão spawn."""
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork"), True
+    return multiprocessing.get_context("spawn"), False
 
 
 def process_batch(
     file_paths: List[str],
     rule_engine: RuleEngine,
     xml_reader: Optional[XMLReader] = None,
-    max_errors: int = 100
+    max_errors: int = 100,
+    timeout: float = TIMEOUT_PADRAO,
+    memory_limit_mb: Optional[float] = LIMITE_MEMORIA_MB_PADRAO,
+    max_workers: Optional[int] = None,
+    max_attempts: int = TENTATIVAS_PADRAO
 ) -> Dict[str, Any]:
     """
     Processa um lote completo de arquivos, não para em erros individuais.
-    
+
     Args:
         file_paths: Lista de caminhos de arquivo
-        rule_engine: Instância do RuleEngine
-        xml_reader: Instância do XMLReader (cria se None)
+        rule_engine: Instância do RuleEngine; os alertas dos workers são
+            acrescentados a `rule_engine.alertas`, na ordem dos arquivos concluídos
+        xml_reader: Mantido por compatibilidade (não utilizado)
         max_errors: Máximo de erros antes de abortar lote (padrão: 100)
-        
+        timeout: Tempo máximo de parede por arquivo, em segundos (padrão: 30)
+        memory_limit_mb: Memória adicional permitida a cada worker (None = sem limite)
+        max_workers: Processos worker simultâneos (padrão: até 4, conforme CPUs)
+        max_attempts: Execuções por arquivo em caso de timeout/memória/queda do worker
+
     Returns:
         Dicionário com:
             - total: Total de arquivos no lote
-            - processed: Arquivos processados (pode ser < total se abortar)
+            - processed: Arquivos concluídos (pode ser < total se abortar)
             - success: Arquivos processados com sucesso
             - errors: Número de erros
             - results: Lista de resultados bem-sucedidos
             - error_details: Lista de erros detalhados
+            - quarantine: Arquivos que falharam em todas as tentativas
+            - file_stats: Duração, pico de memória e tentativas de cada arquivo
+            - alerts: Alertas gerados pelas regras nos arquivos com sucesso
+            - events: Contagens de eventos do motor somadas no lote (evento -> {chave: qtd})
             - duration: Tempo total de processamento
     """
-    if xml_reader is None:
-        xml_reader = XMLReader()
-    
     total = len(file_paths)
     success_count = 0
     error_count = 0
     results = []
     error_details = []
-    
+    quarantine = []
+    file_stats = []
+    alert_count = 0
+    events: Dict[str, Dict[str, int]] = {}
+
     logger.info(f"🚀 Iniciando processamento de lote com {total} arquivos")
     start_time = time.time()
-    
-    for i, file_path in enumerate(file_paths, 1):
-        logger.info(f"📄 Processando {i}/{total}: {Path(file_path).name}")
-        
-        success, result, error = process_file_safe(
-            file_path,
-            rule_engine,
-            xml_reader
-        )
-        
+
+    contexto, herda_engine = _contexto_multiprocessing()
+    if max_workers is None:
+        max_workers = min(4, os.cpu_count() or 1)
+    max_workers = max(1, min(max_workers, total or 1))
+
+    def novo_worker():
+        return _Worker(contexto, rule_engine if herda_engine else None, memory_limit_mb)
+
+    # No fork os workers herdam o engine: recebem um spool vazio, não o arquivo de alertas do pai
+    alertas_lote = rule_engine.alertas
+    rule_engine.alertas = AlertSpool()
+    pendentes = deque((i, file_path, 1) for i, file_path in enumerate(file_paths, 1))
+    workers = []
+
+    def registrar(indice, file_path, tentativa, success, payload, error, duracao, pico, quarentena=False):
+        nonlocal success_count, error_count, alert_count
+        nome = Path(file_path).name
+        stats = {
+            'file': nome,
+            'index': indice,
+            'status': 'success' if success else ('quarantine' if quarentena else 'error'),
+            'duration': round(duracao, 3),
+            'peak_memory_mb': pico,
+            'attempts': tentativa
+        }
+        file_stats.append(stats)
         if success:
             success_count += 1
-            results.append(result)
-            logger.info(f"✅ Sucesso: {Path(file_path).name}")
+            tree = etree.ElementTree(etree.fromstring(payload['xml'], _PARSER_LOTE))
+            for alerta in payload['alertas']:
+                alertas_lote.append(alerta)
+            alert_count += len(payload['alertas'])
+            for evento, chaves in payload['eventos'].items():
+                soma = events.setdefault(evento, {})
+                for chave, quantidade in chaves.items():
+                    soma[chave] = soma.get(chave, 0) + quantidade
+            results.append({'modified': payload['modified'], 'tree': tree, 'file_name': nome,
+                            'index': indice, 'duration': stats['duration'],
+                            'peak_memory_mb': pico, 'alerts': len(payload['alertas']),
+                            'events': payload['eventos']})
+            logger.info(f"✅ Sucesso: {nome} ({duracao:.1f}s, {pico} MB)")
+            return
+        error_count += 1
+        detalhe = {
+            'file': nome,
+            'path': file_path,
+            'error': error,
+            'index': indice,
+            'duration': stats['duration'],
+            'peak_memory_mb': pico,
+            'attempts': tentativa
+        }
+        error_details.append(detalhe)
+        if quarentena:
+            quarantine.append(detalhe)
+            logger.error(f"☣️  Quarentena: {nome} após {tentativa} tentativa(s): {error}")
         else:
-            error_count += 1
-            error_details.append({
-                'file': Path(file_path).name,
-                'path': file_path,
-                'error': error,
-                'index': i
-            })
-            logger.error(f"❌ Erro em {Path(file_path).name}: {error}")
-            
-            # Abortar se muitos erros
-            if error_count >= max_errors:
-                logger.critical(
-                    f"🛑 Atingido limite de {max_errors} erros. "
-                    f"Abortando lote após {i}/{total} arquivos."
-                )
+            logger.error(f"❌ Erro em {nome}: {error}")
+
+    try:
+        if total:
+            workers.extend(novo_worker() for _ in range(max_workers))
+        while error_count < max_errors:
+            for worker in workers:
+                if worker.tarefa is None and pendentes:
+                    indice, file_path, tentativa = pendentes.popleft()
+                    logger.info(f"📄 Processando {indice}/{total}: {Path(file_path).name}"
+                                + (f" (tentativa {tentativa})" if tentativa > 1 else ""))
+                    worker.enviar((indice, file_path, tentativa))
+            ocupados = [w for w in workers if w.tarefa is not None]
+            if not ocupados:
                 break
-    
+
+            prazo = min(w.inicio for w in ocupados) + timeout - time.monotonic()
+            prontas = wait([w.conexao for w in ocupados], timeout=max(0.0, prazo))
+
+            for posicao, worker in enumerate(workers):
+                if worker.tarefa is None or error_count >= max_errors:
+                    continue
+                indice, file_path, tentativa = worker.tarefa
+                duracao = time.monotonic() - worker.inicio
+                if worker.conexao in prontas:
+                    try:
+                        resposta = worker.conexao.recv()
+                    except (EOFError, OSError):
+                        resposta = None
+                    if resposta is not None and resposta[0] != 'MEMORIA':
+                        success, payload, error, duracao, pico = resposta
+                        worker.tarefa = None
+                        registrar(indice, file_path, tentativa, success, payload, error, duracao, pico)
+                        continue
+                    if resposta is None:
+                        worker.processo.join(1)
+                        falha = f"Worker encerrado inesperadamente (código {worker.processo.exitcode})"
+                        pico = None
+                    else:
+                        _, _, falha, duracao, pico = resposta
+                elif duracao >= timeout:
+                    falha = f"Timeout de {timeout:.0f}s excedido"
+                    pico = _memoria_proc_mb("VmHWM", worker.processo.pid)
+                    pico = round(pico, 1) if pico is not None else None
+                else:
+                    continue
+
+                # Falha anormal: o worker é descartado e substituído
+                worker.encerrar(forcar=True)
+                workers[posicao] = novo_worker()
+                if tentativa < max_attempts:
+                    logger.warning(f"⚠️  {Path(file_path).name}: {falha}; nova tentativa em outro worker")
+                    pendentes.appendleft((indice, file_path, tentativa + 1))
+                else:
+                    registrar(indice, file_path, tentativa, False, None, falha, duracao, pico,
+                              quarentena=True)
+
+        if error_count >= max_errors:
+            logger.critical(
+                f"🛑 Atingido limite de {max_errors} erros. "
+                f"Abortando lote após {success_count + error_count}/{total} arquivos."
+            )
+    finally:
+        for worker in workers:
+            worker.encerrar(forcar=worker.tarefa is not None)
+        rule_engine.alertas = alertas_lote
+
     duration = time.time() - start_time
-    
+    results.sort(key=lambda r: r['index'])
+    file_stats.sort(key=lambda s: s['index'])
+
     # Relatório final
     summary = {
         'total': total,
-        'processed': i,  # Quantos foram tentados
+        'processed': success_count + error_count,  # Quantos foram concluídos
         'success': success_count,
         'errors': error_count,
         'results': results,
         'error_details': error_details,
+        'quarantine': quarantine,
+        'file_stats': file_stats,
+        'alerts': alert_count,
+        'events': events,
         'duration': duration,
         'throughput': success_count / duration if duration > 0 else 0
     }
-    
+
     logger.info(f"\n" + "="*60)
     logger.info(f"📊 RESUMO DO LOTE")
     logger.info(f"="*60)
     logger.info(f"  Total de arquivos: {total}")
     logger.info(f"  Processados: {summary['processed']}")
-    logger.info(f"  ✅ Sucesso: {success_count} ({success_count/total*100:.1f}%)")
-    logger.info(f"  ❌ Erros: {error_count} ({error_count/total*100:.1f}%)")
+    if total:
+        logger.info(f"  ✅ Sucesso: {success_count} ({success_count/total*100:.1f}%)")
+        logger.info(f"  ❌ Erros: {error_count} ({error_count/total*100:.1f}%)")
+    logger.info(f"  ☣️  Quarentena: {len(quarantine)}")
+    logger.info(f"  ⚠️  Alertas: {alert_count}")
     logger.info(f"  ⏱️  Tempo total: {duration:.1f}s")
     logger.info(f"  ⚡ Throughput: {summary['throughput']:.1f} arquivos/segundo")
     logger.info(f"="*60)
-    
+
     if error_count > 0:
         logger.warning(f"\n⚠️  {error_count} ERROS ENCONTRADOS:")
         for err in error_details[:10]:  # Mostrar apenas primeiros 10
             logger.warning(f"  - {err['file']}: {err['error']}")
         if len(error_details) > 10:
             logger.warning(f"  ... e mais {len(error_details)-10} erros")
-    
+
     return summary
 
 
 def save_error_report(summary: Dict[str, Any], output_path: str):
     """
     Salva relatório de erros em arquivo.
-    
+
     Args:
         summary: Dicionário de resumo do process_batch
         output_path: Caminho do arquivo de saída
     """
     import json
     from datetime import datetime
-    
+
     report = {
         'timestamp': datetime.now().isoformat(),
         'total_files': summary['total'],
@@ -206,10 +464,12 @@ def save_error_report(summary: Dict[str, Any], output_path: str):
         'error_count': summary['errors'],
         'duration_seconds': summary['duration'],
         'throughput_files_per_second': summary['throughput'],
-        'errors': summary['error_details']
+        'errors': summary['error_details'],
+        'quarantine': summary.get('quarantine', []),
+        'files': summary.get('file_stats', [])
     }
-    
+
     with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(report, f, indent=2, ensure_ascii=False)
-    
+
     logger.info(f"📄 Relatório de erros salvo em: {output_path}")
@@ -0,0 +1,335 @@
+# src/business/processing/watch_daemon.py
+
+"""
+Processamento automático por monitoramento de pastas.
+
+Em vez de um usuário selecionar a pasta e disparar cada etapa, o daemon
+monitora (FolderWatcher):
+- a pasta de importação: cada ZIP novo é importado (backup + dados da
+  fatura) e o .051 é extraído para "Correção XML/<auditor>";
+- a pasta "Correção XML" (recursiva): cada .051 novo ou alterado passa por
+  validação (regras), validação XSD e atualização do hash (ZIP em Validacao_CMB).
+  Os alertas das regras de cada arquivo vão para ALERTAS_REMOCAO_<arquivo>.xlsx,
+  ao lado do .051.
+
+As etapas são as mesmas do WorkflowController, e a deduplicação usa o
+mesmo índice de hashes (FileLog) da validação manual: arquivos já
+processados são ignorados, inclusive após reiniciar o daemon.
+
+Métricas de fila e latência (`estatisticas()`) podem ser gravadas
+periodicamente em JSON para dimensionamento do hardware.
+"""
+
+import json
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+import lxml.etree as etree
+
+from src.business.rules.rule_engine import RuleEngine
+from src.database import db_manager
+from src.infrastructure.files import file_manager
+from src.infrastructure.files.folder_watcher import FolderWatcher
+from src.infrastructure.reports import report_generator
+from src.models.repositories.execution_repository import ExecutionRepository
+
+logger = logging.getLogger(__name__)
+
+# Amostras de latência mantidas para média/percentis
+JANELA_LATENCIAS = 1000
+
+
+def _percentil(valores, fracao: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(fracao * len(ordenados)))]
+
+
+class WatchDaemon:
+    """
+    Daemon headless de importação/validação/XSD/hash por monitoramento de pastas.
+
+    Args:
+        pasta_importacao: Pasta onde chegam os ZIPs das faturas
+        nome_auditor: Subpasta de "Correção XML" onde os .051 importados são extraídos
+        debounce_segundos: Tempo sem alterações para considerar um arquivo completo
+        caminho_metricas: Arquivo JSON atualizado com as métricas (opcional)
+        intervalo_metricas: Intervalo entre gravações das métricas
+    """
+
+    def __init__(self, pasta_importacao: str, nome_auditor: str = "Monitor",
+                 debounce_segundos: float = 2.0, intervalo_varredura: float = 30.0,
+                 usar_inotify: bool = True, caminho_metricas: Optional[str] = None,
+                 intervalo_metricas: float = 30.0, user_id: Optional[int] = None,
+                 log_callback: Optional[Callable[[str], None]] = None):
+        # Import tardio: o controller carrega os dados de Unimeds na inicialização
+        from src.workflow_controller import CAMINHO_XSD, WorkflowController
+
+        self.pasta_importacao = os.path.abspath(pasta_importacao)
+        self.pasta_backup = os.path.join(self.pasta_importacao, "Backup")
+        self.pasta_correcao_raiz = os.path.join(self.pasta_importacao, "Correção XML")
+        self.pasta_correcao = os.path.join(self.pasta_correcao_raiz,
+                                           nome_auditor.replace(' ', '_').replace('.', ''))
+        for pasta in (self.pasta_backup, self.pasta_correcao):
+            os.makedirs(pasta, exist_ok=True)
+
+        self.caminho_xsd = CAMINHO_XSD
+        self.caminho_metricas = caminho_metricas
+        self.intervalo_metricas = intervalo_metricas
+        self.log_callback = log_callback
+
+        self.controller = WorkflowController(user_id=user_id)
+        self.controller.pasta_faturas_importadas_atual = self.pasta_importacao
+        self.engine: Optional[RuleEngine] = None
+        self._exec_repo: Optional[ExecutionRepository] = None
+        self._parser_xml = etree.XMLParser(recover=True)
+
+        self.watcher = FolderWatcher(
+            [(self.pasta_importacao, (".zip",), False), (self.pasta_correcao_raiz, (".051",), True)],
+            debounce_segundos=debounce_segundos, intervalo_varredura=intervalo_varredura,
+            usar_inotify=usar_inotify)
+        self._lock_watcher = threading.Lock()
+
+        self._fila: "queue.Queue" = queue.Queue()
+        self._parar = threading.Event()
+        self._em_processamento = 0
+        self._contadores = {'detectados': 0, 'processados': 0, 'pulados': 0, 'erros': 0}
+        self._esperas = deque(maxlen=JANELA_LATENCIAS)
+        self._duracoes = deque(maxlen=JANELA_LATENCIAS)
+        self._latencias = deque(maxlen=JANELA_LATENCIAS)
+        self._lock_metricas = threading.Lock()
+
+    def _log(self, mensagem: str):
+        if self.log_callback:
+            self.log_callback(mensagem)
+        else:
+            logger.info(mensagem)
+
+    # ------------------------------------------------------------------ setup
+
+    def iniciar(self) -> bool:
+        """Carrega as regras e abre a execução de tracking."""
+        self.engine = RuleEngine()
+        if not self.engine.load_all_rules():
+            self._log("ERRO CRÍTICO: Falha ao carregar as regras de validação.")
+            return False
+        self._exec_repo = ExecutionRepository()
+        self.controller.current_execution_id = db_manager.log_execution_start(
+            operation_type='WATCH', user_id=self.controller.user_id)
+        self._log(f"INFO: Monitorando '{self.pasta_importacao}' ({self.watcher.modo}), "
+                  f"execução {self.controller.current_execution_id}.")
+        return True
+
+    def encerrar(self):
+        """Fecha o watcher e a execução de tracking."""
+        self.watcher.fechar()
+        if self._exec_repo is not None:
+            self._exec_repo.session.close()
+            self._exec_repo = None
+        db_manager.log_execution_end(
+            execution_id=self.controller.current_execution_id,
+            status='COMPLETED',
+            success_count=self._contadores['processados'],
+            error_count=self._contadores['erros']
+        )
+        self._gravar_metricas()
+
+    def parar(self):
+        """Pede a parada; os arquivos já na fila são concluídos."""
+        self._parar.set()
+
+    # ----------------------------------------------------------- laço principal
+
+    def executar(self, duracao: Optional[float] = None) -> Dict:
+        """
+        Monitora as pastas até `parar()` (ou até `duracao` segundos).
+
+        Returns:
+            Métricas finais (ver estatisticas())
+        """
+        if not self.iniciar():
+            return self.estatisticas()
+
+        processador = threading.Thread(target=self._consumir_fila, name="watch-processador", daemon=True)
+        processador.start()
+        limite = time.monotonic() + duracao if duracao is not None else None
+        ultima_gravacao = time.monotonic()
+        try:
+            while not self._parar.is_set():
+                if limite is not None and time.monotonic() >= limite:
+                    break
+                with self._lock_watcher:
+                    prontos = self.watcher.coletar(timeout=1.0)
+                for caminho in prontos:
+                    self._enfileirar(caminho)
+
+                if self.caminho_metricas and time.monotonic() - ultima_gravacao >= self.intervalo_metricas:
+                    self._gravar_metricas()
+                    ultima_gravacao = time.monotonic()
+        finally:
+            self._fila.put(None)
+            processador.join()
+            self.encerrar()
+        return self.estatisticas()
+
+    def _enfileirar(self, caminho: str):
+        with self._lock_metricas:
+            self._contadores['detectados'] += 1
+        self._fila.put((caminho, time.monotonic()))
+
+    def _consumir_fila(self):
+        while True:
+            item = self._fila.get()
+            if item is None:
+                return
+            caminho, detectado_em = item
+            inicio = time.monotonic()
+            with self._lock_metricas:
+                self._em_processamento = 1
+            try:
+                resultado = self.processar(caminho)
+            except Exception as e:
+                logger.error(f"Erro ao processar '{caminho}': {e}")
+                resultado = 'ERRO'
+            fim = time.monotonic()
+            with self._lock_metricas:
+                self._em_processamento = 0
+                chave = {'PULADO': 'pulados', 'ERRO': 'erros'}.get(resultado, 'processados')
+                self._contadores[chave] += 1
+                self._esperas.append(inicio - detectado_em)
+                self._duracoes.append(fim - inicio)
+                self._latencias.append(fim - detectado_em)
+
+    # ------------------------------------------------------------------ etapas
+
+    def processar(self, caminho: str) -> str:
+        """
+        Processa um arquivo detectado (ZIP da importação ou .051 da correção).
+
+        Returns:
+            CONCLUIDO, PULADO ou ERRO
+        """
+        if caminho.lower().endswith(".zip"):
+            return self._processar_zip(caminho)
+        return self._processar_051(caminho)
+
+    def _processar_zip(self, caminho_zip: str) -> str:
+        """Importação: backup, dados da fatura e extração do .051 para a pasta de correção."""
+        from src.workflow_controller import calculate_file_hash
+
+        nome_zip = os.path.basename(caminho_zip)
+        zip_hash = calculate_file_hash(caminho_zip)
+        if self._exec_repo.is_file_processed(zip_hash):
+            self._log(f"⏭️ PULADO: '{nome_zip}' já importado anteriormente.")
+            return 'PULADO'
+
+        self._log(f"--- Importando: {nome_zip} ---")
+        pasta_temp = tempfile.mkdtemp(prefix="audit_watch_")
+        try:
+            dados_fatura = self.controller.importar_fatura(caminho_zip, self.pasta_backup, pasta_temp, self._log)
+        finally:
+            shutil.rmtree(pasta_temp, ignore_errors=True)
+        if not dados_fatura:
+            return 'ERRO'
+        self.controller.lista_faturas_processadas.append(dados_fatura)
+
+        caminho_xml = file_manager.extrair_xml_fatura_do_zip(caminho_zip, self.pasta_correcao)
+        if caminho_xml:
+            # Processado logo abaixo: o watcher não deve entregá-lo de novo
+            with self._lock_watcher:
+                self.watcher.ignorar(caminho_xml)
+        db_manager.log_file_processing(
+            execution_id=self.controller.current_execution_id,
+            file_name=nome_zip,
+            file_path=caminho_zip,
+            file_hash=zip_hash,
+            status='SUCCESS',
+            message='Importada pelo monitoramento de pastas'
+        )
+        if not caminho_xml:
+            return 'ERRO'
+        return self._processar_051(caminho_xml)
+
+    def _processar_051(self, caminho_xml: str) -> str:
+        """Validação (regras), XSD e atualização do hash de um .051."""
+        nome_xml = os.path.basename(caminho_xml)
+        self._log(f"--- Validando: {nome_xml} ---")
+        try:
+            status, _, mensagem, _ = self.controller.validar_arquivo(
+                self.engine, self._exec_repo, caminho_xml, nome_xml, self._log)
+            self._gerar_relatorio_alertas(caminho_xml)
+        finally:
+            # Os alertas são por arquivo: o spool não cresce durante a vida do daemon
+            self.engine.alertas.clear()
+            # O arquivo pode ter sido salvo pelas regras: não é uma alteração externa
+            with self._lock_watcher:
+                self.watcher.ignorar(caminho_xml)
+        if status != 'CONCLUIDO':
+            return status
+
+        valido, detalhes = file_manager.validar_xml_com_xsd(self.caminho_xsd, caminho_xml)
+        if not valido:
+            self._log(f"ERRO: '{nome_xml}' está inválido no XSD; hash não atualizado.")
+            self._log(detalhes)
+            return 'ERRO'
+
+        # PULADO: .051 sem ZIP no Backup (colocado direto na pasta de correção)
+        status_hash, _ = self.controller.recriar_zip_com_hash(
+            caminho_xml, self.pasta_importacao, self._parser_xml, self._log)
+        return status_hash
+
+    def _gerar_relatorio_alertas(self, caminho_xml: str):
+        """Relatório dos alertas gerados pelas regras para o .051, na pasta do arquivo."""
+        if not self.engine.alertas:
+            return
+        nome_base = os.path.splitext(os.path.basename(caminho_xml))[0]
+        sucesso, caminho = report_generator.gerar_relatorio_alertas(
+            self.engine.alertas, os.path.dirname(caminho_xml), f"ALERTAS_REMOCAO_{nome_base}.xlsx")
+        if sucesso:
+            self._log(f"⚠️ ALERTAS: {len(self.engine.alertas)} alerta(s) - Relatório: {caminho}")
+        else:
+            self._log(f"AVISO: Erro ao gerar relatório de alertas de '{nome_base}'.")
+
+    # ----------------------------------------------------------------- métricas
+
+    def estatisticas(self) -> Dict:
+        """
+        Profundidade da fila e latências (segundos) das últimas JANELA_LATENCIAS entregas:
+        espera = detecção -> início, processamento = duração das etapas, latencia = total.
+        """
+        with self._lock_metricas:
+            esperas, duracoes, latencias = list(self._esperas), list(self._duracoes), list(self._latencias)
+            metricas = dict(self._contadores)
+            metricas['em_processamento'] = self._em_processamento
+        metricas.update({
+            'modo': self.watcher.modo,
+            'fila': self._fila.qsize(),
+            'aguardando_estabilizar': self.watcher.em_espera,
+            'espera_media_s': round(sum(esperas) / len(esperas), 3) if esperas else 0.0,
+            'processamento_medio_s': round(sum(duracoes) / len(duracoes), 3) if duracoes else 0.0,
+            'latencia_media_s': round(sum(latencias) / len(latencias), 3) if latencias else 0.0,
+            'latencia_p95_s': round(_percentil(latencias, 0.95), 3),
+            'latencia_max_s': round(max(latencias), 3) if latencias else 0.0,
+            'atualizado_em': datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+        })
+        return metricas
+
+    def _gravar_metricas(self):
+        if not self.caminho_metricas:
+            return
+        temporario = f"{self.caminho_metricas}.tmp"
+        try:
+            with open(temporario, 'w', encoding='utf-8') as arquivo:
+                json.dump(self.estatisticas(), arquivo, ensure_ascii=False, indent=2)
+            os.replace(temporario, self.caminho_metricas)
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar as métricas em '{self.caminho_metricas}': {e}")
@@ -1,3 +1,3 @@
 # src/business/rules/__init__.py
 """Rules package"""
-__all__ = ['rule_engine']
+__all__ = ['context_index', 'rule_engine', 'rule_index', 'schema_order', 'streaming_engine']
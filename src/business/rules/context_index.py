@@ -0,0 +1,147 @@
+# src/business/rules/context_index.py
+
+"""
+Contexto de guia/beneficiário por documento e estado das ações rotativas.
+
+As ações `corrigir_*_rotativo` escolhem o profissional pela posição de um
+contador, agrupado pelo beneficiário do item. Procurar o beneficiário com
+`.//ptu:dadosBeneficiario/ptu:id_Benef` a cada ancestral custa uma busca na
+subárvore inteira perto da raiz, repetida para cada item (quadrático em
+faturas com milhares de equipes).
+
+O `ContextoGuias` percorre os `id_Benef` uma única vez e guarda, para cada
+elemento que contém algum, o primeiro em ordem de documento: a consulta de
+um item passa a ser uma sequência de buscas em dicionário pelos seus
+ancestrais, com o mesmo resultado da busca nível a nível.
+
+O `EstadoRotacao` guarda os contadores de uma execução, com tamanho
+limitado (os beneficiários menos recentes são descartados).
+"""
+
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Optional
+
+import lxml.etree as etree
+
+from src.infrastructure.parsers.xml_reader import NAMESPACES
+
+PTU = NAMESPACES['ptu']
+
+_XPATH_BENEFICIARIO = ".//ptu:dadosBeneficiario/ptu:id_Benef"
+_BUSCAR_BENEFICIARIOS = etree.XPath("descendant-or-self::ptu:dadosBeneficiario/ptu:id_Benef",
+                                    namespaces=NAMESPACES)
+_TAG_INSCRICAO = f"{{{PTU}}}nr_Inscricao"
+
+# Tags cuja alteração estrutural torna o contexto obsoleto
+_DEPENDENCIAS_BENEFICIARIO = frozenset({"dadosBeneficiario", "id_Benef"})
+
+# Contadores mantidos por execução (ação, beneficiário)
+LIMITE_ROTACAO = 10000
+
+
+class ContextoGuias:
+    """
+    Beneficiário e inscrição de cada elemento de um documento (ou guia, no modo em fluxo).
+
+    Os textos são lidos na consulta (alterações de texto valem de imediato);
+    inserções e remoções de `dadosBeneficiario`/`id_Benef` exigem `invalidar`.
+    """
+
+    def __init__(self, raiz):
+        self.raiz = raiz
+        # elemento -> primeiro id_Benef (ordem de documento) da sua subárvore
+        self._primeiro_benef: Optional[Dict] = None
+        # pai -> texto do nr_Inscricao filho
+        self._inscricoes: Dict = {}
+
+    def _indexar(self) -> Dict:
+        primeiro = {}
+        raiz = self.raiz
+        for id_benef in _BUSCAR_BENEFICIARIOS(raiz):
+            if id_benef.getparent() is raiz:
+                continue
+            # Um ancestral já indexado contém um id_Benef anterior, e os acima dele também
+            ancestral = id_benef.getparent().getparent()
+            while ancestral is not None and ancestral not in primeiro:
+                primeiro[ancestral] = id_benef
+                if ancestral is raiz:
+                    break
+                ancestral = ancestral.getparent()
+        return primeiro
+
+    def beneficiario(self, elemento) -> Optional[str]:
+        """
+        `id_Benef` do ancestral mais próximo que contém um (o primeiro em ordem de documento).
+
+        Equivale a buscar `.//ptu:dadosBeneficiario/ptu:id_Benef` em cada
+        ancestral, do pai para a raiz, parando no primeiro com texto.
+        """
+        if self._primeiro_benef is None:
+            self._primeiro_benef = self._indexar()
+        primeiro_benef = self._primeiro_benef
+        ancestral = elemento.getparent()
+        acima_da_raiz = elemento is self.raiz
+        while ancestral is not None and not acima_da_raiz:
+            id_benef = primeiro_benef.get(ancestral)
+            if id_benef is not None and id_benef.text:
+                return id_benef.text
+            acima_da_raiz = ancestral is self.raiz
+            ancestral = ancestral.getparent()
+
+        # Acima da raiz indexada (guia no modo em fluxo): busca nível a nível
+        while ancestral is not None:
+            encontrados = ancestral.xpath(_XPATH_BENEFICIARIO, namespaces=NAMESPACES)
+            if encontrados and encontrados[0].text:
+                return encontrados[0].text
+            ancestral = ancestral.getparent()
+        return None
+
+    def inscricao(self, elemento) -> Optional[str]:
+        """Texto do `nr_Inscricao` filho do pai do elemento (None se não houver)."""
+        pai = elemento.getparent()
+        if pai is None:
+            return None
+        if pai not in self._inscricoes:
+            no = pai.find(_TAG_INSCRICAO)
+            self._inscricoes[pai] = no.text if no is not None else None
+        return self._inscricoes[pai]
+
+    def invalidar(self, escritas: Optional[FrozenSet[str]]):
+        """Descarta o contexto se as tags alteradas o afetam (None = sempre)."""
+        if escritas is None or not escritas.isdisjoint(_DEPENDENCIAS_BENEFICIARIO):
+            self._primeiro_benef = None
+        if escritas is None or "nr_Inscricao" in escritas:
+            self._inscricoes.clear()
+
+
+class EstadoRotacao:
+    """
+    Contadores das ações rotativas por (ação, chave), reiniciados a cada execução.
+
+    Guarda no máximo `limite` contadores; o usado há mais tempo é descartado
+    (e recomeça do primeiro profissional se a chave voltar a aparecer).
+    """
+
+    def __init__(self, limite: int = LIMITE_ROTACAO):
+        self.limite = max(1, limite)
+        self.execucao = None
+        self._contadores: OrderedDict = OrderedDict()
+
+    def iniciar_execucao(self, execution_id):
+        """Zera os contadores quando a execução muda."""
+        if execution_id != self.execucao:
+            self.execucao = execution_id
+            self._contadores.clear()
+
+    def proximo(self, acao: str, chave: str, quantidade: int) -> int:
+        """Índice (0..quantidade-1) do próximo profissional para a chave, avançando o contador."""
+        contadores = self._contadores
+        item = (acao, chave)
+        contador = contadores.pop(item, 0)
+        contadores[item] = contador + 1
+        if len(contadores) > self.limite:
+            contadores.popitem(last=False)
+        return contador % quantidade
+
+    def __len__(self):
+        return len(self._contadores)
@@ -0,0 +1,109 @@
+# src/business/rules/feature_index.py
+
+"""
+Características por arquivo para a reexecução de impacto de regras.
+
+Na validação, cada arquivo tem registrados os tipos de elemento (nomes locais
+ptu:) e os valores dos campos discriminantes mais usados pelas guardas das
+regras. Dada uma regra (versão antiga e nova), `requisitos_da_regra` traduz
+suas condições em filtros sobre esse índice, de forma conservadora: qualquer
+arquivo em que a regra possa casar é selecionado; só são descartados os que
+certamente não casam (tipo de elemento ausente ou nenhum valor da guarda).
+"""
+
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+import lxml.etree as etree
+
+from src.business.rules.rule_index import extrair_guarda
+from src.infrastructure.parsers.xml_reader import NAMESPACES
+
+# Campos cujos valores são indexados
+CAMPOS_INDEXADOS = ('cd_Servico', 'cd_cnpj', 'cd_Prest', 'CBO', 'tp_Participacao')
+
+CAMPO_TIPO = '@tipo'
+
+_PREFIXO_PTU = f"{{{NAMESPACES['ptu']}}}"
+_RE_ULTIMO_NOME = re.compile(r"ptu:([A-Za-z_][\w.-]*)\s*$")
+
+
+def _registrar(elemento, tipos: Set[str], valores: Dict[str, Set[str]]):
+    tag = elemento.tag
+    if not isinstance(tag, str) or not tag.startswith(_PREFIXO_PTU):
+        return
+    nome = tag[len(_PREFIXO_PTU):]
+    tipos.add(nome)
+    if nome in valores and elemento.text:
+        texto = elemento.text.strip()
+        if texto:
+            valores[nome].add(texto)
+
+
+def extrair_caracteristicas(raiz) -> Tuple[Set[str], Dict[str, Set[str]]]:
+    """
+    Tipos de elemento e valores dos campos indexados de uma árvore já carregada.
+
+    Returns:
+        (tipos, valores por campo)
+    """
+    tipos: Set[str] = set()
+    valores: Dict[str, Set[str]] = {campo: set() for campo in CAMPOS_INDEXADOS}
+    for elemento in raiz.iter():
+        _registrar(elemento, tipos, valores)
+    return tipos, valores
+
+
+def extrair_caracteristicas_arquivo(caminho: str) -> Tuple[Set[str], Dict[str, Set[str]]]:
+    """
+    Mesmo que `extrair_caracteristicas`, lendo o arquivo em fluxo (memória
+    constante, usado para faturas grandes e na indexação de pastas).
+    """
+    tipos: Set[str] = set()
+    valores: Dict[str, Set[str]] = {campo: set() for campo in CAMPOS_INDEXADOS}
+    for _, elemento in etree.iterparse(caminho, events=('end',), huge_tree=True):
+        _registrar(elemento, tipos, valores)
+        # Elemento (e filhos) já registrados: libera a memória
+        elemento.clear(keep_tail=False)
+        while elemento.getprevious() is not None:
+            del elemento.getparent()[0]
+    return tipos, valores
+
+
+def _valores_da_lista(id_lista: str, external_lists: Dict) -> Optional[Set[str]]:
+    lista = external_lists.get(id_lista)
+    if lista is None:
+        return None
+    return {str(valor) for valor in lista}
+
+
+def requisitos_da_regra(regra: Optional[Dict], external_lists: Optional[Dict] = None) -> List[Dict[str, Set[str]]]:
+    """
+    Filtros do índice que selecionam os arquivos em que a regra pode casar.
+
+    Returns:
+        Lista com um requisito (campo -> valores aceitos); lista vazia se a
+        regra não existe/está inativa. Um requisito vazio seleciona todos.
+    """
+    if not regra or not regra.get('ativo', True):
+        return []
+
+    condicoes = regra.get('condicoes', {}) or {}
+    requisito: Dict[str, Set[str]] = {}
+
+    tipo_elemento = condicoes.get('tipo_elemento')
+    if tipo_elemento:
+        requisito[CAMPO_TIPO] = {tipo_elemento}
+
+    guarda = extrair_guarda(condicoes)
+    if guarda is not None:
+        correspondencia = _RE_ULTIMO_NOME.search(guarda.xpath)
+        campo = correspondencia.group(1) if correspondencia else None
+        if campo in CAMPOS_INDEXADOS:
+            if guarda.id_lista is not None:
+                aceitos = _valores_da_lista(guarda.id_lista, external_lists or {})
+            else:
+                aceitos = {valor.strip() for valor in guarda.valores}
+            if aceitos is not None:
+                requisito[campo] = aceitos
+    return [requisito]
@@ -3,11 +3,19 @@
 import json
 import os
 import logging
+import time
 import lxml.etree as etree
 
 # Updated imports for MVC structure
 from src.infrastructure.parsers.xml_reader import XMLReader, NAMESPACES
 from src.infrastructure.files.file_handler import FileHandler
+from src.infrastructure.files.alert_spool import AlertSpool
+from src.infrastructure.files.change_journal import DiarioAlteracoes
+from src.infrastructure.parsers import date_parser
+from src.infrastructure.logging.event_log import ContadorEventos
+from src.business.rules.context_index import ContextoGuias, EstadoRotacao
+from src.business.rules.rule_index import IndiceElementos, RegraCompilada, afeta_guarda, compilar_regras
+from src.business.rules import schema_order
 from src.database import db_manager
 
 # Tracker de glosas evitadas (valores REAIS do XML)
@@ -26,6 +34,9 @@ LIST_CONFIG = {
     "ignore_00": {"key": "Código", "type": "set"}
 }
 
+# Identificação da ordenação pelo XSD no diário de alterações
+REGRA_ORDEM_SCHEMA = "ORDEM_SCHEMA"
+
 class RuleEngine:
     """
     Motor de regras para carregar, interpretar e aplicar correções em arquivos XML
@@ -47,14 +58,44 @@ class RuleEngine:
         
         self.rules_config_master = {}
         self.loaded_rules = []
+        # Regras compiladas para o índice por campo discriminante (ver rule_index)
+        self._regras_compiladas = []
+        self._chave_compilacao = None
+        # Snapshot do banco em uso (None quando as regras vieram do JSON) e
+        # regras compiladas por hash de conteúdo, reaproveitadas na troca de versão
+        self.versao_regras = None
+        self._compiladas_por_hash = {}
+        self.intervalo_verificacao_regras = 5.0
+        self._ultima_verificacao_regras = 0.0
+        # Memória de XPath/texto do documento em processamento (None fora de apply_rules_to_xml)
+        self._contexto_avaliacao = None
+        # Guia/beneficiário do documento em processamento (ver context_index)
+        self._contexto_guias = None
+        # Contadores das ações rotativas, reiniciados a cada execução
+        self.rotacao = EstadoRotacao()
+        self.estatisticas_memo = {'consultas': 0, 'acertos': 0}
+        # Regras aplicadas, rotações e datas corrigidas: contadas por arquivo, um resumo no log
+        self.eventos = ContadorEventos(logger)
+        # Chamado com (regra, elemento) a cada correção aplicada (ex.: simulação de ROI em dry-run)
+        self.observador_correcoes = None
+        # Diário das alterações do último apply_rules_to_xml (ver change_journal)
+        self.diario = None
+        self._regra_em_aplicacao = None
         self.external_lists = {}
         self.xml_reader = XMLReader()
         self.file_handler = FileHandler()
+        # Alertas da ação 'gerar_alerta' (gravados em disco, memória constante)
+        self.alertas = AlertSpool()
         
         # Carregar configuração de regras
         rules_config_path = os.path.join(self.config_dir, "rules_config.json")
         self.rules_config_master = self._load_json_file(rules_config_path) or {}
 
+        # Ordem dos filhos pelo XSD, aplicada em uma passada após as regras (ver schema_order)
+        self.ordem_schema = None
+        if self.rules_config_master.get("ordenacao_schema", True):
+            self.ordem_schema = schema_order.carregar_ordem_schema()
+
     def _load_json_file(self, file_path):
         """Carrega e decodifica um arquivo JSON de forma segura."""
         if not os.path.exists(file_path): 
@@ -130,14 +171,18 @@ class RuleEngine:
             if not self._load_list_from_json(list_id, file_name): 
                 return False
         
-        # Tentar carregar regras do SQLite primeiro
+        # Tentar carregar regras do SQLite primeiro (snapshot versionado mais recente)
         if use_database:
             try:
-                from src.database.rule_repository import get_active_rules
-                self.loaded_rules = get_active_rules()
+                from src.database.rule_repository import RuleRepository
+                snapshot = RuleRepository.get_snapshot()
+                if snapshot is None and RuleRepository.publish_snapshot("system", "Snapshot inicial"):
+                    snapshot = RuleRepository.get_snapshot()
                 
-                if self.loaded_rules:
-                    logger.info(f"✅ {len(self.loaded_rules)} regras carregadas do banco de dados.")
+                if snapshot and snapshot['regras']:
+                    self._trocar_snapshot(snapshot)
+                    logger.info(f"✅ {len(self.loaded_rules)} regras carregadas do banco de dados "
+                                f"(snapshot v{self.versao_regras}).")
                     return True
                 else:
                     logger.warning("Banco de regras vazio, tentando carregar do JSON...")
@@ -147,9 +192,74 @@ class RuleEngine:
         # Fallback: Carregar dos arquivos JSON
         return self._load_rules_from_json()
     
+    def _trocar_snapshot(self, snapshot):
+        """
+        Troca o conjunto de regras pelo do snapshot, recompilando só as regras
+        cujo hash não estava no conjunto anterior. A troca é feita por atribuição
+        (lista de regras e compiladas de uma vez) e só ocorre entre arquivos.
+
+        Returns:
+            int: Quantidade de regras recompiladas
+        """
+        anteriores = self._compiladas_por_hash
+        por_hash = {}
+        compiladas = []
+        recompiladas = 0
+        for item in snapshot['regras']:
+            compilada = por_hash.get(item['hash']) or anteriores.get(item['hash'])
+            if compilada is None:
+                compilada = RegraCompilada(item['regra'])
+                recompiladas += 1
+            por_hash[item['hash']] = compilada
+            compiladas.append(compilada)
+
+        regras = [compilada.regra for compilada in compiladas]
+        self.loaded_rules = regras
+        self._regras_compiladas = compiladas
+        self._chave_compilacao = (id(regras), len(regras))
+        self._compiladas_por_hash = por_hash
+        self.versao_regras = snapshot['versao']
+        self._ultima_verificacao_regras = time.monotonic()
+        return recompiladas
+
+    def atualizar_regras(self, forcar=False):
+        """
+        Verifica se há snapshot de regras mais novo no banco e, se houver, troca
+        o conjunto em uso. A consulta é feita no máximo a cada
+        `intervalo_verificacao_regras` segundos (forcar=True ignora o intervalo).
+
+        Returns:
+            bool: True se o conjunto de regras foi trocado
+        """
+        if self.versao_regras is None:
+            return False
+        agora = time.monotonic()
+        if not forcar and agora - self._ultima_verificacao_regras < self.intervalo_verificacao_regras:
+            return False
+        self._ultima_verificacao_regras = agora
+
+        try:
+            from src.database.rule_repository import RuleRepository
+            versao = RuleRepository.get_latest_snapshot_version()
+            if versao is None or versao <= self.versao_regras:
+                return False
+            snapshot = RuleRepository.get_snapshot(versao)
+        except Exception as e:
+            logger.warning(f"Erro ao verificar novas versões de regras: {e}")
+            return False
+        if snapshot is None:
+            return False
+
+        versao_anterior = self.versao_regras
+        recompiladas = self._trocar_snapshot(snapshot)
+        logger.info(f"🔄 Regras atualizadas: v{versao_anterior} -> v{self.versao_regras} "
+                    f"({len(self.loaded_rules)} ativas, {recompiladas} recompiladas)")
+        return True
+
     def _load_rules_from_json(self):
         """Carrega regras dos arquivos JSON (fallback)."""
         self.loaded_rules = []
+        self.versao_regras = None
         
         for group in self.rules_config_master.get("grupos_para_carregar", []):
             if group.get("ativo", False):
@@ -167,6 +277,18 @@ class RuleEngine:
         logger.info(f"Total de {len(self.loaded_rules)} regras ativas carregadas do JSON.")
         return True
 
+    def _buscar_nos(self, element, xpath_expr):
+        """XPath a partir do elemento, usando a memória do documento quando disponível."""
+        if self._contexto_avaliacao is not None:
+            return self._contexto_avaliacao.nos(element, xpath_expr)
+        return self.xml_reader.find_elements_by_xpath(element, xpath_expr)
+
+    def _texto_primeiro(self, element, xpath_expr, nodes):
+        """Texto do primeiro nó de `nodes` (resultado de `xpath_expr`), memorizado quando possível."""
+        if self._contexto_avaliacao is not None:
+            return self._contexto_avaliacao.texto(element, xpath_expr)
+        return self.xml_reader.get_element_text(nodes[0])
+
     def _evaluate_condition(self, element, condition):
         """Avalia recursivamente se um elemento XML atende a um conjunto de condições."""
         if not condition:
@@ -187,14 +309,14 @@ class RuleEngine:
             xpath_expr = tag_cond.get("xpath")
             compare_type = tag_cond.get("tipo_comparacao", "valor_permitido")
             
-            nodes = self.xml_reader.find_elements_by_xpath(element, xpath_expr)
+            nodes = self._buscar_nos(element, xpath_expr)
             
             if compare_type == "existe": return bool(nodes)
             if compare_type == "nao_existe": return not bool(nodes)
             if not nodes: 
                 return False
             
-            node_text = self.xml_reader.get_element_text(nodes[0])
+            node_text = self._texto_primeiro(element, xpath_expr, nodes)
             if node_text is None: return False
 
 
@@ -240,12 +362,12 @@ class RuleEngine:
             xpath_hr_inicial = horarios_cond.get("xpath_hr_inicial", "./ptu:hr_Inicial")
             xpath_hr_final = horarios_cond.get("xpath_hr_final", "./ptu:hr_Final")
             
-            nodes_inicial = self.xml_reader.find_elements_by_xpath(element, xpath_hr_inicial)
-            nodes_final = self.xml_reader.find_elements_by_xpath(element, xpath_hr_final)
+            nodes_inicial = self._buscar_nos(element, xpath_hr_inicial)
+            nodes_final = self._buscar_nos(element, xpath_hr_final)
             
             if nodes_inicial and nodes_final:
-                hr_inicial = self.xml_reader.get_element_text(nodes_inicial[0])
-                hr_final = self.xml_reader.get_element_text(nodes_final[0])
+                hr_inicial = self._texto_primeiro(element, xpath_hr_inicial, nodes_inicial)
+                hr_final = self._texto_primeiro(element, xpath_hr_final, nodes_final)
                 
                 # Retorna True se os horários são iguais (condição atendida)
                 return hr_inicial == hr_final
@@ -293,7 +415,7 @@ class RuleEngine:
             
             # Buscar todos os irmãos procedimentosExecutados
             todos_procs = self.xml_reader.find_elements_by_xpath(parent_dados_guia, "./ptu:procedimentosExecutados")
-            logger.debug(f"copiar_horarios: encontrados {len(todos_procs)} procedimentosExecutados")
+            logger.debug("copiar_horarios: encontrados %d procedimentosExecutados", len(todos_procs))
             
             hr_inicial_novo = None
             hr_final_novo = None
@@ -317,10 +439,12 @@ class RuleEngine:
             
             if hr_inicial_novo and hr_final_novo:
                 # Aplicar os novos horários
-                hr_inicial_nodes[0].text = hr_inicial_novo
-                hr_final_nodes[0].text = hr_final_novo
+                self._definir_texto(hr_inicial_nodes[0], hr_inicial_novo)
+                self._definir_texto(hr_final_nodes[0], hr_final_novo)
                 
-                logger.info(f"Horários taxa observação corrigidos: {hr_inicial_atual}/{hr_final_atual} -> {hr_inicial_novo}/{hr_final_novo}")
+                self.eventos.registrar("horarios_copiados", self._regra_em_aplicacao,
+                                       "Horários taxa observação corrigidos: %s/%s -> %s/%s",
+                                       hr_inicial_atual, hr_final_atual, hr_inicial_novo, hr_final_novo)
                 modified = True
                 return modified
 
@@ -360,6 +484,9 @@ class RuleEngine:
             new_children_sequence = [children_map[tag_name] for tag_name in ordem_correta if tag_name in children_map]
             new_children_sequence.extend(child for child in all_children if etree.QName(child).localname not in order_set)
             
+            if self.diario is not None:
+                self.diario.registrar_reordenacao(target_node_for_reorder, new_children_sequence,
+                                                  self._regra_em_aplicacao)
             target_node_for_reorder.clear()
             for child in new_children_sequence:
                 target_node_for_reorder.append(child)
@@ -368,37 +495,9 @@ class RuleEngine:
 
         # Ação especial que não requer tag_alvo
         if action_type == "corrigir_dia_31_internacao":
-            import re
             modified = False
-            
-            def tem_dia_31(texto):
-                """Verifica se o texto contém dia 31 em qualquer formato"""
-                if not texto:
-                    return False
-                # Formato YYYY/MM/DD (ex: 2025/10/3123:59:00-04)
-                if '/31' in texto:
-                    return True
-                # Formato YYYYMMDD (ex: 20251031)
-                if re.search(r'\d{4}(01|03|05|07|08|10|12)31', texto):
-                    return True
-                return False
-            
-            def substituir_dia_31(texto):
-                """Substitui dia 31 por dia 30 em ambos formatos de data"""
-                if not texto:
-                    return texto
-                
-                resultado = texto
-                
-                # Formato YYYY/MM/DD (ex: 2025/10/3123:59:00-04)
-                if '/31' in resultado:
-                    resultado = re.sub(r'/31(?=\d{2}:\d{2}:\d{2}|$)', '/30', resultado)
-                
-                # Formato YYYYMMDD (ex: 20251031 -> 20251030)
-                # Meses com 31 dias: 01, 03, 05, 07, 08, 10, 12
-                resultado = re.sub(r'(\d{4})(01|03|05|07|08|10|12)31', r'\g<1>\g<2>30', resultado)
-                
-                return resultado
+            tem_dia_31 = date_parser.tem_dia_31
+            substituir_dia_31 = date_parser.substituir_dia_31
             
             # Corrigir dt_FimFaturamento (apenas se período > 30 dias)
             dt_fim_nodes = self.xml_reader.find_elements_by_xpath(element, ".//ptu:dt_FimFaturamento")
@@ -406,29 +505,19 @@ class RuleEngine:
             
             for dt_node in dt_fim_nodes:
                 if tem_dia_31(dt_node.text):
-                    # Verificar se período de internação é <= 30 dias (válido)
+                    # Verificar se período de internação é <= 30 dias (válido), contagem inclusiva
                     periodo_valido = False
                     if dt_ini_nodes:
-                        from datetime import datetime
-                        ini_text = dt_ini_nodes[0].text or ""
-                        fim_text = dt_node.text or ""
-                        try:
-                            # Extrair data (YYYY/MM/DD)
-                            ini_data_str = ini_text[:10].replace("/", "-")
-                            fim_data_str = fim_text[:10].replace("/", "-")
-                            ini_data = datetime.strptime(ini_data_str, "%Y-%m-%d")
-                            fim_data = datetime.strptime(fim_data_str, "%Y-%m-%d")
-                            diferenca_dias = (fim_data - ini_data).days + 1  # Contagem inclusiva
-                            periodo_valido = (diferenca_dias <= 30)
-                        except (ValueError, IndexError):
-                            periodo_valido = False
+                        diferenca_dias = date_parser.dias_no_periodo(dt_ini_nodes[0].text, dt_node.text)
+                        periodo_valido = diferenca_dias is not None and diferenca_dias <= 30
                     
                     if periodo_valido:
-                        logger.debug(f"dt_FimFaturamento dia 31 mantido (período <= 30 dias): {dt_node.text}")
+                        logger.debug("dt_FimFaturamento dia 31 mantido (período <= 30 dias): %s", dt_node.text)
                     else:
                         novo_valor = substituir_dia_31(dt_node.text)
-                        logger.info(f"Corrigindo dt_FimFaturamento: {dt_node.text} -> {novo_valor}")
-                        dt_node.text = novo_valor
+                        self.eventos.registrar("dia_31", "dt_FimFaturamento", "Corrigindo dt_FimFaturamento: %s -> %s",
+                                               dt_node.text, novo_valor)
+                        self._definir_texto(dt_node, novo_valor)
                         modified = True
             
             # Corrigir dt_Execucao em todos os procedimentosExecutados
@@ -438,8 +527,9 @@ class RuleEngine:
                 for dt_node in dt_exec_nodes:
                     if tem_dia_31(dt_node.text):
                         novo_valor = substituir_dia_31(dt_node.text)
-                        logger.info(f"Corrigindo dt_Execucao: {dt_node.text} -> {novo_valor}")
-                        dt_node.text = novo_valor
+                        self.eventos.registrar("dia_31", "dt_Execucao", "Corrigindo dt_Execucao: %s -> %s",
+                                               dt_node.text, novo_valor)
+                        self._definir_texto(dt_node, novo_valor)
                         modified = True
                 
                 for tag_data in ["dt_Atendimento", "dt_Inicial", "dt_Final"]:
@@ -447,8 +537,9 @@ class RuleEngine:
                     for dt_node in dt_nodes:
                         if tem_dia_31(dt_node.text):
                             novo_valor = substituir_dia_31(dt_node.text)
-                            logger.info(f"Corrigindo {tag_data}: {dt_node.text} -> {novo_valor}")
-                            dt_node.text = novo_valor
+                            self.eventos.registrar("dia_31", tag_data, "Corrigindo %s: %s -> %s",
+                                                   tag_data, dt_node.text, novo_valor)
+                            self._definir_texto(dt_node, novo_valor)
                             modified = True
             
             return modified
@@ -504,31 +595,15 @@ class RuleEngine:
             
             if sg_conselho != "OUT" and not eh_nome_institucional:
                 # Dados parecem válidos (conselho não é OUT e nome não é institucional)
-                logger.debug(f"PJ→PF Ignorado: {nm_profissional} (sg_Conselho={sg_conselho})")
+                logger.debug("PJ→PF Ignorado: %s (sg_Conselho=%s)", nm_profissional, sg_conselho)
                 return False
             
-            # Contador para rotação (usa atributo da instância para manter estado entre chamadas)
-            if not hasattr(self, '_pf_rotation_counter'):
-                self._pf_rotation_counter = {}
-            
-            # Obter beneficiário para agrupar
-            beneficiario = None
-            parent_guia = element.getparent()
-            if parent_guia is not None:
-                nr_inscricao = self.xml_reader.find_elements_by_xpath(parent_guia, "./ptu:nr_Inscricao")
-                if nr_inscricao and nr_inscricao[0].text:
-                    beneficiario = nr_inscricao[0].text
-            
-            # Se não conseguiu identificar beneficiário, usa contador global
-            key = beneficiario or "_global"
+            # Obter beneficiário para agrupar (se não identificar, usa contador global)
+            key = self._obter_contexto_guias(element).inscricao(element) or "_global"
             
             # Incrementar contador e obter profissional
-            if key not in self._pf_rotation_counter:
-                self._pf_rotation_counter[key] = 0
-            
-            idx = self._pf_rotation_counter[key] % len(PROFISSIONAIS)
+            idx = self.rotacao.proximo(action_type, key, len(PROFISSIONAIS))
             prof = PROFISSIONAIS[idx]
-            self._pf_rotation_counter[key] += 1
             
             modified = False
             
@@ -539,10 +614,11 @@ class RuleEngine:
                 if parent is not None:
                     # Pegar namespace do próprio elemento cd_cnpj
                     ns = etree.QName(cnpj_node).namespace
-                    parent.remove(cnpj_node)
+                    self._remover_no(cnpj_node)
                     # Criar tag cd_cpf com o mesmo namespace do cd_cnpj removido
                     cpf_tag = etree.SubElement(parent, f"{{{ns}}}cd_cpf")
                     cpf_tag.text = prof["cpf"]
+                    self._registrar_insercao(cpf_tag)
                     modified = True
             
             # Função auxiliar para garantir tag com conteúdo
@@ -551,7 +627,7 @@ class RuleEngine:
                 nodes = self.xml_reader.find_elements_by_xpath(element, xpath)
                 if nodes:
                     if nodes[0].text != valor:
-                        nodes[0].text = valor
+                        self._definir_texto(nodes[0], valor)
                         modified = True
             
             # Atualizar dados do profissional
@@ -565,7 +641,8 @@ class RuleEngine:
             set_tag("./ptu:equipe_Profissional/ptu:CBO", prof["cbo"])
             
             if modified:
-                logger.info(f"PJ→PF Rotativo: Beneficiário {key} → {prof['nome']}")
+                self.eventos.registrar(action_type, prof['nome'], "PJ→PF Rotativo: Beneficiário %s → %s",
+                                       key, prof['nome'])
             
             return modified
         
@@ -588,28 +665,12 @@ class RuleEngine:
             ]
             
             # Contador por beneficiário (garante médicos diferentes para mesma carteirinha)
-            if not hasattr(self, '_intensivista_rotation_counter'):
-                self._intensivista_rotation_counter = {}
-            
-            # Obter id_Benef do beneficiário
-            beneficiario_key = "_global"
-            parent = element.getparent()
-            while parent is not None:
-                id_benef = self.xml_reader.find_elements_by_xpath(parent, ".//ptu:dadosBeneficiario/ptu:id_Benef")
-                if id_benef and id_benef[0].text:
-                    beneficiario_key = id_benef[0].text
-                    break
-                parent = parent.getparent()
-            
-            # Inicializar contador para este beneficiário
-            if beneficiario_key not in self._intensivista_rotation_counter:
-                self._intensivista_rotation_counter[beneficiario_key] = 0
-            
-            idx = self._intensivista_rotation_counter[beneficiario_key] % len(INTENSIVISTAS)
+            beneficiario_key = self._obter_contexto_guias(element).beneficiario(element) or "_global"
+            
+            idx = self.rotacao.proximo(action_type, beneficiario_key, len(INTENSIVISTAS))
             prof = INTENSIVISTAS[idx]
-            self._intensivista_rotation_counter[beneficiario_key] += 1
             
-            logger.debug(f"Intensivista: Beneficiário {beneficiario_key} → {prof['nome']} (índice {idx})")
+            logger.debug("Intensivista: Beneficiário %s → %s (índice %d)", beneficiario_key, prof['nome'], idx)
             
             modified = False
             
@@ -619,7 +680,7 @@ class RuleEngine:
                 nodes = self.xml_reader.find_elements_by_xpath(element, xpath)
                 if nodes:
                     if nodes[0].text != valor:
-                        nodes[0].text = valor
+                        self._definir_texto(nodes[0], valor)
                         modified = True
             
             # Remover CNPJ se existir e criar cd_cpf com namespace do elemento original
@@ -629,10 +690,11 @@ class RuleEngine:
                 if parent is not None:
                     # Pegar namespace do próprio elemento cd_cnpj
                     ns = etree.QName(cnpj_node).namespace
-                    parent.remove(cnpj_node)
+                    self._remover_no(cnpj_node)
                     # Criar tag cd_cpf com o mesmo namespace do cd_cnpj removido
                     cpf_tag = etree.SubElement(parent, f"{{{ns}}}cd_cpf")
                     cpf_tag.text = prof["cpf"]
+                    self._registrar_insercao(cpf_tag)
                     modified = True
             
             # Atualizar dados do intensivista
@@ -647,7 +709,8 @@ class RuleEngine:
             set_tag("./ptu:equipe_Profissional/ptu:CBO", prof["cbo"])
             
             if modified:
-                logger.info(f"Intensivista Rotativo: {prof['nome']} (CRM {prof['crm']})")
+                self.eventos.registrar(action_type, prof['nome'], "Intensivista Rotativo: %s (CRM %s)",
+                                       prof['nome'], prof['crm'])
             
             return modified
         
@@ -682,12 +745,8 @@ class RuleEngine:
             ]
             
             # Contador para rotação
-            if not hasattr(self, '_solicitante_rotation_counter'):
-                self._solicitante_rotation_counter = 0
-            
-            idx = self._solicitante_rotation_counter % len(PROFISSIONAIS)
+            idx = self.rotacao.proximo(action_type, "_global", len(PROFISSIONAIS))
             prof = PROFISSIONAIS[idx]
-            self._solicitante_rotation_counter += 1
             
             modified = False
             
@@ -697,7 +756,7 @@ class RuleEngine:
                 nodes = self.xml_reader.find_elements_by_xpath(element, xpath)
                 if nodes:
                     if nodes[0].text != valor:
-                        nodes[0].text = valor
+                        self._definir_texto(nodes[0], valor)
                         modified = True
             
             # Atualizar dados do solicitante
@@ -708,7 +767,8 @@ class RuleEngine:
             set_tag("./ptu:profissional/ptu:CBO", prof["cbo"])
             
             if modified:
-                logger.info(f"Solicitante Rotativo: {prof['nome']} (CRM {prof['crm']})")
+                self.eventos.registrar(action_type, prof['nome'], "Solicitante Rotativo: %s (CRM %s)",
+                                       prof['nome'], prof['crm'])
             
             return modified
         
@@ -722,12 +782,8 @@ class RuleEngine:
                 {"nome": "VICTOR H. M. BONOMO", "crm": "8108", "uf": "50", "cbo": "225125"}
             ]
             
-            if not hasattr(self, '_profissional_rotation_counter'):
-                self._profissional_rotation_counter = 0
-            
-            idx = self._profissional_rotation_counter % len(PROFISSIONAIS)
+            idx = self.rotacao.proximo(action_type, "_global", len(PROFISSIONAIS))
             prof = PROFISSIONAIS[idx]
-            self._profissional_rotation_counter += 1
             
             modified = False
             
@@ -735,7 +791,7 @@ class RuleEngine:
                 nonlocal modified
                 nodes = self.xml_reader.find_elements_by_xpath(element, xpath)
                 if nodes and nodes[0].text != valor:
-                    nodes[0].text = valor
+                    self._definir_texto(nodes[0], valor)
                     modified = True
             
             set_tag("./ptu:nm_Profissional", prof["nome"])
@@ -745,7 +801,8 @@ class RuleEngine:
             set_tag("./ptu:CBO", prof["cbo"])
             
             if modified:
-                logger.info(f"Profissional Rotativo: {prof['nome']} (CRM {prof['crm']})")
+                self.eventos.registrar(action_type, prof['nome'], "Profissional Rotativo: %s (CRM %s)",
+                                       prof['nome'], prof['crm'])
             
             return modified
 
@@ -758,7 +815,7 @@ class RuleEngine:
             if target_nodes:
                 new_content = str(action_config.get("novo_conteudo", ""))
                 if target_nodes[0].text != new_content:
-                    target_nodes[0].text = new_content
+                    self._definir_texto(target_nodes[0], new_content)
                     modified = True
         
         elif action_type == "alterar_tag":
@@ -766,21 +823,21 @@ class RuleEngine:
             if target_nodes:
                 novo_valor = str(action_config.get("novo_valor", ""))
                 if target_nodes[0].text != novo_valor:
-                    target_nodes[0].text = novo_valor
+                    self._definir_texto(target_nodes[0], novo_valor)
                     modified = True
         
         elif action_type == "remover_tag_inteira":
             for node in target_nodes:
                 parent = node.getparent()
                 if parent is not None:
-                    parent.remove(node)
+                    self._remover_no(node)
                     modified = True
 
         elif action_type == "garantir_tag_com_conteudo":
             novo_conteudo = str(action_config.get("novo_conteudo", ""))
             if target_nodes:
                 if target_nodes[0].text != novo_conteudo:
-                    target_nodes[0].text = novo_conteudo
+                    self._definir_texto(target_nodes[0], novo_conteudo)
                     modified = True
             else:
                 parts = tag_alvo_xpath.split('/')
@@ -808,6 +865,7 @@ class RuleEngine:
                     parent_node.insert(0, new_tag)
                 else:
                     parent_node.append(new_tag)
+                self._registrar_insercao(new_tag)
                 modified = True
         
         elif action_type == "gerar_alerta":
@@ -838,23 +896,63 @@ class RuleEngine:
                 if cd_servico:
                     alerta_info["dados"]["codigo"] = cd_servico[0].text
             
-            # Armazenar alerta na lista de alertas do engine
-            if not hasattr(self, 'alertas'):
-                self.alertas = []
-            
             # Adicionar nome do arquivo se disponível
             if hasattr(self, '_current_file_name'):
                 alerta_info["dados"]["arquivo"] = self._current_file_name
             
             self.alertas.append(alerta_info)
             
-            logger.warning(f"ALERTA: {mensagem} - Dados: {alerta_info['dados']}")
+            # Os alertas vão para o relatório; no log, só a contagem (e as amostras)
+            # Argumentos formatados depois, na thread do listener: os dados vão serializados
+            self.eventos.registrar("alerta", self._regra_em_aplicacao, "ALERTA: %s - Dados: %s",
+                                   mensagem, json.dumps(alerta_info["dados"], ensure_ascii=False, default=str))
             # Não modifica o XML, mas retorna True para indicar que a regra foi processada
             modified = True
         
         # Ação: Copiar horários de outro item da guia (usado para taxas de observação)
         return modified
     
+    def _obter_contexto_guias(self, element):
+        """Contexto de guia/beneficiário do documento em processamento (ou só da árvore do elemento)."""
+        if self._contexto_guias is not None:
+            return self._contexto_guias
+        return ContextoGuias(element.getroottree().getroot())
+
+    def _ordenar_pelo_schema(self, raiz):
+        """Passada única de ordenação pelo XSD sobre a subárvore já corrigida pelas regras."""
+        ao_reordenar = None
+        if self.diario is not None:
+            def ao_reordenar(pai, nova_ordem):
+                self.diario.registrar_reordenacao(pai, nova_ordem, REGRA_ORDEM_SCHEMA)
+        reordenados = self.ordem_schema.ordenar(raiz, ao_reordenar)
+        if reordenados:
+            logger.info(f"Ordem do schema aplicada em {reordenados} elemento(s).")
+        return reordenados > 0
+
+    def _definir_texto(self, no, valor):
+        """Troca o texto de um nó existente, registrando no diário."""
+        if self.diario is not None:
+            self.diario.registrar_texto(no, valor, self._regra_em_aplicacao)
+        no.text = valor
+
+    def _remover_no(self, no):
+        if self.diario is not None:
+            self.diario.registrar_remocao(no, self._regra_em_aplicacao)
+        no.getparent().remove(no)
+
+    def _registrar_insercao(self, no):
+        """Registra no diário um nó já inserido (com o conteúdo final)."""
+        if self.diario is not None:
+            self.diario.registrar_insercao(no, self._regra_em_aplicacao)
+
+    def _obter_regras_compiladas(self):
+        """Compila as regras carregadas (guardas e escritas) quando a lista muda."""
+        chave = (id(self.loaded_rules), len(self.loaded_rules))
+        if chave != self._chave_compilacao:
+            self._regras_compiladas = compilar_regras(self.loaded_rules)
+            self._chave_compilacao = chave
+        return self._regras_compiladas
+
     def apply_rules_to_xml(self, xml_tree, execution_id=-1, file_name=""):
         """
         Aplica todo o conjunto de regras carregadas a uma árvore XML.
@@ -866,26 +964,114 @@ class RuleEngine:
 
         Returns:
             bool: True se alguma alteração foi feita, False caso contrário.
+            As alterações feitas ficam em `self.diario`.
+        """
+        # Entre arquivos: adota o snapshot de regras mais recente, se houver
+        self.atualizar_regras()
+        self.diario = DiarioAlteracoes(file_name)
+        self.eventos.iniciar(file_name)
+        try:
+            return self.aplicar_regras_em_elemento(xml_tree, xml_tree.getroot(), execution_id=execution_id,
+                                                   file_name=file_name)
+        finally:
+            self.eventos.finalizar()
+
+    def aplicar_regras_em_elemento(self, xml_tree, raiz, regras=None, incluir_raiz=False,
+                                   execution_id=-1, file_name=""):
+        """
+        Aplica as regras à subárvore de `raiz` (documento inteiro ou uma guia no modo em fluxo).
+
+        Args:
+            xml_tree: Árvore à qual `raiz` pertence (repassada ao tracking)
+            raiz: Elemento a partir do qual os alvos (`.//ptu:{tipo_elemento}`) são buscados
+            regras: Regras compiladas a aplicar (padrão: todas as carregadas)
+            incluir_raiz: Se True, a própria raiz também pode ser alvo (ex.: regras de guiaSADT)
         """
-        alterations_made = False
-        root = xml_tree.getroot()
-        
         self._current_file_name = file_name
+        self.rotacao.iniciar_execucao(execution_id)
+        if regras is None:
+            regras = self._obter_regras_compiladas()
+        
+        # Índice do documento: listas de elementos por tipo e valores dos campos discriminantes
+        indice = IndiceElementos(raiz, self.xml_reader, incluir_raiz=incluir_raiz)
+        self._contexto_avaliacao = indice.contexto
+        self._contexto_guias = indice.guias
+        try:
+            alterations_made = self._aplicar_regras_indexadas(xml_tree, indice, regras, execution_id, file_name)
+        finally:
+            self._contexto_avaliacao = None
+            self._contexto_guias = None
+
+        if self.ordem_schema is not None and self._ordenar_pelo_schema(raiz):
+            alterations_made = True
         
-        for rule in self.loaded_rules:
+        memo = indice.contexto.estatisticas()
+        self.estatisticas_memo['consultas'] += memo['consultas']
+        self.estatisticas_memo['acertos'] += memo['acertos']
+        logger.debug("Memória de XPath em '%s': %d/%d acertos (%.0f%%)", file_name, memo['acertos'],
+                     memo['consultas'], memo['taxa_acerto'] * 100)
+        return alterations_made
+
+    def apply_rules_streaming(self, caminho_entrada, caminho_saida=None, execution_id=-1, file_name=""):
+        """
+        Aplica as regras guia a guia, sem carregar o arquivo inteiro (ver streaming_engine).
+
+        Returns:
+            bool: True se alguma alteração foi feita (e o arquivo de saída gravado).
+        """
+        from src.business.rules import streaming_engine
+        self.atualizar_regras()
+        # Em fluxo o arquivo é sempre regravado guia a guia: sem diário
+        self.diario = None
+        self.eventos.iniciar(file_name)
+        try:
+            return streaming_engine.aplicar_regras_em_fluxo(self, caminho_entrada, caminho_saida,
+                                                            execution_id=execution_id, file_name=file_name)
+        finally:
+            self.eventos.finalizar()
+
+    def _aplicar_regras_indexadas(self, xml_tree, indice, regras, execution_id, file_name):
+        """Laço regra a regra de apply_rules_to_xml (ver rule_index)."""
+        alterations_made = False
+        root = indice.raiz
+        
+        for compilada in regras:
+            rule = compilada.regra
             try:
                 conditions = rule.get("condicoes", {})
-                tipo_elemento = conditions.get("tipo_elemento")
+                tipo_elemento = compilada.tipo_elemento
                 
-                target_elements = self.xml_reader.find_elements_by_xpath(root, f".//ptu:{tipo_elemento}") if tipo_elemento else [root]
+                if tipo_elemento:
+                    target_elements = indice.elementos(tipo_elemento)
+                    if not target_elements:
+                        continue
+                    posicoes = indice.candidatos(tipo_elemento, compilada.guarda, self.external_lists)
+                else:
+                    target_elements = [root]
+                    posicoes = range(1)
                 
-                for element in target_elements:
+                k = 0
+                while k < len(posicoes):
+                    posicao = posicoes[k]
+                    k += 1
+                    element = target_elements[posicao]
                     cond_result = self._evaluate_condition(element, conditions)
                     if cond_result:
+                        self._regra_em_aplicacao = rule.get('id')
                         if self._apply_action(element, rule.get("acao", {})):
-                            logger.info(f"Regra '{rule.get('id')}' aplicada com sucesso.")
+                            self.eventos.registrar("regra_aplicada", rule.get('id'),
+                                                   "Regra '%s' aplicada com sucesso.", rule.get('id'))
                             alterations_made = True
                             
+                            indice.invalidar(compilada.escritas)
+                            if tipo_elemento and afeta_guarda(compilada.escritas, compilada.guarda):
+                                # A ação pode ter alterado o campo da guarda: avalia todos os restantes
+                                posicoes = range(posicao + 1, len(target_elements))
+                                k = 0
+                            
+                            if self.observador_correcoes is not None:
+                                self.observador_correcoes(rule, element)
+                            
                             # Tracking de glosas evitadas (valores REAIS do XML)
                             if execution_id != -1 and tracker is not None:
                                 try:
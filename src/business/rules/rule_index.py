@@ -0,0 +1,355 @@
+# src/business/rules/rule_index.py
+
+"""
+Índice invertido de regras por campo discriminante.
+
+A maioria das regras só pode casar quando um campo do elemento tem um valor
+exato (ex.: `cd_Servico` numa lista `valor_permitido`, um `cd_cnpj`, um
+`cd_Prest`). Na carga, essas guardas de igualdade são extraídas das
+condições; durante a aplicação, cada campo discriminante é lido uma única
+vez por elemento e agrupado por valor, de modo que cada regra só avalia os
+elementos que podem casar.
+
+A ordem de aplicação não muda (regra a regra, elementos em ordem de
+documento). Os caches são invalidados pelos nomes de tags que cada ação
+pode alterar.
+
+O `ContextoAvaliacao` memoriza, por elemento, o resultado de cada XPath e o
+texto do primeiro nó, compartilhados entre todas as regras avaliadas no
+mesmo documento (o mesmo `./ptu:procedimentos/ptu:cd_Servico` é lido por
+dezenas de regras).
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional
+
+import lxml.etree as etree
+
+from src.business.rules.context_index import ContextoGuias
+from src.infrastructure.parsers.xml_reader import NAMESPACES
+
+_RE_NOME_PTU = re.compile(r"ptu:([A-Za-z_][\w.-]*)")
+
+# XPaths compilados uma única vez por expressão
+_XPATHS_COMPILADOS: Dict[str, etree.XPath] = {}
+
+# Demais tipos tratados por _evaluate_condition antes de 'valor_permitido'
+_OUTRAS_COMPARACOES = (
+    "existe", "nao_existe", "not_in_lista", "contem_e_especialidade", "valor_atual_diferente",
+    "contem_inicio", "nao_contem_inicio", "contem", "diferente",
+)
+
+# Ações com tags fixas no código (não aparecem na configuração da regra)
+_EQUIPE = frozenset({
+    "equipe_Profissional", "cdCnpjCpf", "cd_cnpj", "cd_cpf", "Prestador", "cd_Uni_Prest", "cd_Prest",
+    "nm_Profissional", "dadosConselho", "sg_Conselho", "nr_Conselho", "UF", "CBO", "tp_Participacao",
+})
+_ESCRITAS_FIXAS = {
+    "corrigir_pj_para_pf_rotativo": _EQUIPE,
+    "corrigir_para_intensivista_rotativo": _EQUIPE,
+    "corrigir_solicitante_rotativo": frozenset({
+        "profissional", "nm_Profissional", "dadosConselho", "sg_Conselho", "nr_Conselho", "UF", "CBO",
+    }),
+    "corrigir_profissional_rotativo": frozenset({
+        "nm_Profissional", "dadosConselho", "sg_Conselho", "nr_Conselho", "UF", "CBO",
+    }),
+    "corrigir_dia_31_internacao": frozenset({
+        "dt_FimFaturamento", "dt_Execucao", "dt_Atendimento", "dt_Inicial", "dt_Final",
+    }),
+    "copiar_horarios_de_outro_item": frozenset({"hr_Inicial", "hr_Final"}),
+    "gerar_alerta": frozenset(),
+}
+# Ações que alteram texto/cria tags apenas nos nós nomeados em tag_alvo
+_ESCRITA_EM_TAG_ALVO = ("substituir_conteudo_tag", "alterar_tag", "garantir_tag_com_conteudo")
+# remover_tag_inteira e reordenar_elementos_filhos mexem em subárvores inteiras:
+# qualquer cache pode ficar obsoleto (escrita = None -> invalida tudo).
+
+
+@lru_cache(maxsize=None)
+def nomes_no_xpath(xpath: str) -> Optional[FrozenSet[str]]:
+    """Nomes locais (ptu:) usados no XPath; None se houver curingas, funções ou terminar num ancestral."""
+    if not xpath or "*" in xpath or "(" in xpath or xpath.rstrip().endswith(".."):
+        return None
+    return frozenset(_RE_NOME_PTU.findall(xpath))
+
+
+def _nomes_em_valores(config) -> set:
+    """Todos os nomes ptu: citados em strings da configuração (recursivo)."""
+    nomes = set()
+    if isinstance(config, str):
+        nomes.update(_RE_NOME_PTU.findall(config))
+    elif isinstance(config, dict):
+        for valor in config.values():
+            nomes |= _nomes_em_valores(valor)
+    elif isinstance(config, list):
+        for valor in config:
+            nomes |= _nomes_em_valores(valor)
+    return nomes
+
+
+def nomes_escritos(acao: Dict) -> Optional[FrozenSet[str]]:
+    """
+    Nomes de tags que a ação pode alterar (texto ou estrutura).
+
+    Returns:
+        frozenset com os nomes, ou None quando a ação pode afetar qualquer
+        parte do documento (remoção/reordenação de subárvores, ação desconhecida).
+    """
+    tipo = (acao or {}).get("tipo_acao")
+    if tipo == "multiplas_acoes":
+        nomes = set()
+        for sub_acao in acao.get("sub_acoes", []):
+            sub_nomes = nomes_escritos(sub_acao)
+            if sub_nomes is None:
+                return None
+            nomes |= sub_nomes
+        return frozenset(nomes)
+    if tipo in _ESCRITAS_FIXAS:
+        return _ESCRITAS_FIXAS[tipo] | frozenset(_nomes_em_valores(acao))
+    if tipo in _ESCRITA_EM_TAG_ALVO:
+        tag_alvo = acao.get("tag_alvo")
+        if not tag_alvo or nomes_no_xpath(tag_alvo) is None:
+            return None
+        return frozenset(_nomes_em_valores(acao))
+    return None
+
+
+class Guarda:
+    """Condição necessária: o texto do primeiro nó de `xpath` pertence a um conjunto."""
+
+    __slots__ = ("xpath", "valores", "id_lista", "dependencias")
+
+    def __init__(self, xpath: str, valores: Optional[FrozenSet[str]] = None, id_lista: Optional[str] = None):
+        self.xpath = xpath
+        self.valores = valores
+        self.id_lista = id_lista
+        self.dependencias = nomes_no_xpath(xpath)
+
+    def conjunto(self, external_lists: Dict):
+        """Valores aceitos (frozenset fixo ou lista externa carregada)."""
+        if self.id_lista is not None:
+            return external_lists.get(self.id_lista)
+        return self.valores
+
+
+def _guarda_de_tag_valor(tag_cond: Dict) -> Optional[Guarda]:
+    xpath = tag_cond.get("xpath")
+    if not xpath or nomes_no_xpath(xpath) is None:
+        return None
+    tipo = tag_cond.get("tipo_comparacao", "valor_permitido")
+    if tipo == "valor_atual_igual":
+        return Guarda(xpath, valores=frozenset({str(tag_cond.get("valor_atual"))}))
+    if tipo == "in_lista" and tag_cond.get("id_lista"):
+        return Guarda(xpath, id_lista=tag_cond["id_lista"])
+    if tipo not in _OUTRAS_COMPARACOES and isinstance(tag_cond.get("valor_permitido"), list):
+        # Lista (não string): 'in' é igualdade, não busca de substring
+        return Guarda(xpath, valores=frozenset(str(v) for v in tag_cond["valor_permitido"]))
+    return None
+
+
+def extrair_guarda(condicao: Dict) -> Optional[Guarda]:
+    """
+    Extrai uma guarda de igualdade implicada pela condição, se houver.
+
+    - condicao_tag_valor com valor_permitido (lista), valor_atual_igual ou in_lista
+    - AND: a guarda mais seletiva entre as subcondições (valores fixos antes de listas)
+    - OR: só quando todos os ramos têm guarda de valores fixos no mesmo XPath (união)
+    """
+    if not condicao:
+        return None
+
+    if "condicao_multipla" in condicao:
+        multi = condicao["condicao_multipla"]
+        guardas = [extrair_guarda(sc) for sc in multi.get("sub_condicoes", [])]
+        if multi.get("tipo") == "AND":
+            validas = [g for g in guardas if g is not None]
+            if not validas:
+                return None
+            fixas = [g for g in validas if g.valores is not None]
+            return min(fixas, key=lambda g: len(g.valores)) if fixas else validas[0]
+        if multi.get("tipo") == "OR":
+            if not guardas or any(g is None or g.valores is None for g in guardas):
+                return None
+            if len({g.xpath for g in guardas}) != 1:
+                return None
+            return Guarda(guardas[0].xpath, valores=frozenset().union(*(g.valores for g in guardas)))
+        return None
+
+    if "condicao_tag_valor" in condicao:
+        return _guarda_de_tag_valor(condicao["condicao_tag_valor"])
+    return None
+
+
+class RegraCompilada:
+    """Regra com dados pré-calculados para o índice."""
+
+    __slots__ = ("regra", "tipo_elemento", "guarda", "escritas")
+
+    def __init__(self, regra: Dict):
+        self.regra = regra
+        condicoes = regra.get("condicoes", {}) or {}
+        self.tipo_elemento = condicoes.get("tipo_elemento")
+        self.guarda = extrair_guarda(condicoes)
+        self.escritas = nomes_escritos(regra.get("acao", {}))
+
+
+def compilar_regras(regras: List[Dict]) -> List[RegraCompilada]:
+    """Compila as regras na mesma ordem em que foram carregadas."""
+    return [RegraCompilada(regra) for regra in regras]
+
+
+def afeta_guarda(escritas: Optional[FrozenSet[str]], guarda: Optional[Guarda]) -> bool:
+    """Indica se uma escrita nesses nomes pode mudar o valor lido pela guarda."""
+    if guarda is None:
+        return False
+    if escritas is None or guarda.dependencias is None:
+        return True
+    return not escritas.isdisjoint(guarda.dependencias)
+
+
+def _xpath_compilado(expressao: str) -> etree.XPath:
+    compilado = _XPATHS_COMPILADOS.get(expressao)
+    if compilado is None:
+        compilado = etree.XPath(expressao, namespaces=NAMESPACES)
+        _XPATHS_COMPILADOS[expressao] = compilado
+    return compilado
+
+
+class ContextoAvaliacao:
+    """
+    Memória de avaliação por documento: (XPath, elemento) -> nós e texto do primeiro nó.
+
+    As entradas de um XPath são descartadas quando uma ação escreve em alguma
+    tag citada nele (ou em qualquer tag, se o XPath não puder ser analisado).
+    """
+
+    def __init__(self, xml_reader):
+        self.xml_reader = xml_reader
+        self._nos: Dict[str, Dict] = {}
+        self._textos: Dict[str, Dict] = {}
+        self.consultas = 0
+        self.acertos = 0
+
+    def _buscar(self, elemento, xpath: str):
+        """Retorna (nós, veio_da_memoria)."""
+        por_elemento = self._nos.setdefault(xpath, {})
+        resultado = por_elemento.get(elemento)
+        if resultado is not None:
+            return resultado, True
+        resultado = _xpath_compilado(xpath)(elemento)
+        por_elemento[elemento] = resultado
+        return resultado, False
+
+    def nos(self, elemento, xpath: str) -> list:
+        """Resultado de `xpath` a partir de `elemento` (memorizado)."""
+        resultado, memorizado = self._buscar(elemento, xpath)
+        self.consultas += 1
+        self.acertos += memorizado
+        return resultado
+
+    def texto(self, elemento, xpath: str) -> Optional[str]:
+        """Texto (sem espaços) do primeiro nó de `xpath`; None se não houver nó ou texto."""
+        self.consultas += 1
+        por_elemento = self._textos.setdefault(xpath, {})
+        if elemento in por_elemento:
+            self.acertos += 1
+            return por_elemento[elemento]
+        nos, _ = self._buscar(elemento, xpath)
+        valor = self.xml_reader.get_element_text(nos[0]) if nos else None
+        por_elemento[elemento] = valor
+        return valor
+
+    def invalidar(self, escritas: Optional[FrozenSet[str]]):
+        """Descarta os XPaths que dependem das tags alteradas (None = todos)."""
+        if escritas is None:
+            self._nos.clear()
+            self._textos.clear()
+            return
+        if not escritas:
+            return
+        for memoria in (self._nos, self._textos):
+            for xpath in list(memoria):
+                dependencias = nomes_no_xpath(xpath)
+                if dependencias is None or not escritas.isdisjoint(dependencias):
+                    del memoria[xpath]
+
+    def estatisticas(self) -> Dict:
+        """Consultas, acertos e taxa de acerto da memória."""
+        taxa = self.acertos / self.consultas if self.consultas else 0.0
+        return {'consultas': self.consultas, 'acertos': self.acertos, 'taxa_acerto': taxa}
+
+
+class IndiceElementos:
+    """
+    Caches por documento:
+    - elementos de cada tipo (resultado de `.//ptu:{tipo}`)
+    - para (tipo, xpath da guarda): valor -> posições dos elementos com esse valor
+
+    Invalidação por nomes de tags alterados (ou total), repassada ao
+    `ContextoAvaliacao` e ao `ContextoGuias` do documento.
+    """
+
+    def __init__(self, raiz, xml_reader, incluir_raiz: bool = False):
+        self.raiz = raiz
+        self.xml_reader = xml_reader
+        self._eixo = "descendant-or-self::" if incluir_raiz else ".//"
+        self.contexto = ContextoAvaliacao(xml_reader)
+        self.guias = ContextoGuias(raiz)
+        self._elementos: Dict[str, list] = {}
+        self._por_valor: Dict[tuple, Dict[Optional[str], List[int]]] = {}
+        self.consultas_evitadas = 0
+
+    def elementos(self, tipo: str) -> list:
+        lista = self._elementos.get(tipo)
+        if lista is None:
+            lista = _xpath_compilado(f"{self._eixo}ptu:{tipo}")(self.raiz)
+            self._elementos[tipo] = lista
+        else:
+            self.consultas_evitadas += 1
+        return lista
+
+    def _valores(self, tipo: str, xpath: str) -> Dict[Optional[str], List[int]]:
+        chave = (tipo, xpath)
+        por_valor = self._por_valor.get(chave)
+        if por_valor is None:
+            por_valor = {}
+            for posicao, elemento in enumerate(self.elementos(tipo)):
+                por_valor.setdefault(self.contexto.texto(elemento, xpath), []).append(posicao)
+            self._por_valor[chave] = por_valor
+        return por_valor
+
+    def candidatos(self, tipo: str, guarda: Optional[Guarda], external_lists: Dict):
+        """Posições (ordem de documento) dos elementos que satisfazem a guarda."""
+        aceitos = guarda.conjunto(external_lists) if guarda is not None else None
+        if aceitos is None:
+            return range(len(self.elementos(tipo)))
+        por_valor = self._valores(tipo, guarda.xpath)
+        if len(por_valor) <= len(aceitos):
+            listas = [pos for valor, pos in por_valor.items() if valor is not None and valor in aceitos]
+        else:
+            listas = [por_valor[valor] for valor in aceitos if valor in por_valor]
+        if not listas:
+            return []
+        if len(listas) == 1:
+            return listas[0]
+        return sorted(p for pos in listas for p in pos)
+
+    def invalidar(self, escritas: Optional[FrozenSet[str]]):
+        """Descarta caches que dependem das tags alteradas (None = todos)."""
+        self.contexto.invalidar(escritas)
+        self.guias.invalidar(escritas)
+        if escritas is None:
+            self._elementos.clear()
+            self._por_valor.clear()
+            return
+        if not escritas:
+            return
+        for tipo in [t for t in self._elementos if t in escritas]:
+            del self._elementos[tipo]
+        for chave in list(self._por_valor):
+            tipo, xpath = chave
+            dependencias = nomes_no_xpath(xpath)
+            if tipo in escritas or tipo not in self._elementos or dependencias is None \
+                    or not escritas.isdisjoint(dependencias):
+                del self._por_valor[chave]
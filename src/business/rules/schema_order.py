@@ -0,0 +1,249 @@
+# src/business/rules/schema_order.py
+
+"""
+Ordem canônica dos elementos compilada do XSD do PTU.
+
+Para cada complexType do schema (nomeado ou inline) a ordem dos filhos do
+`xs:sequence` vira uma tabela `tag -> (posição, tipo do filho)`, com as tags
+já no formato `{namespace}nome` do lxml. Uma única passada pelo documento
+acompanha o tipo de cada elemento a partir do tipo do pai (a mesma tag pode
+ter ordens diferentes conforme o contexto, ex.: `equipe_Profissional` em
+guias de honorários) e reordena os pais fora de ordem, substituindo as
+regras `reordenar_elementos_filhos` com listas escritas à mão.
+
+A passada é conservadora: um pai com algum filho que o tipo não declara
+(tag desconhecida, comentário, tipo inferido errado) não é reordenado.
+Grupos repetidos (`maxOccurs` > 1 em sequence/choice) mantêm a ordem em
+que os filhos aparecem, já que alternâncias como a, b, a, b são válidas.
+"""
+
+import logging
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+import lxml.etree as etree
+
+logger = logging.getLogger(__name__)
+
+XSD_NS = "http://www.w3.org/2001/XMLSchema"
+
+CAMINHO_XSD_PADRAO = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "schemas", "ptu_ComplexTypes-V3_0.xsd",
+)
+
+_ELEMENT = f"{{{XSD_NS}}}element"
+_GRUPOS = frozenset({f"{{{XSD_NS}}}sequence", f"{{{XSD_NS}}}choice", f"{{{XSD_NS}}}all"})
+_COMPLEX_TYPE = f"{{{XSD_NS}}}complexType"
+_COMPLEX_CONTENT = f"{{{XSD_NS}}}complexContent"
+_EXTENSION = f"{{{XSD_NS}}}extension"
+
+# Tabelas compiladas por (caminho, mtime) do XSD
+_CACHE: Dict[Tuple[str, int], "OrdemSchema"] = {}
+
+
+class OrdemSchema:
+    """Tabelas de ordem por tipo e passada de reordenação."""
+
+    def __init__(self, tipos: Dict[str, Dict[str, Tuple[int, Optional[Tuple[str, ...]]]]],
+                 tipos_por_elemento: Dict[str, Tuple[str, ...]], nao_ordenaveis=frozenset()):
+        # tipo -> {tag: (posição, (tipo do filho,) ou None se simples)}
+        self.tipos = tipos
+        # Tipos com que cada tag é declarada no schema (elementos sem tipo vindo do pai, ex.: a raiz)
+        self.tipos_por_elemento = tipos_por_elemento
+        # Tipos com a mesma tag em posições diferentes: só usados para tipar os filhos
+        self.nao_ordenaveis = frozenset(nao_ordenaveis)
+
+    def ordenar(self, raiz, ao_reordenar: Optional[Callable] = None) -> int:
+        """
+        Reordena, em uma passada, os filhos de todos os elementos fora da ordem do schema.
+
+        Os tipos possíveis de cada elemento vêm dos tipos do pai; sem eles
+        (raiz, pai não reconhecido), valem todos os tipos com que a tag é
+        declarada. Só contam os tipos que aceitam todos os filhos presentes
+        e, se restar mais de um, o elemento só é reordenado quando todos
+        levam à mesma ordem.
+
+        Args:
+            raiz: Elemento inicial (o próprio elemento também é verificado)
+            ao_reordenar: Chamado com (pai, nova ordem dos filhos) antes de cada reordenação
+
+        Returns:
+            Quantidade de elementos reordenados
+        """
+        reordenados = 0
+        tipos = self.tipos
+        tipos_por_elemento = self.tipos_por_elemento
+        nao_ordenaveis = self.nao_ordenaveis
+        pilha = [(raiz, None)]
+        while pilha:
+            elemento, candidatos = pilha.pop()
+            filhos = list(elemento)
+            if not filhos:
+                continue
+            if candidatos is None:
+                candidatos = tipos_por_elemento.get(elemento.tag, ())
+
+            compativeis = []
+            for candidato in candidatos:
+                tabela = tipos[candidato]
+                entradas = [tabela.get(filho.tag) for filho in filhos]
+                if None not in entradas:
+                    compativeis.append((candidato, entradas))
+            if not compativeis:
+                # Pai não reconhecido: os filhos são tipados pela própria tag
+                pilha.extend((filho, None) for filho in filhos if isinstance(filho.tag, str))
+                continue
+
+            if len(compativeis) == 1:
+                candidato, entradas = compativeis[0]
+                ordem = None if candidato in nao_ordenaveis else _permutacao(entradas)
+                tipos_filhos = [entrada[1] for entrada in entradas]
+            else:
+                ordens = {None if candidato in nao_ordenaveis else _permutacao(entradas)
+                          for candidato, entradas in compativeis}
+                ordem = ordens.pop() if len(ordens) == 1 else None
+                tipos_filhos = [_uniao(entradas_filho) for entradas_filho in zip(*(e for _, e in compativeis))]
+
+            if ordem is not None:
+                filhos = [filhos[i] for i in ordem]
+                tipos_filhos = [tipos_filhos[i] for i in ordem]
+                if ao_reordenar is not None:
+                    ao_reordenar(elemento, filhos)
+                elemento[:] = filhos
+                reordenados += 1
+
+            # Filhos de tipo simples não têm elementos a ordenar
+            pilha.extend((filho, tipos_filho) for filho, tipos_filho in zip(filhos, tipos_filhos)
+                         if tipos_filho is not None)
+        return reordenados
+
+
+def _permutacao(entradas: List[Tuple[int, Optional[Tuple[str, ...]]]]) -> Optional[Tuple[int, ...]]:
+    """Índices dos filhos na ordem do schema, ou None se já estiverem em ordem."""
+    anterior = -1
+    for posicao, _ in entradas:
+        if posicao < anterior:
+            # sorted é estável: repetições e grupos repetidos mantêm a ordem atual
+            return tuple(sorted(range(len(entradas)), key=lambda i: entradas[i][0]))
+        anterior = posicao
+    return None
+
+
+def _uniao(entradas_filho) -> Optional[Tuple[str, ...]]:
+    """Tipos possíveis de um filho segundo cada tipo compatível do pai."""
+    uniao = {tipo for entrada in entradas_filho if entrada[1] for tipo in entrada[1]}
+    return tuple(sorted(uniao)) if uniao else None
+
+
+class _Compilador:
+    """Percorre o XSD e monta as tabelas de OrdemSchema."""
+
+    def __init__(self, schema):
+        self.alvo = schema.get("targetNamespace", "")
+        self.definicoes = {ct.get("name"): ct for ct in schema.iterchildren(_COMPLEX_TYPE)}
+        self.tipos: Dict[str, Dict[str, Tuple[int, Optional[Tuple[str, ...]]]]] = {}
+        self.nao_ordenaveis = set()
+        # Partículas (tag, posição relativa, tipo) por tipo, usadas pelas extensões
+        self._particulas: Dict[str, List] = {}
+        self._declaracoes: Dict[str, set] = {}
+        self._em_compilacao = set()
+
+    def compilar(self) -> OrdemSchema:
+        for nome in self.definicoes:
+            self._tipo_nomeado(nome)
+        tipos_por_elemento = {tag: tuple(sorted(tipos)) for tag, tipos in self._declaracoes.items()}
+        return OrdemSchema(self.tipos, tipos_por_elemento, self.nao_ordenaveis)
+
+    def _tipo_nomeado(self, nome: str) -> List:
+        """Partículas (tag, posição relativa, tipo) do tipo, compilando-o se preciso."""
+        if nome in self._em_compilacao:
+            raise ValueError(f"Extensão circular no tipo {nome}")
+        if nome not in self._particulas:
+            self._em_compilacao.add(nome)
+            self._registrar(nome, self._particulas_do_tipo(self.definicoes[nome], nome))
+            self._em_compilacao.discard(nome)
+        return self._particulas[nome]
+
+    def _registrar(self, nome: str, particulas: List):
+        self._particulas[nome] = particulas
+        posicoes = sorted({posicao for _, posicao, _ in particulas})
+        indice = {posicao: i for i, posicao in enumerate(posicoes)}
+        posicao_por_tag: Dict[str, int] = {}
+        tipos_por_tag: Dict[str, set] = {}
+        for tag, posicao, tipo in particulas:
+            if posicao_por_tag.setdefault(tag, indice[posicao]) != indice[posicao]:
+                # Mesma tag em dois pontos do conteúdo: a ordem depende do contexto
+                self.nao_ordenaveis.add(nome)
+            if tipo is not None:
+                tipos_por_tag.setdefault(tag, set()).add(tipo)
+        self.tipos[nome] = {
+            tag: (posicao, tuple(sorted(tipos_por_tag[tag])) if tag in tipos_por_tag else None)
+            for tag, posicao in posicao_por_tag.items()
+        }
+
+    def _particulas_do_tipo(self, complex_type, nome: str) -> List:
+        for filho in complex_type.iterchildren(_COMPLEX_CONTENT):
+            for extensao in filho.iterchildren(_EXTENSION):
+                base = self._nome_local(extensao.get("base"))
+                # Extensão: conteúdo do tipo base seguido do conteúdo próprio
+                particulas = [(tag, (0,) + posicao, tipo) for tag, posicao, tipo in self._tipo_nomeado(base)] \
+                    if base in self.definicoes else []
+                for grupo in extensao.iterchildren(*_GRUPOS):
+                    particulas.extend(self._particulas_do_grupo(grupo, (1,), nome, False))
+                return particulas
+        particulas = []
+        for grupo in complex_type.iterchildren(*_GRUPOS):
+            particulas.extend(self._particulas_do_grupo(grupo, (), nome, False))
+        return particulas
+
+    def _particulas_do_grupo(self, grupo, prefixo: Tuple, dono: str, repetido: bool) -> List:
+        repetido = repetido or grupo.get("maxOccurs", "1") != "1"
+        particulas = []
+        for i, particula in enumerate(grupo.iterchildren(_ELEMENT, *_GRUPOS)):
+            posicao = prefixo if repetido else prefixo + (i,)
+            if particula.tag != _ELEMENT:
+                particulas.extend(self._particulas_do_grupo(particula, posicao, dono, repetido))
+                continue
+            nome = particula.get("name")
+            tag = f"{{{self.alvo}}}{nome}"
+            inline = particula.find(_COMPLEX_TYPE)
+            if inline is not None:
+                tipo = f"{dono}/{nome}"
+                self._registrar(tipo, self._particulas_do_tipo(inline, tipo))
+            else:
+                tipo = self._nome_local(particula.get("type"))
+                tipo = tipo if tipo in self.definicoes else None
+            if tipo is not None:
+                self._declaracoes.setdefault(tag, set()).add(tipo)
+            particulas.append((tag, posicao, tipo))
+        return particulas
+
+    @staticmethod
+    def _nome_local(referencia: Optional[str]) -> Optional[str]:
+        return referencia.split(":")[-1] if referencia else None
+
+
+def compilar_ordem_schema(caminho_xsd: str) -> OrdemSchema:
+    """Compila as tabelas de ordem de um XSD (sem cache)."""
+    schema = etree.parse(caminho_xsd).getroot()
+    return _Compilador(schema).compilar()
+
+
+def carregar_ordem_schema(caminho_xsd: str = None) -> Optional[OrdemSchema]:
+    """
+    Tabelas de ordem do XSD, compiladas uma vez por processo (recompila se o arquivo mudar).
+
+    Returns:
+        OrdemSchema, ou None se o XSD não puder ser lido
+    """
+    caminho_xsd = caminho_xsd or CAMINHO_XSD_PADRAO
+    try:
+        chave = (os.path.abspath(caminho_xsd), os.stat(caminho_xsd).st_mtime_ns)
+        if chave not in _CACHE:
+            _CACHE[chave] = compilar_ordem_schema(caminho_xsd)
+            logger.debug(f"Ordem do schema compilada: {len(_CACHE[chave].tipos)} tipos ({caminho_xsd})")
+        return _CACHE[chave]
+    except Exception as e:
+        logger.error(f"Erro ao compilar a ordem do schema '{caminho_xsd}': {e}")
+        return None
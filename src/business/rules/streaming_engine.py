@@ -0,0 +1,183 @@
+# src/business/rules/streaming_engine.py
+
+"""
+Aplicação de regras em fluxo (memória limitada) para faturas muito grandes.
+
+Em vez de carregar o `.051` inteiro, o arquivo é lido com `iterparse`:
+
+1. Cada guia (`guiaConsulta`, `guiaSADT`, `guiaInternacao`, `guiaHonorarios`)
+   recebe as regras de escopo de guia assim que termina de ser lida, é
+   serializada num arquivo temporário e substituída na árvore por um
+   marcador vazio. Só o "esqueleto" do documento (cabeçalho, hash,
+   contêineres e marcadores) permanece em memória.
+2. Passo final: as regras são aplicadas ao esqueleto (cabeçalho, hash;
+   as guias ali são só marcadores) e a saída é gravada com `etree.xmlfile`, lendo as guias do temporário uma a
+   uma no lugar de cada marcador.
+
+O pico de memória depende da maior guia, não do tamanho do arquivo.
+
+Diferenças em relação a `apply_rules_to_xml`:
+- As regras são aplicadas guia a guia (todas as regras numa guia, depois a
+  próxima), não regra a regra no documento inteiro. Para regras locais à
+  guia o resultado é o mesmo; nas ações rotativas a sequência de
+  profissionais pode diferir quando o mesmo beneficiário aparece em várias
+  guias.
+- Regras sem `tipo_elemento` ou sobre os contêineres só rodam no passo
+  final e enxergam o esqueleto, não o conteúdo das guias.
+- Cada guia é gravada com a própria declaração de namespace (o conteúdo e
+  o hash não mudam).
+"""
+
+import logging
+import os
+import struct
+import tempfile
+
+import lxml.etree as etree
+
+from src.infrastructure.parsers.xml_reader import NAMESPACES
+
+logger = logging.getLogger(__name__)
+
+# Arquivos a partir deste tamanho são validados em fluxo no WorkflowController
+TAMANHO_MINIMO_STREAMING = 64 * 1024 * 1024
+
+TAGS_GUIA = ("guiaConsulta", "guiaSADT", "guiaInternacao", "guiaHonorarios")
+
+# Elementos do esqueleto: regras com esses tipos são regras de documento
+TAGS_DOCUMENTO = frozenset({
+    "GuiaCobrancaUtilizacao", "arquivoCobrancaUtilizacao", "Tipoguia", "CobrancaReembolso",
+})
+
+_MARCADOR = "{urn:auditdesk:streaming}guia"
+_TAMANHO = struct.Struct("<Q")
+
+
+def _regra_de_guia(compilada) -> bool:
+    """Indica se a regra pode ser aplicada isoladamente a cada guia."""
+    tipo = compilada.tipo_elemento
+    return bool(tipo) and tipo not in TAGS_DOCUMENTO
+
+
+def _gravar_guia(spool, guia) -> int:
+    """Serializa a guia (já indentada) no temporário, precedida do tamanho."""
+    etree.indent(guia, space="")
+    dados = etree.tostring(guia, with_tail=False)
+    spool.write(_TAMANHO.pack(len(dados)))
+    spool.write(dados)
+    return len(dados)
+
+
+def _ler_guias(spool, parser):
+    """Lê as guias do temporário na ordem em que foram gravadas."""
+    spool.seek(0)
+    while True:
+        cabecalho = spool.read(_TAMANHO.size)
+        if not cabecalho:
+            return
+        (tamanho,) = _TAMANHO.unpack(cabecalho)
+        yield etree.fromstring(spool.read(tamanho), parser)
+
+
+def _contem_marcador(elemento) -> bool:
+    return elemento.tag == _MARCADOR or next(elemento.iter(_MARCADOR), None) is not None
+
+
+def _escrever(xf, elemento, guias, nsmap_pai):
+    """Grava o esqueleto, substituindo cada marcador pela próxima guia."""
+    if elemento.tag == _MARCADOR:
+        guia = next(guias)
+        guia.tail = elemento.tail
+        xf.write(guia)
+        return
+    if not isinstance(elemento.tag, str) or not _contem_marcador(elemento):
+        xf.write(elemento)
+        return
+
+    nsmap = {prefixo: uri for prefixo, uri in elemento.nsmap.items() if nsmap_pai.get(prefixo) != uri}
+    with xf.element(elemento.tag, dict(elemento.attrib), nsmap=nsmap):
+        if elemento.text:
+            xf.write(elemento.text)
+        for filho in elemento:
+            _escrever(xf, filho, guias, elemento.nsmap)
+    if elemento.tail:
+        xf.write(elemento.tail)
+
+
+def aplicar_regras_em_fluxo(engine, caminho_entrada: str, caminho_saida: str = None,
+                            execution_id: int = -1, file_name: str = "") -> bool:
+    """
+    Aplica as regras carregadas em `engine` guia a guia e grava a saída em fluxo.
+
+    Args:
+        engine: RuleEngine com as regras já carregadas
+        caminho_entrada: Arquivo .051 de origem
+        caminho_saida: Destino (padrão: sobrescreve a origem); só é gravado se houver alteração
+        execution_id / file_name: Repassados ao tracking, como em apply_rules_to_xml
+
+    Returns:
+        bool: True se alguma alteração foi feita, False caso contrário (ou em erro).
+    """
+    caminho_saida = caminho_saida or caminho_entrada
+    regras = engine._obter_regras_compiladas()
+    regras_guia = [c for c in regras if _regra_de_guia(c)]
+    tags = [f"{{{NAMESPACES['ptu']}}}{tag}" for tag in TAGS_GUIA]
+
+    alterado = False
+    qtd_guias = 0
+    maior_guia = 0
+    with tempfile.TemporaryFile(prefix="guias_", suffix=".spool") as spool:
+        try:
+            contexto = etree.iterparse(caminho_entrada, events=("end",), tag=tags, recover=True,
+                                       strip_cdata=False, resolve_entities=False)
+            for _, guia in contexto:
+                if engine.aplicar_regras_em_elemento(guia.getroottree(), guia, regras=regras_guia,
+                                                     incluir_raiz=True, execution_id=execution_id,
+                                                     file_name=file_name):
+                    alterado = True
+                maior_guia = max(maior_guia, _gravar_guia(spool, guia))
+                qtd_guias += 1
+
+                # Troca a guia por um marcador: a memória fica limitada ao esqueleto
+                marcador = etree.Element(_MARCADOR)
+                guia.getparent().replace(guia, marcador)
+            esqueleto = contexto.root
+        except Exception as e:
+            logger.error(f"Erro ao processar '{caminho_entrada}' em fluxo: {e}")
+            return False
+
+        if esqueleto is None:
+            logger.error(f"Nenhum conteúdo XML encontrado em '{caminho_entrada}'.")
+            return False
+
+        # Passo final: regras sobre o esqueleto (cabeçalho, hash, contêineres)
+        if engine.aplicar_regras_em_elemento(esqueleto.getroottree(), esqueleto, regras=regras,
+                                             execution_id=execution_id, file_name=file_name):
+            alterado = True
+
+        logger.info(f"{qtd_guias} guia(s) processada(s) em fluxo; maior guia: {maior_guia / 1024:.0f} KB.")
+        if not alterado:
+            return False
+
+        pasta_saida = os.path.dirname(os.path.abspath(caminho_saida))
+        descritor, caminho_temp = tempfile.mkstemp(prefix=".stream_", suffix=".051", dir=pasta_saida)
+        os.close(descritor)
+        try:
+            etree.indent(esqueleto, space="")
+            parser = etree.XMLParser(strip_cdata=False, resolve_entities=False)
+            guias = _ler_guias(spool, parser)
+            with open(caminho_temp, "wb") as destino:
+                # Mesmo cabeçalho de FileHandler.save_xml_tree
+                destino.write(b"<?xml version='1.0' encoding='ISO-8859-1'?>\n")
+                with etree.xmlfile(destino, encoding="ISO-8859-1") as xf:
+                    _escrever(xf, esqueleto, guias, {})
+                destino.write(b"\n")
+            os.replace(caminho_temp, caminho_saida)
+        except Exception as e:
+            logger.error(f"Erro ao gravar '{caminho_saida}' em fluxo: {e}")
+            if os.path.exists(caminho_temp):
+                os.remove(caminho_temp)
+            return False
+
+    logger.info(f"XML salvo em: {caminho_saida}")
+    return True
@@ -5,7 +5,10 @@ from sqlalchemy.orm import sessionmaker, scoped_session
 from datetime import datetime
 from .models import Base, ExecutionLog, FileLog, User, ROIMetrics
 from .models_fatura import Fatura, FaturaHistorico  # Modelos de faturas para consulta
-from .models_rules import AuditRule, AuditRuleHistory, AuditRuleList  # Modelos de regras
+from .models_rules import AuditRule, AuditRuleHistory, AuditRuleList, AuditRuleSnapshot  # Modelos de regras
+from .models_jobs import BatchJob, BatchJobArquivo  # Jobs em lote retomáveis
+from .models_features import ArquivoFeatures, ArquivoFeatureValor  # Índice para reexecução de impacto
+from .models_importacao import ImportacaoZip, ImportacaoEstado  # Cache de importação de ZIPs
 
 # ✅ SEGURANÇA: Importar gerenciador seguro de senhas
 from src.infrastructure.security.password_manager import PasswordManager
@@ -46,7 +49,11 @@ def init_db():
     """Cria as tabelas no banco de dados se não existirem e cria usuário admin."""
     Base.metadata.create_all(engine)
     logger.info(f"Banco de dados inicializado ({DB_PROVIDER})")
-    
+
+    # Índice de busca textual de faturas (FTS5 / pg_trgm) - idempotente
+    from .fatura_repository import garantir_indice_busca
+    garantir_indice_busca()
+
     # ✅ SEGURANÇA: Criar usuário admin sem senha padrão
     session = get_session()
     try:
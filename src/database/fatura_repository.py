@@ -4,12 +4,249 @@ Glox - Repositório de Faturas
 Funções para consulta e gerenciamento de faturas importadas.
 """
 
+import logging
 from typing import Optional, List, Dict
 from datetime import datetime
-from sqlalchemy import func
+from sqlalchemy import func, text, select, insert, update
+from sqlalchemy.exc import OperationalError
 from .db_manager import get_session
 from .models_fatura import Fatura, FaturaHistorico
 
+logger = logging.getLogger(__name__)
+
+# Colunas cobertas pelo índice de busca (ordem = peso no ranking)
+COLUNAS_BUSCA = ('nro_fatura', 'unimed_nome', 'responsavel')
+
+# Tamanho mínimo de termo para o índice de trigramas
+TAMANHO_MINIMO_TRIGRAMA = 3
+
+# Faturas por consulta IN / executemany em importar_lote
+TAMANHO_BLOCO_IMPORTACAO = 500
+
+# None = ainda não verificado; True/False = índice FTS5/pg_trgm disponível
+_indice_busca_disponivel: Optional[bool] = None
+
+_DDL_SQLITE = [
+    """CREATE VIRTUAL TABLE faturas_busca USING fts5(
+        nro_fatura, unimed_nome, responsavel,
+        content='faturas', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS faturas_busca_ai AFTER INSERT ON faturas BEGIN
+        INSERT INTO faturas_busca(rowid, nro_fatura, unimed_nome, responsavel)
+        VALUES (new.id, new.nro_fatura, new.unimed_nome, new.responsavel);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS faturas_busca_ad AFTER DELETE ON faturas BEGIN
+        INSERT INTO faturas_busca(faturas_busca, rowid, nro_fatura, unimed_nome, responsavel)
+        VALUES ('delete', old.id, old.nro_fatura, old.unimed_nome, old.responsavel);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS faturas_busca_au
+    AFTER UPDATE OF nro_fatura, unimed_nome, responsavel ON faturas BEGIN
+        INSERT INTO faturas_busca(faturas_busca, rowid, nro_fatura, unimed_nome, responsavel)
+        VALUES ('delete', old.id, old.nro_fatura, old.unimed_nome, old.responsavel);
+        INSERT INTO faturas_busca(rowid, nro_fatura, unimed_nome, responsavel)
+        VALUES (new.id, new.nro_fatura, new.unimed_nome, new.responsavel);
+    END""",
+]
+
+_DDL_POSTGRESQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+] + [
+    f"CREATE INDEX IF NOT EXISTS ix_faturas_{coluna}_trgm ON faturas USING gin ({coluna} gin_trgm_ops)"
+    for coluna in COLUNAS_BUSCA
+]
+
+
+def garantir_indice_busca() -> bool:
+    """
+    Cria (se necessário) o índice de busca textual das faturas.
+    
+    - SQLite: tabela virtual FTS5 com tokenizer trigram, sincronizada por triggers.
+    - PostgreSQL: extensão pg_trgm com índices GIN em cada coluna pesquisável.
+    
+    Operação idempotente. Se o banco não suportar o índice, a busca
+    cai para LIKE (mais lento, mas funcional).
+    
+    Returns:
+        True se o índice está disponível
+    """
+    global _indice_busca_disponivel
+    session = get_session()
+    try:
+        dialeto = session.get_bind().dialect.name
+        if dialeto == 'sqlite':
+            existe = session.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'faturas_busca'"
+            )).first()
+            if not existe:
+                for ddl in _DDL_SQLITE:
+                    session.execute(text(ddl))
+                # Popular o índice com as faturas já existentes
+                session.execute(text("INSERT INTO faturas_busca(faturas_busca) VALUES ('rebuild')"))
+                logger.info("Índice de busca FTS5 (trigram) criado para faturas.")
+            else:
+                for ddl in _DDL_SQLITE[1:]:
+                    session.execute(text(ddl))
+        elif dialeto == 'postgresql':
+            for ddl in _DDL_POSTGRESQL:
+                session.execute(text(ddl))
+        else:
+            _indice_busca_disponivel = False
+            return False
+        
+        session.commit()
+        _indice_busca_disponivel = True
+        return True
+    except OperationalError as e:
+        session.rollback()
+        logger.warning(f"Índice de busca indisponível, usando LIKE: {e}")
+        _indice_busca_disponivel = False
+        return False
+    except Exception as e:
+        session.rollback()
+        print(f"Erro ao criar índice de busca: {e}")
+        _indice_busca_disponivel = False
+        return False
+    finally:
+        session.close()
+
+
+def _escapar_like(termo: str) -> str:
+    """Escapa curingas do LIKE para busca literal."""
+    return termo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _expressao_fts(termo: str) -> Optional[str]:
+    """
+    Monta a expressão MATCH do FTS5: cada palavra vira uma frase entre aspas
+    (AND implícito). Palavras menores que um trigrama são descartadas.
+    """
+    palavras = [p for p in termo.split() if len(p) >= TAMANHO_MINIMO_TRIGRAMA]
+    if not palavras:
+        return None
+    return ' '.join('"' + p.replace('"', '""') + '"' for p in palavras)
+
+
+def _contar_ate(session, origem_sql: str, params: Dict) -> int:
+    """count(*) limitado a :teto linhas (não percorre todos os resultados de um termo amplo)."""
+    return session.execute(text(
+        f"SELECT count(*) FROM (SELECT 1 FROM {origem_sql} LIMIT :teto) AS amostra"
+    ), params).scalar() or 0
+
+
+def pesquisar_faturas(termo: str, pagina: int = 1, por_pagina: int = 20) -> Dict:
+    """
+    Busca faturas por número (parcial), nome da Unimed ou responsável.
+    
+    Resultados ordenados por relevância: número exato, depois prefixo do
+    número, depois o ranking do índice (bm25 no SQLite, similaridade de
+    trigramas no PostgreSQL).
+    
+    O total só é contado até uma página além da atual: se houver mais
+    resultados, 'total' é esse limite e 'total_exato' é False ("mais de N").
+    
+    Args:
+        termo: Texto digitado pelo usuário
+        pagina: Página desejada (começa em 1)
+        por_pagina: Quantidade de resultados por página
+    
+    Returns:
+        {'total': int, 'total_exato': bool, 'pagina': int, 'por_pagina': int, 'resultados': [dict]}
+    """
+    termo = (termo or '').strip()
+    pagina = max(1, int(pagina))
+    por_pagina = max(1, int(por_pagina))
+    vazio = {'total': 0, 'total_exato': True, 'pagina': pagina, 'por_pagina': por_pagina, 'resultados': []}
+    if not termo:
+        return vazio
+    
+    if _indice_busca_disponivel is None:
+        garantir_indice_busca()
+    
+    session = get_session()
+    try:
+        dialeto = session.get_bind().dialect.name
+        params = {
+            'termo': termo,
+            'prefixo_fim': termo + '\uffff',
+            'limite': por_pagina,
+            'deslocamento': (pagina - 1) * por_pagina,
+            # Basta saber se existe a próxima página
+            'teto': (pagina + 1) * por_pagina + 1,
+        }
+        # Classe de relevância: 0 = número exato, 1 = prefixo do número, 2 = demais
+        classe_sql = (
+            "CASE WHEN f.nro_fatura = :termo THEN 0 "
+            "WHEN f.nro_fatura >= :termo AND f.nro_fatura < :prefixo_fim THEN 1 "
+            "ELSE 2 END"
+        )
+        expressao = _expressao_fts(termo)
+        
+        if dialeto == 'sqlite' and _indice_busca_disponivel and expressao:
+            params['expressao'] = expressao
+            total = _contar_ate(session, "faturas_busca WHERE faturas_busca MATCH :expressao", params)
+            linhas = session.execute(text(f"""
+                SELECT f.id, {classe_sql} AS classe
+                FROM faturas_busca
+                JOIN faturas f ON f.id = faturas_busca.rowid
+                WHERE faturas_busca MATCH :expressao
+                ORDER BY classe, bm25(faturas_busca, 10.0, 2.0, 1.0), f.nro_fatura
+                LIMIT :limite OFFSET :deslocamento
+            """), params).all()
+        elif len(termo) < TAMANHO_MINIMO_TRIGRAMA or (dialeto == 'sqlite' and not expressao):
+            # Termo curto demais para trigramas: prefixo do número (usa o índice único)
+            filtro = "f.nro_fatura >= :termo AND f.nro_fatura < :prefixo_fim"
+            total = _contar_ate(session, f"faturas f WHERE {filtro}", params)
+            linhas = session.execute(text(f"""
+                SELECT f.id, {classe_sql} AS classe FROM faturas f
+                WHERE {filtro}
+                ORDER BY classe, f.nro_fatura
+                LIMIT :limite OFFSET :deslocamento
+            """), params).all()
+        else:
+            # PostgreSQL (pg_trgm acelera ILIKE '%x%') ou fallback LIKE
+            params['padrao'] = f"%{_escapar_like(termo)}%"
+            operador = 'ILIKE' if dialeto == 'postgresql' else 'LIKE'
+            filtro = ' OR '.join(
+                f"f.{coluna} {operador} :padrao ESCAPE '\\'" for coluna in COLUNAS_BUSCA
+            )
+            if dialeto == 'postgresql' and _indice_busca_disponivel:
+                ordem_score = ("greatest(similarity(f.nro_fatura, :termo), "
+                               "similarity(coalesce(f.unimed_nome, ''), :termo), "
+                               "similarity(coalesce(f.responsavel, ''), :termo)) DESC, ")
+            else:
+                ordem_score = ""
+            total = _contar_ate(session, f"faturas f WHERE {filtro}", params)
+            linhas = session.execute(text(f"""
+                SELECT f.id, {classe_sql} AS classe FROM faturas f
+                WHERE {filtro}
+                ORDER BY classe, {ordem_score}f.nro_fatura
+                LIMIT :limite OFFSET :deslocamento
+            """), params).all()
+        
+        total_exato = total < params['teto']
+        total = min(total, params['teto'] - 1)
+        ids = [linha[0] for linha in linhas]
+        if not ids:
+            return {**vazio, 'total': total, 'total_exato': total_exato}
+        
+        faturas = {f.id: f for f in session.query(Fatura).filter(Fatura.id.in_(ids)).all()}
+        resultados = []
+        for posicao, fatura_id in enumerate(ids):
+            fatura = faturas.get(fatura_id)
+            if fatura is None:
+                continue
+            item = fatura.to_dict()
+            item['relevancia'] = params['deslocamento'] + posicao + 1
+            resultados.append(item)
+        
+        return {'total': total, 'total_exato': total_exato, 'pagina': pagina, 'por_pagina': por_pagina,
+                'resultados': resultados}
+    except Exception as e:
+        print(f"Erro ao pesquisar faturas: {e}")
+        return vazio
+    finally:
+        session.close()
+
 
 def buscar_fatura(nro_fatura: str) -> Optional[Dict]:
     """
@@ -28,11 +265,13 @@ def buscar_fatura(nro_fatura: str) -> Optional[Dict]:
             Fatura.nro_fatura == nro_fatura
         ).first()
         
-        # Se não encontrou, tenta busca parcial
+        # Se não encontrou, usa o melhor resultado do índice de busca
         if not fatura:
-            fatura = session.query(Fatura).filter(
-                Fatura.nro_fatura.contains(nro_fatura)
-            ).first()
+            melhor = pesquisar_faturas(nro_fatura, pagina=1, por_pagina=1)['resultados']
+            if melhor:
+                fatura = session.query(Fatura).filter(
+                    Fatura.nro_fatura == melhor[0]['nro_fatura']
+                ).first()
         
         if fatura:
             resultado = fatura.to_dict()
@@ -162,7 +401,11 @@ def get_estatisticas_faturas() -> Dict:
 
 def importar_lote(faturas: List[Dict], origem: str = "Excel") -> Dict:
     """
-    Importa um lote de faturas de uma vez.
+    Importa um lote de faturas de uma vez (upsert em massa).
+    
+    As faturas existentes são identificadas por consultas IN em blocos;
+    inserções, atualizações e históricos são gravados com executemany,
+    evitando uma consulta por fatura.
     
     Args:
         faturas: Lista de dicionários com dados das faturas
@@ -173,42 +416,67 @@ def importar_lote(faturas: List[Dict], origem: str = "Excel") -> Dict:
     """
     session = get_session()
     stats = {'criadas': 0, 'atualizadas': 0, 'erros': 0}
+    colunas = set(Fatura.__table__.columns.keys()) - {'id'}
+    
+    # Consolidar por número (ocorrências repetidas contam como atualização)
+    por_numero: Dict[str, Dict] = {}
+    for dados in faturas:
+        nro_fatura = dados.get('nro_fatura')
+        if not nro_fatura:
+            stats['erros'] += 1
+            continue
+        campos = {k: v for k, v in dados.items() if k in colunas}
+        if nro_fatura in por_numero:
+            por_numero[nro_fatura].update(campos)
+            stats['atualizadas'] += 1
+        else:
+            por_numero[nro_fatura] = campos
     
     try:
-        for dados in faturas:
-            nro_fatura = dados.get('nro_fatura')
-            if not nro_fatura:
-                stats['erros'] += 1
-                continue
+        numeros = list(por_numero)
+        for inicio in range(0, len(numeros), TAMANHO_BLOCO_IMPORTACAO):
+            bloco = numeros[inicio:inicio + TAMANHO_BLOCO_IMPORTACAO]
+            existentes = dict(session.execute(
+                select(Fatura.nro_fatura, Fatura.id).where(Fatura.nro_fatura.in_(bloco))
+            ).all())
             
-            # Verificar se já existe
-            fatura = session.query(Fatura).filter(
-                Fatura.nro_fatura == nro_fatura
-            ).first()
+            novas = []
+            atualizacoes = []
+            for nro_fatura in bloco:
+                campos = por_numero[nro_fatura]
+                if nro_fatura in existentes:
+                    alteracoes = {k: v for k, v in campos.items() if k != 'nro_fatura'}
+                    if alteracoes:
+                        atualizacoes.append({'id': existentes[nro_fatura], **alteracoes})
+                else:
+                    novas.append({**campos, 'arquivo_origem': origem})
             
-            if fatura:
-                # Atualizar
-                for key, value in dados.items():
-                    if hasattr(fatura, key) and key not in ['id', 'nro_fatura']:
-                        setattr(fatura, key, value)
-                stats['atualizadas'] += 1
-                acao = "Dados atualizados"
+            if novas:
+                session.execute(insert(Fatura), novas)
+                ids_novos = dict(session.execute(
+                    select(Fatura.nro_fatura, Fatura.id).where(
+                        Fatura.nro_fatura.in_([n['nro_fatura'] for n in novas])
+                    )
+                ).all())
             else:
-                # Criar
-                dados['arquivo_origem'] = origem
-                fatura = Fatura(**dados)
-                session.add(fatura)
-                session.flush()  # Obter ID
-                stats['criadas'] += 1
-                acao = f"Importada de {origem}"
+                ids_novos = {}
             
-            # Adicionar histórico
-            historico = FaturaHistorico(
-                fatura_id=fatura.id,
-                acao=acao,
-                origem=origem
-            )
-            session.add(historico)
+            # Bulk UPDATE por chave primária (agrupado por conjunto de colunas)
+            if atualizacoes:
+                session.execute(update(Fatura), atualizacoes)
+            
+            historicos = [
+                {'fatura_id': existentes[n], 'acao': "Dados atualizados", 'origem': origem}
+                for n in bloco if n in existentes
+            ] + [
+                {'fatura_id': ids_novos[n], 'acao': f"Importada de {origem}", 'origem': origem}
+                for n in bloco if n in ids_novos
+            ]
+            if historicos:
+                session.execute(insert(FaturaHistorico), historicos)
+            
+            stats['atualizadas'] += len(existentes)
+            stats['criadas'] += len(ids_novos)
         
         session.commit()
         return stats
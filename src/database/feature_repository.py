@@ -0,0 +1,127 @@
+"""
+Glox - Repositório do Índice de Características por Arquivo
+
+Grava, durante a validação, os tipos de elemento e os valores dos campos
+discriminantes de cada arquivo, e responde quais arquivos podem ser afetados
+por uma regra (ver src/business/rules/feature_index.py).
+"""
+
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from datetime import datetime
+from sqlalchemy import exists, and_
+from .db_manager import get_session
+from .models_features import ArquivoFeatures, ArquivoFeatureValor
+
+logger = logging.getLogger(__name__)
+
+CAMPO_TIPO = '@tipo'
+
+
+def registrar_features(caminho: str, nome_arquivo: str, file_hash: Optional[str],
+                       execution_id: Optional[int], tipos: Iterable[str],
+                       valores: Dict[str, Set[str]]) -> bool:
+    """
+    Grava (ou substitui) as características de um arquivo.
+
+    Args:
+        caminho: Caminho do arquivo (chave do índice)
+        tipos: Nomes locais dos elementos ptu: presentes
+        valores: campo -> valores encontrados no arquivo
+
+    Returns:
+        True se gravou
+    """
+    caminho = str(caminho)
+    pares = [(CAMPO_TIPO, tipo) for tipo in sorted(set(tipos))]
+    for campo in sorted(valores):
+        pares.extend((campo, valor[:100]) for valor in sorted(valores[campo]))
+
+    session = get_session()
+    try:
+        arquivo = session.query(ArquivoFeatures).filter(ArquivoFeatures.caminho == caminho).first()
+        if arquivo is None:
+            arquivo = ArquivoFeatures(caminho=caminho)
+            session.add(arquivo)
+            session.flush()
+        else:
+            session.query(ArquivoFeatureValor).filter(
+                ArquivoFeatureValor.arquivo_id == arquivo.id
+            ).delete(synchronize_session=False)
+
+        arquivo.nome_arquivo = nome_arquivo
+        arquivo.file_hash = file_hash
+        arquivo.execution_id = execution_id
+        arquivo.quantidade_valores = len(pares)
+        arquivo.indexado_em = datetime.now()
+        session.bulk_insert_mappings(ArquivoFeatureValor, [
+            {'arquivo_id': arquivo.id, 'campo': campo, 'valor': valor} for campo, valor in pares
+        ])
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Erro ao indexar características de {nome_arquivo}: {e}")
+        return False
+    finally:
+        session.close()
+
+
+def buscar_candidatos(requisitos: List[Dict[str, Set[str]]]) -> List[str]:
+    """
+    Caminhos dos arquivos que atendem a pelo menos um dos requisitos.
+
+    Cada requisito é um dicionário campo -> valores aceitos; o arquivo atende
+    quando, para todos os campos do requisito, possui algum dos valores.
+    Um requisito vazio ({}) casa com todos os arquivos indexados.
+    """
+    session = get_session()
+    try:
+        caminhos = set()
+        for requisito in requisitos:
+            query = session.query(ArquivoFeatures.caminho)
+            for campo, aceitos in requisito.items():
+                query = query.filter(exists().where(and_(
+                    ArquivoFeatureValor.arquivo_id == ArquivoFeatures.id,
+                    ArquivoFeatureValor.campo == campo,
+                    ArquivoFeatureValor.valor.in_(sorted(aceitos))
+                )))
+            caminhos.update(caminho for (caminho,) in query.all())
+        return sorted(caminhos)
+    finally:
+        session.close()
+
+
+def contar_indexados() -> int:
+    """Total de arquivos no índice"""
+    session = get_session()
+    try:
+        return session.query(ArquivoFeatures).count()
+    finally:
+        session.close()
+
+
+def remover_ausentes() -> Tuple[int, int]:
+    """
+    Remove do índice os arquivos que não existem mais em disco.
+
+    Returns:
+        (removidos, restantes)
+    """
+    session = get_session()
+    try:
+        removidos = 0
+        arquivos = session.query(ArquivoFeatures).all()
+        for arquivo in arquivos:
+            if not os.path.exists(arquivo.caminho):
+                session.delete(arquivo)
+                removidos += 1
+        session.commit()
+        return removidos, len(arquivos) - removidos
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Erro ao limpar índice de características: {e}")
+        return 0, 0
+    finally:
+        session.close()
@@ -0,0 +1,286 @@
+"""
+Glox - Fila Distribuída de Validação
+
+Os arquivos de um job FILA_VALIDACAO (tabela batch_job_arquivos) formam uma
+fila de trabalho compartilhada: vários workers, em máquinas diferentes e
+apontando para o mesmo PostgreSQL, reservam itens com
+`SELECT ... FOR UPDATE SKIP LOCKED` e processam o lote em paralelo.
+
+Cada reserva tem validade (lease) renovada pelo heartbeat do worker. Itens
+com lease vencida (worker caiu) voltam para PENDENTE; após MAX_TENTATIVAS
+reservas o item é marcado como ERRO para não travar a fila.
+
+No SQLite o FOR UPDATE é ignorado (a escrita já é serializada pelo banco),
+então a fila também funciona localmente com um único processo.
+"""
+
+import json
+import logging
+from typing import Optional, List, Dict, Iterator, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from .db_manager import get_session
+from .models_jobs import BatchJob, BatchJobArquivo
+from . import job_repository
+
+logger = logging.getLogger(__name__)
+
+TIPO_FILA = 'FILA_VALIDACAO'
+
+# Validade padrão da reserva; o heartbeat renova a cada LEASE_PADRAO_SEGUNDOS / 3
+LEASE_PADRAO_SEGUNDOS = 120
+
+# Reservas de um mesmo item antes de considerá-lo problemático
+MAX_TENTATIVAS = 3
+
+
+def _agora_banco(session) -> datetime:
+    """Hora do servidor de banco: todos os workers usam o mesmo relógio para as leases."""
+    agora = session.execute(select(func.current_timestamp())).scalar()
+    if isinstance(agora, str):
+        agora = datetime.fromisoformat(agora)
+    return agora.replace(tzinfo=None)
+
+
+def enfileirar_lote(arquivos: List[str], caminho_pasta: str, user_id: Optional[int] = None) -> Optional[int]:
+    """
+    Publica um lote de arquivos .051 na fila distribuída.
+
+    Args:
+        arquivos: Caminhos acessíveis por todos os workers (ex.: pasta de rede)
+        caminho_pasta: Pasta onde o relatório de alertas do lote será gravado
+
+    Returns:
+        ID do job ou None em caso de erro
+    """
+    return job_repository.criar_job(TIPO_FILA, arquivos, {'caminho_pasta': caminho_pasta}, user_id=user_id)
+
+
+def _concluir_job_se_esgotado(session, job: BatchJob, agora: datetime) -> bool:
+    """Marca o job como CONCLUIDO se não restam itens pendentes ou em processamento."""
+    session.flush()
+    restantes = (session.query(func.count(BatchJobArquivo.id))
+                 .filter(BatchJobArquivo.job_id == job.id,
+                         BatchJobArquivo.status.in_(('PENDENTE', 'EM_PROCESSAMENTO')))
+                 .scalar())
+    if restantes == 0 and job.status == 'EXECUTANDO':
+        job.status = 'CONCLUIDO'
+        job.finalizado_em = agora
+        return True
+    return False
+
+
+def liberar_itens_expirados() -> Tuple[int, List[int]]:
+    """
+    Devolve à fila os itens cuja lease venceu (worker parado ou sem heartbeat).
+
+    Um item que esgota MAX_TENTATIVAS vira ERRO; se era o último aberto do
+    job, o job é concluído aqui e o worker que chamou gera o relatório.
+
+    Returns:
+        (quantidade de itens devolvidos ou marcados como ERRO, IDs dos jobs concluídos)
+    """
+    session = get_session()
+    try:
+        agora = _agora_banco(session)
+        expirados = (session.query(BatchJobArquivo)
+                     .filter(BatchJobArquivo.status == 'EM_PROCESSAMENTO',
+                             BatchJobArquivo.lease_ate < agora)
+                     .with_for_update(skip_locked=True)
+                     .all())
+        jobs_com_erro = {}
+        for item in expirados:
+            logger.warning(f"Lease vencida: '{item.caminho}' (worker {item.worker_id}, tentativa {item.tentativas})")
+            if (item.tentativas or 0) >= MAX_TENTATIVAS:
+                item.status = 'ERRO'
+                item.mensagem = f"Lease vencida após {item.tentativas} tentativa(s)"
+                item.atualizado_em = agora
+                item.job.processados = (item.job.processados or 0) + 1
+                jobs_com_erro[item.job_id] = item.job
+            else:
+                item.status = 'PENDENTE'
+            item.worker_id = None
+            item.lease_ate = None
+        concluidos = [job_id for job_id, job in jobs_com_erro.items()
+                      if _concluir_job_se_esgotado(session, job, agora)]
+        session.commit()
+        return len(expirados), concluidos
+    except Exception as e:
+        logger.error(f"Erro ao liberar itens expirados: {e}")
+        session.rollback()
+        return 0, []
+    finally:
+        session.close()
+
+
+def reservar_itens(worker_id: str, quantidade: int = 1, lease_segundos: int = LEASE_PADRAO_SEGUNDOS,
+                   job_id: Optional[int] = None) -> List[Dict]:
+    """
+    Reserva até `quantidade` itens pendentes para o worker.
+
+    Usa FOR UPDATE SKIP LOCKED: workers concorrentes nunca recebem o mesmo
+    item e não esperam uns pelos outros.
+
+    Returns:
+        Lista de {'id', 'job_id', 'posicao', 'caminho'}
+    """
+    session = get_session()
+    try:
+        agora = _agora_banco(session)
+        query = (session.query(BatchJobArquivo)
+                 .join(BatchJob, BatchJob.id == BatchJobArquivo.job_id)
+                 .filter(BatchJob.tipo == TIPO_FILA,
+                         BatchJob.status.in_(('PENDENTE', 'EXECUTANDO')),
+                         BatchJobArquivo.status == 'PENDENTE'))
+        if job_id is not None:
+            query = query.filter(BatchJobArquivo.job_id == job_id)
+        itens = (query.order_by(BatchJobArquivo.job_id, BatchJobArquivo.posicao)
+                 .limit(quantidade)
+                 .with_for_update(skip_locked=True, of=BatchJobArquivo)
+                 .all())
+
+        reservados = []
+        lease_ate = agora + timedelta(seconds=lease_segundos)
+        for item in itens:
+            item.status = 'EM_PROCESSAMENTO'
+            item.worker_id = worker_id
+            item.lease_ate = lease_ate
+            item.tentativas = (item.tentativas or 0) + 1
+            reservados.append({'id': item.id, 'job_id': item.job_id,
+                               'posicao': item.posicao, 'caminho': item.caminho})
+
+        if reservados:
+            (session.query(BatchJob)
+             .filter(BatchJob.id.in_({r['job_id'] for r in reservados}), BatchJob.status == 'PENDENTE')
+             .update({BatchJob.status: 'EXECUTANDO'}, synchronize_session=False))
+        session.commit()
+        return reservados
+    except Exception as e:
+        logger.error(f"Erro ao reservar itens da fila: {e}")
+        session.rollback()
+        return []
+    finally:
+        session.close()
+
+
+def renovar_lease(worker_id: str, item_ids: List[int], lease_segundos: int = LEASE_PADRAO_SEGUNDOS) -> int:
+    """
+    Heartbeat: estende a lease dos itens que ainda pertencem ao worker.
+
+    Returns:
+        Quantidade de itens renovados (menor que len(item_ids) se algum foi devolvido à fila)
+    """
+    if not item_ids:
+        return 0
+    session = get_session()
+    try:
+        agora = _agora_banco(session)
+        renovados = (session.query(BatchJobArquivo)
+                     .filter(BatchJobArquivo.id.in_(item_ids),
+                             BatchJobArquivo.worker_id == worker_id,
+                             BatchJobArquivo.status == 'EM_PROCESSAMENTO')
+                     .update({BatchJobArquivo.lease_ate: agora + timedelta(seconds=lease_segundos)},
+                             synchronize_session=False))
+        session.commit()
+        return renovados
+    except Exception as e:
+        logger.error(f"Erro ao renovar lease do worker {worker_id}: {e}")
+        session.rollback()
+        return 0
+    finally:
+        session.close()
+
+
+def devolver_itens(worker_id: str, item_ids: List[int]) -> int:
+    """
+    Devolve à fila itens reservados que o worker não vai processar (parada ordenada).
+    A tentativa não é contabilizada.
+    """
+    if not item_ids:
+        return 0
+    session = get_session()
+    try:
+        devolvidos = (session.query(BatchJobArquivo)
+                      .filter(BatchJobArquivo.id.in_(item_ids),
+                              BatchJobArquivo.worker_id == worker_id,
+                              BatchJobArquivo.status == 'EM_PROCESSAMENTO')
+                      .update({BatchJobArquivo.status: 'PENDENTE',
+                               BatchJobArquivo.worker_id: None,
+                               BatchJobArquivo.lease_ate: None,
+                               BatchJobArquivo.tentativas: BatchJobArquivo.tentativas - 1},
+                              synchronize_session=False))
+        session.commit()
+        return devolvidos
+    except Exception as e:
+        logger.error(f"Erro ao devolver itens do worker {worker_id}: {e}")
+        session.rollback()
+        return 0
+    finally:
+        session.close()
+
+
+def concluir_item(item_id: int, worker_id: str, status: str, alterado: bool = False,
+                  mensagem: Optional[str] = None, file_hash: Optional[str] = None,
+                  alertas: Optional[List[Dict]] = None) -> Dict:
+    """
+    Grava o resultado de um item reservado pelo worker.
+
+    O resultado só é aceito se o item ainda pertence ao worker (a lease pode
+    ter vencido e o item ido para outro worker).
+
+    Returns:
+        {'aceito': bool, 'job_concluido': bool, 'job_id': int}
+    """
+    resultado = {'aceito': False, 'job_concluido': False, 'job_id': None}
+    session = get_session()
+    try:
+        item = (session.query(BatchJobArquivo)
+                .filter(BatchJobArquivo.id == item_id,
+                        BatchJobArquivo.worker_id == worker_id,
+                        BatchJobArquivo.status == 'EM_PROCESSAMENTO')
+                .with_for_update()
+                .first())
+        if item is None:
+            logger.warning(f"Item {item_id} não pertence mais ao worker {worker_id}; resultado descartado.")
+            return resultado
+
+        agora = _agora_banco(session)
+        job = (session.query(BatchJob)
+               .filter(BatchJob.id == item.job_id)
+               .with_for_update()
+               .one())
+        item.status = status
+        item.alterado = alterado
+        item.mensagem = mensagem
+        item.file_hash = file_hash
+        item.alertas = json.dumps(alertas, ensure_ascii=False, default=str) if alertas else None
+        item.atualizado_em = agora
+        item.lease_ate = None
+
+        job.processados = (job.processados or 0) + 1
+        job.ultimo_arquivo = item.caminho
+        job.checkpoint_em = agora
+        resultado['job_concluido'] = _concluir_job_se_esgotado(session, job, agora)
+        session.commit()
+        resultado.update(aceito=True, job_id=job.id)
+        return resultado
+    except Exception as e:
+        logger.error(f"Erro ao concluir item {item_id}: {e}")
+        session.rollback()
+        return resultado
+    finally:
+        session.close()
+
+
+def alertas_do_job(job_id: int) -> Iterator[Dict]:
+    """Alertas gravados pelos workers, na ordem dos arquivos do job."""
+    session = get_session()
+    try:
+        linhas = (session.query(BatchJobArquivo.alertas)
+                  .filter(BatchJobArquivo.job_id == job_id, BatchJobArquivo.alertas.isnot(None))
+                  .order_by(BatchJobArquivo.posicao)
+                  .yield_per(200))
+        for (alertas,) in linhas:
+            yield from json.loads(alertas)
+    finally:
+        session.close()
@@ -0,0 +1,226 @@
+"""
+Glox - Repositório do Cache de Importação de Faturas
+
+Memoriza o resultado da importação de cada ZIP (dados da fatura e guias de
+internação relevantes) pelo hash do conteúdo, e o estado do processador por
+pasta. Uma reimportação reconhece o ZIP pelo stat (caminho, tamanho, mtime)
+ou, se ele mudou de lugar, pelo hash; em nenhum dos casos o XML é relido.
+
+O resultado depende do valor mínimo das guias e dos códigos HM ignorados, que
+entram na assinatura dos parâmetros: mudando qualquer um deles, os ZIPs são
+importados de novo.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from .db_manager import get_session
+from .models_importacao import ImportacaoZip, ImportacaoEstado
+
+logger = logging.getLogger(__name__)
+
+# Incrementar quando a extração (xml_parser) mudar o formato dos dados gravados
+VERSAO_EXTRACAO = 1
+
+TAMANHO_BLOCO = 1024 * 1024
+
+
+def assinatura_parametros(valor_minimo: float, codigos_ignorados: Iterable[str]) -> str:
+    """Assinatura dos parâmetros que afetam o resultado da importação"""
+    texto = json.dumps([VERSAO_EXTRACAO, float(valor_minimo), sorted(codigos_ignorados or [])])
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+
+def calcular_hash_zip(caminho: str) -> str:
+    """MD5 do conteúdo do ZIP, lido em blocos (mesmo valor de calculate_file_hash)"""
+    md5 = hashlib.md5()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b''):
+            md5.update(bloco)
+    return md5.hexdigest()
+
+
+def _para_dict(registro: ImportacaoZip) -> dict:
+    return {
+        'zip_hash': registro.zip_hash,
+        'dados_fatura': json.loads(registro.dados_fatura),
+        'guias_relevantes': json.loads(registro.guias_relevantes) if registro.guias_relevantes else [],
+    }
+
+
+def buscar_zip(caminho: str, parametros: str) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Procura o resultado memorizado de um ZIP.
+
+    Primeiro pelo stat (sem ler o arquivo); se não houver, calcula o hash e
+    procura por conteúdo, atualizando o local visto para a próxima vez.
+
+    Returns:
+        (registro, zip_hash): registro com 'zip_hash', 'dados_fatura' e
+        'guias_relevantes', ou None se não memorizado; zip_hash é None
+        se o arquivo não puder ser lido.
+    """
+    caminho = os.path.abspath(caminho)
+    try:
+        stat = os.stat(caminho)
+    except OSError:
+        return None, None
+
+    session = get_session()
+    try:
+        registro = session.query(ImportacaoZip).filter(
+            ImportacaoZip.caminho == caminho,
+            ImportacaoZip.tamanho == stat.st_size,
+            ImportacaoZip.mtime_ns == stat.st_mtime_ns,
+            ImportacaoZip.parametros == parametros
+        ).first()
+        if registro is not None:
+            return _para_dict(registro), registro.zip_hash
+
+        try:
+            zip_hash = calcular_hash_zip(caminho)
+        except OSError:
+            return None, None
+
+        registro = session.query(ImportacaoZip).filter(
+            ImportacaoZip.zip_hash == zip_hash,
+            ImportacaoZip.parametros == parametros
+        ).first()
+        if registro is None:
+            return None, zip_hash
+
+        registro.caminho = caminho
+        registro.tamanho = stat.st_size
+        registro.mtime_ns = stat.st_mtime_ns
+        registro.nome_zip = os.path.basename(caminho)
+        resultado = _para_dict(registro)
+        session.commit()
+        return resultado, zip_hash
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Erro ao consultar cache de importação de {os.path.basename(caminho)}: {e}")
+        return None, None
+    finally:
+        session.close()
+
+
+def registrar_zip(zip_hash: str, parametros: str, caminho: str, dados_fatura: dict,
+                  guias_relevantes: Optional[List[dict]]) -> bool:
+    """
+    Grava (ou substitui) o resultado da importação de um ZIP.
+
+    Args:
+        dados_fatura: Dados lidos do XML (sem os campos que dependem do local do ZIP)
+        guias_relevantes: Guias de internação relevantes da fatura
+
+    Returns:
+        True se gravou
+    """
+    caminho = os.path.abspath(caminho)
+    session = get_session()
+    try:
+        stat = os.stat(caminho)
+        registro = session.query(ImportacaoZip).filter(
+            ImportacaoZip.zip_hash == zip_hash,
+            ImportacaoZip.parametros == parametros
+        ).first()
+        if registro is None:
+            registro = ImportacaoZip(zip_hash=zip_hash, parametros=parametros)
+            session.add(registro)
+
+        registro.caminho = caminho
+        registro.tamanho = stat.st_size
+        registro.mtime_ns = stat.st_mtime_ns
+        registro.nome_zip = os.path.basename(caminho)
+        registro.dados_fatura = json.dumps(dados_fatura, ensure_ascii=False)
+        registro.guias_relevantes = json.dumps(guias_relevantes or [], ensure_ascii=False)
+        registro.criado_em = datetime.now()
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Erro ao gravar cache de importação de {os.path.basename(caminho)}: {e}")
+        return False
+    finally:
+        session.close()
+
+
+def salvar_estado(pasta: str, parametros: str, zips: List[Tuple[str, str]],
+                  plano_distribuicao: Optional[dict] = None) -> bool:
+    """
+    Grava o estado do processador para a pasta.
+
+    Args:
+        zips: (zip_hash, caminho) das faturas importadas, na ordem da importação
+        plano_distribuicao: Último plano de distribuição ({} ou None se não houver)
+    """
+    pasta = os.path.abspath(pasta)
+    session = get_session()
+    try:
+        estado = session.query(ImportacaoEstado).filter(ImportacaoEstado.pasta == pasta).first()
+        if estado is None:
+            estado = ImportacaoEstado(pasta=pasta)
+            session.add(estado)
+
+        estado.parametros = parametros
+        estado.zips = json.dumps([list(item) for item in zips], ensure_ascii=False)
+        estado.plano_distribuicao = json.dumps(plano_distribuicao or {}, ensure_ascii=False)
+        estado.atualizado_em = datetime.now()
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Erro ao salvar estado de importação de {pasta}: {e}")
+        return False
+    finally:
+        session.close()
+
+
+def carregar_estado(pasta: str, parametros: str) -> Optional[Dict]:
+    """
+    Estado gravado para a pasta, com os dados memorizados de cada ZIP.
+
+    Returns:
+        {'zips': [{'zip_hash', 'caminho', 'dados_fatura', 'guias_relevantes'}, ...],
+         'plano_distribuicao': dict, 'atualizado_em': datetime}, ou None se não
+        houver estado com os mesmos parâmetros ou algum ZIP saiu do cache.
+    """
+    pasta = os.path.abspath(pasta)
+    session = get_session()
+    try:
+        estado = session.query(ImportacaoEstado).filter(ImportacaoEstado.pasta == pasta).first()
+        if estado is None or estado.parametros != parametros:
+            return None
+
+        itens = json.loads(estado.zips or '[]')
+        hashes = {zip_hash for zip_hash, _ in itens}
+        registros = {}
+        if hashes:
+            registros = {
+                registro.zip_hash: registro for registro in session.query(ImportacaoZip).filter(
+                    ImportacaoZip.zip_hash.in_(sorted(hashes)),
+                    ImportacaoZip.parametros == parametros
+                )
+            }
+        if len(registros) != len(hashes):
+            return None
+
+        zips = []
+        for zip_hash, caminho in itens:
+            item = _para_dict(registros[zip_hash])
+            item['caminho'] = caminho
+            zips.append(item)
+        return {
+            'zips': zips,
+            'plano_distribuicao': json.loads(estado.plano_distribuicao or '{}'),
+            'atualizado_em': estado.atualizado_em,
+        }
+    except Exception as e:
+        logger.error(f"Erro ao carregar estado de importação de {pasta}: {e}")
+        return None
+    finally:
+        session.close()
+
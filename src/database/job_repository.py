@@ -0,0 +1,260 @@
+"""
+Glox - Repositório de Jobs em Lote
+
+Funções para criar, acompanhar, retomar e cancelar jobs de validação e de
+atualização de hash. Cada arquivo concluído grava um checkpoint na mesma
+transação que atualiza o progresso do job, de modo que um job interrompido
+retoma exatamente a partir do primeiro arquivo pendente.
+"""
+
+import json
+import logging
+import os
+from typing import Optional, List, Dict, Tuple
+from datetime import datetime
+from sqlalchemy import func
+from .db_manager import get_session
+from .models_jobs import BatchJob, BatchJobArquivo
+
+logger = logging.getLogger(__name__)
+
+TIPOS_JOB = ('VALIDACAO', 'HASH', 'FILA_VALIDACAO')
+
+# Status a partir dos quais um job pode ser (re)iniciado.
+# EXECUTANDO entra na lista porque um processo que caiu não chega a marcar o job como INTERROMPIDO.
+STATUS_RETOMAVEIS = ('PENDENTE', 'EXECUTANDO', 'INTERROMPIDO')
+STATUS_FINAIS = ('CONCLUIDO', 'CANCELADO', 'FALHOU')
+
+# Saídas parciais dos jobs (data/jobs na raiz do projeto)
+PASTA_JOBS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    'data', 'jobs'
+)
+
+
+def criar_job(tipo: str, arquivos: List[str], parametros: Dict,
+              execution_id: Optional[int] = None, user_id: Optional[int] = None) -> Optional[int]:
+    """
+    Cria um job com a lista de arquivos a processar (todos PENDENTE).
+
+    Args:
+        tipo: VALIDACAO ou HASH
+        arquivos: Caminhos na ordem de processamento
+        parametros: Argumentos necessários para retomar o job (serializados em JSON)
+
+    Returns:
+        ID do job ou None em caso de erro
+    """
+    if tipo not in TIPOS_JOB:
+        logger.error(f"Tipo de job inválido: {tipo}")
+        return None
+
+    session = get_session()
+    try:
+        job = BatchJob(
+            tipo=tipo,
+            status='PENDENTE',
+            parametros=json.dumps(parametros, ensure_ascii=False),
+            execution_id=execution_id,
+            user_id=user_id,
+            total_arquivos=len(arquivos),
+            processados=0,
+        )
+        session.add(job)
+        session.flush()
+        if tipo == 'VALIDACAO':
+            job.alertas_caminho = os.path.join(PASTA_JOBS, f"job_{job.id}_alertas.jsonl")
+            job.alertas_offset = 0
+
+        if arquivos:
+            session.execute(BatchJobArquivo.__table__.insert(), [
+                {'job_id': job.id, 'posicao': posicao, 'caminho': caminho, 'status': 'PENDENTE', 'alterado': False}
+                for posicao, caminho in enumerate(arquivos)
+            ])
+        session.commit()
+        logger.info(f"Job {job.id} ({tipo}) criado com {len(arquivos)} arquivo(s)")
+        return job.id
+    except Exception as e:
+        logger.error(f"Erro ao criar job {tipo}: {e}")
+        session.rollback()
+        return None
+    finally:
+        session.close()
+
+
+def obter_job(job_id: int) -> Optional[Dict]:
+    """Retorna o job como dicionário (None se não existir)."""
+    session = get_session()
+    try:
+        job = session.get(BatchJob, job_id)
+        return job.to_dict() if job else None
+    finally:
+        session.close()
+
+
+def listar_jobs(status: Optional[str] = None, limite: int = 50) -> List[Dict]:
+    """Lista os jobs mais recentes, opcionalmente filtrando pelo status."""
+    session = get_session()
+    try:
+        query = session.query(BatchJob)
+        if status:
+            query = query.filter(BatchJob.status == status.upper())
+        return [job.to_dict() for job in query.order_by(BatchJob.id.desc()).limit(limite).all()]
+    finally:
+        session.close()
+
+
+def iniciar_job(job_id: int) -> Tuple[bool, str]:
+    """
+    Marca o job como EXECUTANDO se ele puder ser (re)iniciado.
+
+    Returns:
+        (sucesso, mensagem)
+    """
+    session = get_session()
+    try:
+        job = session.get(BatchJob, job_id)
+        if not job:
+            return False, f"Job {job_id} não encontrado."
+        if job.status not in STATUS_RETOMAVEIS:
+            return False, f"Job {job_id} está {job.status} e não pode ser retomado."
+        job.status = 'EXECUTANDO'
+        session.commit()
+        return True, f"Job {job_id} em execução."
+    except Exception as e:
+        logger.error(f"Erro ao iniciar job {job_id}: {e}")
+        session.rollback()
+        return False, str(e)
+    finally:
+        session.close()
+
+
+def arquivos_pendentes(job_id: int) -> List[Tuple[int, str]]:
+    """Retorna (posicao, caminho) dos arquivos ainda não processados, em ordem."""
+    session = get_session()
+    try:
+        linhas = (session.query(BatchJobArquivo.posicao, BatchJobArquivo.caminho)
+                  .filter(BatchJobArquivo.job_id == job_id, BatchJobArquivo.status == 'PENDENTE')
+                  .order_by(BatchJobArquivo.posicao)
+                  .all())
+        return [(posicao, caminho) for posicao, caminho in linhas]
+    finally:
+        session.close()
+
+
+def registrar_arquivo(job_id: int, posicao: int, status: str, alterado: bool = False,
+                      mensagem: Optional[str] = None, file_hash: Optional[str] = None,
+                      alertas_offset: Optional[int] = None) -> bool:
+    """
+    Grava o resultado de um arquivo e o checkpoint do job numa única transação.
+
+    Args:
+        status: CONCLUIDO, PULADO ou ERRO
+        alterado: Se o arquivo foi modificado / o ZIP recriado
+        alertas_offset: Tamanho do JSONL de alertas já sincronizado em disco
+
+    Returns:
+        False se o job foi cancelado (ou não existe): o processamento deve parar.
+    """
+    session = get_session()
+    try:
+        job = session.get(BatchJob, job_id)
+        if not job or job.status == 'CANCELADO':
+            return False
+
+        arquivo = (session.query(BatchJobArquivo)
+                   .filter_by(job_id=job_id, posicao=posicao)
+                   .first())
+        if arquivo is None:
+            return False
+
+        agora = datetime.now()
+        if arquivo.status == 'PENDENTE':
+            job.processados = (job.processados or 0) + 1
+        arquivo.status = status
+        arquivo.alterado = alterado
+        arquivo.mensagem = mensagem
+        arquivo.file_hash = file_hash
+        arquivo.atualizado_em = agora
+
+        job.ultimo_arquivo = arquivo.caminho
+        job.checkpoint_em = agora
+        if alertas_offset is not None:
+            job.alertas_offset = alertas_offset
+        session.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Erro ao gravar checkpoint do job {job_id}: {e}")
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+
+def finalizar_job(job_id: int, status: str) -> bool:
+    """
+    Define o status final (ou INTERROMPIDO) do job.
+    Um job cancelado durante a execução permanece CANCELADO.
+    """
+    session = get_session()
+    try:
+        job = session.get(BatchJob, job_id)
+        if not job:
+            return False
+        if job.status != 'CANCELADO':
+            job.status = status
+        if job.status in STATUS_FINAIS:
+            job.finalizado_em = datetime.now()
+        session.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Erro ao finalizar job {job_id}: {e}")
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+
+def cancelar_job(job_id: int) -> Tuple[bool, str]:
+    """
+    Cancela um job não finalizado.
+    Se estiver em execução, o processamento para no próximo checkpoint.
+
+    Returns:
+        (sucesso, mensagem)
+    """
+    session = get_session()
+    try:
+        job = session.get(BatchJob, job_id)
+        if not job:
+            return False, f"Job {job_id} não encontrado."
+        if job.status in STATUS_FINAIS:
+            return False, f"Job {job_id} já está {job.status}."
+        job.status = 'CANCELADO'
+        job.finalizado_em = datetime.now()
+        session.commit()
+        return True, f"Job {job_id} cancelado."
+    except Exception as e:
+        logger.error(f"Erro ao cancelar job {job_id}: {e}")
+        session.rollback()
+        return False, str(e)
+    finally:
+        session.close()
+
+
+def resumo_job(job_id: int) -> Dict[str, int]:
+    """Contagem de arquivos por status, mais o total de alterados."""
+    session = get_session()
+    try:
+        linhas = (session.query(BatchJobArquivo.status, func.count(BatchJobArquivo.id))
+                  .filter(BatchJobArquivo.job_id == job_id)
+                  .group_by(BatchJobArquivo.status)
+                  .all())
+        resumo = {status: 0 for status in ('PENDENTE', 'EM_PROCESSAMENTO', 'CONCLUIDO', 'PULADO', 'ERRO')}
+        resumo.update({status: quantidade for status, quantidade in linhas})
+        resumo['alterados'] = (session.query(func.count(BatchJobArquivo.id))
+                               .filter(BatchJobArquivo.job_id == job_id, BatchJobArquivo.alterado.is_(True))
+                               .scalar() or 0)
+        return resumo
+    finally:
+        session.close()
@@ -0,0 +1,51 @@
+"""
+Glox - Índice de Características por Arquivo
+
+Tabelas:
+- arquivo_features: Um registro por arquivo .051 validado (caminho, hash, execução)
+- arquivo_feature_valores: Pares (campo, valor) presentes no arquivo. O campo
+  '@tipo' guarda os tipos de elemento (nomes locais ptu:) encontrados; os demais
+  são os campos discriminantes (cd_Servico, cd_cnpj, cd_Prest, CBO, tp_Participacao).
+
+Usado pela reexecução de impacto de regras para escolher só os arquivos que
+podem casar com uma regra alterada (ver feature_index e impact_replay).
+"""
+
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from .models import Base
+
+
+class ArquivoFeatures(Base):
+    """Arquivo indexado (o estado gravado em disco após a validação)"""
+    __tablename__ = 'arquivo_features'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    caminho = Column(String(1000), nullable=False, unique=True)
+    nome_arquivo = Column(String(255))
+    file_hash = Column(String(64))  # Hash original (mesmo da deduplicação)
+    execution_id = Column(Integer)
+    quantidade_valores = Column(Integer, default=0)
+    indexado_em = Column(DateTime, default=datetime.now)
+
+    valores = relationship("ArquivoFeatureValor", back_populates="arquivo", cascade="all, delete-orphan")
+
+    def __repr__(self):
+        return f"<ArquivoFeatures(caminho='{self.caminho}', valores={self.quantidade_valores})>"
+
+
+class ArquivoFeatureValor(Base):
+    """Par (campo, valor) presente em um arquivo indexado"""
+    __tablename__ = 'arquivo_feature_valores'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    arquivo_id = Column(Integer, ForeignKey('arquivo_features.id', ondelete='CASCADE'), nullable=False, index=True)
+    campo = Column(String(50), nullable=False)
+    valor = Column(String(100), nullable=False)
+
+    arquivo = relationship("ArquivoFeatures", back_populates="valores")
+
+    __table_args__ = (
+        Index('ix_arquivo_feature_campo_valor', 'campo', 'valor'),
+    )
@@ -0,0 +1,59 @@
+"""
+Glox - Cache de Importação de Faturas
+
+Tabelas:
+- importacao_zips: Resultado da importação de um ZIP (dados da fatura e guias de
+  internação relevantes), chaveado pelo hash do conteúdo e pelos parâmetros da
+  extração. Guarda também o último caminho/tamanho/mtime visto, para que uma
+  reimportação reconheça o ZIP só pelo stat, sem recalcular o hash.
+- importacao_estado: Estado do processador por pasta importada (ZIPs em ordem e
+  último plano de distribuição), restaurável sem reler nenhum XML.
+
+Ver importacao_repository e WorkflowController.importar_fatura.
+"""
+
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, Text, UniqueConstraint, Index
+from datetime import datetime
+from .models import Base
+
+
+class ImportacaoZip(Base):
+    """Dados extraídos de um ZIP de fatura"""
+    __tablename__ = 'importacao_zips'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    zip_hash = Column(String(64), nullable=False)
+    parametros = Column(String(64), nullable=False)  # Assinatura de valor mínimo + códigos ignorados
+
+    # Último local visto (atalho por stat)
+    caminho = Column(String(1000))
+    tamanho = Column(BigInteger)
+    mtime_ns = Column(BigInteger)
+
+    nome_zip = Column(String(255))
+    dados_fatura = Column(Text, nullable=False)  # JSON de xml_parser.extrair_dados_fatura_xml
+    guias_relevantes = Column(Text)  # JSON de xml_parser.extrair_guias_internacao_relevantes
+    criado_em = Column(DateTime, default=datetime.now)
+
+    __table_args__ = (
+        UniqueConstraint('zip_hash', 'parametros', name='uq_importacao_zip_hash_parametros'),
+        Index('ix_importacao_zip_caminho', 'caminho'),
+    )
+
+    def __repr__(self):
+        return f"<ImportacaoZip(nome_zip='{self.nome_zip}', zip_hash='{self.zip_hash}')>"
+
+
+class ImportacaoEstado(Base):
+    """Última importação (e distribuição) de uma pasta"""
+    __tablename__ = 'importacao_estado'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    pasta = Column(String(1000), nullable=False, unique=True)
+    parametros = Column(String(64))
+    zips = Column(Text)  # JSON: [[zip_hash, caminho], ...] na ordem da importação
+    plano_distribuicao = Column(Text)  # JSON do último plano (vazio se não distribuído)
+    atualizado_em = Column(DateTime, default=datetime.now)
+
+    def __repr__(self):
+        return f"<ImportacaoEstado(pasta='{self.pasta}')>"
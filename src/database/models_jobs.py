@@ -0,0 +1,116 @@
+"""
+Glox - Modelos de Jobs em Lote Retomáveis
+
+Tabelas:
+- batch_jobs: Um job de validação ou de atualização de hash (parâmetros, progresso, checkpoint)
+- batch_job_arquivos: Lista de arquivos do job com o estado de cada um
+  (também usada como fila de trabalho compartilhada pelos workers, ver fila_repository)
+"""
+
+import json
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from .models import Base
+
+
+class BatchJob(Base):
+    """
+    Job em lote com checkpoint por arquivo.
+    Um job interrompido (queda, fechamento do app) é retomado a partir
+    dos arquivos ainda pendentes, sem reprocessar os concluídos.
+    """
+    __tablename__ = 'batch_jobs'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tipo = Column(String(20), nullable=False)  # VALIDACAO, HASH, FILA_VALIDACAO
+    status = Column(String(20), default='PENDENTE', index=True)  # PENDENTE, EXECUTANDO, INTERROMPIDO, CONCLUIDO, CANCELADO, FALHOU
+    parametros = Column(Text)  # JSON com os argumentos necessários para retomar
+
+    execution_id = Column(Integer)  # ExecutionLog associado (tracking de ROI)
+    user_id = Column(Integer)
+
+    # Progresso
+    total_arquivos = Column(Integer, default=0)
+    processados = Column(Integer, default=0)
+    ultimo_arquivo = Column(String(500))
+    checkpoint_em = Column(DateTime)
+
+    # Saída parcial de alertas (JSONL) e tamanho válido no último checkpoint
+    alertas_caminho = Column(String(500))
+    alertas_offset = Column(Integer, default=0)
+
+    criado_em = Column(DateTime, default=datetime.now)
+    atualizado_em = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    finalizado_em = Column(DateTime)
+
+    # Relacionamentos
+    arquivos = relationship("BatchJobArquivo", back_populates="job",
+                            cascade="all, delete-orphan", order_by="BatchJobArquivo.posicao")
+
+    def __repr__(self):
+        return f"<BatchJob(id={self.id}, tipo={self.tipo}, status={self.status})>"
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'status': self.status,
+            'parametros': json.loads(self.parametros) if self.parametros else {},
+            'execution_id': self.execution_id,
+            'user_id': self.user_id,
+            'total_arquivos': self.total_arquivos or 0,
+            'processados': self.processados or 0,
+            'ultimo_arquivo': self.ultimo_arquivo,
+            'checkpoint_em': self.checkpoint_em.strftime("%d/%m/%Y %H:%M:%S") if self.checkpoint_em else None,
+            'alertas_caminho': self.alertas_caminho,
+            'alertas_offset': self.alertas_offset or 0,
+            'criado_em': self.criado_em.strftime("%d/%m/%Y %H:%M") if self.criado_em else None,
+            'finalizado_em': self.finalizado_em.strftime("%d/%m/%Y %H:%M") if self.finalizado_em else None,
+        }
+
+
+class BatchJobArquivo(Base):
+    """
+    Arquivo de um job e seu estado.
+    A posição preserva a ordem original da lista de arquivos.
+    """
+    __tablename__ = 'batch_job_arquivos'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(Integer, ForeignKey('batch_jobs.id'), nullable=False)
+    posicao = Column(Integer, nullable=False)
+    caminho = Column(String(500), nullable=False)
+
+    status = Column(String(20), default='PENDENTE')  # PENDENTE, EM_PROCESSAMENTO, CONCLUIDO, PULADO, ERRO
+    alterado = Column(Boolean, default=False)  # Arquivo modificado (validação) / ZIP recriado (hash)
+    mensagem = Column(Text)
+    file_hash = Column(String(64))
+    atualizado_em = Column(DateTime)
+
+    # Fila distribuída: worker dono do item e validade da reserva (renovada pelo heartbeat)
+    worker_id = Column(String(100))
+    lease_ate = Column(DateTime)
+    tentativas = Column(Integer, default=0)
+    alertas = Column(Text)  # JSON com os alertas gerados no arquivo
+
+    # Relacionamento
+    job = relationship("BatchJob", back_populates="arquivos")
+
+    __table_args__ = (
+        Index('ix_batch_job_arquivos_job_status', 'job_id', 'status'),
+    )
+
+    def __repr__(self):
+        return f"<BatchJobArquivo(job_id={self.job_id}, posicao={self.posicao}, status={self.status})>"
+
+    def to_dict(self):
+        return {
+            'posicao': self.posicao,
+            'caminho': self.caminho,
+            'status': self.status,
+            'alterado': bool(self.alterado),
+            'mensagem': self.mensagem or "",
+            'worker_id': self.worker_id,
+            'tentativas': self.tentativas or 0,
+        }
@@ -5,6 +5,7 @@ Nomenclatura Padrão:
 - Tabela: audit_rules (regras principais)
 - Tabela: audit_rule_history (histórico de versões)
 - Tabela: audit_rule_lists (listas de códigos)
+- Tabela: audit_rule_snapshots (conjuntos de regras ativas versionados)
 
 Categorias de Regras (RuleCategory):
 - GLOSA_GUIA: Correções que evitam glosa da guia inteira
@@ -174,6 +175,40 @@ class AuditRuleList(Base):
         return json.loads(self.valores) if self.valores else []
 
 
+class AuditRuleSnapshot(Base):
+    """
+    Snapshot imutável do conjunto de regras ativas.
+
+    A versão cresce monotonicamente a cada alteração publicada. Os motores em
+    execução comparam a versão carregada com a mais recente e trocam de
+    conjunto entre um arquivo e outro, recompilando só as regras cujo hash mudou.
+    """
+    __tablename__ = 'audit_rule_snapshots'
+
+    versao = Column(Integer, primary_key=True, autoincrement=False)
+    checksum = Column(String(64), nullable=False)  # SHA-256 dos hashes das regras, em ordem
+    quantidade = Column(Integer, default=0)
+    regras = Column(Text, nullable=False)  # JSON: [{"hash": ..., "regra": {formato rule_engine}}]
+
+    # Auditoria
+    criado_em = Column(DateTime, default=datetime.utcnow)
+    criado_por = Column(String(100))
+    motivo = Column(String(500))
+
+    def __repr__(self):
+        return f"<AuditRuleSnapshot(versao={self.versao}, regras={self.quantidade})>"
+
+    def to_dict(self):
+        """Snapshot decodificado: versão, checksum e lista de {hash, regra}"""
+        import json
+        return {
+            "versao": self.versao,
+            "checksum": self.checksum,
+            "criado_em": self.criado_em,
+            "regras": json.loads(self.regras) if self.regras else []
+        }
+
+
 # Mapping antigo -> novo grupo
 LEGACY_GROUP_MAPPING = {
     "regras_grupo_1200.json": RuleGroup.LAYOUT,
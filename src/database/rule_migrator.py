@@ -3,7 +3,7 @@ import json
 import logging
 from src.database.db_manager import get_session
 from src.database.models_rules import (
-    AuditRule, AuditRuleList, RuleCategory, RuleGroup
+    AuditRule, AuditRuleHistory, AuditRuleList, RuleCategory, RuleGroup
 )
 
 logger = logging.getLogger(__name__)
@@ -39,6 +39,15 @@ LIST_FILES = {
     "ignore_00.json": "IGNORE_00",
 }
 
+# Regras removidas dos JSONs que ainda podem estar ativas no banco
+MOTIVO_ORDEM_SCHEMA = "Substituída pela ordenação em passada única pelo XSD (schema_order)"
+REGRAS_APOSENTADAS = {
+    "REGRA_ORDEM_EQUIPE_PARA_HONORARIOS": MOTIVO_ORDEM_SCHEMA,
+    "REGRA_ORDEM_EQUIPE_PARA_SADT_E_INTERNACAO": MOTIVO_ORDEM_SCHEMA,
+    "REGRA_ORDEM_EQUIPE_PARA_CONSULTA": MOTIVO_ORDEM_SCHEMA,
+    "REGRA_ORDEM_DADOS_AUDITORIA": MOTIVO_ORDEM_SCHEMA,
+}
+
 def detect_category(rule: dict) -> str:
     """Detecta categoria da regra baseado em metadados ou tipo de ação"""
     # Verificar metadados existentes
@@ -80,6 +89,7 @@ def run_migration(config_path: str = None):
         'rules_migrated': 0,
         'rules_skipped': 0,
         'lists_migrated': 0,
+        'rules_retired': 0,
         'errors': []
     }
 
@@ -98,12 +108,19 @@ def run_migration(config_path: str = None):
         if os.path.exists(filepath):
             _migrate_list_file_safe(filepath, list_id, stats)
             
+    # 3. Desativar regras aposentadas
+    _retire_rules_safe(stats)
+
     total_r = stats['rules_migrated'] + stats['rules_skipped']
     total_l = stats['lists_migrated']
-    if stats['rules_migrated'] > 0 or stats['errors']:
+    if stats['rules_migrated'] > 0 or stats['rules_retired'] > 0 or stats['errors']:
         logger.info(f"Regras sincronizadas ({total_r} regras, {total_l} listas)")
     else:
         logger.debug(f"Regras sincronizadas ({total_r} regras, {total_l} listas) — nenhuma alteração.")
+
+    # 4. Publicar snapshot (não grava nada se o conjunto ativo não mudou)
+    from src.database.rule_repository import RuleRepository
+    stats['snapshot_version'] = RuleRepository.publish_snapshot('auto_sync', 'Sincronização JSON -> banco')
     return stats
 
 def _scan_and_migrate(folder, stats):
@@ -198,6 +215,43 @@ def _migrate_rule_file_safe(filepath, grupo, stats):
     finally:
         session.close()
 
+def _retire_rules_safe(stats):
+    """
+    Desativa no banco as regras de REGRAS_APOSENTADAS (uma única vez: se um
+    administrador reativar a regra depois, a migração não a desativa de novo).
+    """
+    from src.database.rule_repository import RuleRepository
+    session = get_session()
+    try:
+        rules = session.query(AuditRule).filter(
+            AuditRule.id.in_(list(REGRAS_APOSENTADAS)), AuditRule.ativo.is_(True)
+        ).all()
+        retired = 0
+        for rule in rules:
+            motivo = REGRAS_APOSENTADAS[rule.id]
+            ja_aposentada = session.query(AuditRuleHistory).filter(
+                AuditRuleHistory.rule_id == rule.id, AuditRuleHistory.motivo == motivo
+            ).first()
+            if ja_aposentada:
+                continue
+            RuleRepository._log_history(session, rule, "TOGGLE", 'auto_sync', motivo)
+            rule.ativo = False
+            rule.versao += 1
+            rule.atualizado_por = 'auto_sync'
+            retired += 1
+            logger.info(f"Regra desativada: {rule.id} (v{rule.versao}) - {motivo}")
+
+        if retired > 0:
+            session.commit()
+            RuleRepository.invalidate_cache()
+            stats['rules_retired'] += retired
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Erro ao desativar regras aposentadas: {e}")
+        stats['errors'].append(str(e))
+    finally:
+        session.close()
+
 def _migrate_list_file_safe(filepath, list_id, stats):
     session = get_session()
     try:
@@ -3,16 +3,24 @@ Glox - Repositório de Regras
 
 Gerencia operações CRUD para regras no banco SQLite.
 Inclui versionamento automático e histórico de alterações.
+
+Toda alteração publica um snapshot versionado do conjunto de regras ativas
+(audit_rule_snapshots). O cache em memória é local ao processo; os motores em
+execução (inclusive em outros processos/máquinas) acompanham a versão do
+snapshot no banco.
 """
 
+import hashlib
 import json
 import logging
 from datetime import datetime
 from typing import List, Optional, Dict, Any
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from .db_manager import get_session
-from .models_rules import AuditRule, AuditRuleHistory, AuditRuleList, RuleCategory, RuleGroup
+from .models_rules import AuditRule, AuditRuleHistory, AuditRuleList, AuditRuleSnapshot, RuleCategory, RuleGroup
 
 logger = logging.getLogger(__name__)
 
@@ -137,6 +145,7 @@ class RuleRepository:
             
             RuleRepository.invalidate_cache()
             logger.info(f"Regra criada: {rule.id}")
+            RuleRepository.publish_snapshot(criado_por, f"Criada {rule.id}")
             
             return rule
         except Exception as e:
@@ -184,6 +193,7 @@ class RuleRepository:
             session.commit()
             RuleRepository.invalidate_cache()
             logger.info(f"Regra atualizada: {rule_id} (v{rule.versao})")
+            RuleRepository.publish_snapshot(atualizado_por, motivo or f"Atualizada {rule_id}")
             
             return rule
         except Exception as e:
@@ -223,6 +233,7 @@ class RuleRepository:
             session.commit()
             RuleRepository.invalidate_cache()
             logger.info(f"Regra deletada: {rule_id}")
+            RuleRepository.publish_snapshot(deletado_por, f"Removida {rule_id}")
             
             return True
         except Exception as e:
@@ -266,6 +277,90 @@ class RuleRepository:
         finally:
             session.close()
     
+    # ==========================================
+    # Snapshots versionados
+    # ==========================================
+    
+    @staticmethod
+    def rule_hash(regra: Dict) -> str:
+        """Hash do conteúdo da regra (formato rule_engine), independente da ordem das chaves"""
+        conteudo = json.dumps(regra, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def publish_snapshot(criado_por: str = "system", motivo: str = "") -> Optional[int]:
+        """
+        Publica o conjunto atual de regras ativas como um novo snapshot.
+        
+        Se o conjunto for idêntico ao do último snapshot, nada é gravado.
+        
+        Returns:
+            Versão publicada (ou a atual, se não houve mudança); None em caso de erro
+        """
+        for tentativa in range(2):
+            session = get_session()
+            try:
+                regras = session.query(AuditRule).filter(
+                    AuditRule.ativo == True
+                ).order_by(AuditRule.prioridade, AuditRule.id).all()
+                itens = []
+                for rule in regras:
+                    dados = rule.to_dict()
+                    itens.append({'hash': RuleRepository.rule_hash(dados), 'regra': dados})
+                checksum = hashlib.sha256("".join(i['hash'] for i in itens).encode('ascii')).hexdigest()
+                
+                ultimo = session.query(AuditRuleSnapshot).order_by(AuditRuleSnapshot.versao.desc()).first()
+                if ultimo is not None and ultimo.checksum == checksum:
+                    return ultimo.versao
+                
+                versao = (ultimo.versao if ultimo else 0) + 1
+                session.add(AuditRuleSnapshot(
+                    versao=versao,
+                    checksum=checksum,
+                    quantidade=len(itens),
+                    regras=json.dumps(itens, ensure_ascii=False),
+                    criado_por=criado_por,
+                    motivo=motivo[:500]
+                ))
+                session.commit()
+                logger.info(f"Snapshot de regras publicado: v{versao} ({len(itens)} regras ativas)")
+                return versao
+            except IntegrityError:
+                # Outro processo publicou a mesma versão ao mesmo tempo: recalcular
+                session.rollback()
+                if tentativa:
+                    logger.error("Conflito ao publicar snapshot de regras")
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Erro ao publicar snapshot de regras: {e}")
+                return None
+            finally:
+                session.close()
+        return None
+    
+    @staticmethod
+    def get_latest_snapshot_version() -> Optional[int]:
+        """Versão do snapshot mais recente (consulta leve, usada no polling dos motores)"""
+        session = get_session()
+        try:
+            return session.query(func.max(AuditRuleSnapshot.versao)).scalar()
+        finally:
+            session.close()
+    
+    @staticmethod
+    def get_snapshot(versao: Optional[int] = None) -> Optional[Dict]:
+        """Retorna um snapshot (o mais recente se versao=None) já decodificado"""
+        session = get_session()
+        try:
+            query = session.query(AuditRuleSnapshot)
+            if versao is None:
+                snapshot = query.order_by(AuditRuleSnapshot.versao.desc()).first()
+            else:
+                snapshot = query.filter(AuditRuleSnapshot.versao == versao).first()
+            return snapshot.to_dict() if snapshot else None
+        finally:
+            session.close()
+    
     # ==========================================
     # Listas de Códigos
     # ==========================================
@@ -1,3 +1,3 @@
 # src/infrastructure/files/__init__.py
 """Files package"""
-__all__ = ['file_manager', 'file_handler']
+__all__ = ['file_manager', 'file_handler', 'io_executor', 'change_journal']
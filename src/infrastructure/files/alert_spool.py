@@ -0,0 +1,139 @@
+# src/infrastructure/files/alert_spool.py
+
+"""
+Armazenamento de alertas em disco (JSONL).
+
+Os alertas gerados pelas regras (ação 'gerar_alerta') são gravados num
+arquivo temporário à medida que ocorrem, em vez de acumulados numa lista.
+A memória fica constante independentemente da quantidade de alertas, e o
+relatório é gerado lendo o arquivo sequencialmente.
+
+Jobs retomáveis usam `AlertSpool.persistente`: o arquivo tem caminho fixo,
+sobrevive ao processo e é truncado no tamanho do último checkpoint ao retomar.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import weakref
+from typing import Dict, Iterator, Optional
+
+
+def _remover_arquivo(caminho: str):
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+
+class AlertSpool:
+    """
+    Lista de alertas apoiada em arquivo JSONL.
+
+    Compatível com o uso anterior de `engine.alertas` como lista:
+    `append`, `len`, iteração e teste de verdade (`if engine.alertas`).
+    """
+
+    def __init__(self, pasta: Optional[str] = None):
+        self._pasta = pasta
+        self._caminho: Optional[str] = None
+        self._arquivo = None
+        self._quantidade = 0
+        self._lock = threading.Lock()
+        self._finalizador = None
+        self._persistente = False
+
+    @classmethod
+    def persistente(cls, caminho: str, offset: int = 0) -> "AlertSpool":
+        """
+        Spool em arquivo fixo, para jobs retomáveis.
+
+        Descarta o que foi gravado depois de `offset` (alertas de um arquivo
+        cujo checkpoint não chegou a ser gravado) e continua a partir dali.
+        """
+        spool = cls(os.path.dirname(caminho))
+        spool._persistente = True
+        spool._caminho = caminho
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        with open(caminho, 'ab') as arquivo:
+            arquivo.truncate(offset)
+        with open(caminho, 'rb') as arquivo:
+            spool._quantidade = sum(1 for linha in arquivo if linha.strip())
+        spool._arquivo = open(caminho, 'a', encoding='utf-8')
+        return spool
+
+    @property
+    def caminho(self) -> Optional[str]:
+        """Caminho do arquivo JSONL (None enquanto não houver alertas)."""
+        return self._caminho
+
+    def _abrir(self):
+        descritor, self._caminho = tempfile.mkstemp(prefix="alertas_", suffix=".jsonl", dir=self._pasta)
+        self._arquivo = os.fdopen(descritor, 'w', encoding='utf-8')
+        # Garante a remoção do arquivo mesmo se close() não for chamado
+        self._finalizador = weakref.finalize(self, _remover_arquivo, self._caminho)
+
+    def append(self, alerta: Dict):
+        """Grava um alerta no final do arquivo."""
+        linha = json.dumps(alerta, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._arquivo is None:
+                self._abrir()
+            self._arquivo.write(linha + "\n")
+            self._quantidade += 1
+
+    def __len__(self) -> int:
+        return self._quantidade
+
+    def __bool__(self) -> bool:
+        return self._quantidade > 0
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Lê os alertas em ordem de gravação, um por vez."""
+        with self._lock:
+            if self._arquivo is None:
+                return iter(())
+            self._arquivo.flush()
+            caminho = self._caminho
+        return self._ler(caminho)
+
+    def sincronizar(self) -> int:
+        """Força a gravação em disco e retorna o tamanho do arquivo (offset de checkpoint)."""
+        with self._lock:
+            if self._arquivo is None:
+                return 0
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+            return os.fstat(self._arquivo.fileno()).st_size
+
+    @staticmethod
+    def _ler(caminho: str) -> Iterator[Dict]:
+        with open(caminho, 'r', encoding='utf-8') as arquivo:
+            for linha in arquivo:
+                if linha.strip():
+                    yield json.loads(linha)
+
+    def clear(self):
+        """Descarta todos os alertas e remove o arquivo."""
+        with self._lock:
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
+            if self._finalizador is not None:
+                self._finalizador()
+                self._finalizador = None
+            elif self._persistente and self._caminho:
+                _remover_arquivo(self._caminho)
+            self._caminho = None
+            self._quantidade = 0
+
+    def close(self):
+        """Fecha o spool. No modo persistente o arquivo é mantido para retomada."""
+        if not self._persistente:
+            self.clear()
+            return
+        with self._lock:
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
@@ -0,0 +1,315 @@
+# src/infrastructure/files/change_journal.py
+
+"""
+Diário de alterações por arquivo e aplicação como patches de bytes.
+
+O RuleEngine registra cada alteração que as ações fazem na árvore (texto de
+um nó, elemento inserido/removido, filhos reordenados), com o caminho do
+elemento, o valor anterior e o novo. Com o diário:
+
+- alterações só de texto são gravadas trocando apenas as faixas de bytes dos
+  textos no arquivo original, sem reserializar o documento (cada nó é
+  localizado pela linha de origem e o texto anterior é conferido byte a byte;
+  qualquer divergência faz o chamador voltar à gravação completa);
+- o arquivo pode ser revertido (patches inversos, ou desfazendo na árvore) e
+  as diferenças exibidas sem manter cópia de backup do XML.
+"""
+
+import json
+import os
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import lxml.etree as etree
+
+TIPO_TEXTO = 'texto'
+TIPO_INSERCAO = 'insercao'
+TIPO_REMOCAO = 'remocao'
+TIPO_REORDENACAO = 'reordenacao'
+
+# Pasta (ao lado dos .051) onde a validação grava os diários
+PASTA_DIARIOS = "Diarios"
+
+# Encodings em que os patches são aplicados (a gravação completa usa ISO-8859-1)
+ENCODINGS_PATCH = frozenset({'ISO-8859-1', 'ISO8859-1', 'LATIN-1', 'LATIN1'})
+
+_FIM_NOME_TAG = frozenset(b" \t\r\n/>")
+_BLOCO_CONTAGEM = 1024 * 1024
+_RE_ENCODING = re.compile(rb"^\s*<\?xml[^>]*?encoding\s*=\s*[\"']([A-Za-z0-9._-]+)[\"']")
+
+
+def caminho_diario(caminho_xml: str) -> str:
+    """Arquivo JSON do diário de um .051 (pasta Diarios ao lado do arquivo)."""
+    pasta, nome = os.path.split(os.path.abspath(caminho_xml))
+    return os.path.join(pasta, PASTA_DIARIOS, f"{nome}.json")
+
+
+def encoding_declarado(dados: bytes) -> str:
+    """Encoding da declaração XML do conteúdo (UTF-8 se não houver)."""
+    encontrado = _RE_ENCODING.match(dados[:256])
+    return encontrado.group(1).decode('ascii') if encontrado else 'UTF-8'
+
+
+def _caminho(elemento) -> str:
+    return elemento.getroottree().getpath(elemento)
+
+
+def _nome_qualificado(elemento) -> str:
+    """Nome da tag como escrito no arquivo (prefixo:nome local)."""
+    local = etree.QName(elemento).localname
+    return f"{elemento.prefix}:{local}" if elemento.prefix else local
+
+
+def _localizar(arvore, caminho: str):
+    raiz = arvore.getroot()
+    prefixos = {prefixo: uri for prefixo, uri in raiz.nsmap.items() if prefixo}
+    encontrados = arvore.xpath(caminho, namespaces=prefixos)
+    if not encontrados:
+        raise ValueError(f"Elemento do diário não encontrado: {caminho}")
+    return encontrados[0]
+
+
+class DiarioAlteracoes:
+    """Alterações feitas pelas regras em um arquivo, na ordem em que ocorreram."""
+
+    def __init__(self, arquivo: str = "", entradas: Optional[List[Dict]] = None):
+        self.arquivo = arquivo
+        self.entradas: List[Dict] = entradas or []
+
+    def __len__(self) -> int:
+        return len(self.entradas)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.entradas)
+
+    def registrar_texto(self, elemento, depois: Optional[str], regra: Optional[str] = None):
+        """Antes de trocar o texto do elemento."""
+        antes = elemento.text
+        if antes == depois:
+            return
+        self.entradas.append({
+            'tipo': TIPO_TEXTO, 'regra': regra, 'caminho': _caminho(elemento),
+            'tag': _nome_qualificado(elemento), 'linha': elemento.sourceline,
+            'antes': antes, 'depois': depois,
+        })
+
+    def _registrar_estrutura(self, tipo: str, elemento, regra: Optional[str]):
+        pai = elemento.getparent()
+        self.entradas.append({
+            'tipo': tipo, 'regra': regra, 'caminho': _caminho(elemento),
+            'tag': _nome_qualificado(elemento), 'caminho_pai': _caminho(pai), 'indice': pai.index(elemento),
+            'xml': etree.tostring(elemento, encoding='unicode', with_tail=False),
+        })
+
+    def registrar_insercao(self, elemento, regra: Optional[str] = None):
+        """Depois de inserir o elemento na árvore."""
+        self._registrar_estrutura(TIPO_INSERCAO, elemento, regra)
+
+    def registrar_remocao(self, elemento, regra: Optional[str] = None):
+        """Antes de remover o elemento da árvore."""
+        self._registrar_estrutura(TIPO_REMOCAO, elemento, regra)
+
+    def registrar_reordenacao(self, pai, nova_ordem: List, regra: Optional[str] = None):
+        """Antes de reordenar: `nova_ordem` são os filhos atuais de `pai` na ordem nova."""
+        filhos = list(pai)
+        posicao = {id(filho): indice for indice, filho in enumerate(filhos)}
+        self.entradas.append({
+            'tipo': TIPO_REORDENACAO, 'regra': regra, 'caminho': _caminho(pai),
+            'tag': _nome_qualificado(pai),
+            'ordem': [posicao[id(filho)] for filho in nova_ordem],
+            'antes': [etree.QName(filho).localname for filho in filhos],
+            'depois': [etree.QName(filho).localname for filho in nova_ordem],
+        })
+
+    @property
+    def somente_texto(self) -> bool:
+        return all(entrada['tipo'] == TIPO_TEXTO for entrada in self.entradas)
+
+    def alteracoes_de_texto(self) -> List[Dict]:
+        """
+        Resultado líquido por nó (primeiro valor anterior, último novo),
+        sem os nós que voltaram ao valor original, em ordem de linha.
+        """
+        por_caminho: Dict[str, Dict] = {}
+        for entrada in self.entradas:
+            if entrada['tipo'] != TIPO_TEXTO:
+                continue
+            existente = por_caminho.get(entrada['caminho'])
+            if existente is None:
+                por_caminho[entrada['caminho']] = dict(entrada, regras=[entrada['regra']])
+            else:
+                existente['depois'] = entrada['depois']
+                existente['regras'].append(entrada['regra'])
+        liquidas = [a for a in por_caminho.values() if (a['antes'] or '') != (a['depois'] or '')]
+        return sorted(liquidas, key=lambda a: (a['linha'] or 0, a['caminho']))
+
+    def linhas_diff(self) -> List[str]:
+        """Diferenças em texto, uma por alteração (para exibição)."""
+        linhas = []
+        for entrada in self.entradas:
+            regra = f" [{entrada['regra']}]" if entrada.get('regra') else ""
+            if entrada['tipo'] == TIPO_TEXTO:
+                linha = f" (linha {entrada['linha']})" if entrada.get('linha') else ""
+                linhas.append(f"~ {entrada['caminho']}{linha}: {entrada['antes']!r} -> {entrada['depois']!r}{regra}")
+            elif entrada['tipo'] == TIPO_INSERCAO:
+                linhas.append(f"+ {entrada['caminho']}: {entrada['xml']}{regra}")
+            elif entrada['tipo'] == TIPO_REMOCAO:
+                linhas.append(f"- {entrada['caminho']}: {entrada['xml']}{regra}")
+            else:
+                linhas.append(f"↕ {entrada['caminho']}: {entrada['antes']} -> {entrada['depois']}{regra}")
+        return linhas
+
+    def desfazer(self, arvore) -> int:
+        """
+        Desfaz as alterações na árvore (em ordem inversa).
+
+        Returns:
+            Quantidade de entradas desfeitas
+        """
+        for entrada in reversed(self.entradas):
+            tipo = entrada['tipo']
+            if tipo == TIPO_TEXTO:
+                _localizar(arvore, entrada['caminho']).text = entrada['antes']
+            elif tipo == TIPO_INSERCAO:
+                elemento = _localizar(arvore, entrada['caminho'])
+                elemento.getparent().remove(elemento)
+            elif tipo == TIPO_REMOCAO:
+                _localizar(arvore, entrada['caminho_pai']).insert(entrada['indice'], etree.fromstring(entrada['xml']))
+            elif tipo == TIPO_REORDENACAO:
+                pai = _localizar(arvore, entrada['caminho'])
+                filhos = list(pai)
+                originais = [None] * len(filhos)
+                for posicao_nova, posicao_original in enumerate(entrada['ordem']):
+                    originais[posicao_original] = filhos[posicao_nova]
+                for filho in originais:
+                    pai.append(filho)
+        return len(self.entradas)
+
+    def to_dict(self) -> Dict:
+        return {'arquivo': self.arquivo, 'entradas': self.entradas}
+
+    @classmethod
+    def from_dict(cls, dados: Dict) -> "DiarioAlteracoes":
+        return cls(dados.get('arquivo', ''), list(dados.get('entradas', [])))
+
+    def salvar(self, caminho: str, **extras):
+        """Grava o diário em JSON (temporário + renomeação)."""
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({**self.to_dict(), **extras}, f, ensure_ascii=False, indent=1)
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def carregar(cls, caminho: str) -> Tuple["DiarioAlteracoes", Dict]:
+        """Returns: (diário, campos extras gravados junto)"""
+        with open(caminho, 'r', encoding='utf-8') as f:
+            dados = json.load(f)
+        extras = {chave: valor for chave, valor in dados.items() if chave not in ('arquivo', 'entradas')}
+        return cls.from_dict(dados), extras
+
+
+def _escapar(texto: Optional[str], encoding: str) -> bytes:
+    """Texto como a serialização do lxml o escreve."""
+    texto = (texto or '').replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    return texto.encode(encoding, 'xmlcharrefreplace')
+
+
+def _avancar_linhas(dados: bytes, posicao: int, quantidade: int) -> int:
+    """Posição logo após `quantidade` quebras de linha a partir de `posicao` (-1 se não houver)."""
+    while quantidade > 0:
+        fim_bloco = posicao + _BLOCO_CONTAGEM
+        no_bloco = dados.count(b"\n", posicao, fim_bloco)
+        if no_bloco < quantidade and fim_bloco < len(dados):
+            quantidade -= no_bloco
+            posicao = fim_bloco
+            continue
+        for _ in range(quantidade):
+            posicao = dados.find(b"\n", posicao)
+            if posicao < 0:
+                return -1
+            posicao += 1
+        return posicao
+    return posicao
+
+
+def _faixa_do_texto(dados: bytes, inicio_linha: int, tag: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Faixa de bytes do texto do elemento `tag` que começa na linha.
+
+    None se a tag não estiver na linha, aparecer mais de uma vez nela, for
+    auto-fechada ou o conteúdo tiver outros elementos.
+    """
+    fim_linha = dados.find(b"\n", inicio_linha)
+    if fim_linha < 0:
+        fim_linha = len(dados)
+    abertura = b"<" + tag
+    posicao = dados.find(abertura, inicio_linha, fim_linha)
+    while posicao >= 0 and dados[posicao + len(abertura)] not in _FIM_NOME_TAG:
+        posicao = dados.find(abertura, posicao + 1, fim_linha)
+    if posicao < 0:
+        return None
+    fim_abertura = dados.find(b">", posicao)
+    if fim_abertura < 0 or dados[fim_abertura - 1:fim_abertura] == b"/":
+        return None
+    # Outra ocorrência da mesma tag na linha: não dá para saber qual é o nó
+    seguinte = dados.find(abertura, fim_abertura, fim_linha)
+    while seguinte >= 0:
+        if dados[seguinte + len(abertura)] in _FIM_NOME_TAG:
+            return None
+        seguinte = dados.find(abertura, seguinte + 1, fim_linha)
+    inicio_texto = fim_abertura + 1
+    fim_texto = dados.find(b"</" + tag + b">", inicio_texto)
+    if fim_texto < 0 or b"<" in dados[inicio_texto:fim_texto]:
+        return None
+    return inicio_texto, fim_texto
+
+
+def aplicar_patches(dados: bytes, alteracoes: List[Dict], reverter: bool = False) -> Optional[bytes]:
+    """
+    Aplica alterações de texto (ver `DiarioAlteracoes.alteracoes_de_texto`) como
+    troca de faixas de bytes.
+
+    Args:
+        dados: Conteúdo atual do arquivo
+        reverter: Troca 'depois' por 'antes' (o arquivo deve conter os valores novos)
+
+    Returns:
+        O novo conteúdo, ou None se alguma alteração não puder ser localizada
+        e conferida com segurança (o chamador deve gravar o documento inteiro)
+    """
+    encoding = encoding_declarado(dados)
+    if encoding.upper() not in ENCODINGS_PATCH:
+        return None
+    esperado, novo = ('depois', 'antes') if reverter else ('antes', 'depois')
+
+    partes = []
+    posicao = 0
+    linha = 1
+    for alteracao in sorted(alteracoes, key=lambda a: a['linha'] or 0):
+        alvo = alteracao.get('linha')
+        valores = (alteracao[esperado] or '', alteracao[novo] or '')
+        if not alvo or alvo < linha or any(c in v for v in valores for c in '\r\n'):
+            return None
+        inicio_linha = _avancar_linhas(dados, posicao, alvo - linha)
+        if inicio_linha < 0:
+            return None
+        linha = alvo
+        posicao = inicio_linha
+
+        faixa = _faixa_do_texto(dados, inicio_linha, alteracao['tag'].encode('ascii', 'ignore'))
+        if faixa is None or dados[faixa[0]:faixa[1]] != _escapar(valores[0], encoding):
+            return None
+        partes.append((faixa, _escapar(valores[1], encoding)))
+
+    resultado = []
+    anterior = 0
+    # Mais de um nó na mesma linha: as faixas podem não estar em ordem
+    for (inicio, fim), substituto in sorted(partes):
+        if inicio < anterior:
+            return None
+        resultado.append(dados[anterior:inicio])
+        resultado.append(substituto)
+        anterior = fim
+    resultado.append(dados[anterior:])
+    return b"".join(resultado)
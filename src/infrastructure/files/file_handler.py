@@ -1,16 +1,51 @@
 # src/validator/core/file_handler.py
 import os
+import re
 import glob
+import stat
+import hashlib
 import logging
+import threading
+from contextlib import contextmanager
 import lxml.etree as etree # Garanta que esta importação existe
+from src.infrastructure.files import change_journal
 
 
 # Configuração de logger específico para o módulo
 logger = logging.getLogger(__name__)
 
+# Trechos que o layout de etree.indent(space="") não produz: tags coladas ou
+# espaço entre tags diferente de uma única quebra de linha. Pode acusar falsos
+# positivos (ex.: texto começando com espaço), que só custam a reindentação.
+_RE_FORA_DO_LAYOUT = re.compile(rb">(?:<|[ \t\r]|\n[ \t\r\n])")
+
+# Arquivos gravados por lote antes do fsync, no modo fsync_em_lote
+TAMANHO_LOTE_FSYNC = 256
+
+
+def _fsync_caminho(caminho, diretorio=False):
+    """fsync de um arquivo ou diretório já gravado (diretórios: ignorado onde não há suporte, ex.: Windows)."""
+    try:
+        descritor = os.open(caminho, os.O_RDONLY)
+    except OSError:
+        if diretorio:
+            return
+        raise
+    try:
+        os.fsync(descritor)
+    except OSError:
+        if not diretorio:
+            raise
+    finally:
+        os.close(descritor)
+
+
 class FileHandler:
     def __init__(self):
-        pass
+        # Modo fsync_em_lote: arquivos gravados aguardando fsync (None = fsync a cada gravação)
+        self._pendentes_fsync = None
+        self._tamanho_lote = TAMANHO_LOTE_FSYNC
+        self._lock_lote = threading.Lock()
 
     def list_xml_files(self, folder_path):
         """
@@ -22,23 +57,181 @@ class FileHandler:
             return []
         return glob.glob(os.path.join(folder_path, "*.051"))
 
-    def save_xml_tree(self, xml_tree, output_path):
+    def serializar_xml(self, xml_tree):
+        """
+        Bytes do XML em ISO-8859-1 com pretty_print, no layout de etree.indent(space="").
+
+        A árvore só é reindentada quando a serialização mostra que o layout
+        difere (ex.: elementos inseridos pelas regras ou arquivo de outra origem).
+        """
+        dados = etree.tostring(xml_tree, encoding='ISO-8859-1', xml_declaration=True, pretty_print=True)
+        if _RE_FORA_DO_LAYOUT.search(dados):
+            etree.indent(xml_tree.getroot(), space="")
+            dados = etree.tostring(xml_tree, encoding='ISO-8859-1', xml_declaration=True, pretty_print=True)
+        return dados
+
+    def save_xml_tree(self, xml_tree, output_path, hash_original=None, diario=None):
         """
         Salva uma árvore XML para um arquivo, usando encoding ISO-8859-1 e pretty_print.
+
+        A gravação é atômica: arquivo temporário na mesma pasta, fsync e
+        renomeação sobre o destino (uma queda no meio nunca deixa um .051
+        truncado). Se os bytes serializados forem iguais ao conteúdo atual do
+        destino, nada é gravado.
+
+        Args:
+            hash_original: MD5 do conteúdo atual do destino, se já conhecido
+                (evita reler o arquivo para saber se mudou)
+            diario: DiarioAlteracoes da árvore, carregada de `output_path`. Se
+                só houver alterações de texto, o arquivo original recebe apenas
+                a troca desses textos (sem reserializar); senão, ou se algum
+                texto não puder ser conferido, grava o documento inteiro.
         """
         try:
             # Garante que o diretório de saída existe
-            output_dir = os.path.dirname(output_path)
-            if output_dir and not os.path.exists(output_dir):
+            output_dir = os.path.dirname(os.path.abspath(output_path))
+            if not os.path.exists(output_dir):
                 os.makedirs(output_dir)
-            
-            # --- LINHA ADICIONADA PARA CORRIGIR A FORMATAÇÃO ---
-            # Re-indenta toda a árvore do XML para garantir a formatação correta
-            etree.indent(xml_tree.getroot(), space="")
 
-            xml_tree.write(output_path, encoding='ISO-8859-1', xml_declaration=True, pretty_print=True)
+            dados = None
+            if diario is not None and diario.somente_texto:
+                dados = self._aplicar_diario(output_path, diario, hash_original)
+            if dados is None:
+                dados = self.serializar_xml(xml_tree)
+            if self._conteudo_igual(output_path, dados, hash_original):
+                logger.info(f"XML sem alteração no conteúdo, gravação dispensada: {output_path}")
+                return True
+
+            self._gravar_atomico(output_path, dados)
             logger.info(f"XML salvo em: {output_path}")
             return True
         except Exception as e:
             logger.error(f"Erro ao salvar XML em {output_path}: {e}")
-            return False
\ No newline at end of file
+            return False
+
+    def _aplicar_diario(self, caminho, diario, hash_original):
+        """Conteúdo original com os textos trocados, ou None (gravar o documento inteiro)."""
+        try:
+            with open(caminho, 'rb') as f:
+                original = f.read()
+        except OSError:
+            return None
+        if hash_original is not None and hashlib.md5(original).hexdigest() != hash_original:
+            # O arquivo mudou desde a leitura: as linhas do diário não valem mais
+            return None
+        return change_journal.aplicar_patches(original, diario.alteracoes_de_texto())
+
+    def reverter_com_diario(self, caminho, diario):
+        """
+        Devolve o arquivo ao conteúdo anterior às alterações do diário.
+
+        Só textos: patches inversos nas mesmas faixas de bytes; com alterações
+        estruturais (ou se algum texto não conferir): desfaz na árvore e grava
+        o documento inteiro.
+
+        Returns:
+            True se reverteu
+        """
+        try:
+            if diario.somente_texto:
+                with open(caminho, 'rb') as f:
+                    atual = f.read()
+                dados = change_journal.aplicar_patches(atual, diario.alteracoes_de_texto(), reverter=True)
+                if dados is not None:
+                    self._gravar_atomico(caminho, dados)
+                    logger.info(f"XML revertido (textos) em: {caminho}")
+                    return True
+            arvore = etree.parse(caminho, etree.XMLParser(huge_tree=True, strip_cdata=False, resolve_entities=False))
+            diario.desfazer(arvore)
+            return self.save_xml_tree(arvore, caminho)
+        except Exception as e:
+            logger.error(f"Erro ao reverter {caminho} pelo diário: {e}")
+            return False
+
+    def _conteudo_igual(self, caminho, dados, hash_original):
+        if hash_original is not None:
+            return hashlib.md5(dados).hexdigest() == hash_original
+        try:
+            if os.path.getsize(caminho) != len(dados):
+                return False
+            with open(caminho, 'rb') as f:
+                return f.read() == dados
+        except OSError:
+            return False
+
+    def _gravar_atomico(self, caminho, dados):
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        em_lote = self._pendentes_fsync is not None
+        try:
+            with open(temporario, 'wb') as destino:
+                destino.write(dados)
+                destino.flush()
+                if not em_lote:
+                    os.fsync(destino.fileno())
+            if os.path.exists(caminho):
+                # Mantém as permissões do arquivo substituído
+                os.chmod(temporario, stat.S_IMODE(os.stat(caminho).st_mode))
+            os.replace(temporario, caminho)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+        if em_lote:
+            with self._lock_lote:
+                self._pendentes_fsync.append(caminho)
+                cheio = len(self._pendentes_fsync) >= self._tamanho_lote
+            if cheio:
+                self.sincronizar_lote()
+        else:
+            # A renomeação só é durável após o fsync da pasta
+            _fsync_caminho(os.path.dirname(os.path.abspath(caminho)), diretorio=True)
+
+    @contextmanager
+    def fsync_em_lote(self, tamanho_lote=TAMANHO_LOTE_FSYNC):
+        """
+        Agrupa os fsync das gravações feitas dentro do bloco (pastas grandes).
+
+        Cada arquivo continua sendo gravado em temporário e renomeado (nunca
+        fica truncado por queda do processo), mas o fsync dos arquivos e das
+        pastas é feito a cada `tamanho_lote` arquivos e na saída do bloco:
+        numa queda do sistema, só o lote corrente pode voltar ao conteúdo
+        anterior. Não usar quando cada gravação precisa ser durável antes do
+        passo seguinte (ex.: checkpoint por arquivo).
+        """
+        with self._lock_lote:
+            aninhado = self._pendentes_fsync is not None
+            if not aninhado:
+                self._pendentes_fsync = []
+                self._tamanho_lote = max(1, tamanho_lote)
+        try:
+            yield self
+        finally:
+            if not aninhado:
+                self.sincronizar_lote()
+                with self._lock_lote:
+                    self._pendentes_fsync = None
+
+    def sincronizar_lote(self):
+        """
+        fsync dos arquivos gravados no lote corrente e de suas pastas (uma vez cada).
+
+        Returns:
+            int: Quantidade de arquivos sincronizados
+        """
+        with self._lock_lote:
+            if not self._pendentes_fsync:
+                return 0
+            caminhos = self._pendentes_fsync
+            self._pendentes_fsync = []
+
+        pastas = set()
+        for caminho in caminhos:
+            try:
+                _fsync_caminho(caminho)
+            except OSError as e:
+                logger.warning(f"Erro no fsync de {caminho}: {e}")
+            pastas.add(os.path.dirname(os.path.abspath(caminho)))
+        for pasta in pastas:
+            _fsync_caminho(pasta, diretorio=True)
+        logger.debug(f"fsync em lote: {len(caminhos)} arquivo(s) em {len(pastas)} pasta(s).")
+        return len(caminhos)
@@ -3,9 +3,12 @@
 import os
 import glob
 import shutil
+import threading
 import zipfile
 import lxml.etree as etree
 
+from .io_executor import IOExecutor, MAX_WORKERS_PADRAO, copiar_arquivo, mover_arquivo
+
 def listar_arquivos_zip(caminho_pasta):
     if not os.path.isdir(caminho_pasta):
         return []
@@ -27,24 +30,67 @@ def fazer_backup_fatura(caminho_fatura_original, caminho_pasta_backup):
     except Exception:
         return False
 
+def fazer_backup_faturas(lista_caminhos_zips, caminho_pasta_backup, log_callback=None, max_workers=None):
+    """Copia em paralelo os ZIPs que ainda não estão no backup. Retorna o resumo do IOExecutor."""
+    tarefas = [
+        (caminho_zip, lambda c=caminho_zip: copiar_arquivo(c, caminho_pasta_backup))
+        for caminho_zip in lista_caminhos_zips
+        if os.path.isfile(caminho_zip)
+        and not os.path.exists(os.path.join(caminho_pasta_backup, os.path.basename(caminho_zip)))
+    ]
+    executor = IOExecutor(max_workers=max_workers or MAX_WORKERS_PADRAO, log_callback=log_callback)
+    return executor.executar(tarefas, descricao="Copiando backups")
+
+def _extrair_membro_zip(caminho_zip, pasta_destino):
+    """
+    Extrai o .051 do ZIP e retorna (caminho_extraido, bytes).
+
+    Grava em arquivo temporário e renomeia no final, para que extrações
+    simultâneas de ZIPs com o mesmo nome interno não corrompam o destino.
+    """
+    with zipfile.ZipFile(caminho_zip, 'r') as arquivo_zip_aberto:
+        for info in arquivo_zip_aberto.infolist():
+            if not info.filename.lower().endswith(".051"):
+                continue
+            # Mesma sanitização do ZipFile.extract (sem caminhos absolutos ou '..')
+            partes = [p for p in info.filename.replace('\\', '/').split('/') if p not in ('', '.', '..')]
+            caminho_destino = os.path.join(pasta_destino, *partes)
+            os.makedirs(os.path.dirname(caminho_destino), exist_ok=True)
+            temporario = f"{caminho_destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with arquivo_zip_aberto.open(info) as origem, open(temporario, 'wb') as saida:
+                    shutil.copyfileobj(origem, saida, 1024 * 1024)
+                os.replace(temporario, caminho_destino)
+            finally:
+                if os.path.exists(temporario):
+                    os.remove(temporario)
+            return caminho_destino, info.file_size
+    return None, 0
+
 def extrair_xml_fatura_do_zip(caminho_zip, pasta_destino):
     try:
-        with zipfile.ZipFile(caminho_zip, 'r') as arquivo_zip_aberto:
-            for nome_arquivo_interno in arquivo_zip_aberto.namelist():
-                if nome_arquivo_interno.lower().endswith(".051"):
-                    arquivo_zip_aberto.extract(nome_arquivo_interno, path=pasta_destino)
-                    return os.path.join(pasta_destino, nome_arquivo_interno)
-            return None
+        return _extrair_membro_zip(caminho_zip, pasta_destino)[0]
     except (zipfile.BadZipFile, FileNotFoundError):
         return None
 
-def extrair_xmls_de_lista_zips(lista_caminhos_zips, pasta_destino):
+def extrair_xmls_de_lista_zips(lista_caminhos_zips, pasta_destino, log_callback=None, max_workers=None):
+    """Extrai o .051 de cada ZIP em paralelo. Retorna o resumo do IOExecutor."""
     os.makedirs(pasta_destino, exist_ok=True)
-    for caminho_zip in lista_caminhos_zips:
-        if os.path.exists(caminho_zip):
-            extrair_xml_fatura_do_zip(caminho_zip, pasta_destino)
+    tarefas = [
+        (caminho_zip, lambda c=caminho_zip: _extrair_membro_zip(c, pasta_destino)[1])
+        for caminho_zip in lista_caminhos_zips if os.path.exists(caminho_zip)
+    ]
+    executor = IOExecutor(max_workers=max_workers or MAX_WORKERS_PADRAO, log_callback=log_callback)
+    return executor.executar(tarefas, descricao="Extraindo XMLs")
 
-def organizar_faturas_por_auditor(plano_distribuicao, pasta_faturas_origem, pasta_distribuicao_raiz):
+def organizar_faturas_por_auditor(plano_distribuicao, pasta_faturas_origem, pasta_distribuicao_raiz,
+                                  log_callback=None, max_workers=None):
+    """
+    Move os ZIPs de cada auditor para sua pasta de distribuição, em paralelo.
+    Usa rename quando origem e destino estão no mesmo sistema de arquivos.
+    Retorna o resumo do IOExecutor.
+    """
+    tarefas = []
     for nome_auditor, dados in plano_distribuicao.items():
         nome_pasta_auditor = nome_auditor.replace(' ', '_').replace('.', '')
         caminho_pasta_auditor = os.path.join(pasta_distribuicao_raiz, nome_pasta_auditor)
@@ -52,7 +98,12 @@ def organizar_faturas_por_auditor(plano_distribuicao, pasta_faturas_origem, past
         for fatura in dados['faturas']:
             caminho_original = fatura.get('caminho_zip_original')
             if caminho_original and os.path.exists(caminho_original):
-                shutil.move(caminho_original, caminho_pasta_auditor)
+                tarefas.append((
+                    caminho_original,
+                    lambda c=caminho_original, p=caminho_pasta_auditor: mover_arquivo(c, p)
+                ))
+    executor = IOExecutor(max_workers=max_workers or MAX_WORKERS_PADRAO, log_callback=log_callback)
+    return executor.executar(tarefas, descricao="Movendo ZIPs")
 
 def recriar_zip_com_hash_atualizado(caminho_zip_original, caminho_xml_corrigido, novo_hash):
     try:
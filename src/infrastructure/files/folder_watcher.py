@@ -0,0 +1,267 @@
+# src/infrastructure/files/folder_watcher.py
+
+"""
+Monitoramento de pastas para o processamento automático (WatchDaemon).
+
+Detecta arquivos novos ou alterados nas pastas monitoradas e só os entrega
+quando estão completos ("debounce"):
+- tamanho e data de modificação inalterados por `debounce_segundos`;
+- ZIP com diretório central legível (cópia parcial não passa);
+- .051 terminando em '>' (XML gravado até o fim).
+
+No Linux usa inotify (via ctypes, sem dependência externa) para reagir assim
+que o arquivo é fechado/movido. Como inotify não enxerga alterações feitas
+por outras máquinas em compartilhamentos de rede, uma varredura completa com
+`os.scandir` é feita a cada `intervalo_varredura`. Sem inotify, a varredura
+periódica é o único mecanismo (polling).
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+import zipfile
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Constantes de <sys/inotify.h>
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_MASCARA = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+_EVENTO = struct.Struct("iIII")
+
+
+class _Inotify:
+    """Interface mínima para inotify(7) via libc."""
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falhou")
+        self._pastas: Dict[int, str] = {}
+        self.transbordou = False
+
+    @staticmethod
+    def disponivel() -> bool:
+        return sys.platform.startswith("linux")
+
+    def adicionar(self, pasta: str):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(pasta), _MASCARA)
+        if wd < 0:
+            logger.warning(f"inotify: não foi possível monitorar '{pasta}' (errno {ctypes.get_errno()})")
+            return
+        self._pastas[wd] = pasta
+
+    def ler(self, timeout: float) -> List[Tuple[str, int]]:
+        """Aguarda até `timeout` segundos e retorna (caminho, máscara) dos eventos."""
+        prontos, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+        if not prontos:
+            return []
+        try:
+            dados = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        eventos = []
+        posicao = 0
+        while posicao + _EVENTO.size <= len(dados):
+            wd, mascara, _, tamanho = _EVENTO.unpack_from(dados, posicao)
+            posicao += _EVENTO.size
+            nome = dados[posicao:posicao + tamanho].rstrip(b"\0")
+            posicao += tamanho
+            if mascara & _IN_Q_OVERFLOW:
+                self.transbordou = True
+                continue
+            pasta = self._pastas.get(wd)
+            if pasta and nome:
+                eventos.append((os.path.join(pasta, os.fsdecode(nome)), mascara))
+        return eventos
+
+    def fechar(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def arquivo_completo(caminho: str) -> bool:
+    """Verifica se o arquivo parece completamente gravado (ZIP íntegro / XML fechado)."""
+    try:
+        if caminho.lower().endswith(".zip"):
+            return zipfile.is_zipfile(caminho)
+        with open(caminho, "rb") as arquivo:
+            arquivo.seek(0, os.SEEK_END)
+            tamanho = arquivo.tell()
+            if tamanho == 0:
+                return False
+            arquivo.seek(max(0, tamanho - 256))
+            return arquivo.read().rstrip().endswith(b">")
+    except OSError:
+        return False
+
+
+class FolderWatcher:
+    """
+    Entrega arquivos novos/alterados e estáveis das pastas monitoradas.
+
+    Args:
+        alvos: Lista de (pasta, extensões, recursivo)
+        debounce_segundos: Tempo sem alterações antes de considerar o arquivo pronto
+        intervalo_varredura: Intervalo entre varreduras completas com os.scandir
+        usar_inotify: Tenta usar inotify (Linux); senão, apenas polling
+    """
+
+    def __init__(self, alvos: Iterable[Tuple[str, Tuple[str, ...], bool]], debounce_segundos: float = 2.0,
+                 intervalo_varredura: float = 30.0, usar_inotify: bool = True):
+        self.alvos = [(os.path.abspath(pasta), tuple(e.lower() for e in extensoes), recursivo)
+                      for pasta, extensoes, recursivo in alvos]
+        self.debounce_segundos = debounce_segundos
+        self.intervalo_varredura = intervalo_varredura
+
+        # caminho -> (assinatura, instante da última mudança)
+        self._candidatos: Dict[str, Tuple[Tuple[int, int], float]] = {}
+        # caminho -> assinatura já entregue (ou gravada pelo próprio daemon)
+        self._entregues: Dict[str, Tuple[int, int]] = {}
+        self._ultima_varredura = 0.0
+
+        self._inotify: Optional[_Inotify] = None
+        if usar_inotify and _Inotify.disponivel():
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError) as e:
+                logger.warning(f"inotify indisponível ({e}); usando polling.")
+        if self._inotify is None:
+            # Sem eventos, a varredura é o único mecanismo: precisa ser frequente
+            self.intervalo_varredura = min(self.intervalo_varredura, max(self.debounce_segundos, 1.0))
+        for pasta, _, recursivo in self.alvos:
+            self._monitorar(pasta, recursivo)
+
+    @property
+    def modo(self) -> str:
+        return "inotify" if self._inotify else "polling"
+
+    @property
+    def em_espera(self) -> int:
+        """Arquivos detectados aguardando estabilizar."""
+        return len(self._candidatos)
+
+    def _monitorar(self, pasta: str, recursivo: bool):
+        if self._inotify is None or not os.path.isdir(pasta):
+            return
+        self._inotify.adicionar(pasta)
+        if recursivo:
+            for raiz, subpastas, _ in os.walk(pasta):
+                for nome in subpastas:
+                    self._inotify.adicionar(os.path.join(raiz, nome))
+
+    def _alvo(self, caminho: str) -> Optional[Tuple[str, Tuple[str, ...], bool]]:
+        for alvo in self.alvos:
+            pasta, extensoes, recursivo = alvo
+            diretorio = os.path.dirname(caminho)
+            if diretorio == pasta or (recursivo and diretorio.startswith(pasta + os.sep)):
+                return alvo
+        return None
+
+    def _considerar(self, caminho: str, stat: Optional[os.stat_result] = None):
+        """Registra o arquivo como candidato se for novo ou tiver mudado desde a entrega."""
+        alvo = self._alvo(caminho)
+        if alvo is None or not caminho.lower().endswith(alvo[1]):
+            return
+        try:
+            stat = stat or os.stat(caminho)
+        except FileNotFoundError:
+            self._candidatos.pop(caminho, None)
+            return
+        assinatura = (stat.st_size, stat.st_mtime_ns)
+        if self._entregues.get(caminho) == assinatura:
+            return
+        anterior = self._candidatos.get(caminho)
+        if anterior is None or anterior[0] != assinatura:
+            self._candidatos[caminho] = (assinatura, time.monotonic())
+
+    def _varrer_pasta(self, pasta: str, extensoes: Tuple[str, ...], recursivo: bool):
+        try:
+            with os.scandir(pasta) as entradas:
+                for entrada in entradas:
+                    if entrada.is_dir(follow_symlinks=False):
+                        if recursivo:
+                            self._varrer_pasta(entrada.path, extensoes, recursivo)
+                    elif entrada.name.lower().endswith(extensoes):
+                        self._considerar(entrada.path, entrada.stat())
+        except FileNotFoundError:
+            pass
+
+    def varrer(self):
+        """Varredura completa das pastas monitoradas."""
+        for pasta, extensoes, recursivo in self.alvos:
+            self._varrer_pasta(pasta, extensoes, recursivo)
+        self._ultima_varredura = time.monotonic()
+
+    def ignorar(self, caminho: str):
+        """Marca o estado atual do arquivo como já entregue (ex.: gravado pelo próprio daemon)."""
+        caminho = os.path.abspath(caminho)
+        self._candidatos.pop(caminho, None)
+        try:
+            stat = os.stat(caminho)
+        except FileNotFoundError:
+            self._entregues.pop(caminho, None)
+            return
+        self._entregues[caminho] = (stat.st_size, stat.st_mtime_ns)
+
+    def coletar(self, timeout: float = 1.0) -> List[str]:
+        """
+        Aguarda eventos por até `timeout` segundos e retorna os arquivos prontos,
+        em ordem de detecção.
+        """
+        if self._inotify is not None:
+            espera = timeout if not self._candidatos else min(timeout, self.debounce_segundos / 2)
+            for caminho, mascara in self._inotify.ler(espera):
+                if mascara & _IN_ISDIR:
+                    alvo = self._alvo(caminho)
+                    if alvo and alvo[2]:
+                        self._monitorar(caminho, True)
+                        self._varrer_pasta(caminho, alvo[1], True)
+                else:
+                    self._considerar(caminho)
+            if self._inotify.transbordou:
+                self._inotify.transbordou = False
+                self._ultima_varredura = 0.0
+        elif timeout > 0:
+            time.sleep(timeout)
+
+        if time.monotonic() - self._ultima_varredura >= self.intervalo_varredura:
+            self.varrer()
+
+        prontos = []
+        agora = time.monotonic()
+        for caminho, (assinatura, desde) in list(self._candidatos.items()):
+            if agora - desde < self.debounce_segundos:
+                continue
+            try:
+                stat = os.stat(caminho)
+            except FileNotFoundError:
+                del self._candidatos[caminho]
+                continue
+            atual = (stat.st_size, stat.st_mtime_ns)
+            if atual != assinatura:
+                self._candidatos[caminho] = (atual, agora)
+            elif arquivo_completo(caminho):
+                del self._candidatos[caminho]
+                self._entregues[caminho] = atual
+                prontos.append(caminho)
+        return prontos
+
+    def fechar(self):
+        if self._inotify is not None:
+            self._inotify.fechar()
+            self._inotify = None
@@ -0,0 +1,188 @@
+# src/infrastructure/files/io_executor.py
+
+"""
+Executor de I/O em paralelo para mover, copiar e extrair arquivos.
+
+Em compartilhamentos de rede o tempo é dominado pela latência de cada
+operação, então várias operações simultâneas (pool de threads limitado)
+aumentam a vazão. Erros transitórios (arquivo em uso, timeout de rede) são
+repetidos com espera exponencial; o progresso e a vazão agregada (MB/s e
+arquivos/s) são enviados ao log_callback.
+"""
+
+import errno
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS_PADRAO = 8
+TENTATIVAS_PADRAO = 3
+ESPERA_INICIAL_S = 0.5
+INTERVALO_PROGRESSO_S = 1.0
+
+_ERRNOS_TRANSITORIOS = {
+    errno.EAGAIN, errno.EBUSY, errno.EIO, errno.ETIMEDOUT,
+    errno.ECONNRESET, errno.ECONNABORTED, errno.ENETUNREACH, errno.EHOSTUNREACH,
+    getattr(errno, 'ESTALE', -1),
+}
+# Windows: arquivo em uso (32/33), rede indisponível (53/64/121)
+_WINERRORS_TRANSITORIOS = {32, 33, 53, 64, 121}
+
+
+def erro_transitorio(erro: BaseException) -> bool:
+    """Indica se vale a pena repetir a operação que gerou o erro."""
+    if isinstance(erro, (FileNotFoundError, FileExistsError, IsADirectoryError)):
+        return False
+    if getattr(erro, 'winerror', None) in _WINERRORS_TRANSITORIOS:
+        return True
+    if isinstance(erro, (TimeoutError, ConnectionError)):
+        return True
+    return isinstance(erro, OSError) and erro.errno in _ERRNOS_TRANSITORIOS
+
+
+def _mesmo_sistema_de_arquivos(origem: str, pasta_destino: str) -> bool:
+    try:
+        return os.stat(origem).st_dev == os.stat(pasta_destino).st_dev
+    except OSError:
+        return False
+
+
+def mover_arquivo(origem: str, pasta_destino: str) -> int:
+    """
+    Move um arquivo para a pasta de destino.
+
+    Usa rename atômico quando origem e destino estão no mesmo sistema de
+    arquivos; caso contrário, cópia + remoção (shutil.move).
+
+    Returns:
+        Quantidade de bytes movidos
+    """
+    tamanho = os.path.getsize(origem)
+    destino = os.path.join(pasta_destino, os.path.basename(origem))
+    if os.path.exists(destino):
+        raise FileExistsError(errno.EEXIST, "Destino já existe", destino)
+    if _mesmo_sistema_de_arquivos(origem, pasta_destino):
+        os.rename(origem, destino)
+    else:
+        shutil.move(origem, destino)
+    return tamanho
+
+
+def copiar_arquivo(origem: str, pasta_destino: str) -> int:
+    """Copia um arquivo (com metadados) para a pasta de destino. Retorna os bytes copiados."""
+    destino = os.path.join(pasta_destino, os.path.basename(origem))
+    shutil.copy2(origem, destino)
+    return os.path.getsize(destino)
+
+
+class IOExecutor:
+    """
+    Pool de threads limitado para operações de arquivo.
+
+    Uso:
+        executor = IOExecutor(log_callback=log)
+        resumo = executor.executar(
+            [(caminho, lambda c=caminho: mover_arquivo(c, pasta)) for caminho in zips],
+            descricao="Movendo ZIPs"
+        )
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS_PADRAO, tentativas: int = TENTATIVAS_PADRAO,
+                 espera_inicial: float = ESPERA_INICIAL_S,
+                 log_callback: Optional[Callable[[str], None]] = None,
+                 intervalo_progresso: float = INTERVALO_PROGRESSO_S):
+        self.max_workers = max(1, max_workers)
+        self.tentativas = max(1, tentativas)
+        self.espera_inicial = espera_inicial
+        self.log_callback = log_callback
+        self.intervalo_progresso = intervalo_progresso
+
+    def _log(self, msg: str):
+        if self.log_callback:
+            self.log_callback(msg)
+        else:
+            logger.info(msg)
+
+    def _com_retentativas(self, operacao: Callable[[], int], rotulo: str) -> int:
+        """Executa a operação repetindo erros transitórios com espera exponencial."""
+        espera = self.espera_inicial
+        for tentativa in range(1, self.tentativas + 1):
+            try:
+                return operacao() or 0
+            except Exception as e:
+                if tentativa == self.tentativas or not erro_transitorio(e):
+                    raise
+                logger.warning(f"Erro transitório em '{rotulo}' (tentativa {tentativa}/{self.tentativas}): {e}")
+                time.sleep(espera)
+                espera *= 2
+        return 0
+
+    def executar(self, tarefas: Iterable[Tuple[str, Callable[[], int]]], descricao: str = "Processando") -> dict:
+        """
+        Executa as tarefas em paralelo.
+
+        Args:
+            tarefas: Pares (rótulo, operação); a operação retorna os bytes processados
+            descricao: Texto usado nas mensagens de progresso
+
+        Returns:
+            {'sucesso': int, 'falhas': [(rotulo, erro)], 'bytes': int,
+             'duracao_s': float, 'mb_por_s': float, 'arquivos_por_s': float}
+        """
+        tarefas = list(tarefas)
+        total = len(tarefas)
+        resumo = {'sucesso': 0, 'falhas': [], 'bytes': 0,
+                  'duracao_s': 0.0, 'mb_por_s': 0.0, 'arquivos_por_s': 0.0}
+        if not total:
+            return resumo
+
+        inicio = time.perf_counter()
+        ultimo_relatorio = inicio
+        concluidas = 0
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, total),
+                                thread_name_prefix="io_executor") as pool:
+            futuros = {
+                pool.submit(self._com_retentativas, operacao, rotulo): rotulo
+                for rotulo, operacao in tarefas
+            }
+            # Progresso é reportado pela thread chamadora (não pelas workers)
+            for futuro in as_completed(futuros):
+                rotulo = futuros[futuro]
+                concluidas += 1
+                try:
+                    resumo['bytes'] += futuro.result()
+                    resumo['sucesso'] += 1
+                except Exception as e:
+                    resumo['falhas'].append((rotulo, str(e)))
+                    self._log(f"ERRO: {descricao} - falha em '{os.path.basename(rotulo)}': {e}")
+
+                agora = time.perf_counter()
+                if agora - ultimo_relatorio >= self.intervalo_progresso and concluidas < total:
+                    ultimo_relatorio = agora
+                    self._log(self._formatar_progresso(descricao, concluidas, total, resumo['bytes'], agora - inicio))
+
+        duracao = time.perf_counter() - inicio
+        resumo['duracao_s'] = duracao
+        resumo['mb_por_s'] = (resumo['bytes'] / (1024 * 1024)) / duracao if duracao > 0 else 0.0
+        resumo['arquivos_por_s'] = total / duracao if duracao > 0 else 0.0
+
+        self._log(
+            f"INFO: {descricao} concluído: {resumo['sucesso']}/{total} arquivo(s) em {duracao:.1f}s "
+            f"({resumo['mb_por_s']:.1f} MB/s, {resumo['arquivos_por_s']:.1f} arquivos/s)"
+            + (f", {len(resumo['falhas'])} falha(s)" if resumo['falhas'] else "")
+        )
+        return resumo
+
+    @staticmethod
+    def _formatar_progresso(descricao: str, concluidas: int, total: int, bytes_total: int, decorrido: float) -> str:
+        mb_s = (bytes_total / (1024 * 1024)) / decorrido if decorrido > 0 else 0.0
+        arquivos_s = concluidas / decorrido if decorrido > 0 else 0.0
+        return (f"INFO: {descricao}: {concluidas}/{total} ({concluidas * 100 // total}%) - "
+                f"{mb_s:.1f} MB/s, {arquivos_s:.1f} arquivos/s")
+
@@ -0,0 +1,74 @@
+"""
+Contagem por arquivo dos eventos repetitivos do motor de regras.
+
+Regras aplicadas, rotações de profissionais e datas corrigidas acontecem uma
+vez por elemento: em vez de uma linha de log para cada ocorrência, o motor
+conta os eventos do arquivo e emite um único resumo no fim. Ocorrências
+individuais podem ser amostradas (uma a cada N por evento/chave) para
+diagnóstico, e o resumo leva as contagens como dados estruturados (ver
+JsonLinesFormatter em logger_config).
+
+A amostragem padrão vem da variável AUDIT_PLUS_LOG_AMOSTRA (0 = desligada).
+"""
+
+import logging
+import os
+from collections import Counter
+from typing import Dict, Optional
+
+# Uma ocorrência registrada a cada N por (evento, chave); 0 desliga a amostragem
+AMOSTRA_A_CADA = int(os.getenv("AUDIT_PLUS_LOG_AMOSTRA", "0") or 0)
+
+
+class ContadorEventos:
+    """Contagens de eventos de um arquivo, com amostragem opcional das ocorrências."""
+
+    def __init__(self, logger: logging.Logger, amostra_a_cada: Optional[int] = None):
+        self.logger = logger
+        self.amostra_a_cada = AMOSTRA_A_CADA if amostra_a_cada is None else amostra_a_cada
+        self.arquivo = ""
+        self.contagens: Counter = Counter()
+        # Contagens do último arquivo finalizado (para quem chama o motor de fora, ex.: workers)
+        self.ultimo_resumo: Dict[str, Dict[str, int]] = {}
+
+    def iniciar(self, arquivo: str) -> None:
+        """Começa a contagem de um novo arquivo."""
+        self.arquivo = arquivo
+        self.contagens = Counter()
+
+    def registrar(self, evento: str, chave=None, mensagem: Optional[str] = None, *args) -> None:
+        """
+        Conta uma ocorrência do evento.
+
+        `mensagem` e `args` (formatação %) só são usados se a ocorrência for
+        amostrada; sem amostragem, nenhum texto é montado.
+        """
+        self.contagens[(evento, chave)] += 1
+        if mensagem is None or not self.amostra_a_cada:
+            return
+        ocorrencia = self.contagens[(evento, chave)]
+        if (ocorrencia - 1) % self.amostra_a_cada == 0 and self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(mensagem, *args, extra={'dados': {
+                'evento': evento, 'chave': chave, 'arquivo': self.arquivo, 'ocorrencia': ocorrencia}})
+
+    def por_evento(self) -> Dict[str, Dict[str, int]]:
+        """Contagens agrupadas: evento -> {chave: quantidade}"""
+        agrupado: Dict[str, Dict[str, int]] = {}
+        for (evento, chave), quantidade in self.contagens.items():
+            agrupado.setdefault(evento, {})[str(chave)] = quantidade
+        return agrupado
+
+    def finalizar(self) -> Dict[str, Dict[str, int]]:
+        """Emite o resumo do arquivo (uma linha) e devolve as contagens."""
+        agrupado = self.por_evento()
+        if agrupado and self.logger.isEnabledFor(logging.INFO):
+            partes = []
+            for evento in sorted(agrupado):
+                itens = sorted(agrupado[evento].items(), key=lambda item: (-item[1], item[0]))
+                partes.append(f"{evento}: " + ", ".join(f"{chave}={quantidade}" for chave, quantidade in itens))
+            self.logger.info("Arquivo '%s': %d evento(s) - %s", self.arquivo, sum(self.contagens.values()),
+                             "; ".join(partes), extra={'dados': {
+                                 'evento': 'resumo_arquivo', 'arquivo': self.arquivo, 'contagens': agrupado}})
+        self.contagens = Counter()
+        self.ultimo_resumo = agrupado
+        return agrupado
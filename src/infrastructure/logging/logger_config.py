@@ -1,11 +1,25 @@
 """
 Configuração centralizada de logging para Audit+ v3.0.
+
+Os handlers (terminal, arquivo e, opcionalmente, JSON-lines) rodam numa
+thread própria atrás de um QueueHandler/QueueListener: quem loga só enfileira
+o registro, sem formatar a mensagem nem esperar pelo disco/stdout.
 """
 
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
 import sys
+from datetime import datetime
 from pathlib import Path
 
+# Listener ativo (parado e substituído a cada setup_logging)
+_listener = None
+_fila_handler = None
+
 
 class CleanFormatter(logging.Formatter):
     """Formatter que mostra só a última parte do nome do módulo."""
@@ -16,13 +30,54 @@ class CleanFormatter(logging.Formatter):
         return super().format(record)
 
 
-def setup_logging(level=logging.INFO, log_file='audit_plus.log'):
+class JsonLinesFormatter(logging.Formatter):
+    """Um objeto JSON por linha, com os dados estruturados do registro (extra={'dados': {...}})."""
+
+    def format(self, record):
+        registro = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensagem': record.getMessage(),
+        }
+        dados = getattr(record, 'dados', None)
+        if dados:
+            registro.update(dados)
+        if record.exc_info:
+            registro['excecao'] = self.formatException(record.exc_info)
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+
+class _FilaHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que enfileira o registro sem formatá-lo.
+
+    O QueueHandler padrão formata a mensagem (msg % args) na thread de quem
+    loga; aqui a formatação fica para o listener. Os argumentos devem ser
+    valores que não mudam depois da chamada (textos, números).
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(level=logging.INFO, log_file='audit_plus.log', jsonl_file=None):
     """
     Configura logging centralizado para toda a aplicação.
 
+    Args:
+        level: Nível do terminal e do root logger
+        log_file: Arquivo de log texto (nível DEBUG)
+        jsonl_file: Arquivo JSON-lines opcional para leitura por máquina
+            (padrão: variável AUDIT_PLUS_LOG_JSONL, se definida)
+
     Returns:
         Logger configurado
     """
+    global _listener, _fila_handler
+    parar_logging()
+    jsonl_file = jsonl_file or os.getenv('AUDIT_PLUS_LOG_JSONL')
+
     # Criar diretório de logs se não existir
     log_path = Path(log_file)
     log_path.parent.mkdir(parents=True, exist_ok=True)
@@ -46,11 +101,26 @@ def setup_logging(level=logging.INFO, log_file='audit_plus.log'):
     ))
     file_handler.setLevel(logging.DEBUG)
 
+    handlers = [console, file_handler]
+
+    # Handler: JSON-lines (opcional)
+    if jsonl_file:
+        Path(jsonl_file).parent.mkdir(parents=True, exist_ok=True)
+        jsonl_handler = logging.FileHandler(jsonl_file, encoding='utf-8')
+        jsonl_handler.setFormatter(JsonLinesFormatter())
+        jsonl_handler.setLevel(logging.DEBUG)
+        handlers.append(jsonl_handler)
+
+    # Handlers na thread do listener; o root só enfileira
+    fila = queue.SimpleQueue()
+    _fila_handler = _FilaHandler(fila)
+    _listener = logging.handlers.QueueListener(fila, *handlers, respect_handler_level=True)
+    _listener.start()
+
     # Root logger
     root = logging.getLogger()
     root.setLevel(level)
-    root.addHandler(console)
-    root.addHandler(file_handler)
+    root.addHandler(_fila_handler)
 
     # Silenciar bibliotecas ruidosas
     for noisy in ('matplotlib', 'PIL', 'sqlalchemy.engine', 'urllib3', 'chardet'):
@@ -63,6 +133,22 @@ def setup_logging(level=logging.INFO, log_file='audit_plus.log'):
     return logger
 
 
+def parar_logging():
+    """Esvazia a fila, fecha os handlers e remove o QueueHandler do root (chamado também na saída)."""
+    global _listener, _fila_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    logging.getLogger().removeHandler(_fila_handler)
+    _listener = None
+    _fila_handler = None
+
+
+atexit.register(parar_logging)
+
+
 def get_logger(name):
     """Obtém um logger específico para um módulo."""
     return logging.getLogger(f'audit_plus.{name}')
@@ -1,3 +1,3 @@
 # src/infrastructure/parsers/__init__.py
 """Parsers package"""
-__all__ = ['xml_parser', 'xml_reader']
+__all__ = ['date_parser', 'xml_parser', 'xml_reader']
@@ -0,0 +1,178 @@
+# src/infrastructure/parsers/date_parser.py
+
+"""
+Leitura e normalização das datas do PTU, compartilhada pelas regras e pelos parsers.
+
+As datas do PTU vêm quase sempre em dois formatos fixos:
+- `YYYY/MM/DDhh:mm:ss-TZ` (ex.: `2025/10/3123:59:00-04`), com ou sem espaço
+  antes da hora;
+- `YYYYMMDD` (ex.: `20251031`).
+
+Esses formatos são reconhecidos pelas posições dos separadores e lidos por
+fatias fixas, sem `strptime`. Qualquer outro texto segue a sequência de
+formatos original. Os resultados ficam em cache por texto, já que a mesma
+data se repete em muitas guias do mesmo arquivo.
+"""
+
+import logging
+import re
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Textos distintos mantidos em cache por função
+TAMANHO_CACHE = 65536
+
+# Dia 31 nos meses que o têm: YYYY/MM/31 (antes da hora ou no fim) e YYYYMM31
+_RE_DIA_31_COMPACTA = re.compile(r'(\d{4})(01|03|05|07|08|10|12)31')
+_RE_DIA_31_BARRA = re.compile(r'/31(?=\d{2}:\d{2}:\d{2}|$)')
+
+_RE_FUSO_FINAL = re.compile(r'-\d+$')
+_RE_DATA_HORA_COLADA = re.compile(r'(\d{4})/(\d{2})/(\d{2})(\d{2}):(\d{2}):(\d{2})')
+
+# Formatos tentados, em ordem, quando o texto não tem um dos formatos fixos
+_FORMATOS = (
+    '%Y/%m/%d %H:%M:%S',      # 2025/09/01 12:26:00
+    '%Y/%m/%d%H:%M:%S',       # 2025/09/0112:26:00
+    '%Y/%m/%d %H:%M:%S-%f',   # 2025/09/01 12:26:00-04
+    '%Y/%m/%d%H:%M:%S-%f',    # 2025/09/0112:26:00-04
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d%H:%M:%S',
+)
+
+
+@lru_cache(maxsize=TAMANHO_CACHE)
+def tem_dia_31(texto: Optional[str]) -> bool:
+    """True se o texto contém dia 31 (`/31` ou `YYYYMM31` de mês com 31 dias)."""
+    if not texto:
+        return False
+    return '/31' in texto or _RE_DIA_31_COMPACTA.search(texto) is not None
+
+
+@lru_cache(maxsize=TAMANHO_CACHE)
+def substituir_dia_31(texto: Optional[str]) -> Optional[str]:
+    """Troca o dia 31 por 30 nos dois formatos (`2025/10/3123:59:00-04`, `20251031`)."""
+    if not texto:
+        return texto
+    if '/31' in texto:
+        texto = _RE_DIA_31_BARRA.sub('/30', texto)
+    return _RE_DIA_31_COMPACTA.sub(r'\g<1>\g<2>30', texto)
+
+
+@lru_cache(maxsize=TAMANHO_CACHE)
+def data_inicial(texto: Optional[str]) -> Optional[date]:
+    """Data dos 10 primeiros caracteres (`YYYY/MM/DD` ou `YYYY-MM-DD`); None se inválida."""
+    if not texto:
+        return None
+    trecho = texto[:10]
+    if len(trecho) == 10 and trecho[4] in '/-' and trecho[7] in '/-':
+        digitos = trecho[0:4] + trecho[5:7] + trecho[8:10]
+        if digitos.isdecimal():
+            try:
+                return date(int(digitos[0:4]), int(digitos[4:6]), int(digitos[6:8]))
+            except ValueError:
+                return None
+    try:
+        return datetime.strptime(trecho.replace('/', '-'), '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def dias_no_periodo(texto_inicio: Optional[str], texto_fim: Optional[str]) -> Optional[int]:
+    """Quantidade de dias entre as datas, contando os dois extremos; None se alguma for inválida."""
+    inicio = data_inicial(texto_inicio)
+    fim = data_inicial(texto_fim)
+    if inicio is None or fim is None:
+        return None
+    return (fim - inicio).days + 1
+
+
+@lru_cache(maxsize=TAMANHO_CACHE)
+def parse_data_hora(texto: Optional[str]) -> Optional[datetime]:
+    """
+    Data/hora de um texto do PTU (o fuso, se houver, é descartado).
+
+    Formatos fixos lidos por posição: `YYYY/MM/DDhh:mm:ss[...]`,
+    `YYYY/MM/DD hh:mm:ss`, `YYYY-MM-DD hh:mm:ss` e `YYYYMMDD`. Os demais
+    passam pela sequência de formatos de `strptime`.
+
+    Returns:
+        datetime sem fuso, ou None se o texto não for uma data reconhecida
+    """
+    if not texto:
+        return None
+    limpo = texto.strip()
+    tamanho = len(limpo)
+
+    if tamanho >= 18 and limpo[4] == '/' and limpo[7] == '/' and limpo[12] == ':' and limpo[15] == ':':
+        # 2025/09/0112:26:00, com ou sem fuso (-04) ou outro sufixo
+        digitos = limpo[0:4] + limpo[5:7] + limpo[8:12] + limpo[13:15] + limpo[16:18]
+        resultado = _de_digitos(digitos)
+    elif tamanho == 19 and limpo[4] == limpo[7] and limpo[4] in '/-' and limpo[10] == ' ' \
+            and limpo[13] == ':' and limpo[16] == ':':
+        # 2025/09/01 12:26:00 ou 2025-09-01 12:26:00
+        digitos = limpo[0:4] + limpo[5:7] + limpo[8:10] + limpo[11:13] + limpo[14:16] + limpo[17:19]
+        resultado = _de_digitos(digitos)
+    elif tamanho == 8:
+        # 20251031
+        resultado = _de_digitos(limpo + '000000')
+    else:
+        resultado = None
+
+    if resultado is None:
+        resultado = _parse_por_formatos(limpo)
+    return resultado
+
+
+def parse_datas(textos: Iterable[Optional[str]]) -> List[Optional[datetime]]:
+    """
+    Lê uma coluna de textos de data/hora de uma vez (mesma ordem, None onde inválido).
+
+    Cada texto distinto é lido uma única vez, mesmo fora do cache.
+    """
+    lidos = {}
+    resultado = []
+    for texto in textos:
+        if texto not in lidos:
+            lidos[texto] = parse_data_hora(texto)
+        resultado.append(lidos[texto])
+    return resultado
+
+
+def _de_digitos(digitos: str) -> Optional[datetime]:
+    """datetime de 14 dígitos YYYYMMDDhhmmss; None se não forem dígitos ou a data não existir."""
+    if len(digitos) != 14 or not digitos.isdecimal():
+        return None
+    try:
+        return datetime(int(digitos[0:4]), int(digitos[4:6]), int(digitos[6:8]),
+                        int(digitos[8:10]), int(digitos[10:12]), int(digitos[12:14]))
+    except ValueError:
+        return None
+
+
+def _parse_por_formatos(limpo: str) -> Optional[datetime]:
+    """Sequência de formatos de `strptime` para textos fora dos formatos fixos."""
+    for fmt in _FORMATOS:
+        try:
+            if '-%f' in fmt and '-' in limpo:
+                if len(limpo) >= 21:
+                    if ' ' in limpo[:10]:
+                        return datetime.strptime(limpo[:19], fmt.replace('-%f', ''))
+                    if len(limpo) >= 16:
+                        return datetime.strptime(limpo[:16], '%Y/%m/%d%H:%M:%S')
+                return datetime.strptime(_RE_FUSO_FINAL.sub('', limpo), fmt.replace('-%f', ''))
+            return datetime.strptime(limpo, fmt)
+        except ValueError:
+            continue
+
+    match = _RE_DATA_HORA_COLADA.match(limpo)
+    if match:
+        try:
+            return datetime(*map(int, match.groups()))
+        except ValueError:
+            pass
+
+    logger.warning(f"Formato de data não reconhecido: '{limpo}'")
+    return None
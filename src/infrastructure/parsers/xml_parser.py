@@ -3,12 +3,18 @@
 import logging
 import lxml.etree as etree
 import os
-import re
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Union
 
+from src.infrastructure.parsers import date_parser
+
 NAMESPACES = {'ptu': 'http://ptu.unimed.coop.br/schemas/V3_0'}
 
+# Tipos de guia considerados na estimativa de esforço de auditoria
+_XPATH_QTD_GUIAS = ('count(.//ptu:guiaConsulta | .//ptu:guiaSADT | '
+                    './/ptu:guiaInternacao | .//ptu:guiaHonorarios)')
+_XPATH_QTD_PROCEDIMENTOS = 'count(.//ptu:procedimentosExecutados)'
+
 def _parse_xml_file(caminho_arquivo_xml: str) -> Optional[etree._ElementTree]:
     """Parser XML comum para todas as funções."""
     try:
@@ -50,67 +56,15 @@ def _extrair_dados_guia(guia: etree._Element) -> Dict[str, str]:
         "regime_internacao": _obter_texto_elemento(guia, './/ptu:dadosInternacao/ptu:rg_Internacao') or '',
     }
 
-def _parse_data_flexivel(date_string: str) -> Optional[datetime]:
-    """Tenta analisar uma string de data/hora com múltiplos formatos - CORRIGIDA."""
-    if not date_string:
+def _texto_de_data(texto: Optional[str]) -> Optional[str]:
+    """Texto de data sem espaços, ou None se ausente ou curto demais para conter data e hora."""
+    if texto is None:
         return None
-        
-    clean_string = date_string.strip()
-    
-    # ✅ CORREÇÃO: Adicionar suporte para formato SEM ESPAÇO
-    formatos = [
-        '%Y/%m/%d %H:%M:%S',      # Formato correto: 2025/09/01 12:26:00
-        '%Y/%m/%d%H:%M:%S',       # Formato problemático: 2025/09/0112:26:00
-        '%Y/%m/%d %H:%M:%S-%f',   # Com timezone: 2025/09/01 12:26:00-04  
-        '%Y/%m/%d%H:%M:%S-%f',    # Com timezone sem espaço: 2025/09/0112:26:00-04
-        '%Y-%m-%d %H:%M:%S',      # Formato alternativo
-        '%Y-%m-%d%H:%M:%S',       # Formato alternativo sem espaço
-    ]
-    
-    for fmt in formatos:
-        try:
-            if '-%f' in fmt and '-' in clean_string:
-                if len(clean_string) >= 21:
-                    if ' ' in clean_string[:10]:
-                        string_to_parse = clean_string[:19]
-                        return datetime.strptime(string_to_parse, fmt.replace('-%f', ''))
-                    else:
-                        if len(clean_string) >= 16:
-                            string_to_parse = clean_string[:16]
-                            return datetime.strptime(string_to_parse, '%Y/%m/%d%H:%M:%S')
-                string_sem_timezone = re.sub(r'-\d+$', '', clean_string)
-                return datetime.strptime(string_sem_timezone, fmt.replace('-%f', ''))
-            else:
-                return datetime.strptime(clean_string, fmt)
-        except ValueError:
-            continue
-    
-    # ✅ Parser manual para o formato problemático
-    try:
-        match = re.match(r'(\d{4})/(\d{2})/(\d{2})(\d{2}):(\d{2}):(\d{2})', clean_string)
-        if match:
-            year, month, day, hour, minute, second = map(int, match.groups())
-            return datetime(year, month, day, hour, minute, second)
-    except:
-        pass
-    
-    logging.warning(f"Formato de data não reconhecido: '{clean_string}'")
-    return None
-
-def _validar_e_calcular_duracao(dt_ini_str: Optional[str], dt_fim_str: Optional[str], numero_guia: str) -> Optional[timedelta]:
-    """Valida e calcula a duração entre duas datas - CORRIGIDA."""
-    if dt_ini_str is None or dt_fim_str is None:
-        return None
-        
-    dt_ini_clean = str(dt_ini_str).strip()
-    dt_fim_clean = str(dt_fim_str).strip()
-    
-    if len(dt_ini_clean) < 10 or len(dt_fim_clean) < 10:
-        return None
-
-    dt_ini = _parse_data_flexivel(dt_ini_clean)
-    dt_fim = _parse_data_flexivel(dt_fim_clean)
+    limpo = str(texto).strip()
+    return limpo if len(limpo) >= 10 else None
 
+def _validar_e_calcular_duracao(dt_ini: Optional[datetime], dt_fim: Optional[datetime], numero_guia: str) -> Optional[timedelta]:
+    """Valida e calcula a duração entre duas datas já lidas (ver date_parser.parse_datas)."""
     if dt_ini and dt_fim:
         if dt_fim >= dt_ini:
             return dt_fim - dt_ini
@@ -139,6 +93,10 @@ def extrair_dados_fatura_xml(caminho_arquivo_xml: str) -> Optional[Dict[str, Opt
         'data_emissao': _obter_texto_elemento(raiz, './/ptu:dt_EmissaoDoc'),
         'data_vencimento': _obter_texto_elemento(raiz, './/ptu:dt_VencimentoDoc'),
         'valor_total_documento': _obter_texto_elemento(raiz, './/ptu:vl_TotalDoc'),
+        # Métricas de volume usadas pela distribuição (esforço de auditoria)
+        'qtd_guias': int(raiz.xpath(_XPATH_QTD_GUIAS, namespaces=NAMESPACES)),
+        'qtd_procedimentos': int(raiz.xpath(_XPATH_QTD_PROCEDIMENTOS, namespaces=NAMESPACES)),
+        'tamanho_bytes': os.path.getsize(caminho_arquivo_xml),
     }
 
 def extrair_guias_internacao_relevantes(
@@ -183,16 +141,27 @@ def extrair_guias_internacao_curta_para_sinalizacao(caminho_xml: str) -> List[Di
     nome_arquivo = os.path.basename(caminho_xml)
     guias_internacao = raiz.xpath('.//ptu:guiaInternacao', namespaces=NAMESPACES)
 
+    # Primeiro as guias candidatas e seus textos de data; depois todas as datas lidas de uma vez
+    candidatas = []
     for guia in guias_internacao:
         try:
             dados_guia = _extrair_dados_guia(guia)
-            dt_ini_str = _obter_texto_elemento(guia, './/ptu:dadosFaturamento/ptu:dt_IniFaturamento')
-            dt_fim_str = _obter_texto_elemento(guia, './/ptu:dadosFaturamento/ptu:dt_FimFaturamento')
-            
             if not dados_guia.get("regime_internacao") or not dados_guia.get("numero_guia"):
                 continue
+            dt_ini_str = _texto_de_data(_obter_texto_elemento(guia, './/ptu:dadosFaturamento/ptu:dt_IniFaturamento'))
+            dt_fim_str = _texto_de_data(_obter_texto_elemento(guia, './/ptu:dadosFaturamento/ptu:dt_FimFaturamento'))
+            if dt_ini_str is None or dt_fim_str is None:
+                continue
+            candidatas.append((dados_guia, dt_ini_str, dt_fim_str))
+        except Exception as e:
+            logging.warning(f"Erro ao processar guia: {e}")
+            continue
 
-            duracao = _validar_e_calcular_duracao(dt_ini_str, dt_fim_str, dados_guia["numero_guia"])
+    datas = date_parser.parse_datas([texto for _, ini, fim in candidatas for texto in (ini, fim)])
+
+    for i, (dados_guia, _, _) in enumerate(candidatas):
+        try:
+            duracao = _validar_e_calcular_duracao(datas[2 * i], datas[2 * i + 1], dados_guia["numero_guia"])
             
             if (duracao is not None and 
                 timedelta(hours=0) <= duracao <= timedelta(hours=12) and 
@@ -1,3 +1,3 @@
 # src/infrastructure/reports/__init__.py
 """Reports package"""
-__all__ = ['report_generator']
+__all__ = ['procedure_table', 'report_generator']
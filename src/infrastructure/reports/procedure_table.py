@@ -0,0 +1,307 @@
+# src/infrastructure/reports/procedure_table.py
+
+"""
+Tabela colunar de procedimentos das faturas (.051) para análises.
+
+Cada fatura vira um arquivo Parquet com uma linha por item cobrado (um
+`procedimentosExecutados`, ou a própria guia de consulta), gravado em
+`<pasta>/competencia=AAAAMM/<arquivo>.parquet`. As análises leem só as
+colunas e competências de que precisam, sem reler os XMLs, e agregam com
+NumPy sobre os índices de dicionário do Arrow.
+
+A extração é feita guia a guia com `iterparse` (memória proporcional a uma
+guia) e usa apenas lxml; gravação, leitura e agregações exigem pyarrow e
+numpy, importados só quando usados.
+"""
+
+import logging
+import os
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+import lxml.etree as etree
+
+from src.infrastructure.parsers import date_parser
+from src.infrastructure.parsers.xml_reader import NAMESPACES
+from src.infrastructure.reports.report_generator import _formatar_competencia_aaaamm
+
+logger = logging.getLogger(__name__)
+
+PTU = f"{{{NAMESPACES['ptu']}}}"
+
+PASTA_PROCEDIMENTOS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))),
+    'data', 'procedimentos'
+)
+
+TAGS_GUIA = ("guiaConsulta", "guiaSADT", "guiaInternacao", "guiaHonorarios")
+_TAGS_CABECALHO = ("nr_Documento", "nr_Competencia", "dt_EmissaoDoc")
+
+# Colunas gravadas, em ordem; 'competencia' fica no nome da pasta (partição)
+COLUNAS = (
+    ("arquivo", "string"), ("numero_fatura", "string"), ("tipo_guia", "string"), ("nr_guia", "string"),
+    ("id_benef", "string"), ("seq_item", "int32"), ("cd_servico", "string"), ("tp_tabela", "string"),
+    ("dt_execucao", "date32"), ("hr_inicial", "string"), ("hr_final", "string"),
+    ("vl_serv_cobrado", "float64"), ("tx_adm_servico", "float64"), ("cbo", "string"),
+    ("cd_uni_prest", "string"), ("cd_prest", "string"),
+)
+
+# Caminhos relativos ao item (procedimentosExecutados ou guia de consulta)
+_CAMINHOS_ITEM = {
+    "seq_item": f".//{PTU}procedimentos/{PTU}seq_item",
+    "cd_servico": f".//{PTU}procedimentos/{PTU}cd_Servico",
+    "tp_tabela": f".//{PTU}procedimentos/{PTU}tp_Tabela",
+    "hr_inicial": f"{PTU}hr_Inicial",
+    "hr_final": f"{PTU}hr_Final",
+    "vl_serv_cobrado": f".//{PTU}valores/{PTU}vl_ServCobrado",
+    "tx_adm_servico": f".//{PTU}taxas/{PTU}tx_AdmServico",
+    "cbo": f".//{PTU}equipe_Profissional/{PTU}CBO",
+}
+_CAMINHOS_DATA = (f"{PTU}dt_Execucao", f".//{PTU}dt_Atendimento")
+_CAMINHOS_GUIA = {
+    "nr_guia": f".//{PTU}nr_Guias/{PTU}nr_GuiaTissPrestador",
+    "id_benef": f"{PTU}dadosBeneficiario/{PTU}id_Benef",
+    "cd_uni_prest": f"{PTU}dadosExecutante/{PTU}UnimedPrestador/{PTU}cd_Uni_Prest",
+    "cd_prest": f"{PTU}dadosExecutante/{PTU}UnimedPrestador/{PTU}cd_Prest",
+}
+
+
+def _texto(elemento, caminho: str) -> Optional[str]:
+    encontrado = elemento.find(caminho)
+    if encontrado is None or encontrado.text is None:
+        return None
+    return encontrado.text.strip() or None
+
+
+def _numero(texto: Optional[str], tipo=float):
+    if texto is None:
+        return None
+    try:
+        return tipo(texto.replace(',', '.')) if tipo is float else tipo(texto)
+    except ValueError:
+        return None
+
+
+def colunas_vazias() -> Dict[str, list]:
+    """Dicionário coluna -> lista vazia, na ordem de COLUNAS (mais 'competencia')."""
+    colunas = {nome: [] for nome, _ in COLUNAS}
+    colunas["competencia"] = []
+    return colunas
+
+
+def _adicionar_itens(colunas: Dict[str, list], guia, tipo_guia: str):
+    dados_guia = {nome: _texto(guia, caminho) for nome, caminho in _CAMINHOS_GUIA.items()}
+    itens = list(guia.iter(f"{PTU}procedimentosExecutados")) or [guia]
+    for item in itens:
+        valores = {nome: _texto(item, caminho) for nome, caminho in _CAMINHOS_ITEM.items()}
+        data = next((texto for texto in (_texto(item, c) for c in _CAMINHOS_DATA) if texto), None)
+        data_hora = date_parser.parse_data_hora(data)
+
+        colunas["tipo_guia"].append(tipo_guia)
+        for nome, valor in dados_guia.items():
+            colunas[nome].append(valor)
+        colunas["seq_item"].append(_numero(valores["seq_item"], int))
+        colunas["cd_servico"].append(valores["cd_servico"])
+        colunas["tp_tabela"].append(valores["tp_tabela"])
+        colunas["dt_execucao"].append(data_hora.date() if data_hora else None)
+        colunas["hr_inicial"].append(valores["hr_inicial"])
+        colunas["hr_final"].append(valores["hr_final"])
+        colunas["vl_serv_cobrado"].append(_numero(valores["vl_serv_cobrado"]))
+        colunas["tx_adm_servico"].append(_numero(valores["tx_adm_servico"]))
+        colunas["cbo"].append(valores["cbo"])
+
+
+def extrair_procedimentos(caminho_xml: str) -> Optional[Dict[str, list]]:
+    """
+    Linhas de procedimento de uma fatura, em colunas (listas de mesmo tamanho).
+
+    Returns:
+        Dicionário coluna -> valores (inclui 'competencia' no formato AAAAMM),
+        ou None se o arquivo não puder ser lido
+    """
+    colunas = colunas_vazias()
+    cabecalho = {}
+    tags = [f"{PTU}{tag}" for tag in TAGS_GUIA + _TAGS_CABECALHO]
+    try:
+        contexto = etree.iterparse(caminho_xml, events=("end",), tag=tags, recover=True,
+                                   huge_tree=True, resolve_entities=False)
+        for _, elemento in contexto:
+            nome = etree.QName(elemento).localname
+            if nome in _TAGS_CABECALHO:
+                cabecalho.setdefault(nome, (elemento.text or "").strip())
+                continue
+            _adicionar_itens(colunas, elemento, nome)
+            # Libera a guia já extraída (e as anteriores) da árvore em construção
+            elemento.clear()
+            pai = elemento.getparent()
+            if pai is not None:
+                while elemento.getprevious() is not None:
+                    del pai[0]
+    except (etree.XMLSyntaxError, OSError) as e:
+        logger.error(f"Erro ao extrair procedimentos de '{os.path.basename(caminho_xml)}': {e}")
+        return None
+
+    # Dados da fatura valem para todas as linhas (o cabeçalho pode vir depois das guias)
+    total = len(colunas["tipo_guia"])
+    competencia = _formatar_competencia_aaaamm(cabecalho.get("nr_Competencia"), cabecalho.get("dt_EmissaoDoc"))
+    colunas["arquivo"] = [os.path.basename(caminho_xml)] * total
+    colunas["numero_fatura"] = [cabecalho.get("nr_Documento")] * total
+    colunas["competencia"] = [competencia or "desconhecida"] * total
+    return colunas
+
+
+def _schema(pa):
+    return pa.schema([(nome, getattr(pa, tipo)()) for nome, tipo in COLUNAS])
+
+
+def caminho_parquet(pasta_saida: str, competencia: str, arquivo: str) -> str:
+    return os.path.join(pasta_saida, f"competencia={competencia}", f"{arquivo}.parquet")
+
+
+def gravar_fatura(colunas: Dict[str, list], pasta_saida: str, arquivo: str) -> Optional[str]:
+    """
+    Grava as linhas de uma fatura na partição da sua competência (substitui a versão anterior).
+
+    Returns:
+        Caminho do Parquet gravado, ou None se pyarrow não estiver instalado
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        logger.warning("pyarrow não instalado - tabela de procedimentos não gravada (pip install pyarrow).")
+        return None
+
+    competencia = colunas["competencia"][0] if colunas["competencia"] else "desconhecida"
+    schema = _schema(pa)
+    tabela = pa.Table.from_arrays([pa.array(colunas[campo.name], type=campo.type) for campo in schema],
+                                  schema=schema)
+    destino = caminho_parquet(pasta_saida, competencia, arquivo)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    temporario = f"{destino}.{os.getpid()}.tmp"
+    try:
+        pq.write_table(tabela, temporario, compression="zstd")
+        os.replace(temporario, destino)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+    # A fatura pode ter mudado de competência: remove versões em outras partições
+    for particao in os.listdir(pasta_saida):
+        antigo = os.path.join(pasta_saida, particao, f"{arquivo}.parquet")
+        if antigo != destino and os.path.exists(antigo):
+            os.remove(antigo)
+    return destino
+
+
+def _parquet_atual(pasta_saida: str, caminho_xml: str) -> bool:
+    """True se já existe Parquet da fatura mais novo que o .051."""
+    if not os.path.isdir(pasta_saida):
+        return False
+    nome = f"{os.path.basename(caminho_xml)}.parquet"
+    mtime_xml = os.path.getmtime(caminho_xml)
+    for particao in os.listdir(pasta_saida):
+        existente = os.path.join(pasta_saida, particao, nome)
+        if os.path.exists(existente) and os.path.getmtime(existente) >= mtime_xml:
+            return True
+    return False
+
+
+def exportar_faturas(arquivos: Iterable[str], pasta_saida: str = None, forcar: bool = False,
+                     log_callback=None) -> Dict[str, int]:
+    """
+    Extrai e grava a tabela de procedimentos de cada .051 (só os alterados desde a última exportação).
+
+    Returns:
+        Contagem de arquivos 'exportados', 'atualizados' (pulados), 'erros' e 'linhas' gravadas
+    """
+    pasta_saida = pasta_saida or PASTA_PROCEDIMENTOS
+    resumo = {"exportados": 0, "atualizados": 0, "erros": 0, "linhas": 0}
+    for caminho in arquivos:
+        if not forcar and _parquet_atual(pasta_saida, caminho):
+            resumo["atualizados"] += 1
+            continue
+        colunas = extrair_procedimentos(caminho)
+        if colunas is None:
+            resumo["erros"] += 1
+            continue
+        if gravar_fatura(colunas, pasta_saida, os.path.basename(caminho)) is None:
+            resumo["erros"] += 1
+            break
+        resumo["exportados"] += 1
+        resumo["linhas"] += len(colunas["arquivo"])
+        if log_callback:
+            log_callback(f"{os.path.basename(caminho)}: {len(colunas['arquivo'])} procedimento(s)")
+    return resumo
+
+
+def carregar_procedimentos(pasta_saida: str = None, competencias: Optional[List[str]] = None,
+                           colunas: Optional[List[str]] = None):
+    """
+    Tabela Arrow com as faturas exportadas (só as competências e colunas pedidas).
+
+    Returns:
+        pyarrow.Table (com a coluna 'competencia'), ou None se pyarrow não
+        estiver instalado ou não houver dados
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+    except ImportError:
+        logger.warning("pyarrow não instalado - tabela de procedimentos indisponível (pip install pyarrow).")
+        return None
+
+    pasta_saida = pasta_saida or PASTA_PROCEDIMENTOS
+    if not os.path.isdir(pasta_saida):
+        return None
+    particionamento = ds.partitioning(pa.schema([("competencia", pa.string())]), flavor="hive")
+    dataset = ds.dataset(pasta_saida, format="parquet", partitioning=particionamento)
+    filtro = ds.field("competencia").isin(competencias) if competencias else None
+    return dataset.to_table(columns=colunas, filter=filtro)
+
+
+def agregar(tabela, chave: str, valor: str = "vl_serv_cobrado") -> List[Dict]:
+    """
+    Quantidade de linhas e soma de `valor` por valor de `chave`, do maior total para o menor.
+
+    A chave é codificada em dicionário pelo Arrow e somada com `numpy.bincount`
+    (linhas sem chave ficam no grupo None; valores nulos contam como zero).
+    """
+    import numpy as np
+    import pyarrow.compute as pc
+
+    codificada = tabela.column(chave).combine_chunks().dictionary_encode()
+    grupos = codificada.dictionary.to_pylist() + [None]
+    indices = pc.fill_null(codificada.indices, len(grupos) - 1).to_numpy(zero_copy_only=False)
+    valores = pc.fill_null(tabela.column(valor), 0.0).to_numpy()
+
+    quantidades = np.bincount(indices, minlength=len(grupos))
+    totais = np.bincount(indices, weights=valores, minlength=len(grupos))
+    ordem = np.argsort(-totais, kind="stable")
+    return [{"grupo": grupos[i], "quantidade": int(quantidades[i]), "total": round(float(totais[i]), 2)}
+            for i in ordem if quantidades[i]]
+
+
+def resumo_por_competencia(tabela) -> List[Dict]:
+    """Itens, valor cobrado e taxa administrativa por competência (em ordem de competência)."""
+    cobrado = {linha["grupo"]: linha for linha in agregar(tabela, "competencia", "vl_serv_cobrado")}
+    taxas = {linha["grupo"]: linha["total"] for linha in agregar(tabela, "competencia", "tx_adm_servico")}
+    return [{"competencia": competencia, "itens": cobrado[competencia]["quantidade"],
+             "vl_serv_cobrado": cobrado[competencia]["total"], "tx_adm_servico": taxas.get(competencia, 0.0)}
+            for competencia in sorted(cobrado, key=lambda c: (c is None, c))]
+
+
+def dividir_por_data(tabela, data_corte) -> Dict[str, int]:
+    """Itens executados até `data_corte` (inclusive), depois dela e sem data."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if isinstance(data_corte, datetime):
+        data_corte = data_corte.date()
+    coluna = tabela.column("dt_execucao")
+    sem_data = pc.is_null(coluna).to_numpy(zero_copy_only=False)
+    # date32 = dias desde 1970-01-01
+    dias = pc.fill_null(coluna.cast(pa.int32()), 0).to_numpy()
+    depois = dias > (data_corte - date(1970, 1, 1)).days
+    return {"ate": int((~sem_data & ~depois).sum()), "depois": int((~sem_data & depois).sum()),
+            "sem_data": int(sem_data.sum())}
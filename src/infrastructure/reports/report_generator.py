@@ -3,6 +3,7 @@
 import csv
 import logging
 import os
+import shutil
 import openpyxl
 from openpyxl import utils as openpyxl_utils
 from datetime import datetime
@@ -19,6 +20,15 @@ REGIME_INTERNACAO_MAP = {
     '3': 'Domiciliar'
 }
 
+# Cópias dos relatórios de distribuição (data/historico_distribuicao na raiz do projeto)
+PASTA_HISTORICO_DISTRIBUICAO = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))),
+    'data', 'historico_distribuicao'
+)
+
+# Faturas enviadas por vez ao banco de consulta enquanto o relatório é escrito
+TAMANHO_LOTE_IMPORTACAO = 2000
+
 # --- FUNÇÕES AUXILIARES ---
 
 def _formatar_competencia_aaaamm(competencia_aamm_str: Optional[str],
@@ -46,9 +56,11 @@ def _formatar_data_para_relatorio(data_str_yyyymmdd: Optional[str]) -> str:
     if not data_str_yyyymmdd or len(data_str_yyyymmdd) != 8:
         return data_str_yyyymmdd or 'N/A'
     
+    # Fatiamento + validação por construção (bem mais rápido que strptime/strftime)
     try:
-        dt_obj = datetime.strptime(data_str_yyyymmdd, '%Y%m%d')
-        return dt_obj.strftime('%d/%m/%Y')
+        ano, mes, dia = data_str_yyyymmdd[0:4], data_str_yyyymmdd[4:6], data_str_yyyymmdd[6:8]
+        datetime(int(ano), int(mes), int(dia))
+        return f"{dia}/{mes}/{ano}"
     except ValueError:
         return data_str_yyyymmdd
 
@@ -78,12 +90,130 @@ def _formatar_unimed_destino(cod_unimed: Optional[str], nome_unimed: Optional[st
 
 # --- FUNÇÕES PRINCIPAIS ---
 
+CABECALHOS_DISTRIBUICAO = [
+    "Nº FATURA", "COMP", "UNIMED",
+    "EMISSÃO", "VENCIMENTO", "VALOR",
+    "AUDITOR"
+]
+
+def _linhas_distribuicao(plano_distribuicao: Dict[str, Any]):
+    """Gera (linha do relatório, dados para importação) fatura a fatura."""
+    for nome_auditor, dados_auditor in plano_distribuicao.items():
+        for fatura_info in dados_auditor.get('faturas', []):
+            competencia_original = fatura_info.get('competencia')
+            data_emissao_original = fatura_info.get('data_emissao')
+            competencia_fmt = _formatar_competencia_aaaamm(competencia_original, data_emissao_original)
+
+            cod_uni_destino = fatura_info.get('codigo_unimed_destino')
+            nome_uni_destino = fatura_info.get('nome_unimed_destino')
+            unimed_destino_formatada = _formatar_unimed_destino(cod_uni_destino, nome_uni_destino)
+
+            valor_numerico = _formatar_valor_para_numero(fatura_info.get('valor_total_documento'))
+
+            linha_dados = [
+                fatura_info.get('numero_fatura', 'N/A'),
+                competencia_fmt,
+                unimed_destino_formatada,
+                _formatar_data_para_relatorio(data_emissao_original),
+                _formatar_data_para_relatorio(fatura_info.get('data_vencimento')),
+                valor_numerico,
+                nome_auditor
+            ]
+            dados_importacao = {
+                'nro_fatura': str(fatura_info.get('numero_fatura', '')),
+                'competencia': competencia_fmt,
+                'unimed_codigo': cod_uni_destino,
+                'unimed_nome': nome_uni_destino,
+                'valor': valor_numerico,
+                'responsavel': nome_auditor,
+                'status': 'PENDENTE'
+            }
+            yield linha_dados, dados_importacao
+
+def _larguras_colunas(plano_distribuicao: Dict[str, Any]) -> List[int]:
+    """Largura de cada coluna pelo maior conteúdo (pré-passagem, sem guardar linhas)."""
+    larguras = [len(c) for c in CABECALHOS_DISTRIBUICAO]
+    for linha, _ in _linhas_distribuicao(plano_distribuicao):
+        for idx, valor in enumerate(linha):
+            if valor is not None and len(str(valor)) > larguras[idx]:
+                larguras[idx] = len(str(valor))
+    return [largura + 2 for largura in larguras]
+
+def _gravar_parquet_distribuicao(plano_distribuicao: Dict[str, Any], caminho_parquet: str) -> bool:
+    """Grava a distribuição em Parquet, em lotes (requer pyarrow)."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        logger.warning("pyarrow não instalado - saída Parquet ignorada (pip install pyarrow).")
+        return False
+
+    schema = pa.schema([
+        ("numero_fatura", pa.string()), ("competencia", pa.string()), ("unimed", pa.string()),
+        ("emissao", pa.string()), ("vencimento", pa.string()), ("valor", pa.float64()),
+        ("auditor", pa.string()),
+    ])
+    tamanho_lote = 10000
+    with pq.ParquetWriter(caminho_parquet, schema) as writer:
+        lote = []
+        for linha, _ in _linhas_distribuicao(plano_distribuicao):
+            lote.append([None if v is None else (v if i == 5 else str(v)) for i, v in enumerate(linha)])
+            if len(lote) >= tamanho_lote:
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(coluna, type=campo.type) for coluna, campo in zip(zip(*lote), schema)], schema=schema
+                ))
+                lote = []
+        if lote:
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(coluna, type=campo.type) for coluna, campo in zip(zip(*lote), schema)], schema=schema
+            ))
+    return True
+
+class _ImportacaoEmLotes:
+    """Envia as faturas do relatório ao banco em lotes de TAMANHO_LOTE_IMPORTACAO (memória constante)."""
+
+    def __init__(self, origem: str):
+        self.origem = origem
+        self.lote: List[Dict[str, Any]] = []
+        self.stats = {'criadas': 0, 'atualizadas': 0, 'erros': 0}
+        self.ativa = True
+
+    def adicionar(self, dados_importacao: Dict[str, Any]):
+        if not self.ativa:
+            return
+        self.lote.append(dados_importacao)
+        if len(self.lote) >= TAMANHO_LOTE_IMPORTACAO:
+            self.enviar()
+
+    def enviar(self):
+        """Importa o lote pendente; após uma falha, as faturas seguintes não são mais enviadas."""
+        lote, self.lote = self.lote, []
+        if not lote or not self.ativa:
+            return
+        try:
+            from src.database.fatura_repository import importar_lote
+            for chave, valor in importar_lote(lote, self.origem).items():
+                self.stats[chave] = self.stats.get(chave, 0) + valor
+        except Exception as e:
+            self.ativa = False
+            logger.warning(f"Não foi possível importar faturas para o banco: {e}")
+
 def gerar_relatorio_distribuicao(plano_distribuicao: Dict[str, Any],
-                                 caminho_pasta_distribuicao: str) -> Tuple[bool, Optional[str]]:
+                                 caminho_pasta_distribuicao: str,
+                                 formatos_extras: Tuple[str, ...] = ()) -> Tuple[bool, Optional[str]]:
     """
     Gera relatório Excel com a distribuição das faturas por auditor.
     
-    NOVO: Também salva uma cópia no histórico e auto-importa para o banco de faturas.
+    O workbook é escrito em modo write_only (streaming, memória constante).
+    Também salva uma cópia no histórico (cópia de arquivo) e auto-importa
+    para o banco de faturas com upsert em massa. A importação só começa
+    depois que o workbook foi salvo, numa segunda passada pelo plano, em
+    lotes de TAMANHO_LOTE_IMPORTACAO.
+    
+    Args:
+        plano_distribuicao: Plano retornado por distribuir_faturas
+        caminho_pasta_distribuicao: Pasta de saída
+        formatos_extras: Saídas adicionais opcionais: 'csv' e/ou 'parquet'
     """
     if not plano_distribuicao:
         logger.error("Plano de distribuição está vazio. Relatório Excel não gerado.")
@@ -92,100 +222,75 @@ def gerar_relatorio_distribuicao(plano_distribuicao: Dict[str, Any],
     nome_arquivo_excel = "DISTRIBUIÇÃO.xlsx"
     caminho_completo_excel = os.path.join(caminho_pasta_distribuicao, nome_arquivo_excel)
     
-    # Lista para coletar faturas para importação
-    faturas_para_importar = []
+    importacao = _ImportacaoEmLotes(f"Distribuição {datetime.now().strftime('%d/%m/%Y')}")
 
     try:
-        workbook = openpyxl.Workbook()
-        sheet = workbook.active
-        
-        if sheet is None:
-            logger.error("Não foi possível obter a planilha ativa do novo workbook Excel.")
-            return False, None
-        
-        sheet.title = "Distribuição Faturas Audit+"
-
-        cabecalhos = [
-            "Nº FATURA", "COMP", "UNIMED",
-            "EMISSÃO", "VENCIMENTO", "VALOR",
-            "AUDITOR"
-        ]
-        sheet.append(cabecalhos)
-
-        for nome_auditor, dados_auditor in plano_distribuicao.items():
-            for fatura_info in dados_auditor.get('faturas', []):
-                competencia_original = fatura_info.get('competencia')
-                data_emissao_original = fatura_info.get('data_emissao')
-                competencia_fmt = _formatar_competencia_aaaamm(competencia_original, data_emissao_original)
-
-                cod_uni_destino = fatura_info.get('codigo_unimed_destino')
-                nome_uni_destino = fatura_info.get('nome_unimed_destino')
-                unimed_destino_formatada = _formatar_unimed_destino(cod_uni_destino, nome_uni_destino)
-
-                valor_numerico = _formatar_valor_para_numero(fatura_info.get('valor_total_documento'))
-                
-                linha_dados = [
-                    fatura_info.get('numero_fatura', 'N/A'),
-                    competencia_fmt,
-                    unimed_destino_formatada,
-                    _formatar_data_para_relatorio(data_emissao_original),
-                    _formatar_data_para_relatorio(fatura_info.get('data_vencimento')),
-                    valor_numerico,
-                    nome_auditor
-                ]
-                sheet.append(linha_dados)
-                
-                cell_valor = sheet.cell(row=sheet.max_row, column=cabecalhos.index("VALOR") + 1)
+        from openpyxl.cell import WriteOnlyCell
+
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet("Distribuição Faturas Audit+")
+
+        # Em write_only as larguras precisam ser definidas antes das linhas
+        for col_idx, largura in enumerate(_larguras_colunas(plano_distribuicao), 1):
+            sheet.column_dimensions[openpyxl_utils.get_column_letter(col_idx)].width = largura
+
+        sheet.append(CABECALHOS_DISTRIBUICAO)
+        idx_valor = CABECALHOS_DISTRIBUICAO.index("VALOR")
+
+        csv_file = None
+        csv_writer = None
+        if 'csv' in formatos_extras:
+            csv_file = open(os.path.join(caminho_pasta_distribuicao, "DISTRIBUIÇÃO.csv"),
+                            'w', newline='', encoding='utf-8-sig')
+            csv_writer = csv.writer(csv_file, delimiter=';')
+            csv_writer.writerow(CABECALHOS_DISTRIBUICAO)
+
+        try:
+            for linha_dados, _ in _linhas_distribuicao(plano_distribuicao):
+                cell_valor = WriteOnlyCell(sheet, value=linha_dados[idx_valor])
                 cell_valor.number_format = 'R$ #,##0.00'
-                
-                # Coletar fatura para importação ao banco
-                faturas_para_importar.append({
-                    'nro_fatura': str(fatura_info.get('numero_fatura', '')),
-                    'competencia': competencia_fmt,
-                    'unimed_codigo': cod_uni_destino,
-                    'unimed_nome': nome_uni_destino,
-                    'valor': valor_numerico,
-                    'responsavel': nome_auditor,
-                    'status': 'PENDENTE'
-                })
-        
-        for col_idx, column in enumerate(sheet.columns, 1):
-            max_length = 0
-            column_letter = openpyxl_utils.get_column_letter(col_idx)
-            for cell in column:
-                try:
-                    if cell.value and len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = (max_length + 2) if max_length > 0 else 12
-            sheet.column_dimensions[column_letter].width = adjusted_width
+                sheet.append(linha_dados[:idx_valor] + [cell_valor] + linha_dados[idx_valor + 1:])
+
+                if csv_writer:
+                    csv_writer.writerow(
+                        linha_dados[:idx_valor]
+                        + [f"{linha_dados[idx_valor]:.2f}".replace('.', ',')]
+                        + linha_dados[idx_valor + 1:]
+                    )
+        finally:
+            if csv_file:
+                csv_file.close()
 
         # Salvar na pasta de distribuição
         workbook.save(filename=caminho_completo_excel)
         logger.info(f"Relatório '{nome_arquivo_excel}' gerado com sucesso em '{caminho_pasta_distribuicao}'.")
+
+        if 'parquet' in formatos_extras:
+            caminho_parquet = os.path.join(caminho_pasta_distribuicao, "DISTRIBUIÇÃO.parquet")
+            if _gravar_parquet_distribuicao(plano_distribuicao, caminho_parquet):
+                logger.info(f"Relatório Parquet gerado: {caminho_parquet}")
         
         # ✅ NOVO: Salvar cópia no histórico com timestamp
         try:
-            historico_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), 'data', 'historico_distribuicao')
+            historico_dir = PASTA_HISTORICO_DISTRIBUICAO
             os.makedirs(historico_dir, exist_ok=True)
             
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             nome_historico = f"DISTRIBUICAO_{timestamp}.xlsx"
             caminho_historico = os.path.join(historico_dir, nome_historico)
             
-            workbook.save(filename=caminho_historico)
+            shutil.copy2(caminho_completo_excel, caminho_historico)
             logger.info(f"📁 Cópia salva no histórico: {caminho_historico}")
         except Exception as e:
             logger.warning(f"Não foi possível salvar cópia no histórico: {e}")
         
-        # ✅ NOVO: Auto-importar faturas para o banco de consulta
-        try:
-            from src.database.fatura_repository import importar_lote
-            stats = importar_lote(faturas_para_importar, f"Distribuição {datetime.now().strftime('%d/%m/%Y')}")
-            logger.info(f"📊 {stats['criadas']} faturas criadas, {stats['atualizadas']} atualizadas no banco.")
-        except Exception as e:
-            logger.warning(f"Não foi possível importar faturas para o banco: {e}")
+        # Auto-importação para o banco de consulta, só com o relatório já salvo
+        for _, dados_importacao in _linhas_distribuicao(plano_distribuicao):
+            importacao.adicionar(dados_importacao)
+        importacao.enviar()
+        if importacao.ativa:
+            logger.info(f"📊 {importacao.stats['criadas']} faturas criadas, "
+                        f"{importacao.stats['atualizadas']} atualizadas no banco.")
         
         return True, caminho_completo_excel
 
@@ -193,6 +298,71 @@ def gerar_relatorio_distribuicao(plano_distribuicao: Dict[str, Any],
         logger.exception(f"Falha ao gerar o relatório Excel. Erro: {e}")
         return False, None
 
+def gerar_relatorio_alertas(alertas, caminho_pasta: str,
+                            nome_arquivo: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+    """
+    Gera o relatório Excel de alertas da remoção (ação 'gerar_alerta').
+    
+    Usa workbook write_only: as linhas são lidas do spool de alertas e
+    gravadas uma a uma, com memória constante e tempo linear.
+    
+    Args:
+        alertas: Iterável de alertas ({'mensagem', 'dados'}), ex.: AlertSpool
+        caminho_pasta: Pasta onde o relatório será salvo
+        nome_arquivo: Nome do .xlsx (padrão: ALERTAS_REMOCAO_<data_hora>.xlsx)
+    
+    Returns:
+        (sucesso, caminho do relatório)
+    """
+    try:
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+        
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet("Alertas")
+        
+        # Larguras devem ser definidas antes da primeira linha
+        for coluna, largura in zip("ABCDE", (30, 15, 20, 15, 50)):
+            ws.column_dimensions[coluna].width = largura
+        
+        # Cabeçalho estilizado (apenas a primeira linha tem estilo)
+        header_fill = PatternFill(start_color="FF6B6B", end_color="FF6B6B", fill_type="solid")
+        header_font = Font(bold=True, color="FFFFFF")
+        border = Border(
+            left=Side(style='thin'),
+            right=Side(style='thin'),
+            top=Side(style='thin'),
+            bottom=Side(style='thin')
+        )
+        cabecalho = []
+        for titulo in ["Arquivo", "Guia", "Beneficiário", "Código", "Mensagem"]:
+            cell = WriteOnlyCell(ws, value=titulo)
+            cell.fill = header_fill
+            cell.font = header_font
+            cell.alignment = Alignment(horizontal='center')
+            cell.border = border
+            cabecalho.append(cell)
+        ws.append(cabecalho)
+        
+        for alerta in alertas:
+            dados = alerta.get("dados", {})
+            ws.append([
+                dados.get("arquivo", ""),
+                dados.get("guia", ""),
+                dados.get("beneficiario", ""),
+                dados.get("codigo", ""),
+                alerta.get("mensagem", ""),
+            ])
+        
+        if nome_arquivo is None:
+            nome_arquivo = f"ALERTAS_REMOCAO_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        caminho_relatorio = os.path.join(caminho_pasta, nome_arquivo)
+        wb.save(caminho_relatorio)
+        return True, caminho_relatorio
+    except Exception as e:
+        logger.exception(f"Falha ao gerar o relatório de alertas. Erro: {e}")
+        return False, None
+
 def gerar_csv_internacao(guias_relevantes: List[Dict[str, Any]],
                          output_folder: str) -> bool:
     """Gera CSV com guias de internação relevantes."""
@@ -1,3 +1,3 @@
 # src/infrastructure/workers/__init__.py
 """Workers package"""
-__all__ = ['worker', 'exception_handler']
+__all__ = ['worker', 'exception_handler', 'progress_channel', 'job_scheduler']
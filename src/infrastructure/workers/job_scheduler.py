@@ -0,0 +1,340 @@
+# src/infrastructure/workers/job_scheduler.py
+"""
+Agendador central das tarefas em segundo plano da aplicação.
+
+Todas as ações longas das páginas (importação, validação, XSD, hash) entram
+numa fila única, atendida por um número fixo de threads:
+- Prioridade: a tarefa pendente de menor número de prioridade sai primeiro
+  (empate: ordem de chegada).
+- Recursos: cada tarefa declara os recursos que usa (ex.: 'pasta:/faturas/x',
+  'disco'); uma tarefa só começa se nenhum dos seus recursos estiver no limite
+  de uso simultâneo. Pastas são hierárquicas: uma pasta em uso também ocupa
+  as suas subpastas e as pastas que a contêm. Uma tarefa bloqueada não segura
+  as de trás que estejam livres.
+- Cancelamento cooperativo: a tarefa pendente sai da fila; a que está rodando
+  recebe `cancel_check` e deve consultá-lo entre arquivos.
+
+As funções recebem, se declararem os parâmetros, `log_callback`,
+`progress_callback` (ver CanalProgresso) e `cancel_check`. O histórico das
+tarefas terminadas, com tempos de espera e de execução, fica em memória para
+o dashboard.
+"""
+
+import heapq
+import inspect
+import itertools
+import logging
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+from src.infrastructure.workers.progress_channel import CanalProgresso
+
+logger = logging.getLogger(__name__)
+
+PRIORIDADE_ALTA = 0
+PRIORIDADE_NORMAL = 5
+PRIORIDADE_BAIXA = 10
+
+# Threads de execução e uso simultâneo permitido por recurso (pela chave ou pelo tipo antes de ':')
+MAX_THREADS = 3
+LIMITES_PADRAO = {'disco': 2}
+LIMITE_RECURSO = 1
+
+TAMANHO_HISTORICO = 200
+
+PREFIXO_PASTA = 'pasta:'
+
+PENDENTE, EXECUTANDO, CONCLUIDO, FALHOU, CANCELADO = 'PENDENTE', 'EXECUTANDO', 'CONCLUIDO', 'FALHOU', 'CANCELADO'
+
+
+def recurso_pasta(caminho: str) -> str:
+    """Chave de recurso de uma pasta (mesma pasta => mesma chave)."""
+    return PREFIXO_PASTA + os.path.normcase(os.path.abspath(caminho))
+
+
+def pastas_conflitam(recurso_a: str, recurso_b: str) -> bool:
+    """True se as pastas são a mesma ou uma contém a outra."""
+    a, b = recurso_a[len(PREFIXO_PASTA):], recurso_b[len(PREFIXO_PASTA):]
+    if a == b:
+        return True
+    curto, longo = sorted((a, b), key=len)
+    return longo.startswith(curto.rstrip(os.sep) + os.sep)
+
+
+class Tarefa:
+    """Uma tarefa submetida ao agendador (estado, tempos, resultado)."""
+
+    def __init__(self, id_tarefa: int, nome: str, fn: Callable, args: tuple, kwargs: dict,
+                 prioridade: int, recursos: Iterable[str], canal: Optional[CanalProgresso],
+                 ao_terminar: Optional[Callable[['Tarefa'], None]]):
+        self.id = id_tarefa
+        self.nome = nome
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.prioridade = prioridade
+        self.recursos = tuple(sorted(set(recursos)))
+        self.canal = canal if canal is not None else CanalProgresso()
+        self.ao_terminar = ao_terminar
+
+        self.status = PENDENTE
+        self.resultado = None
+        self.erro: Optional[str] = None
+        self.criada_em = time.monotonic()
+        self.iniciada_em: Optional[float] = None
+        self.finalizada_em: Optional[float] = None
+        self.data_criacao = datetime.now()
+        self._cancelamento = threading.Event()
+
+    def cancelamento_solicitado(self) -> bool:
+        """Consultado pela função entre arquivos (passado como cancel_check)."""
+        return self._cancelamento.is_set()
+
+    @property
+    def espera_segundos(self) -> float:
+        """Tempo na fila (até agora, se ainda pendente)."""
+        fim = self.iniciada_em or self.finalizada_em or time.monotonic()
+        return fim - self.criada_em
+
+    @property
+    def duracao_segundos(self) -> Optional[float]:
+        """Tempo de execução (até agora, se rodando); None se nunca começou."""
+        if self.iniciada_em is None:
+            return None
+        return (self.finalizada_em or time.monotonic()) - self.iniciada_em
+
+    def como_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'nome': self.nome,
+            'status': self.status,
+            'prioridade': self.prioridade,
+            'recursos': list(self.recursos),
+            'criada_em': self.data_criacao,
+            'espera_segundos': self.espera_segundos,
+            'duracao_segundos': self.duracao_segundos,
+            'erro': self.erro.strip().splitlines()[-1] if self.erro else None,
+        }
+
+    def __repr__(self):
+        return f"<Tarefa(id={self.id}, nome='{self.nome}', status='{self.status}')>"
+
+
+class AgendadorTarefas:
+    """Fila com prioridades e limites por recurso, atendida por `max_threads` threads."""
+
+    def __init__(self, max_threads: int = MAX_THREADS, limites: Optional[Dict[str, int]] = None):
+        self.max_threads = max_threads
+        self.limites = dict(LIMITES_PADRAO if limites is None else limites)
+        self._condicao = threading.Condition()
+        self._fila: List[tuple] = []  # heap de (prioridade, sequência, tarefa)
+        self._sequencia = itertools.count()
+        self._ids = itertools.count(1)
+        self._em_uso: Dict[str, int] = {}
+        self._executando: Dict[int, Tarefa] = {}
+        self._historico = deque(maxlen=TAMANHO_HISTORICO)
+        self._threads: List[threading.Thread] = []
+        self._encerrado = False
+
+    # ------------------------------------------------------------------ API
+
+    def submeter(self, fn: Callable, *args, nome: Optional[str] = None, prioridade: int = PRIORIDADE_NORMAL,
+                 recursos: Iterable[str] = (), canal: Optional[CanalProgresso] = None,
+                 ao_terminar: Optional[Callable[[Tarefa], None]] = None, **kwargs) -> Tarefa:
+        """
+        Enfileira `fn(*args, **kwargs)`.
+
+        Args:
+            nome: Nome exibido no histórico (padrão: nome da função)
+            prioridade: Menor sai primeiro (PRIORIDADE_ALTA/NORMAL/BAIXA)
+            recursos: Chaves dos recursos usados (ex.: recurso_pasta(...), 'disco')
+            canal: Canal para log/andamento (criado se não informado)
+            ao_terminar: Chamado na thread da tarefa quando ela termina, falha ou é cancelada
+        """
+        with self._condicao:
+            if self._encerrado:
+                raise RuntimeError("Agendador encerrado")
+            tarefa = Tarefa(next(self._ids), nome or getattr(fn, '__name__', 'tarefa'), fn, args, kwargs,
+                            prioridade, recursos, canal, ao_terminar)
+            heapq.heappush(self._fila, (prioridade, next(self._sequencia), tarefa))
+            self._garantir_threads()
+            self._condicao.notify_all()
+        return tarefa
+
+    def cancelar(self, tarefa: Tarefa) -> bool:
+        """
+        Cancela a tarefa: se pendente, sai da fila; se rodando, sinaliza o
+        cancelamento (a função para no próximo cancel_check).
+
+        Returns:
+            False se a tarefa já havia terminado
+        """
+        with self._condicao:
+            if tarefa.status == PENDENTE:
+                self._fila = [item for item in self._fila if item[2] is not tarefa]
+                heapq.heapify(self._fila)
+                tarefa._cancelamento.set()
+                tarefa.status = CANCELADO
+                tarefa.finalizada_em = time.monotonic()
+                self._historico.append(tarefa)
+                self._condicao.notify_all()
+            elif tarefa.status == EXECUTANDO:
+                tarefa._cancelamento.set()
+                return True
+            else:
+                return False
+        self._notificar(tarefa)
+        return True
+
+    def pendentes(self) -> List[dict]:
+        """Tarefas na fila, na ordem em que seriam atendidas (sem contar os recursos)."""
+        with self._condicao:
+            return [item[2].como_dict() for item in sorted(self._fila, key=lambda item: item[:2])]
+
+    def executando(self) -> List[dict]:
+        with self._condicao:
+            return [tarefa.como_dict() for tarefa in self._executando.values()]
+
+    def historico(self) -> List[dict]:
+        """Tarefas terminadas (mais recentes primeiro)."""
+        with self._condicao:
+            return [tarefa.como_dict() for tarefa in reversed(self._historico)]
+
+    def aguardar(self, timeout: Optional[float] = None) -> bool:
+        """Espera a fila esvaziar e as tarefas em execução terminarem. False se o tempo acabar."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._condicao:
+            while self._fila or self._executando:
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    return False
+                self._condicao.wait(restante)
+        return True
+
+    def encerrar(self, cancelar_pendentes: bool = True, timeout: Optional[float] = None) -> None:
+        """Para de aceitar tarefas, cancela as pendentes e sinaliza as em execução."""
+        with self._condicao:
+            pendentes = [item[2] for item in self._fila] if cancelar_pendentes else []
+            em_execucao = list(self._executando.values())
+        for tarefa in pendentes:
+            self.cancelar(tarefa)
+        for tarefa in em_execucao:
+            tarefa._cancelamento.set()
+        with self._condicao:
+            self._encerrado = True
+            self._condicao.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    # ------------------------------------------------------------ Execução
+
+    def _garantir_threads(self) -> None:
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        while len(self._threads) < self.max_threads:
+            thread = threading.Thread(target=self._laco, name=f"agendador-{len(self._threads) + 1}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _limite(self, recurso: str) -> int:
+        if recurso in self.limites:
+            return self.limites[recurso]
+        return self.limites.get(recurso.split(':', 1)[0], LIMITE_RECURSO)
+
+    def _uso(self, recurso: str) -> int:
+        """Uso atual do recurso; para pastas, soma a própria, as que a contêm e as subpastas."""
+        if not recurso.startswith(PREFIXO_PASTA):
+            return self._em_uso.get(recurso, 0)
+        return sum(quantidade for chave, quantidade in self._em_uso.items()
+                   if chave.startswith(PREFIXO_PASTA) and pastas_conflitam(chave, recurso))
+
+    def _proxima_livre(self) -> Optional[Tarefa]:
+        """Retira da fila a tarefa mais prioritária cujos recursos estão livres (com o lock)."""
+        for item in sorted(self._fila, key=lambda item: item[:2]):
+            tarefa = item[2]
+            if all(self._uso(recurso) < self._limite(recurso) for recurso in tarefa.recursos):
+                self._fila.remove(item)
+                heapq.heapify(self._fila)
+                return tarefa
+        return None
+
+    def _laco(self) -> None:
+        while True:
+            with self._condicao:
+                tarefa = None
+                while tarefa is None:
+                    if self._encerrado and not self._fila:
+                        return
+                    tarefa = self._proxima_livre()
+                    if tarefa is None:
+                        self._condicao.wait()
+                for recurso in tarefa.recursos:
+                    self._em_uso[recurso] = self._em_uso.get(recurso, 0) + 1
+                tarefa.status = EXECUTANDO
+                tarefa.iniciada_em = time.monotonic()
+                self._executando[tarefa.id] = tarefa
+
+            self._executar(tarefa)
+
+            with self._condicao:
+                for recurso in tarefa.recursos:
+                    self._em_uso[recurso] -= 1
+                    if not self._em_uso[recurso]:
+                        del self._em_uso[recurso]
+                del self._executando[tarefa.id]
+                self._historico.append(tarefa)
+                self._condicao.notify_all()
+            self._notificar(tarefa)
+
+    def _executar(self, tarefa: Tarefa) -> None:
+        try:
+            tarefa.resultado = tarefa.fn(*tarefa.args, **self._argumentos(tarefa))
+            tarefa.status = CANCELADO if tarefa.cancelamento_solicitado() else CONCLUIDO
+        except Exception:
+            tarefa.erro = traceback.format_exc()
+            tarefa.status = FALHOU
+            logger.error("Tarefa '%s' falhou: %s", tarefa.nome, tarefa.erro.strip().splitlines()[-1])
+        finally:
+            tarefa.finalizada_em = time.monotonic()
+
+    @staticmethod
+    def _argumentos(tarefa: Tarefa) -> dict:
+        """kwargs da tarefa + log/andamento/cancelamento para as funções que os declaram."""
+        kwargs = dict(tarefa.kwargs)
+        try:
+            parametros = inspect.signature(tarefa.fn).parameters
+        except (TypeError, ValueError):
+            parametros = {}
+        aceita_tudo = any(p.kind is inspect.Parameter.VAR_KEYWORD for p in parametros.values())
+        for nome, valor in (('log_callback', tarefa.canal.log),
+                            ('progress_callback', tarefa.canal.progresso),
+                            ('cancel_check', tarefa.cancelamento_solicitado)):
+            if nome in parametros or aceita_tudo:
+                kwargs.setdefault(nome, valor)
+        return kwargs
+
+    @staticmethod
+    def _notificar(tarefa: Tarefa) -> None:
+        if tarefa.ao_terminar is None:
+            return
+        try:
+            tarefa.ao_terminar(tarefa)
+        except Exception as e:
+            logger.error("Erro no retorno da tarefa '%s': %s", tarefa.nome, e)
+
+
+_agendador: Optional[AgendadorTarefas] = None
+_lock_agendador = threading.Lock()
+
+
+def obter_agendador() -> AgendadorTarefas:
+    """Agendador único da aplicação (criado no primeiro uso)."""
+    global _agendador
+    with _lock_agendador:
+        if _agendador is None:
+            _agendador = AgendadorTarefas()
+        return _agendador
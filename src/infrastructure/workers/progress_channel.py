@@ -0,0 +1,88 @@
+# src/infrastructure/workers/progress_channel.py
+"""
+Canal de progresso entre a thread de trabalho e a interface.
+
+O worker escreve as mensagens de log e o andamento (arquivos feitos/total)
+no canal sem nenhum sinal Qt; a interface drena o canal periodicamente (ver
+LogView), recebendo de uma vez todas as linhas acumuladas e só o andamento
+mais recente. As linhas ficam num buffer circular: se a interface não
+acompanhar, as mais antigas são descartadas e contadas.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+# Linhas mantidas entre duas drenagens
+CAPACIDADE_PADRAO = 2000
+
+
+class CanalProgresso:
+    """Buffer circular de linhas de log + último andamento, seguro entre threads."""
+
+    def __init__(self, capacidade: int = CAPACIDADE_PADRAO, relogio=time.monotonic):
+        self._linhas = deque(maxlen=capacidade)
+        self._lock = threading.Lock()
+        self._relogio = relogio
+        self._descartadas = 0
+        self._andamento = None
+        self._andamento_novo = False
+        self._inicio = None
+        self._feitos_inicio = 0
+
+    def log(self, mensagem: str) -> None:
+        """Enfileira uma linha (usado como log_callback do controller)."""
+        with self._lock:
+            if len(self._linhas) == self._linhas.maxlen:
+                self._descartadas += 1
+            self._linhas.append(str(mensagem))
+
+    def progresso(self, feitos: int, total: int) -> None:
+        """
+        Registra o andamento (usado como progress_callback do controller).
+
+        A taxa (arquivos/s) e a previsão de término são calculadas desde a
+        primeira chamada, descontando os arquivos já feitos nela (retomada).
+        """
+        agora = self._relogio()
+        with self._lock:
+            if self._inicio is None or feitos < self._feitos_inicio:
+                self._inicio, self._feitos_inicio = agora, feitos
+            decorrido = agora - self._inicio
+            taxa = (feitos - self._feitos_inicio) / decorrido if decorrido > 0 else 0.0
+            restantes = max(total - feitos, 0)
+            self._andamento = {
+                'feitos': feitos,
+                'total': total,
+                'taxa': taxa,
+                'eta_segundos': restantes / taxa if taxa > 0 else None,
+            }
+            self._andamento_novo = True
+
+    def drenar(self):
+        """
+        Retira tudo o que foi acumulado desde a última drenagem.
+
+        Returns:
+            (linhas, descartadas, andamento): andamento é None se não mudou
+        """
+        with self._lock:
+            linhas: List[str] = list(self._linhas)
+            self._linhas.clear()
+            descartadas, self._descartadas = self._descartadas, 0
+            andamento: Optional[dict] = self._andamento if self._andamento_novo else None
+            self._andamento_novo = False
+        return linhas, descartadas, andamento
+
+
+def formatar_andamento(andamento: dict) -> str:
+    """Texto curto do andamento: '12/340 arquivo(s) - 3.4/s - restam ~1min 36s'"""
+    texto = f"{andamento['feitos']}/{andamento['total']} arquivo(s)"
+    if andamento['taxa'] > 0:
+        texto += f" - {andamento['taxa']:.1f}/s"
+    eta = andamento['eta_segundos']
+    if eta is not None and andamento['feitos'] < andamento['total']:
+        minutos, segundos = divmod(int(round(eta)), 60)
+        texto += f" - restam ~{minutos}min {segundos:02d}s" if minutos else f" - restam ~{segundos}s"
+    return texto
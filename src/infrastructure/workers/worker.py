@@ -1,35 +1,49 @@
 # src/gui/worker.py
 
 from PyQt6.QtCore import QObject, pyqtSignal
-import traceback
+
+from src.infrastructure.workers.job_scheduler import (CANCELADO, FALHOU, PRIORIDADE_NORMAL, Tarefa,
+                                                      obter_agendador)
+from src.infrastructure.workers.progress_channel import CanalProgresso
 
 class Worker(QObject):
     """
-    Worker genérico que executa uma função em uma thread separada.
+    Worker genérico que executa uma função em segundo plano pelo agendador da aplicação.
+
+    A tarefa entra na fila do agendador (job_scheduler) com prioridade e
+    recursos; o log e o andamento vão para `self.canal`, que a interface drena
+    em lotes (LogView.acompanhar). Os sinais são emitidos na thread da tarefa
+    e entregues na thread da interface.
     """
     finished = pyqtSignal(object)  # Sinal emitido quando a tarefa termina, com o resultado
     error = pyqtSignal(str)        # Sinal emitido em caso de erro
-    progress = pyqtSignal(str)     # Sinal para enviar mensagens de log durante a execução
 
-    def __init__(self, fn, *args, **kwargs):
+    def __init__(self, fn, *args, nome=None, prioridade=PRIORIDADE_NORMAL, recursos=(), **kwargs):
         super().__init__()
         self.fn = fn
         self.args = args
         self.kwargs = kwargs
+        self.nome = nome
+        self.prioridade = prioridade
+        self.recursos = recursos
+        self.canal = CanalProgresso()
+        self.tarefa = None
+
+    def iniciar(self) -> Tarefa:
+        """Submete a tarefa ao agendador (conecte os sinais antes)."""
+        self.tarefa = obter_agendador().submeter(
+            self.fn, *self.args, nome=self.nome, prioridade=self.prioridade, recursos=self.recursos,
+            canal=self.canal, ao_terminar=self._ao_terminar, **self.kwargs)
+        return self.tarefa
+
+    def cancelar(self) -> bool:
+        """Cancela a tarefa (pendente: sai da fila; rodando: para entre arquivos)."""
+        return self.tarefa is not None and obter_agendador().cancelar(self.tarefa)
 
-    def run(self):
-        """
-        Executa a função de trabalho.
-        """
-        try:
-            # Passamos a nossa função de log como um argumento para a função de trabalho
-            # Isso permite que a lógica do controller envie mensagens para a GUI
-            kwargs_com_log = self.kwargs.copy()
-            kwargs_com_log['log_callback'] = self.progress.emit
-            
-            resultado = self.fn(*self.args, **kwargs_com_log)
-            self.finished.emit(resultado)
-        except Exception:
-            # Em caso de erro, captura o traceback e o emite como uma string
-            error_str = traceback.format_exc()
-            self.error.emit(error_str)
\ No newline at end of file
+    def _ao_terminar(self, tarefa: Tarefa):
+        if tarefa.status == FALHOU:
+            self.error.emit(tarefa.erro)
+        elif tarefa.status == CANCELADO and tarefa.iniciada_em is None:
+            self.finished.emit((False, "Tarefa cancelada antes de iniciar."))
+        else:
+            self.finished.emit(tarefa.resultado)
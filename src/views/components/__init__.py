@@ -5,5 +5,6 @@ Componentes reutilizáveis de UI.
 """
 
 from .kpi_card import KPICard
+from .log_view import LogView
 
-__all__ = ['KPICard']
+__all__ = ['KPICard', 'LogView']
@@ -0,0 +1,72 @@
+# src/views/components/log_view.py
+"""
+Log View Component
+Área de log das páginas de processamento, alimentada em lotes por um CanalProgresso.
+"""
+
+from PyQt6.QtWidgets import QPlainTextEdit
+from PyQt6.QtCore import QTimer, pyqtSignal
+
+from src.infrastructure.workers.progress_channel import CanalProgresso
+
+# Linhas mantidas na tela (as mais antigas saem)
+MAX_LINHAS = 5000
+# Intervalo entre drenagens do canal
+INTERVALO_MS = 100
+
+
+class LogView(QPlainTextEdit):
+    """
+    Log somente leitura com limite de linhas.
+
+    O QPlainTextEdit só faz o layout dos blocos visíveis e, com
+    `setMaximumBlockCount`, descarta as linhas mais antigas; as mensagens do
+    worker chegam a cada INTERVALO_MS num único `appendPlainText`.
+
+    Usage:
+        log_view = LogView("As mensagens aparecerão aqui...")
+        log_view.acompanhar(worker.canal)
+        log_view.andamento.connect(atualizar_barra)
+    """
+
+    andamento = pyqtSignal(dict)  # Último andamento do canal (feitos, total, taxa, eta_segundos)
+
+    def __init__(self, placeholder: str = "", max_linhas: int = MAX_LINHAS, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setMaximumBlockCount(max_linhas)
+        if placeholder:
+            self.setPlaceholderText(placeholder)
+        self._canal = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(INTERVALO_MS)
+        self._timer.timeout.connect(self.descarregar)
+
+    def acompanhar(self, canal: CanalProgresso):
+        """Passa a drenar `canal` periodicamente (substitui o canal anterior)."""
+        self.descarregar()
+        self._canal = canal
+        self._timer.start()
+
+    def descarregar(self):
+        """Escreve as linhas pendentes do canal e emite o andamento, se mudou."""
+        if self._canal is None:
+            return
+        linhas, descartadas, andamento = self._canal.drenar()
+        if descartadas:
+            linhas.insert(0, f"… {descartadas} linha(s) de log omitida(s) …")
+        if linhas:
+            self.appendPlainText("\n".join(linhas))
+        if andamento is not None:
+            self.andamento.emit(andamento)
+
+    def append(self, texto: str):
+        """Mensagem da própria página, depois das pendentes do worker."""
+        self.descarregar()
+        self.appendPlainText(texto)
+
+    def parar(self):
+        """Drena o que restou e deixa de acompanhar o canal."""
+        self.descarregar()
+        self._timer.stop()
+        self._canal = None
@@ -1,16 +1,17 @@
 """
 Glox - Página de Consulta de Faturas
 
-Permite buscar faturas por número e visualizar status/histórico.
+Permite buscar faturas por número, Unimed ou responsável (busca enquanto
+digita, com paginação) e visualizar status/histórico.
 Também permite importar dados de planilhas Excel.
 """
 
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, 
     QLineEdit, QFrame, QScrollArea, QFileDialog, QMessageBox,
-    QProgressBar
+    QProgressBar, QListWidget, QListWidgetItem
 )
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
+from PyQt6.QtCore import Qt, QThread, QTimer, pyqtSignal
 from PyQt6.QtGui import QFont
 import os
 
@@ -25,6 +26,10 @@ STATUS_COLORS = {
     'GLOSADA': '#9C27B0'
 }
 
+# Busca enquanto digita
+DEBOUNCE_BUSCA_MS = 250
+RESULTADOS_POR_PAGINA = 20
+
 
 class ImportWorker(QThread):
     """Worker para importação em background"""
@@ -59,6 +64,8 @@ class PaginaConsultaFaturas(QWidget):
     
     def __init__(self):
         super().__init__()
+        self.pagina_atual = 1
+        self.total_resultados = 0
         self.setup_ui()
     
     def setup_ui(self):
@@ -80,7 +87,7 @@ class PaginaConsultaFaturas(QWidget):
         search_layout.setSpacing(10)
         
         self.input_fatura = QLineEdit()
-        self.input_fatura.setPlaceholderText("Digite o número da fatura...")
+        self.input_fatura.setPlaceholderText("Digite o número da fatura, Unimed ou responsável...")
         self.input_fatura.setStyleSheet(f"""
             QLineEdit {{
                 padding: 15px 20px;
@@ -97,6 +104,13 @@ class PaginaConsultaFaturas(QWidget):
         self.input_fatura.returnPressed.connect(self.buscar_fatura)
         search_layout.addWidget(self.input_fatura, 1)
         
+        # Debounce: só pesquisa após uma pausa na digitação
+        self.timer_busca = QTimer(self)
+        self.timer_busca.setSingleShot(True)
+        self.timer_busca.setInterval(DEBOUNCE_BUSCA_MS)
+        self.timer_busca.timeout.connect(lambda: self.pesquisar(pagina=1))
+        self.input_fatura.textChanged.connect(lambda _: self.timer_busca.start())
+        
         btn_buscar = QPushButton("🔎 Buscar")
         btn_buscar.setStyleSheet(f"""
             QPushButton {{
@@ -117,6 +131,45 @@ class PaginaConsultaFaturas(QWidget):
         
         layout.addLayout(search_layout)
         
+        # Lista de resultados da busca enquanto digita
+        self.lista_resultados = QListWidget()
+        self.lista_resultados.setMaximumHeight(180)
+        self.lista_resultados.setStyleSheet(f"""
+            QListWidget {{
+                background: #2E3440;
+                color: #D8DEE9;
+                border: 1px solid #3B4252;
+                border-radius: 8px;
+                font-size: 13px;
+            }}
+            QListWidget::item:selected {{
+                background: {UNIMED_GREEN};
+                color: white;
+            }}
+        """)
+        self.lista_resultados.itemActivated.connect(self.selecionar_resultado)
+        self.lista_resultados.itemClicked.connect(self.selecionar_resultado)
+        self.lista_resultados.hide()
+        layout.addWidget(self.lista_resultados)
+        
+        # Paginação
+        paginacao_layout = QHBoxLayout()
+        self.btn_anterior = QPushButton("◀ Anterior")
+        self.btn_anterior.clicked.connect(lambda: self.pesquisar(self.pagina_atual - 1))
+        paginacao_layout.addWidget(self.btn_anterior)
+        self.lbl_paginacao = QLabel()
+        self.lbl_paginacao.setStyleSheet("color: #88C0D0; font-size: 12px;")
+        self.lbl_paginacao.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        paginacao_layout.addWidget(self.lbl_paginacao, 1)
+        self.btn_proxima = QPushButton("Próxima ▶")
+        self.btn_proxima.clicked.connect(lambda: self.pesquisar(self.pagina_atual + 1))
+        paginacao_layout.addWidget(self.btn_proxima)
+        
+        self.paginacao_frame = QFrame()
+        self.paginacao_frame.setLayout(paginacao_layout)
+        self.paginacao_frame.hide()
+        layout.addWidget(self.paginacao_frame)
+        
         # Área de resultado
         self.resultado_frame = QFrame()
         self.resultado_frame.setStyleSheet("""
@@ -246,12 +299,65 @@ class PaginaConsultaFaturas(QWidget):
         
         layout.addLayout(action_layout)
     
+    def pesquisar(self, pagina=1):
+        """Pesquisa faturas pelo texto digitado e preenche a lista paginada"""
+        termo = self.input_fatura.text().strip()
+        if not termo:
+            self.lista_resultados.clear()
+            self.lista_resultados.hide()
+            self.paginacao_frame.hide()
+            return
+        
+        from src.database.fatura_repository import pesquisar_faturas
+        resultado = pesquisar_faturas(termo, pagina=max(1, pagina), por_pagina=RESULTADOS_POR_PAGINA)
+        
+        self.pagina_atual = resultado['pagina']
+        self.total_resultados = resultado['total']
+        
+        self.lista_resultados.clear()
+        for fatura in resultado['resultados']:
+            texto = (f"{fatura['nro_fatura']}  •  {fatura.get('status_emoji', '')} {fatura['status']}"
+                     f"  •  {fatura.get('unimed') or 'N/A'}  •  {fatura.get('responsavel') or '-'}")
+            item = QListWidgetItem(texto)
+            item.setData(Qt.ItemDataRole.UserRole, fatura['nro_fatura'])
+            self.lista_resultados.addItem(item)
+        
+        total_paginas = max(1, -(-self.total_resultados // RESULTADOS_POR_PAGINA))
+        if resultado['total_exato']:
+            self.lbl_paginacao.setText(
+                f"{self.total_resultados:,} resultado(s) - página {self.pagina_atual} de {total_paginas}"
+            )
+        else:
+            self.lbl_paginacao.setText(
+                f"mais de {self.total_resultados:,} resultado(s) - página {self.pagina_atual}"
+            )
+        self.btn_anterior.setEnabled(self.pagina_atual > 1)
+        self.btn_proxima.setEnabled(self.pagina_atual < total_paginas)
+        
+        self.lista_resultados.setVisible(self.total_resultados > 0)
+        self.paginacao_frame.setVisible(self.total_resultados > 0)
+    
+    def selecionar_resultado(self, item):
+        """Exibe os detalhes da fatura selecionada na lista"""
+        numero = item.data(Qt.ItemDataRole.UserRole)
+        
+        from src.database.fatura_repository import buscar_fatura
+        resultado = buscar_fatura(numero)
+        
+        if resultado:
+            self.exibir_resultado(resultado)
+        else:
+            self.exibir_nao_encontrado(numero)
+    
     def buscar_fatura(self):
         """Busca fatura pelo número digitado"""
         numero = self.input_fatura.text().strip()
         if not numero:
             return
         
+        self.timer_busca.stop()
+        self.pesquisar(pagina=1)
+        
         from src.database.fatura_repository import buscar_fatura
         resultado = buscar_fatura(numero)
         
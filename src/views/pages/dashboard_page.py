@@ -10,6 +10,7 @@ import matplotlib
 matplotlib.use('Qt5Agg')
 
 from src.database import db_manager
+from src.infrastructure.workers.job_scheduler import obter_agendador
 
 # ===== CORES UNIMED =====
 UNIMED_GREEN = "#00A859"
@@ -28,6 +29,27 @@ ACCENT_PURPLE = "#A371F7"
 ACCENT_YELLOW = "#F0C53E"
 ACCENT_RED = "#F85149"
 
+# Cor do status das tarefas em segundo plano
+CORES_STATUS_TAREFA = {
+    'EXECUTANDO': ACCENT_BLUE,
+    'PENDENTE': ACCENT_YELLOW,
+    'CONCLUIDO': UNIMED_GREEN,
+    'FALHOU': ACCENT_RED,
+    'CANCELADO': TEXT_SECONDARY,
+}
+# Linhas exibidas na tabela de tarefas
+MAX_TAREFAS_EXIBIDAS = 20
+
+
+def formatar_segundos(segundos):
+    """'--', '0.4s', '12s' ou '3min 05s'"""
+    if segundos is None:
+        return "--"
+    if segundos < 10:
+        return f"{segundos:.1f}s"
+    minutos, resto = divmod(int(round(segundos)), 60)
+    return f"{minutos}min {resto:02d}s" if minutos else f"{resto}s"
+
 
 class ModernKPICard(QFrame):
     """Card KPI moderno com efeito glassmorphism e gradiente"""
@@ -520,6 +542,29 @@ class PaginaDashboard(QWidget):
         auditor_section.add_content(self.auditor_table)
         layout.addWidget(auditor_section)
         
+        # ===== SEÇÃO TAREFAS EM SEGUNDO PLANO =====
+        tarefas_section = ModernSectionCard("Tarefas em Segundo Plano", "⏱")
+        
+        self.tarefas_table = QTableWidget()
+        self.tarefas_table.setColumnCount(5)
+        self.tarefas_table.setHorizontalHeaderLabels(["Tarefa", "Status", "Espera", "Duração", "Início"])
+        self.tarefas_table.verticalHeader().setVisible(False)
+        self.tarefas_table.setSelectionMode(QTableWidget.SelectionMode.NoSelection)
+        self.tarefas_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.tarefas_table.setShowGrid(False)
+        self.tarefas_table.setMaximumHeight(240)
+        
+        tarefas_header = self.tarefas_table.horizontalHeader()
+        tarefas_header.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        for coluna in range(1, 5):
+            tarefas_header.setSectionResizeMode(coluna, QHeaderView.ResizeMode.Fixed)
+            self.tarefas_table.setColumnWidth(coluna, 110)
+        
+        self.tarefas_table.setStyleSheet(self.auditor_table.styleSheet())
+        
+        tarefas_section.add_content(self.tarefas_table)
+        layout.addWidget(tarefas_section)
+        
         # ===== RODAPÉ COM STATUS =====
         footer_layout = QHBoxLayout()
         footer_layout.setSpacing(20)
@@ -643,6 +688,8 @@ class PaginaDashboard(QWidget):
         except Exception as e:
             print(f"Erro ao carregar auditores: {e}")
         
+        self.carregar_tarefas()
+        
         # Atualizar timestamp
         self.last_update_lbl.setText(f"Última atualização: {datetime.now().strftime('%H:%M:%S')}")
 
@@ -740,6 +787,33 @@ class PaginaDashboard(QWidget):
         self.figure.tight_layout()
         self.canvas.draw()
     
+    def carregar_tarefas(self):
+        """Tabela de tarefas do agendador: em execução, na fila e as últimas terminadas."""
+        agendador = obter_agendador()
+        tarefas = (agendador.executando() + agendador.pendentes() + agendador.historico())[:MAX_TAREFAS_EXIBIDAS]
+        
+        self.tarefas_table.setRowCount(len(tarefas))
+        for row, tarefa in enumerate(tarefas):
+            item_nome = QTableWidgetItem(tarefa['nome'])
+            item_nome.setForeground(QColor(TEXT_PRIMARY))
+            if tarefa['erro']:
+                item_nome.setToolTip(tarefa['erro'])
+            self.tarefas_table.setItem(row, 0, item_nome)
+            
+            item_status = QTableWidgetItem(tarefa['status'].capitalize())
+            item_status.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
+            item_status.setForeground(QColor(CORES_STATUS_TAREFA.get(tarefa['status'], TEXT_SECONDARY)))
+            self.tarefas_table.setItem(row, 1, item_status)
+            
+            valores = (formatar_segundos(tarefa['espera_segundos']),
+                       formatar_segundos(tarefa['duracao_segundos']),
+                       tarefa['criada_em'].strftime('%H:%M:%S'))
+            for coluna, valor in enumerate(valores, 2):
+                item = QTableWidgetItem(valor)
+                item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
+                item.setForeground(QColor(TEXT_SECONDARY))
+                self.tarefas_table.setItem(row, coluna, item)
+
     def resetar_dados(self):
         """Reseta os dados de estatísticas após confirmação do usuário"""
         from PyQt6.QtWidgets import QMessageBox
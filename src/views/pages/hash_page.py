@@ -5,11 +5,13 @@ Seleciona auditor e arquivos para recalcular hashes e recriar ZIPs.
 import os
 import glob
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-                             QPushButton, QTextEdit, QInputDialog,
+                             QPushButton, QInputDialog,
                              QMessageBox, QCheckBox, QScrollArea, QFrame)
-from PyQt6.QtCore import Qt, QThread
+from PyQt6.QtCore import Qt
 
 from src.infrastructure.workers.worker import Worker
+from src.infrastructure.workers.job_scheduler import recurso_pasta
+from src.views.components.log_view import LogView
 from src.ui_helpers import show_friendly_error, show_toast, show_warning
 
 
@@ -17,7 +19,6 @@ class PaginaHash(QWidget):
     def __init__(self, controller):
         super().__init__()
         self.controller = controller
-        self.worker_thread = None
         self.worker = None
         self.checkboxes = []
 
@@ -87,13 +88,17 @@ class PaginaHash(QWidget):
         self.btn_atualizar_hash.setToolTip("Atualiza hash apenas dos arquivos selecionados")
         self.btn_atualizar_hash.clicked.connect(self.iniciar_atualizacao_hash)
 
+        self.btn_cancelar = QPushButton("Cancelar")
+        self.btn_cancelar.setToolTip("Interrompe a atualização após o arquivo atual")
+        self.btn_cancelar.setMinimumHeight(44)
+        self.btn_cancelar.setVisible(False)
+        self.btn_cancelar.clicked.connect(self.cancelar_tarefa)
+
         # Log
         log_label = QLabel("Log da Atualização de Hash:")
         log_label.setObjectName("section_title")
 
-        self.log_area = QTextEdit()
-        self.log_area.setReadOnly(True)
-        self.log_area.setPlaceholderText("O progresso da atualização aparecerá aqui...")
+        self.log_area = LogView("O progresso da atualização aparecerá aqui...")
 
         # Montar layout
         layout.addLayout(auditor_layout)
@@ -102,6 +107,7 @@ class PaginaHash(QWidget):
         layout.addLayout(selection_buttons_layout)
         layout.addWidget(self.selection_counter)
         layout.addWidget(self.btn_atualizar_hash)
+        layout.addWidget(self.btn_cancelar)
         layout.addWidget(log_label)
         layout.addWidget(self.log_area, 1)
 
@@ -201,22 +207,29 @@ class PaginaHash(QWidget):
         self.btn_atualizar_hash.setEnabled(False)
         self.btn_select_all.setEnabled(False)
         self.btn_clear_all.setEnabled(False)
+        self.btn_cancelar.setVisible(True)
+        self.btn_cancelar.setEnabled(True)
 
-        self.worker_thread = QThread()
+        pasta = self.controller.pasta_faturas_importadas_atual
         self.worker = Worker(
             self.controller.executar_atualizacao_hash,
             nome_auditor,
-            arquivos_selecionados
+            arquivos_selecionados,
+            nome=f"Atualização de hash ({nome_auditor})",
+            recursos=(recurso_pasta(pasta), 'disco') if pasta else ('disco',)
         )
-        self.worker.moveToThread(self.worker_thread)
-
-        self.worker_thread.started.connect(self.worker.run)
         self.worker.finished.connect(self.on_task_finished)
         self.worker.error.connect(self.on_task_error)
-        self.worker.progress.connect(self.log_area.append)
-        self.worker_thread.start()
+        self.log_area.acompanhar(self.worker.canal)
+        self.worker.iniciar()
+
+    def cancelar_tarefa(self):
+        if self.worker is not None and self.worker.cancelar():
+            self.btn_cancelar.setEnabled(False)
+            self.log_area.append("⚠ AVISO: Cancelamento solicitado; a atualização para após o arquivo atual.")
 
     def on_task_finished(self, result):
+        self.log_area.parar()
         if result and isinstance(result, tuple):
             sucesso, mensagem = result
             icon = "✓" if sucesso else "✗"
@@ -230,12 +243,10 @@ class PaginaHash(QWidget):
         self.btn_atualizar_hash.setEnabled(True)
         self.btn_select_all.setEnabled(True)
         self.btn_clear_all.setEnabled(True)
-
-        if self.worker_thread is not None:
-            self.worker_thread.quit()
-            self.worker_thread.wait()
+        self.btn_cancelar.setVisible(False)
 
     def on_task_error(self, error_str):
+        self.log_area.parar()
         self.log_area.append(f"✗ ERRO CRÍTICO: {error_str}")
         show_friendly_error(
             self,
@@ -247,7 +258,4 @@ class PaginaHash(QWidget):
         self.btn_atualizar_hash.setEnabled(True)
         self.btn_select_all.setEnabled(True)
         self.btn_clear_all.setEnabled(True)
-
-        if self.worker_thread is not None:
-            self.worker_thread.quit()
-            self.worker_thread.wait()
+        self.btn_cancelar.setVisible(False)
@@ -4,11 +4,14 @@ Importa, distribui e prepara arquivos XML para correção.
 """
 import os
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-                             QPushButton, QTextEdit, QProgressBar,
+                             QPushButton, QProgressBar,
                              QFileDialog, QInputDialog)
-from PyQt6.QtCore import Qt, QThread
+from PyQt6.QtCore import Qt
 
 from src.infrastructure.workers.worker import Worker
+from src.infrastructure.workers.job_scheduler import recurso_pasta
+from src.infrastructure.workers.progress_channel import formatar_andamento
+from src.views.components.log_view import LogView
 from src.ui_helpers import show_friendly_error, show_toast, show_warning
 from src.app_settings import app_settings
 from src.drag_drop_widgets import DragDropLineEdit
@@ -18,7 +21,6 @@ class PaginaProcessador(QWidget):
     def __init__(self, controller):
         super().__init__()
         self.controller = controller
-        self.worker_thread = None
         self.worker = None
 
         layout = QVBoxLayout(self)
@@ -77,6 +79,12 @@ class PaginaProcessador(QWidget):
         botoes_layout.addWidget(self.btn_iniciar_distribuicao)
         botoes_layout.addWidget(self.btn_preparar_correcao)
 
+        self.btn_cancelar = QPushButton("Cancelar")
+        self.btn_cancelar.setToolTip("Interrompe a tarefa em andamento após o arquivo atual")
+        self.btn_cancelar.setMinimumHeight(44)
+        self.btn_cancelar.setVisible(False)
+        botoes_layout.addWidget(self.btn_cancelar)
+
         self.btn_iniciar_distribuicao.setEnabled(False)
         self.btn_preparar_correcao.setEnabled(False)
 
@@ -84,9 +92,8 @@ class PaginaProcessador(QWidget):
         log_label = QLabel("Log de Execução:")
         log_label.setObjectName("section_title")
 
-        self.log_area = QTextEdit()
-        self.log_area.setReadOnly(True)
-        self.log_area.setPlaceholderText("As mensagens de execução aparecerão aqui...")
+        self.log_area = LogView("As mensagens de execução aparecerão aqui...")
+        self.log_area.andamento.connect(self.atualizar_andamento)
 
         layout.addLayout(selecao_layout)
         layout.addLayout(botoes_layout)
@@ -98,10 +105,16 @@ class PaginaProcessador(QWidget):
         self.btn_iniciar_importacao.clicked.connect(self.iniciar_importacao)
         self.btn_iniciar_distribuicao.clicked.connect(self.iniciar_distribuicao)
         self.btn_preparar_correcao.clicked.connect(self.iniciar_preparacao_correcao)
+        self.btn_cancelar.clicked.connect(self.cancelar_tarefa)
 
     def log_message(self, message):
         self.log_area.append(message)
 
+    def atualizar_andamento(self, andamento):
+        self.progress_bar.setRange(0, max(andamento['total'], 1))
+        self.progress_bar.setValue(andamento['feitos'])
+        self.progress_bar.setFormat(formatar_andamento(andamento))
+
     def set_ui_enabled(self, enabled):
         self.btn_iniciar_importacao.setEnabled(enabled)
         faturas_processadas = bool(self.controller.lista_faturas_processadas)
@@ -109,6 +122,8 @@ class PaginaProcessador(QWidget):
         distribuicao_feita = bool(self.controller.plano_ultima_distribuicao)
         self.btn_preparar_correcao.setEnabled(distribuicao_feita and enabled)
         self.progress_bar.setVisible(not enabled)
+        self.btn_cancelar.setVisible(not enabled)
+        self.btn_cancelar.setEnabled(not enabled)
 
     def selecionar_pasta(self):
         last_folder = app_settings.get_last_folder("processador_faturas", "")
@@ -119,10 +134,18 @@ class PaginaProcessador(QWidget):
             self.caminho_pasta_edit.setText(caminho_pasta)
             self.log_message(f"✓ INFO: Pasta selecionada: {caminho_pasta}")
             app_settings.save_last_folder("processador_faturas", caminho_pasta)
+            self._restaurar_estado(caminho_pasta)
 
     def _on_folder_dropped(self, folder_path):
         self.log_message(f"✓ INFO: Pasta selecionada via drag & drop: {folder_path}")
         app_settings.save_last_folder("processador_faturas", folder_path)
+        self._restaurar_estado(folder_path)
+
+    def _restaurar_estado(self, caminho_pasta):
+        # Importação anterior da pasta (cache de importação): libera distribuição/correção sem reimportar
+        restaurado, _ = self.controller.restaurar_estado_importacao(caminho_pasta, self.log_message)
+        if restaurado:
+            self.set_ui_enabled(True)
 
     def iniciar_importacao(self):
         caminho_pasta = self.caminho_pasta_edit.text()
@@ -136,15 +159,8 @@ class PaginaProcessador(QWidget):
         self.progress_bar.setRange(0, 0)
         self.set_ui_enabled(False)
 
-        self.worker_thread = QThread()
-        self.worker = Worker(self.controller.processar_importacao_faturas, caminho_pasta)
-        self.worker.moveToThread(self.worker_thread)
-
-        self.worker_thread.started.connect(self.worker.run)
-        self.worker.finished.connect(self.on_task_finished)
-        self.worker.error.connect(self.on_task_error)
-        self.worker.progress.connect(self.log_message)
-        self.worker_thread.start()
+        self._executar("Importação de faturas", caminho_pasta,
+                       self.controller.processar_importacao_faturas, caminho_pasta)
 
     def iniciar_distribuicao(self):
         nomes_str, ok = QInputDialog.getText(
@@ -160,15 +176,8 @@ class PaginaProcessador(QWidget):
             self.progress_bar.setRange(0, 0)
             self.set_ui_enabled(False)
 
-            self.worker_thread = QThread()
-            self.worker = Worker(self.controller.preparar_distribuicao_faturas, nomes_auditores)
-            self.worker.moveToThread(self.worker_thread)
-
-            self.worker_thread.started.connect(self.worker.run)
-            self.worker.finished.connect(self.on_task_finished)
-            self.worker.error.connect(self.on_task_error)
-            self.worker.progress.connect(self.log_message)
-            self.worker_thread.start()
+            self._executar("Distribuição de faturas", self.controller.pasta_faturas_importadas_atual,
+                           self.controller.preparar_distribuicao_faturas, nomes_auditores)
         else:
             self.log_message("⚠ AVISO: Distribuição cancelada pelo usuário.")
 
@@ -189,17 +198,26 @@ class PaginaProcessador(QWidget):
             self.progress_bar.setRange(0, 0)
             self.set_ui_enabled(False)
 
-            self.worker_thread = QThread()
-            self.worker = Worker(self.controller.preparar_xmls_para_correcao, nome_auditor)
-            self.worker.moveToThread(self.worker_thread)
+            self._executar(f"Preparação para correção ({nome_auditor})",
+                           self.controller.pasta_faturas_importadas_atual,
+                           self.controller.preparar_xmls_para_correcao, nome_auditor)
+
+    def _executar(self, nome, pasta, fn, *args):
+        """Submete a ação ao agendador da aplicação (uma tarefa por vez na mesma pasta)."""
+        recursos = (recurso_pasta(pasta), 'disco') if pasta else ('disco',)
+        self.worker = Worker(fn, *args, nome=nome, recursos=recursos)
+        self.worker.finished.connect(self.on_task_finished)
+        self.worker.error.connect(self.on_task_error)
+        self.log_area.acompanhar(self.worker.canal)
+        self.worker.iniciar()
 
-            self.worker_thread.started.connect(self.worker.run)
-            self.worker.finished.connect(self.on_task_finished)
-            self.worker.error.connect(self.on_task_error)
-            self.worker.progress.connect(self.log_message)
-            self.worker_thread.start()
+    def cancelar_tarefa(self):
+        if self.worker is not None and self.worker.cancelar():
+            self.btn_cancelar.setEnabled(False)
+            self.log_message("⚠ AVISO: Cancelamento solicitado; a tarefa para após o arquivo atual.")
 
     def on_task_finished(self, result=None):
+        self.log_area.parar()
         if result:
             sucesso, mensagem = result if isinstance(result, tuple) else (True, result)
             icon = "✓" if sucesso else "✗"
@@ -214,11 +232,9 @@ class PaginaProcessador(QWidget):
             show_toast(self, "Tarefa concluída!", "success", 3000)
 
         self.set_ui_enabled(True)
-        if self.worker_thread is not None:
-            self.worker_thread.quit()
-            self.worker_thread.wait()
 
     def on_task_error(self, error_str):
+        self.log_area.parar()
         self.log_message(f"✗ ERRO CRÍTICO: {error_str}")
         show_friendly_error(
             self,
@@ -228,6 +244,3 @@ class PaginaProcessador(QWidget):
             error_str
         )
         self.set_ui_enabled(True)
-        if self.worker_thread is not None:
-            self.worker_thread.quit()
-            self.worker_thread.wait()
@@ -4,10 +4,13 @@ Valida regras de negócio, estrutura XSD e internações curtas.
 """
 import os
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-                             QPushButton, QTextEdit, QFileDialog)
-from PyQt6.QtCore import Qt, QThread
+                             QPushButton, QProgressBar, QFileDialog)
+from PyQt6.QtCore import Qt
 
 from src.infrastructure.workers.worker import Worker
+from src.infrastructure.workers.job_scheduler import recurso_pasta
+from src.infrastructure.workers.progress_channel import formatar_andamento
+from src.views.components.log_view import LogView
 from src.ui_helpers import show_friendly_error, show_toast, show_warning
 from src.app_settings import app_settings
 from src.drag_drop_widgets import DragDropLineEdit
@@ -17,7 +20,6 @@ class PaginaValidador(QWidget):
     def __init__(self, controller):
         super().__init__()
         self.controller = controller
-        self.worker_thread = None
         self.worker = None
 
         layout = QVBoxLayout(self)
@@ -29,6 +31,12 @@ class PaginaValidador(QWidget):
         titulo.setObjectName("titulo_pagina")
         layout.addWidget(titulo)
 
+        # Barra de progresso (andamento informado pelo controller)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        self.progress_bar.setTextVisible(True)
+        layout.addWidget(self.progress_bar)
+
         # Seleção de pasta
         selecao_layout = QHBoxLayout()
         selecao_layout.setSpacing(8)
@@ -70,13 +78,18 @@ class PaginaValidador(QWidget):
         botoes_layout.addWidget(self.btn_validar_xsd)
         botoes_layout.addWidget(self.btn_verificar_internacao)
 
+        self.btn_cancelar = QPushButton("Cancelar")
+        self.btn_cancelar.setToolTip("Interrompe a validação após o arquivo atual")
+        self.btn_cancelar.setMinimumHeight(44)
+        self.btn_cancelar.setVisible(False)
+        botoes_layout.addWidget(self.btn_cancelar)
+
         # Log
         log_label = QLabel("Log da Validação:")
         log_label.setObjectName("section_title")
 
-        self.log_area = QTextEdit()
-        self.log_area.setReadOnly(True)
-        self.log_area.setPlaceholderText("Os resultados da validação aparecerão aqui...")
+        self.log_area = LogView("Os resultados da validação aparecerão aqui...")
+        self.log_area.andamento.connect(self.atualizar_andamento)
 
         layout.addLayout(selecao_layout)
         layout.addLayout(botoes_layout)
@@ -88,6 +101,7 @@ class PaginaValidador(QWidget):
         self.btn_iniciar_validacao.clicked.connect(self.iniciar_validacao)
         self.btn_validar_xsd.clicked.connect(self.iniciar_validacao_xsd)
         self.btn_verificar_internacao.clicked.connect(self.iniciar_verificacao_internacao_curta)
+        self.btn_cancelar.clicked.connect(self.cancelar_tarefa)
 
     def selecionar_pasta(self):
         pasta_sugerida = os.path.join(self.controller.pasta_faturas_importadas_atual or "", "Correção XML")
@@ -115,15 +129,7 @@ class PaginaValidador(QWidget):
         self.log_area.append("⏳ INFO: Iniciando validação de regras (lógica)...")
         self._disable_buttons()
 
-        self.worker_thread = QThread()
-        self.worker = Worker(self.controller.executar_validacao_xmls, caminho_pasta)
-        self.worker.moveToThread(self.worker_thread)
-
-        self.worker_thread.started.connect(self.worker.run)
-        self.worker.finished.connect(self.on_task_finished)
-        self.worker.error.connect(self.on_task_error)
-        self.worker.progress.connect(self.log_area.append)
-        self.worker_thread.start()
+        self._executar("Validação de regras", caminho_pasta, self.controller.executar_validacao_xmls)
 
     def iniciar_validacao_xsd(self):
         caminho_pasta = self.caminho_pasta_edit.text()
@@ -136,15 +142,7 @@ class PaginaValidador(QWidget):
         self.log_area.append("⏳ INFO: Iniciando validação de estrutura (XSD)...")
         self._disable_buttons()
 
-        self.worker_thread = QThread()
-        self.worker = Worker(self.controller.validar_pasta_com_xsd, caminho_pasta)
-        self.worker.moveToThread(self.worker_thread)
-
-        self.worker_thread.started.connect(self.worker.run)
-        self.worker.finished.connect(self.on_task_finished)
-        self.worker.error.connect(self.on_task_error)
-        self.worker.progress.connect(self.log_area.append)
-        self.worker_thread.start()
+        self._executar("Validação XSD", caminho_pasta, self.controller.validar_pasta_com_xsd)
 
     def iniciar_verificacao_internacao_curta(self):
         caminho_pasta = self.caminho_pasta_edit.text()
@@ -157,22 +155,39 @@ class PaginaValidador(QWidget):
         self.log_area.append("⏳ INFO: Iniciando verificação de internações curtas...")
         self._disable_buttons()
 
-        self.worker_thread = QThread()
-        self.worker = Worker(self.controller.executar_verificacao_internacao_curta, caminho_pasta)
-        self.worker.moveToThread(self.worker_thread)
+        self._executar("Verificação de internações curtas", caminho_pasta,
+                       self.controller.executar_verificacao_internacao_curta)
 
-        self.worker_thread.started.connect(self.worker.run)
+    def _executar(self, nome, caminho_pasta, fn):
+        """Submete a ação ao agendador: ações na mesma pasta esperam umas pelas outras."""
+        self.worker = Worker(fn, caminho_pasta, nome=nome, recursos=(recurso_pasta(caminho_pasta), 'disco'))
         self.worker.finished.connect(self.on_task_finished)
         self.worker.error.connect(self.on_task_error)
-        self.worker.progress.connect(self.log_area.append)
-        self.worker_thread.start()
+        self.log_area.acompanhar(self.worker.canal)
+        self.worker.iniciar()
+
+    def cancelar_tarefa(self):
+        if self.worker is not None and self.worker.cancelar():
+            self.btn_cancelar.setEnabled(False)
+            self.log_area.append("⚠ AVISO: Cancelamento solicitado; a validação para após o arquivo atual.")
+
+    def atualizar_andamento(self, andamento):
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setRange(0, max(andamento['total'], 1))
+        self.progress_bar.setValue(andamento['feitos'])
+        self.progress_bar.setFormat(formatar_andamento(andamento))
 
     def _disable_buttons(self):
+        self.btn_cancelar.setVisible(True)
+        self.btn_cancelar.setEnabled(True)
         self.btn_iniciar_validacao.setEnabled(False)
         self.btn_validar_xsd.setEnabled(False)
         self.btn_verificar_internacao.setEnabled(False)
 
     def _enable_buttons(self):
+        self.log_area.parar()
+        self.progress_bar.setVisible(False)
+        self.btn_cancelar.setVisible(False)
         self.btn_iniciar_validacao.setEnabled(True)
         self.btn_validar_xsd.setEnabled(True)
         self.btn_verificar_internacao.setEnabled(True)
@@ -188,9 +203,6 @@ class PaginaValidador(QWidget):
             show_toast(self, "Validação concluída com erros", "warning", 3000)
 
         self._enable_buttons()
-        if self.worker_thread is not None:
-            self.worker_thread.quit()
-            self.worker_thread.wait()
 
     def on_task_error(self, error_str):
         self.log_area.append(f"✗ ERRO CRÍTICO: {error_str}")
@@ -202,6 +214,3 @@ class PaginaValidador(QWidget):
             error_str
         )
         self._enable_buttons()
-        if self.worker_thread is not None:
-            self.worker_thread.quit()
-            self.worker_thread.wait()
@@ -11,13 +11,24 @@ from src import data_manager
 from src.business.processing import distribution_engine
 from src.business.processing import hash_calculator
 from src.business.rules import rule_engine
+from src.business.rules import feature_index
+from src.business.rules import streaming_engine
+from src.infrastructure.files import change_journal
 from src.infrastructure.files import file_manager
+from src.infrastructure.files.alert_spool import AlertSpool
 from src.infrastructure.reports import report_generator
 from src.infrastructure.parsers import xml_parser
 from .database import db_manager
+from .database import feature_repository
+from .database import importacao_repository
+from .database import job_repository
 from .models.repositories.execution_repository import ExecutionRepository
 
 
+# Schema PTU usado na validação estrutural
+CAMINHO_XSD = os.path.join(os.path.dirname(__file__), "schemas", "ptu_CobrancaUtilizacao.xsd")
+
+
 def calculate_file_hash(file_path: str) -> str:
     """Calcula o hash MD5 do conteúdo de um arquivo."""
     with open(file_path, 'rb') as f:
@@ -38,6 +49,8 @@ class WorkflowController:
         data_manager.carregar_dados_unimed()
         data_manager.carregar_codigos_hm_tabela00_a_ignorar()
         self.codigos_hm_t00_a_ignorar = data_manager.get_codigos_hm_tabela00_a_ignorar()
+        self.parametros_importacao = importacao_repository.assinatura_parametros(
+            self.VALOR_MINIMO_GUIA, self.codigos_hm_t00_a_ignorar)
 
     def _log(self, message: str, log_callback: Optional[Callable[[str], None]] = None) -> None:
         """Método auxiliar para logging consistente."""
@@ -47,7 +60,9 @@ class WorkflowController:
             print(message)
 
     def processar_importacao_faturas(self, caminho_pasta_selecionada: str,
-                                     log_callback: Optional[Callable[[str], None]] = None) -> tuple[bool, str]:
+                                     log_callback: Optional[Callable[[str], None]] = None,
+                                     progress_callback: Optional[Callable[[int, int], None]] = None,
+                                     cancel_check: Optional[Callable[[], bool]] = None) -> tuple[bool, str]:
         log = lambda msg: self._log(msg, log_callback)
         
         self.pasta_faturas_importadas_atual = caminho_pasta_selecionada
@@ -64,54 +79,139 @@ class WorkflowController:
         if not arquivos_zip:
             return False, "Nenhum arquivo .zip encontrado na pasta selecionada."
 
+        # Backup de todos os ZIPs de uma vez; em importar_fatura resta só a verificação de existência
+        file_manager.fazer_backup_faturas(arquivos_zip, pasta_backup, log_callback=log)
+
         pasta_temp = tempfile.mkdtemp(prefix="audit_")
+        cancelado = False
         try:
             for i, caminho_zip in enumerate(arquivos_zip):
+                if cancel_check and cancel_check():
+                    log(f"AVISO: Importação cancelada após {i} de {len(arquivos_zip)} arquivo(s).")
+                    cancelado = True
+                    break
                 nome_arquivo = os.path.basename(caminho_zip)
                 log(f"INFO: Processando fatura {i+1}/{len(arquivos_zip)}: {nome_arquivo}")
-                
-                file_manager.fazer_backup_fatura(caminho_zip, pasta_backup)
-
-                caminho_xml_extraido = file_manager.extrair_xml_fatura_do_zip(caminho_zip, pasta_temp)
-                if not caminho_xml_extraido:
-                    log(f"AVISO: Nenhum arquivo .051 encontrado em '{nome_arquivo}'. Pulando.")
-                    continue
-
-                dados_fatura = xml_parser.extrair_dados_fatura_xml(caminho_xml_extraido)
-                if not dados_fatura:
-                    log(f"AVISO: Falha ao ler XML para '{nome_arquivo}'. Pulando.")
-                    continue
-
-                dados_fatura['nome_zip'] = nome_arquivo
-                dados_fatura['caminho_zip_original'] = caminho_zip
-
-                cod_unimed = dados_fatura.get('codigo_unimed_destino')
-                if cod_unimed:
-                    nome_unimed = data_manager.obter_nome_unimed(cod_unimed)
-                    dados_fatura['nome_unimed_destino'] = nome_unimed
-                    log(f"  Unimed Destino: {cod_unimed} - {nome_unimed}")
-
-                num_fatura = dados_fatura.get('numero_fatura')
-                if num_fatura:
-                    guias_relevantes = xml_parser.extrair_guias_internacao_relevantes(
-                        caminho_xml_extraido,
-                        num_fatura,
-                        self.VALOR_MINIMO_GUIA,
-                        self.codigos_hm_t00_a_ignorar
-                    )
-                    if guias_relevantes:
-                        self.guias_relevantes_por_fatura[num_fatura] = guias_relevantes
-                        log(f"  {len(guias_relevantes)} guia(s) relevante(s) armazenada(s).")
-
-                self.lista_faturas_processadas.append(dados_fatura)
+                dados_fatura = self.importar_fatura(caminho_zip, pasta_backup, pasta_temp, log)
+                if dados_fatura:
+                    self.lista_faturas_processadas.append(dados_fatura)
+                if progress_callback:
+                    progress_callback(i + 1, len(arquivos_zip))
                 
         finally:
             log("INFO: Limpando pasta de extração temporária...")
             shutil.rmtree(pasta_temp, ignore_errors=True)
 
+        self._salvar_estado_importacao(plano={})
+
         total_processadas = len(self.lista_faturas_processadas)
+        if cancelado:
+            return False, f"Importação cancelada. {total_processadas} fatura(s) processada(s)."
         return True, f"Processamento concluído. {total_processadas} fatura(s) processada(s)."
 
+    def importar_fatura(self, caminho_zip: str, pasta_backup: str, pasta_extracao: str,
+                        log: Callable[[str], None]) -> Optional[dict]:
+        """
+        Importa uma fatura: backup do ZIP, extração do .051 em `pasta_extracao`,
+        dados da fatura e guias de internação relevantes.
+
+        O resultado fica memorizado pelo hash do ZIP (importacao_repository):
+        um ZIP já importado com os mesmos parâmetros não é extraído nem relido.
+
+        Returns:
+            Dados da fatura ou None se o ZIP não puder ser lido.
+        """
+        nome_arquivo = os.path.basename(caminho_zip)
+        file_manager.fazer_backup_fatura(caminho_zip, pasta_backup)
+
+        memorizado, zip_hash = importacao_repository.buscar_zip(caminho_zip, self.parametros_importacao)
+        if memorizado:
+            log("  Dados reaproveitados do cache de importação.")
+            return self._montar_fatura(memorizado['dados_fatura'], memorizado['guias_relevantes'],
+                                       caminho_zip, zip_hash, log)
+
+        caminho_xml_extraido = file_manager.extrair_xml_fatura_do_zip(caminho_zip, pasta_extracao)
+        if not caminho_xml_extraido:
+            log(f"AVISO: Nenhum arquivo .051 encontrado em '{nome_arquivo}'. Pulando.")
+            return None
+
+        dados_fatura = xml_parser.extrair_dados_fatura_xml(caminho_xml_extraido)
+        if not dados_fatura:
+            log(f"AVISO: Falha ao ler XML para '{nome_arquivo}'. Pulando.")
+            return None
+
+        guias_relevantes = []
+        num_fatura = dados_fatura.get('numero_fatura')
+        if num_fatura:
+            guias_relevantes = xml_parser.extrair_guias_internacao_relevantes(
+                caminho_xml_extraido,
+                num_fatura,
+                self.VALOR_MINIMO_GUIA,
+                self.codigos_hm_t00_a_ignorar
+            )
+
+        if zip_hash:
+            importacao_repository.registrar_zip(zip_hash, self.parametros_importacao, caminho_zip,
+                                                dados_fatura, guias_relevantes)
+        return self._montar_fatura(dados_fatura, guias_relevantes, caminho_zip, zip_hash, log)
+
+    def _montar_fatura(self, dados_xml: dict, guias_relevantes: List[dict], caminho_zip: str,
+                       zip_hash: Optional[str], log: Callable[[str], None]) -> dict:
+        """Completa os dados lidos do XML com o local do ZIP e a Unimed, e guarda as guias relevantes."""
+        dados_fatura = dict(dados_xml)
+        dados_fatura['nome_zip'] = os.path.basename(caminho_zip)
+        dados_fatura['caminho_zip_original'] = caminho_zip
+        dados_fatura['zip_hash'] = zip_hash
+
+        cod_unimed = dados_fatura.get('codigo_unimed_destino')
+        if cod_unimed:
+            nome_unimed = data_manager.obter_nome_unimed(cod_unimed)
+            dados_fatura['nome_unimed_destino'] = nome_unimed
+            log(f"  Unimed Destino: {cod_unimed} - {nome_unimed}")
+
+        num_fatura = dados_fatura.get('numero_fatura')
+        if num_fatura and guias_relevantes:
+            self.guias_relevantes_por_fatura[num_fatura] = guias_relevantes
+            log(f"  {len(guias_relevantes)} guia(s) relevante(s) armazenada(s).")
+
+        return dados_fatura
+
+    def _salvar_estado_importacao(self, plano: dict) -> bool:
+        """Grava a importação atual e o plano de distribuição para restaurar sem reler os XMLs."""
+        if not self.pasta_faturas_importadas_atual:
+            return False
+        zips = [(f.get('zip_hash'), f['caminho_zip_original']) for f in self.lista_faturas_processadas]
+        if any(zip_hash is None for zip_hash, _ in zips):
+            return False
+        return importacao_repository.salvar_estado(self.pasta_faturas_importadas_atual, self.parametros_importacao,
+                                                   zips, plano)
+
+    def restaurar_estado_importacao(self, caminho_pasta: str,
+                                    log_callback: Optional[Callable[[str], None]] = None) -> tuple[bool, str]:
+        """
+        Restaura a última importação (e distribuição) da pasta a partir do
+        cache de importação, sem abrir nenhum ZIP ou XML.
+        """
+        log = lambda msg: self._log(msg, log_callback)
+
+        estado = importacao_repository.carregar_estado(caminho_pasta, self.parametros_importacao)
+        if not estado or not estado['zips']:
+            return False, "Nenhuma importação anterior encontrada para esta pasta."
+
+        self.pasta_faturas_importadas_atual = caminho_pasta
+        self.lista_faturas_processadas = []
+        self.guias_relevantes_por_fatura = {}
+        for item in estado['zips']:
+            self.lista_faturas_processadas.append(self._montar_fatura(
+                item['dados_fatura'], item['guias_relevantes'], item['caminho'], item['zip_hash'], lambda msg: None))
+        self.plano_ultima_distribuicao = estado['plano_distribuicao']
+
+        total = len(self.lista_faturas_processadas)
+        atualizado_em = estado['atualizado_em'].strftime('%d/%m/%Y %H:%M') if estado['atualizado_em'] else '?'
+        distribuida = " e distribuição" if self.plano_ultima_distribuicao else ""
+        log(f"INFO: Importação{distribuida} de {atualizado_em} restaurada: {total} fatura(s).")
+        return True, f"Estado restaurado. {total} fatura(s) importada(s)."
+
     def preparar_distribuicao_faturas(self, nomes_auditores: List[str],
                                        log_callback: Optional[Callable[[str], None]] = None) -> tuple[bool, str]:
         log = lambda msg: self._log(msg, log_callback)
@@ -122,11 +222,16 @@ class WorkflowController:
         log("INFO: Calculando plano de distribuição...")
         plano = distribution_engine.distribuir_faturas(self.lista_faturas_processadas, nomes_auditores)
         self.plano_ultima_distribuicao = plano
+        self._salvar_estado_importacao(plano)
         
         pasta_dist_raiz = os.path.join(self.pasta_faturas_importadas_atual, "Distribuição")
         log("INFO: Organizando arquivos ZIP por auditor...")
         
-        file_manager.organizar_faturas_por_auditor(plano, self.pasta_faturas_importadas_atual, pasta_dist_raiz)
+        resumo_io = file_manager.organizar_faturas_por_auditor(
+            plano, self.pasta_faturas_importadas_atual, pasta_dist_raiz, log_callback=log_callback
+        )
+        if resumo_io['falhas']:
+            log(f"AVISO: {len(resumo_io['falhas'])} ZIP(s) não puderam ser movidos.")
         
         log("INFO: Gerando relatório Excel...")
         sucesso, caminho_relatorio = report_generator.gerar_relatorio_distribuicao(plano, pasta_dist_raiz)
@@ -156,7 +261,11 @@ class WorkflowController:
             return True, "Nenhum ZIP para extrair."
         
         log(f"INFO: Extraindo {len(lista_zips_para_extrair)} XML(s)...")
-        file_manager.extrair_xmls_de_lista_zips(lista_zips_para_extrair, pasta_destino_xmls)
+        resumo_io = file_manager.extrair_xmls_de_lista_zips(
+            lista_zips_para_extrair, pasta_destino_xmls, log_callback=log_callback
+        )
+        if resumo_io['falhas']:
+            log(f"AVISO: {len(resumo_io['falhas'])} ZIP(s) não puderam ser extraídos.")
         log("INFO: Extração de XMLs concluída.")
 
         guias_para_csv = []
@@ -175,7 +284,21 @@ class WorkflowController:
         return True, f"Preparação para '{nome_auditor}' concluída."
 
     def executar_validacao_xmls(self, caminho_pasta: str,
-                                log_callback: Optional[Callable[[str], None]] = None) -> tuple[bool, str]:
+                                log_callback: Optional[Callable[[str], None]] = None,
+                                job_id: Optional[int] = None,
+                                progress_callback: Optional[Callable[[int, int], None]] = None,
+                                cancel_check: Optional[Callable[[], bool]] = None) -> tuple[bool, str]:
+        """
+        Aplica as regras de validação aos arquivos .051 da pasta.
+
+        A validação roda como um job retomável: cada arquivo concluído grava um
+        checkpoint (estado do arquivo + offset do JSONL de alertas). Informando
+        `job_id`, um job interrompido continua do primeiro arquivo pendente e a
+        pasta/lista de arquivos originais são lidas do job. `progress_callback`
+        recebe (arquivos feitos, total) a cada arquivo concluído; `cancel_check`
+        é consultado antes de cada arquivo e, se verdadeiro, interrompe o job
+        (retomável).
+        """
         log = lambda msg: self._log(msg, log_callback)
         
         try:
@@ -185,143 +308,117 @@ class WorkflowController:
                 log("ERRO CRÍTICO: Falha ao carregar as regras de validação.")
                 return False, "Falha ao carregar regras."
 
-            log(f"INFO: Buscando arquivos .051 em: {caminho_pasta}")
-            xml_files = file_manager.listar_arquivos_051(caminho_pasta)
+            if job_id is None:
+                log(f"INFO: Buscando arquivos .051 em: {caminho_pasta}")
+                xml_files = file_manager.listar_arquivos_051(caminho_pasta)
 
-            if not xml_files:
-                log("AVISO: Nenhum arquivo .051 encontrado na pasta.")
-                return True, "Nenhum arquivo .051 para validar."
+                if not xml_files:
+                    log("AVISO: Nenhum arquivo .051 encontrado na pasta.")
+                    return True, "Nenhum arquivo .051 para validar."
 
-            log(f"INFO: {len(xml_files)} arquivo(s) encontrados. Iniciando validação...")
+                log(f"INFO: {len(xml_files)} arquivo(s) encontrados. Iniciando validação...")
+                
+                # Criar registro de execução para tracking de ROI
+                self.current_execution_id = db_manager.log_execution_start(
+                    operation_type='VALIDATION',
+                    total_files=len(xml_files),
+                    user_id=self.user_id  # ✅ Agora passa o user_id para produtividade
+                )
+                log(f"INFO: Execução ID {self.current_execution_id} criada.")
+
+                job_id = job_repository.criar_job('VALIDACAO', xml_files, {'caminho_pasta': caminho_pasta},
+                                                  execution_id=self.current_execution_id, user_id=self.user_id)
+                if job_id is None:
+                    return False, "Falha ao registrar o job de validação."
+                log(f"INFO: Job {job_id} criado (retomável com 'manage_jobs.py resume {job_id}').")
             
-            # Criar registro de execução para tracking de ROI
-            self.current_execution_id = db_manager.log_execution_start(
-                operation_type='VALIDATION',
-                total_files=len(xml_files),
-                user_id=self.user_id  # ✅ Agora passa o user_id para produtividade
-            )
-            log(f"INFO: Execução ID {self.current_execution_id} criada.")
+            job = job_repository.obter_job(job_id)
+            if not job or job['tipo'] != 'VALIDACAO':
+                return False, f"Job de validação {job_id} não encontrado."
+            iniciado, mensagem = job_repository.iniciar_job(job_id)
+            if not iniciado:
+                log(f"ERRO: {mensagem}")
+                return False, mensagem
+            caminho_pasta = job['parametros']['caminho_pasta']
+            self.current_execution_id = job['execution_id'] or -1
+            pendentes = job_repository.arquivos_pendentes(job_id)
+            retomando = job['status'] != 'PENDENTE'
+            if retomando:
+                log(f"INFO: Retomando job {job_id}: {job['processados']} de {job['total_arquivos']} "
+                    f"arquivo(s) já processados, {len(pendentes)} pendente(s).")
+
+            # Alertas vão para o JSONL do job, truncado no último checkpoint
+            engine.alertas = AlertSpool.persistente(job['alertas_caminho'], job['alertas_offset'])
             
             # Repositório para verificar duplicatas
             exec_repo = ExecutionRepository()
+            cancelado = False
+            interrompido = False
             
-            modificados = 0
-            pulados = 0
-            
-            for xml_file in xml_files:
-                nome_arquivo = os.path.basename(xml_file)
-                log(f"--- Validando: {nome_arquivo} ---")
-                
-                # Calcular hash do arquivo para deduplicação
-                file_hash = calculate_file_hash(xml_file)
-                
-                # Verificar se já foi processado
-                if exec_repo.is_file_processed(file_hash):
-                    log(f"⏭️ PULADO: Arquivo já processado anteriormente.")
-                    pulados += 1
-                    continue
-                
-                xml_tree = engine.xml_reader.load_xml_tree(xml_file)
-                if not xml_tree: 
-                    log(f"ERRO: Falha ao ler o XML: {nome_arquivo}")
-                    continue
-                
-                if engine.apply_rules_to_xml(xml_tree, self.current_execution_id, nome_arquivo):
-                    engine.file_handler.save_xml_tree(xml_tree, xml_file)
-                    log(f"INFO: Arquivo modificado e salvo.")
-                    modificados += 1
-                    
-                    # Registrar arquivo processado com hash
-                    db_manager.log_file_processing(
-                        execution_id=self.current_execution_id,
-                        file_name=nome_arquivo,
-                        file_path=xml_file,
-                        file_hash=file_hash,
-                        status='SUCCESS'
-                    )
-                else:
-                    log("INFO: Nenhuma regra aplicável encontrada.")
-                    # Registrar mesmo sem modificações
-                    db_manager.log_file_processing(
-                        execution_id=self.current_execution_id,
-                        file_name=nome_arquivo,
-                        file_path=xml_file,
-                        file_hash=file_hash,
-                        status='SUCCESS',
-                        message='Nenhuma regra aplicada'
-                    )
+            try:
+                for indice, (posicao, xml_file) in enumerate(pendentes):
+                    if cancel_check and cancel_check():
+                        interrompido = True
+                        break
+                    nome_arquivo = os.path.basename(xml_file)
+                    log(f"--- Validando: {nome_arquivo} ---")
+                    # O primeiro pendente pode ter sido registrado por esta execução sem chegar ao checkpoint
+                    status, modificado, mensagem, file_hash = self.validar_arquivo(
+                        engine, exec_repo, xml_file, nome_arquivo, log,
+                        reprocessar_da_execucao=retomando and indice == 0)
+
+                    # Checkpoint: alertas em disco antes de marcar o arquivo como concluído
+                    if not job_repository.registrar_arquivo(job_id, posicao, status, alterado=modificado,
+                                                            mensagem=mensagem, file_hash=file_hash,
+                                                            alertas_offset=engine.alertas.sincronizar()):
+                        log(f"AVISO: Job {job_id} cancelado. Interrompendo validação.")
+                        cancelado = True
+                        break
+                    if progress_callback:
+                        progress_callback(job['total_arquivos'] - len(pendentes) + indice + 1, job['total_arquivos'])
+            except BaseException:
+                engine.alertas.close()
+                job_repository.finalizar_job(job_id, 'INTERROMPIDO')
+                raise
             
+            resumo = job_repository.resumo_job(job_id)
+            modificados, pulados = resumo['alterados'], resumo['PULADO']
+            total = job['total_arquivos']
+            if cancelado:
+                engine.alertas.close()
+                return False, f"Validação cancelada (job {job_id})."
+            if interrompido:
+                engine.alertas.close()
+                job_repository.finalizar_job(job_id, 'INTERROMPIDO')
+                log(f"AVISO: Validação interrompida pelo usuário ({total - resumo['PENDENTE']} de {total} arquivo(s) processados).")
+                return False, f"Validação interrompida (job {job_id}, retomável)."
+
             if pulados > 0:
                 msg_final = f"Validação concluída. {modificados} modificado(s), {pulados} pulado(s) (já processados)."
             else:
-                msg_final = f"Validação concluída. {modificados} de {len(xml_files)} arquivo(s) foram modificados."
+                msg_final = f"Validação concluída. {modificados} de {total} arquivo(s) foram modificados."
             log(f"SUCESSO: {msg_final}")
             
             # Gerar relatório de alertas se houver
-            if hasattr(engine, 'alertas') and engine.alertas:
-                try:
-                    from datetime import datetime
-                    from openpyxl import Workbook
-                    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-                    
-                    wb = Workbook()
-                    ws = wb.active
-                    ws.title = "Alertas"
-                    
-                    # Estilos
-                    header_fill = PatternFill(start_color="FF6B6B", end_color="FF6B6B", fill_type="solid")
-                    header_font = Font(bold=True, color="FFFFFF")
-                    border = Border(
-                        left=Side(style='thin'),
-                        right=Side(style='thin'),
-                        top=Side(style='thin'),
-                        bottom=Side(style='thin')
-                    )
-                    
-                    # Headers
-                    headers = ["Arquivo", "Guia", "Beneficiário", "Código", "Mensagem"]
-                    for col, header in enumerate(headers, 1):
-                        cell = ws.cell(row=1, column=col, value=header)
-                        cell.fill = header_fill
-                        cell.font = header_font
-                        cell.alignment = Alignment(horizontal='center')
-                        cell.border = border
-                    
-                    # Dados
-                    for row, alerta in enumerate(engine.alertas, 2):
-                        dados = alerta.get("dados", {})
-                        ws.cell(row=row, column=1, value=dados.get("arquivo", "")).border = border
-                        ws.cell(row=row, column=2, value=dados.get("guia", "")).border = border
-                        ws.cell(row=row, column=3, value=dados.get("beneficiario", "")).border = border
-                        ws.cell(row=row, column=4, value=dados.get("codigo", "")).border = border
-                        ws.cell(row=row, column=5, value=alerta.get("mensagem", "")).border = border
-                    
-                    # Ajustar largura das colunas
-                    ws.column_dimensions['A'].width = 30
-                    ws.column_dimensions['B'].width = 15
-                    ws.column_dimensions['C'].width = 20
-                    ws.column_dimensions['D'].width = 15
-                    ws.column_dimensions['E'].width = 50
-                    
-                    # Salvar arquivo
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    alertas_path = os.path.join(caminho_pasta, f"ALERTAS_REMOCAO_{timestamp}.xlsx")
-                    wb.save(alertas_path)
-                    
-                    log(f"⚠️ ALERTAS: {len(engine.alertas)} alerta(s) gerado(s) - Relatório: {alertas_path}")
-                    msg_final += f"\n⚠️ {len(engine.alertas)} alerta(s) gerado(s). Veja o relatório Excel."
-                    
-                    # Limpar alertas
-                    engine.alertas = []
-                except Exception as alert_error:
-                    log(f"AVISO: Erro ao gerar relatório de alertas: {alert_error}")
+            if engine.alertas:
+                qtd_alertas = len(engine.alertas)
+                sucesso_alertas, alertas_path = report_generator.gerar_relatorio_alertas(engine.alertas, caminho_pasta)
+                if sucesso_alertas:
+                    log(f"⚠️ ALERTAS: {qtd_alertas} alerta(s) gerado(s) - Relatório: {alertas_path}")
+                    msg_final += f"\n⚠️ {qtd_alertas} alerta(s) gerado(s). Veja o relatório Excel."
+                else:
+                    log("AVISO: Erro ao gerar relatório de alertas.")
+            
+            # Limpar alertas (remove o JSONL do job)
+            engine.alertas.clear()
+            job_repository.finalizar_job(job_id, 'CONCLUIDO')
             
             # Finalizar registro de execução
             db_manager.log_execution_end(
                 execution_id=self.current_execution_id,
                 status='COMPLETED',
                 success_count=modificados,
-                error_count=len(xml_files) - modificados
+                error_count=total - modificados
             )
             
             return True, msg_final
@@ -331,12 +428,106 @@ class WorkflowController:
             log(f"ERRO CRÍTICO: {error_msg}")
             return False, error_msg
 
-    def validar_pasta_com_xsd(self, caminho_pasta: str, log_callback: Optional[Callable[[str], None]] = None) -> tuple[bool, str]:
+    def validar_arquivo(self, engine, exec_repo: ExecutionRepository, xml_file: str, nome_arquivo: str,
+                         log: Callable[[str], None],
+                         reprocessar_da_execucao: bool = False) -> tuple[str, bool, Optional[str], Optional[str]]:
+        """
+        Valida um arquivo .051 e registra o processamento.
+
+        Com `reprocessar_da_execucao`, um registro de processamento da própria
+        execução atual não conta como duplicata (retomada após queda).
+
+        Returns:
+            (status do job, modificado, mensagem, hash original)
+        """
+        # Calcular hash do arquivo para deduplicação
+        file_hash = calculate_file_hash(xml_file)
+        
+        # Verificar se já foi processado
+        processado = exec_repo.get_processed_file_info(file_hash)
+        if processado and reprocessar_da_execucao and processado.execution_id == self.current_execution_id:
+            processado = None
+        if processado:
+            log(f"⏭️ PULADO: Arquivo já processado anteriormente.")
+            return 'PULADO', False, 'Arquivo já processado anteriormente', file_hash
+        
+        if os.path.getsize(xml_file) >= streaming_engine.TAMANHO_MINIMO_STREAMING:
+            # Faturas muito grandes: regras aplicadas guia a guia, sem carregar o arquivo inteiro
+            log("INFO: Arquivo grande, aplicando regras em fluxo (guia a guia)...")
+            modificado = engine.apply_rules_streaming(xml_file, execution_id=self.current_execution_id,
+                                                      file_name=nome_arquivo)
+            self._indexar_caracteristicas(xml_file, nome_arquivo, file_hash, log)
+        else:
+            xml_tree = engine.xml_reader.load_xml_tree(xml_file)
+            if not xml_tree: 
+                log(f"ERRO: Falha ao ler o XML: {nome_arquivo}")
+                return 'ERRO', False, 'Falha ao ler o XML', file_hash
+            
+            modificado = engine.apply_rules_to_xml(xml_tree, self.current_execution_id, nome_arquivo)
+            if modificado:
+                salvo = engine.file_handler.save_xml_tree(xml_tree, xml_file, hash_original=file_hash,
+                                                          diario=engine.diario)
+                if salvo and engine.diario:
+                    self._salvar_diario(engine.diario, xml_file, file_hash, log)
+            self._indexar_caracteristicas(xml_file, nome_arquivo, file_hash, log, xml_tree)
+        
+        if modificado:
+            log(f"INFO: Arquivo modificado e salvo.")
+            
+            # Registrar arquivo processado com hash
+            db_manager.log_file_processing(
+                execution_id=self.current_execution_id,
+                file_name=nome_arquivo,
+                file_path=xml_file,
+                file_hash=file_hash,
+                status='SUCCESS'
+            )
+            return 'CONCLUIDO', True, None, file_hash
+
+        log("INFO: Nenhuma regra aplicável encontrada.")
+        # Registrar mesmo sem modificações
+        db_manager.log_file_processing(
+            execution_id=self.current_execution_id,
+            file_name=nome_arquivo,
+            file_path=xml_file,
+            file_hash=file_hash,
+            status='SUCCESS',
+            message='Nenhuma regra aplicada'
+        )
+        return 'CONCLUIDO', False, 'Nenhuma regra aplicada', file_hash
+
+    def _salvar_diario(self, diario, xml_file: str, file_hash: str, log: Callable[[str], None]):
+        """Grava o diário de alterações do arquivo (diff e reversão sem cópia de backup)."""
+        try:
+            diario.salvar(change_journal.caminho_diario(xml_file), hash_original=file_hash,
+                          execucao=self.current_execution_id)
+        except OSError as e:
+            log(f"AVISO: diário de alterações de '{os.path.basename(xml_file)}' não gravado: {e}")
+
+    def _indexar_caracteristicas(self, xml_file: str, nome_arquivo: str, file_hash: str,
+                                 log: Callable[[str], None], xml_tree=None):
+        """
+        Registra tipos de elemento e valores discriminantes do arquivo como ficou
+        em disco, para a reexecução de impacto de regras (tools/replay_rule_impact.py).
+        """
+        try:
+            if xml_tree is not None:
+                tipos, valores = feature_index.extrair_caracteristicas(xml_tree.getroot())
+            else:
+                tipos, valores = feature_index.extrair_caracteristicas_arquivo(xml_file)
+        except (etree.XMLSyntaxError, OSError) as e:
+            log(f"AVISO: características de '{nome_arquivo}' não indexadas: {e}")
+            return
+        feature_repository.registrar_features(os.path.abspath(xml_file), nome_arquivo, file_hash,
+                                              self.current_execution_id, tipos, valores)
+
+    def validar_pasta_com_xsd(self, caminho_pasta: str, log_callback: Optional[Callable[[str], None]] = None,
+                              progress_callback: Optional[Callable[[int, int], None]] = None,
+                              cancel_check: Optional[Callable[[], bool]] = None) -> tuple[bool, str]:
         log = lambda msg: self._log(msg, log_callback)
         log("INFO: Iniciando validação estrutural com XSD...")
         
-        caminho_base = os.path.dirname(__file__)
-        caminho_xsd = os.path.join(caminho_base, "schemas", "ptu_CobrancaUtilizacao.xsd")
+        caminho_xsd = CAMINHO_XSD
         if not os.path.exists(caminho_xsd):
             msg = "ERRO CRÍTICO: Arquivo ptu_CobrancaUtilizacao.xsd não encontrado na pasta 'src/schemas/'."
             log(msg)
@@ -350,7 +541,11 @@ class WorkflowController:
         validos = 0
         total = len(xml_files)
         log(f"INFO: {total} arquivo(s) XML encontrados. Iniciando verificação...")
-        for xml_file in xml_files:
+        for feitos, xml_file in enumerate(xml_files, 1):
+            if cancel_check and cancel_check():
+                msg = f"Validação XSD cancelada. {validos} de {feitos - 1} arquivo(s) verificados são válidos."
+                log(f"AVISO: {msg}")
+                return False, msg
             nome_arquivo = os.path.basename(xml_file)
             sucesso, mensagem = file_manager.validar_xml_com_xsd(caminho_xsd, xml_file)
             if sucesso:
@@ -359,12 +554,16 @@ class WorkflowController:
             else:
                 log(f"ERRO: '{nome_arquivo}' está inválido. Detalhes abaixo:")
                 log(mensagem)
+            if progress_callback:
+                progress_callback(feitos, total)
         msg_final = f"Validação XSD concluída. {validos} de {total} arquivo(s) são válidos."
         log(f"SUCESSO: {msg_final}")
         return True, msg_final
 
     def executar_atualizacao_hash(self, nome_auditor: str, arquivos_selecionados: Optional[List[str]] = None,
-                                  log_callback: Optional[Callable[[str], None]] = None) -> tuple[bool, str]:
+                                  log_callback: Optional[Callable[[str], None]] = None,
+                                  job_id: Optional[int] = None,
+                                  cancel_check: Optional[Callable[[], bool]] = None) -> tuple[bool, str]:
         """
         Atualiza hash de arquivos específicos ou todos os arquivos.
         
@@ -372,72 +571,129 @@ class WorkflowController:
             nome_auditor: Nome do auditor
             arquivos_selecionados: Lista de nomes de arquivos ZIP (None = todos)
             log_callback: Função para logging
+            job_id: Retoma um job de atualização interrompido (ignora os demais argumentos)
+            cancel_check: Consultado antes de cada arquivo; se verdadeiro, interrompe o job (retomável)
         
         Returns:
             (sucesso, mensagem)
         """
         log = lambda msg: self._log(msg, log_callback)
         
-        if not self.pasta_faturas_importadas_atual:
-            return False, "Pasta de importação não definida."
-        
-        nome_pasta_auditor = nome_auditor.replace(' ', '_').replace('.', '')
-        pasta_correcao_base = self.pasta_faturas_importadas_atual or ""
-        pasta_correcao = os.path.join(pasta_correcao_base, "Correção XML", nome_pasta_auditor)
-        if not os.path.isdir(pasta_correcao):
-            return False, f"Pasta de correção para '{nome_auditor}' não encontrada."
-        
-        xmls_corrigidos = file_manager.listar_arquivos_051(pasta_correcao)
-        if not xmls_corrigidos:
-            return True, "Nenhum arquivo .051 para processar."
-        
-        # NOVA FUNCIONALIDADE: Filtrar apenas arquivos selecionados
-        if arquivos_selecionados:
-            # Converter nomes de ZIP para nomes de XML
-            xmls_selecionados_nomes = [nome.replace('.zip', '.051') for nome in arquivos_selecionados]
-            # Filtrar apenas os XMLs correspondentes
-            xmls_corrigidos = [
-                xml_path for xml_path in xmls_corrigidos
-                if os.path.basename(xml_path) in xmls_selecionados_nomes
-            ]
-            log(f"INFO: Modo seletivo - processando {len(xmls_corrigidos)} arquivo(s) selecionado(s)")
-        else:
-            log(f"INFO: Modo completo - processando todos os {len(xmls_corrigidos)} arquivo(s)")
-
-        if not xmls_corrigidos:
-            return True, "Nenhum arquivo selecionado para processar."
-
-        log(f"INFO: Iniciando atualização..."); sucessos = 0
+        if job_id is None:
+            if not self.pasta_faturas_importadas_atual:
+                return False, "Pasta de importação não definida."
+            
+            nome_pasta_auditor = nome_auditor.replace(' ', '_').replace('.', '')
+            pasta_correcao_base = self.pasta_faturas_importadas_atual or ""
+            pasta_correcao = os.path.join(pasta_correcao_base, "Correção XML", nome_pasta_auditor)
+            if not os.path.isdir(pasta_correcao):
+                return False, f"Pasta de correção para '{nome_auditor}' não encontrada."
+            
+            xmls_corrigidos = file_manager.listar_arquivos_051(pasta_correcao)
+            if not xmls_corrigidos:
+                return True, "Nenhum arquivo .051 para processar."
+            
+            # NOVA FUNCIONALIDADE: Filtrar apenas arquivos selecionados
+            if arquivos_selecionados:
+                # Converter nomes de ZIP para nomes de XML
+                xmls_selecionados_nomes = [nome.replace('.zip', '.051') for nome in arquivos_selecionados]
+                # Filtrar apenas os XMLs correspondentes
+                xmls_corrigidos = [
+                    xml_path for xml_path in xmls_corrigidos
+                    if os.path.basename(xml_path) in xmls_selecionados_nomes
+                ]
+                log(f"INFO: Modo seletivo - processando {len(xmls_corrigidos)} arquivo(s) selecionado(s)")
+            else:
+                log(f"INFO: Modo completo - processando todos os {len(xmls_corrigidos)} arquivo(s)")
+
+            if not xmls_corrigidos:
+                return True, "Nenhum arquivo selecionado para processar."
+
+            job_id = job_repository.criar_job('HASH', xmls_corrigidos,
+                                              {'nome_auditor': nome_auditor, 'pasta_importacao': pasta_correcao_base},
+                                              user_id=self.user_id)
+            if job_id is None:
+                return False, "Falha ao registrar o job de atualização de hash."
+
+        job = job_repository.obter_job(job_id)
+        if not job or job['tipo'] != 'HASH':
+            return False, f"Job de atualização de hash {job_id} não encontrado."
+        iniciado, mensagem = job_repository.iniciar_job(job_id)
+        if not iniciado:
+            log(f"ERRO: {mensagem}")
+            return False, mensagem
+        pasta_correcao_base = job['parametros']['pasta_importacao']
+        pendentes = job_repository.arquivos_pendentes(job_id)
+        if job['status'] != 'PENDENTE':
+            log(f"INFO: Retomando job {job_id}: {len(pendentes)} de {job['total_arquivos']} arquivo(s) pendente(s).")
+
+        log(f"INFO: Iniciando atualização...")
         parser_xml = etree.XMLParser(recover=True)
 
-        for xml_path in xmls_corrigidos:
-            nome_xml = os.path.basename(xml_path); log(f"--- Processando: {nome_xml} ---")
-            nome_zip = nome_xml.replace('.051', '.zip')
-            caminho_zip_original = os.path.join(pasta_correcao_base, "Backup", nome_zip)
+        try:
+            for posicao, xml_path in pendentes:
+                if cancel_check and cancel_check():
+                    job_repository.finalizar_job(job_id, 'INTERROMPIDO')
+                    log(f"AVISO: Atualização interrompida pelo usuário (job {job_id}).")
+                    return False, f"Atualização interrompida (job {job_id}, retomável)."
+                nome_xml = os.path.basename(xml_path); log(f"--- Processando: {nome_xml} ---")
+                status, mensagem = self.recriar_zip_com_hash(xml_path, pasta_correcao_base, parser_xml, log)
+                if not job_repository.registrar_arquivo(job_id, posicao, status, alterado=status == 'CONCLUIDO',
+                                                        mensagem=mensagem):
+                    log(f"AVISO: Job {job_id} cancelado. Interrompendo atualização.")
+                    return False, f"Atualização cancelada (job {job_id})."
+        except BaseException:
+            job_repository.finalizar_job(job_id, 'INTERROMPIDO')
+            raise
+
+        job_repository.finalizar_job(job_id, 'CONCLUIDO')
+        sucessos = job_repository.resumo_job(job_id)['alterados']
+        return True, f"Atualização concluída. {sucessos} de {job['total_arquivos']} ZIPs foram recriados."
+
+    def recriar_zip_com_hash(self, xml_path: str, pasta_correcao_base: str, parser_xml,
+                              log: Callable[[str], None]) -> tuple[str, Optional[str]]:
+        """Recalcula o hash de um .051 e recria o ZIP. Retorna (status do job, mensagem)."""
+        nome_xml = os.path.basename(xml_path)
+        nome_zip = nome_xml.replace('.051', '.zip')
+        caminho_zip_original = os.path.join(pasta_correcao_base, "Backup", nome_zip)
+        
+        if not os.path.exists(caminho_zip_original):
+            log(f"AVISO: ZIP original '{nome_zip}' não encontrado no Backup. Pulando.")
+            return 'PULADO', 'ZIP original não encontrado no Backup'
+        
+        try:
+            arvore_xml = etree.parse(xml_path, parser=parser_xml)
+            raiz = arvore_xml.getroot()
+            novo_hash = hash_calculator.calcular_hash_bloco_guia_cobranca(raiz)
+            if not novo_hash:
+                log(f"ERRO: Falha ao calcular o hash para '{nome_xml}'. Pulando.")
+                return 'ERRO', 'Falha ao calcular o hash'
             
-            if not os.path.exists(caminho_zip_original):
-                log(f"AVISO: ZIP original '{nome_zip}' não encontrado no Backup. Pulando."); continue
+            log(f"INFO: Novo hash: {novo_hash}")
             
-            try:
-                arvore_xml = etree.parse(xml_path, parser=parser_xml)
-                raiz = arvore_xml.getroot()
-                novo_hash = hash_calculator.calcular_hash_bloco_guia_cobranca(raiz)
-                if not novo_hash:
-                    log(f"ERRO: Falha ao calcular o hash para '{nome_xml}'. Pulando.")
-                    continue
-                
-                log(f"INFO: Novo hash: {novo_hash}")
-                
-                resultado = file_manager.recriar_zip_com_hash_atualizado(caminho_zip_original, xml_path, novo_hash)
-                
-                if resultado:
-                    log(f"SUCESSO: Novo ZIP '{os.path.basename(str(resultado))}' criado."); sucessos += 1
-                else:
-                    log(f"ERRO: Falha ao recriar o ZIP para '{nome_xml}'.")
-            except Exception as e:
-                log(f"ERRO CRÍTICO ao processar '{nome_xml}': {e}")
-
-        return True, f"Atualização concluída. {sucessos} de {len(xmls_corrigidos)} ZIPs foram recriados."
+            resultado = file_manager.recriar_zip_com_hash_atualizado(caminho_zip_original, xml_path, novo_hash)
+            
+            if resultado:
+                log(f"SUCESSO: Novo ZIP '{os.path.basename(str(resultado))}' criado.")
+                return 'CONCLUIDO', None
+            log(f"ERRO: Falha ao recriar o ZIP para '{nome_xml}'.")
+            return 'ERRO', 'Falha ao recriar o ZIP'
+        except Exception as e:
+            log(f"ERRO CRÍTICO ao processar '{nome_xml}': {e}")
+            return 'ERRO', str(e)
+
+    def retomar_job(self, job_id: int, log_callback: Optional[Callable[[str], None]] = None) -> tuple[bool, str]:
+        """Retoma um job interrompido (validação ou atualização de hash) pelo ID."""
+        job = job_repository.obter_job(job_id)
+        if not job:
+            return False, f"Job {job_id} não encontrado."
+        if job['tipo'] == 'VALIDACAO':
+            return self.executar_validacao_xmls(job['parametros'].get('caminho_pasta'), log_callback, job_id=job_id)
+        if job['tipo'] != 'HASH':
+            return False, f"Job {job_id} ({job['tipo']}) é processado pelos workers da fila distribuída."
+        self.pasta_faturas_importadas_atual = job['parametros'].get('pasta_importacao')
+        return self.executar_atualizacao_hash(job['parametros'].get('nome_auditor'), log_callback=log_callback,
+                                              job_id=job_id)
 
     def executar_verificacao_internacao_curta(self, caminho_pasta: str,
                                               log_callback: Optional[Callable[[str], None]] = None) -> tuple[bool, str]:
@@ -1,5 +1,6 @@
 import sys
 import os
+import importlib
 import pytest
 from lxml import etree
 
@@ -71,3 +72,49 @@ def create_element():
     return _create_element
 
 
+# Módulos que guardam sua própria referência a get_session (`from .db_manager import get_session`)
+MODULOS_COM_SESSAO = (
+    'src.database.db_manager',
+    'src.database.fatura_repository',
+    'src.database.feature_repository',
+    'src.database.fila_repository',
+    'src.database.importacao_repository',
+    'src.database.job_repository',
+    'src.database.rule_repository',
+    'src.database.rule_migrator',
+    'src.business.processing.impact_replay',
+)
+
+
+@pytest.fixture
+def apontar_sessoes(monkeypatch):
+    """
+    Função que faz todos os repositórios abrirem sessões na fábrica informada.
+
+    Além de MODULOS_COM_SESSAO, troca o get_session de qualquer outro módulo
+    de src já importado que tenha a referência original.
+    """
+    def _apontar(fabrica):
+        modulos = [importlib.import_module(nome) for nome in MODULOS_COM_SESSAO]
+        original = modulos[0].get_session
+        modulos += [modulo for nome, modulo in list(sys.modules.items())
+                    if nome.startswith('src.') and getattr(modulo, 'get_session', None) is original]
+        for modulo in modulos:
+            monkeypatch.setattr(modulo, 'get_session', fabrica)
+    return _apontar
+
+
+@pytest.fixture
+def banco_sqlite(tmp_path, apontar_sessoes):
+    """Banco SQLite temporário com todas as tabelas, usado por todos os repositórios"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    # Via db_manager: garante que todos os modelos estejam registrados no Base
+    from src.database.db_manager import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'banco_teste.db'}")
+    Base.metadata.create_all(engine)
+    fabrica = sessionmaker(bind=engine)
+    apontar_sessoes(fabrica)
+    yield fabrica
+    engine.dispose()
@@ -0,0 +1,86 @@
+"""
+Testes unitários para o spool de alertas e o relatório de alertas.
+"""
+import os
+
+import openpyxl
+
+from src.infrastructure.files.alert_spool import AlertSpool
+from src.infrastructure.reports import report_generator
+
+
+def _alerta(i):
+    return {"mensagem": f"Remover item {i}", "dados": {"arquivo": "F1.051", "guia": str(i), "codigo": "10101012"}}
+
+
+class TestAlertSpool:
+    """Testes para AlertSpool"""
+
+    def test_vazio(self):
+        spool = AlertSpool()
+        assert not spool
+        assert len(spool) == 0
+        assert list(spool) == []
+        assert spool.caminho is None
+
+    def test_grava_e_le_em_ordem(self, tmp_path):
+        spool = AlertSpool(pasta=str(tmp_path))
+        for i in range(100):
+            spool.append(_alerta(i))
+
+        assert spool
+        assert len(spool) == 100
+        assert os.path.dirname(spool.caminho) == str(tmp_path)
+        assert [a["dados"]["guia"] for a in spool] == [str(i) for i in range(100)]
+
+    def test_clear_remove_arquivo(self, tmp_path):
+        spool = AlertSpool(pasta=str(tmp_path))
+        spool.append(_alerta(1))
+        caminho = spool.caminho
+
+        spool.clear()
+
+        assert not os.path.exists(caminho)
+        assert len(spool) == 0
+        spool.append(_alerta(2))
+        assert [a["dados"]["guia"] for a in spool] == ["2"]
+        spool.clear()
+
+    def test_persistente_trunca_no_checkpoint(self, tmp_path):
+        caminho = str(tmp_path / "jobs" / "job_1_alertas.jsonl")
+        spool = AlertSpool.persistente(caminho)
+        spool.append(_alerta(1))
+        offset = spool.sincronizar()
+        spool.append(_alerta(2))  # gravado depois do checkpoint
+        spool.close()
+        assert os.path.exists(caminho)
+
+        retomado = AlertSpool.persistente(caminho, offset)
+        assert len(retomado) == 1
+        retomado.append(_alerta(3))
+        assert [a["dados"]["guia"] for a in retomado] == ["1", "3"]
+
+        retomado.clear()
+        assert not os.path.exists(caminho)
+
+    def test_rule_engine_usa_spool(self, rule_engine):
+        assert isinstance(rule_engine.alertas, AlertSpool)
+
+
+class TestRelatorioAlertas:
+    """Testes para report_generator.gerar_relatorio_alertas"""
+
+    def test_gera_planilha(self, tmp_path):
+        spool = AlertSpool(pasta=str(tmp_path))
+        for i in range(3):
+            spool.append(_alerta(i))
+
+        sucesso, caminho = report_generator.gerar_relatorio_alertas(spool, str(tmp_path))
+        spool.clear()
+
+        assert sucesso
+        linhas = list(openpyxl.load_workbook(caminho).active.iter_rows(values_only=True))
+        assert linhas[0] == ("Arquivo", "Guia", "Beneficiário", "Código", "Mensagem")
+        assert len(linhas) == 4
+        assert linhas[3][1] == "2"
+        assert linhas[3][4] == "Remover item 2"
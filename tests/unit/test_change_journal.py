@@ -0,0 +1,163 @@
+"""
+Testes para o diário de alterações: registro pelo RuleEngine, gravação por
+patches de bytes e reversão.
+"""
+import hashlib
+
+import pytest
+from lxml import etree
+
+from src.business.rules.rule_engine import RuleEngine
+from src.infrastructure.files import change_journal
+from src.infrastructure.files.change_journal import DiarioAlteracoes
+from src.infrastructure.files.file_handler import FileHandler
+from src.infrastructure.parsers.xml_reader import NAMESPACES
+
+PTU = NAMESPACES['ptu']
+
+# Indentação de 2 espaços (fora do layout de etree.indent) para conferir que o patch a preserva
+XML_ORIGINAL = (f"<?xml version='1.0' encoding='ISO-8859-1'?>\n"
+                f"<ptu:GuiaCobrancaUtilizacao xmlns:ptu=\"{PTU}\">\n"
+                f"  <ptu:guiaSADT>\n"
+                f"    <ptu:dadosExecutante><ptu:CNES>9999999</ptu:CNES></ptu:dadosExecutante>\n"
+                f"    <ptu:nm_Beneficiario>JOSÉ DA CONCEIÇÃO</ptu:nm_Beneficiario>\n"
+                f"    <ptu:procedimentos>\n"
+                f"      <ptu:tp_Tabela>22</ptu:tp_Tabela>\n"
+                f"      <ptu:cd_Servico>10101012</ptu:cd_Servico>\n"
+                f"    </ptu:procedimentos>\n"
+                f"  </ptu:guiaSADT>\n"
+                f"</ptu:GuiaCobrancaUtilizacao>\n").encode('iso-8859-1')
+
+REGRA_CNES = {
+    'id': 'R_CNES',
+    'condicoes': {
+        'tipo_elemento': 'dadosExecutante',
+        'condicao_tag_valor': {'xpath': './ptu:CNES', 'valor_permitido': ['9999999']}
+    },
+    'acao': {'tipo_acao': 'alterar_tag', 'tag_alvo': './ptu:CNES', 'novo_valor': 'A&B<1>'}
+}
+
+REGRA_TABELA = {
+    'id': 'R_TABELA',
+    'condicoes': {
+        'tipo_elemento': 'procedimentos',
+        'condicao_tag_valor': {'xpath': './ptu:cd_Servico', 'valor_permitido': ['10101012']}
+    },
+    'acao': {'tipo_acao': 'alterar_tag', 'tag_alvo': './ptu:tp_Tabela', 'novo_valor': '18'}
+}
+
+REGRA_REMOCAO = {
+    'id': 'R_REMOVE',
+    'condicoes': {'tipo_elemento': 'guiaSADT'},
+    'acao': {'tipo_acao': 'remover_tag_inteira', 'tag_alvo': './ptu:nm_Beneficiario'}
+}
+
+
+@pytest.fixture
+def arquivo(tmp_path):
+    caminho = tmp_path / 'N0051001.051'
+    caminho.write_bytes(XML_ORIGINAL)
+    return caminho
+
+
+def _aplicar(caminho, *regras):
+    engine = RuleEngine()
+    engine.loaded_rules = [dict(regra) for regra in regras]
+    arvore = engine.xml_reader.load_xml_tree(str(caminho))
+    assert engine.apply_rules_to_xml(arvore, file_name=caminho.name)
+    return engine, arvore
+
+
+def _canonico(arvore):
+    raiz = etree.fromstring(etree.tostring(arvore))
+    etree.indent(raiz, space="")
+    return etree.tostring(raiz)
+
+
+class TestRegistroNoMotor:
+    """Alterações registradas pelo RuleEngine"""
+
+    def test_textos_com_regra_e_linha(self, arquivo):
+        engine, _ = _aplicar(arquivo, REGRA_CNES, REGRA_TABELA)
+
+        assert engine.diario.somente_texto
+        alteracoes = engine.diario.alteracoes_de_texto()
+        assert [(a['regras'], a['tag'], a['linha'], a['antes'], a['depois']) for a in alteracoes] == [
+            (['R_CNES'], 'ptu:CNES', 4, '9999999', 'A&B<1>'),
+            (['R_TABELA'], 'ptu:tp_Tabela', 7, '22', '18'),
+        ]
+
+    def test_remocao_e_estrutural(self, arquivo):
+        engine, _ = _aplicar(arquivo, REGRA_REMOCAO)
+
+        assert not engine.diario.somente_texto
+        assert [entrada['tipo'] for entrada in engine.diario] == [change_journal.TIPO_REMOCAO]
+
+    def test_diario_salvo_e_carregado(self, arquivo, tmp_path):
+        engine, _ = _aplicar(arquivo, REGRA_CNES)
+        caminho = change_journal.caminho_diario(str(arquivo))
+        engine.diario.salvar(caminho, hash_original='abc')
+
+        assert caminho == str(tmp_path / change_journal.PASTA_DIARIOS / 'N0051001.051.json')
+        diario, extras = DiarioAlteracoes.carregar(caminho)
+        assert diario.entradas == engine.diario.entradas
+        assert extras == {'hash_original': 'abc'}
+
+
+class TestGravacaoPorPatch:
+    """save_xml_tree com diário"""
+
+    def test_so_textos_trocam_faixas_do_original(self, arquivo):
+        engine, arvore = _aplicar(arquivo, REGRA_CNES, REGRA_TABELA)
+
+        assert FileHandler().save_xml_tree(arvore, str(arquivo), hash_original=hashlib.md5(XML_ORIGINAL).hexdigest(),
+                                           diario=engine.diario)
+        esperado = (XML_ORIGINAL.replace(b">9999999<", b">A&amp;B&lt;1&gt;<")
+                    .replace(b"<ptu:tp_Tabela>22<", b"<ptu:tp_Tabela>18<"))
+        assert arquivo.read_bytes() == esperado
+        assert _canonico(etree.parse(str(arquivo))) == _canonico(arvore)
+
+    def test_estrutural_grava_documento_inteiro(self, arquivo):
+        engine, arvore = _aplicar(arquivo, REGRA_CNES, REGRA_REMOCAO)
+
+        assert FileHandler().save_xml_tree(arvore, str(arquivo), diario=engine.diario)
+        gravado = arquivo.read_bytes()
+        assert b"\n<ptu:guiaSADT>\n" in gravado  # reindentado no layout padrão
+        assert b"nm_Beneficiario" not in gravado
+
+    def test_texto_divergente_ou_encoding_nao_suportado(self, arquivo):
+        engine, _ = _aplicar(arquivo, REGRA_CNES)
+        alteracoes = engine.diario.alteracoes_de_texto()
+
+        assert change_journal.aplicar_patches(XML_ORIGINAL, alteracoes) is not None
+        assert change_journal.aplicar_patches(XML_ORIGINAL.replace(b"9999999", b"9999998"), alteracoes) is None
+        utf8 = XML_ORIGINAL.decode('iso-8859-1').replace('ISO-8859-1', 'UTF-8').encode('utf-8')
+        assert change_journal.aplicar_patches(utf8, alteracoes) is None
+
+    def test_mesma_tag_duas_vezes_na_linha(self):
+        dados = (f"<?xml version='1.0' encoding='ISO-8859-1'?>\n<ptu:a xmlns:ptu=\"{PTU}\">"
+                 f"<ptu:b>1</ptu:b><ptu:b>1</ptu:b></ptu:a>\n").encode('iso-8859-1')
+        arvore = etree.ElementTree(etree.fromstring(dados))
+        diario = DiarioAlteracoes()
+        diario.registrar_texto(arvore.getroot()[1], '2')
+
+        assert change_journal.aplicar_patches(dados, diario.alteracoes_de_texto()) is None
+
+
+class TestReversao:
+    """Reversão do arquivo pelo diário, sem cópia de backup"""
+
+    def test_patches_inversos_restauram_os_bytes(self, arquivo):
+        engine, arvore = _aplicar(arquivo, REGRA_CNES, REGRA_TABELA)
+        FileHandler().save_xml_tree(arvore, str(arquivo), diario=engine.diario)
+
+        assert FileHandler().reverter_com_diario(str(arquivo), engine.diario)
+        assert arquivo.read_bytes() == XML_ORIGINAL
+
+    def test_desfaz_alteracoes_estruturais(self, arquivo):
+        engine, arvore = _aplicar(arquivo, REGRA_CNES, REGRA_REMOCAO, REGRA_TABELA)
+        FileHandler().save_xml_tree(arvore, str(arquivo), diario=engine.diario)
+        diario = DiarioAlteracoes.from_dict(engine.diario.to_dict())
+
+        assert FileHandler().reverter_com_diario(str(arquivo), diario)
+        assert _canonico(etree.parse(str(arquivo))) == _canonico(etree.ElementTree(etree.fromstring(XML_ORIGINAL)))
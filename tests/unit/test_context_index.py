@@ -0,0 +1,146 @@
+"""
+Testes para o contexto de guia/beneficiário e o estado das ações rotativas (context_index).
+"""
+import json
+import os
+
+from lxml import etree
+
+from src.business.rules.context_index import ContextoGuias, EstadoRotacao
+from src.business.rules.rule_engine import RuleEngine
+from src.infrastructure.parsers.xml_reader import NAMESPACES
+
+PTU = NAMESPACES['ptu']
+PASTA_REGRAS = os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'config', 'regras')
+
+
+def _item(cd_servico="10104020"):
+    return (f"<ptu:procedimentosExecutados><ptu:procedimentos><ptu:cd_Servico>{cd_servico}</ptu:cd_Servico>"
+            f"</ptu:procedimentos><ptu:equipe_Profissional><ptu:nm_Profissional>X</ptu:nm_Profissional>"
+            f"<ptu:CBO>225125</ptu:CBO><ptu:tp_Participacao>00</ptu:tp_Participacao></ptu:equipe_Profissional>"
+            f"</ptu:procedimentosExecutados>")
+
+
+def _guia(id_benef, itens=1):
+    beneficiario = f"<ptu:dadosBeneficiario><ptu:id_Benef>{id_benef}</ptu:id_Benef></ptu:dadosBeneficiario>" \
+        if id_benef is not None else ""
+    return f"<ptu:guiaSADT>{beneficiario}<ptu:dadosGuia>{_item() * itens}</ptu:dadosGuia></ptu:guiaSADT>"
+
+
+def _documento(*guias):
+    return etree.fromstring(f'<ptu:Tipoguia xmlns:ptu="{PTU}">{"".join(guias)}</ptu:Tipoguia>')
+
+
+def _beneficiario_nivel_a_nivel(elemento):
+    """Busca original: XPath em cada ancestral até achar um id_Benef com texto."""
+    pai = elemento.getparent()
+    while pai is not None:
+        id_benef = pai.xpath(".//ptu:dadosBeneficiario/ptu:id_Benef", namespaces=NAMESPACES)
+        if id_benef and id_benef[0].text:
+            return id_benef[0].text
+        pai = pai.getparent()
+    return None
+
+
+class TestContextoGuias:
+    """Beneficiário resolvido pelos ancestrais indexados"""
+
+    def test_equivale_a_busca_nivel_a_nivel(self):
+        # Guia sem beneficiário e beneficiário vazio caem no primeiro do documento
+        raiz = _documento(_guia("111", 2), _guia(None), _guia(""), _guia("222"))
+        contexto = ContextoGuias(raiz)
+
+        itens = list(raiz.iter(f"{{{PTU}}}procedimentosExecutados"))
+        assert [contexto.beneficiario(item) for item in itens] == ["111", "111", "111", "111", "222"]
+        assert all(contexto.beneficiario(e) == _beneficiario_nivel_a_nivel(e) for e in raiz.iter())
+
+    def test_raiz_em_fluxo_consulta_acima_da_guia(self):
+        raiz = _documento(_guia("111"), _guia(None))
+        sem_beneficiario = raiz[1]
+        item = sem_beneficiario.find(f".//{{{PTU}}}procedimentosExecutados")
+
+        assert ContextoGuias(sem_beneficiario).beneficiario(item) == "111"
+        assert ContextoGuias(raiz[0]).beneficiario(raiz[0]) == "111"
+
+    def test_texto_lido_na_consulta_e_invalidacao(self):
+        raiz = _documento(_guia("111"))
+        contexto = ContextoGuias(raiz)
+        item = raiz.find(f".//{{{PTU}}}procedimentosExecutados")
+        assert contexto.beneficiario(item) == "111"
+
+        raiz.find(f".//{{{PTU}}}id_Benef").text = "333"
+        assert contexto.beneficiario(item) == "333"
+
+        guia = raiz[0]
+        guia.remove(guia.find(f"{{{PTU}}}dadosBeneficiario"))
+        contexto.invalidar(frozenset({"nm_Profissional"}))
+        assert contexto.beneficiario(item) == "333"  # dependência não afetada: contexto mantido
+        contexto.invalidar(None)
+        assert contexto.beneficiario(item) is None
+
+    def test_inscricao_do_pai(self):
+        raiz = _documento(f"<ptu:guiasSP_SADT><ptu:nr_Inscricao>0051</ptu:nr_Inscricao>{_item()}</ptu:guiasSP_SADT>")
+        contexto = ContextoGuias(raiz)
+
+        assert contexto.inscricao(raiz.find(f".//{{{PTU}}}procedimentosExecutados")) == "0051"
+        assert contexto.inscricao(raiz) is None
+
+
+class TestEstadoRotacao:
+    """Contadores limitados e reiniciados por execução"""
+
+    def test_rotacao_por_chave(self):
+        estado = EstadoRotacao()
+        assert [estado.proximo("acao", "A", 3) for _ in range(4)] == [0, 1, 2, 0]
+        assert estado.proximo("acao", "B", 3) == 0
+        assert estado.proximo("outra", "A", 3) == 0
+
+    def test_limite_descarta_o_menos_recente(self):
+        estado = EstadoRotacao(limite=2)
+        estado.proximo("acao", "A", 5)
+        estado.proximo("acao", "B", 5)
+        estado.proximo("acao", "A", 5)
+        estado.proximo("acao", "C", 5)
+
+        assert len(estado) == 2
+        assert estado.proximo("acao", "A", 5) == 2
+        assert estado.proximo("acao", "B", 5) == 0
+
+    def test_nova_execucao_zera(self):
+        estado = EstadoRotacao()
+        estado.iniciar_execucao(1)
+        estado.proximo("acao", "A", 5)
+        estado.iniciar_execucao(1)
+        assert estado.proximo("acao", "A", 5) == 1
+        estado.iniciar_execucao(2)
+        assert estado.proximo("acao", "A", 5) == 0
+
+
+class TestMotor:
+    """Ação corrigir_para_intensivista_rotativo com o contexto do documento"""
+
+    def _engine(self):
+        engine = RuleEngine()
+        with open(os.path.join(PASTA_REGRAS, 'intensivista_rotativo.json'), encoding='utf-8') as f:
+            engine.loaded_rules = json.load(f)
+        engine.ordem_schema = None
+        return engine
+
+    def _nomes(self, raiz):
+        return [e.text for e in raiz.iter(f"{{{PTU}}}nm_Profissional")]
+
+    def test_rotacao_por_beneficiario(self):
+        engine = self._engine()
+        raiz = _documento(_guia("111", 2), _guia("222", 1), _guia("111", 1))
+
+        assert engine.apply_rules_to_xml(etree.ElementTree(raiz), execution_id=7)
+        primeiro, segundo = "ELIZETE OSHIRO", "RONALDO NEDER GONCALVES PEREIRA"
+        assert self._nomes(raiz) == [primeiro, segundo, primeiro, "CYNTHYA MASSAE ASAHIDE"]
+
+    def test_nova_execucao_recomeca(self):
+        engine = self._engine()
+        engine.apply_rules_to_xml(etree.ElementTree(_documento(_guia("111"))), execution_id=1)
+        raiz = _documento(_guia("111"))
+
+        engine.apply_rules_to_xml(etree.ElementTree(raiz), execution_id=2)
+        assert self._nomes(raiz) == ["ELIZETE OSHIRO"]
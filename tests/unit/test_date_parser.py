@@ -0,0 +1,88 @@
+"""
+Testes para a leitura de datas do PTU (date_parser) e seus usos no xml_parser.
+"""
+from datetime import date, datetime
+
+import pytest
+
+from src.infrastructure.parsers import date_parser, xml_parser
+from src.infrastructure.parsers.xml_reader import NAMESPACES
+
+PTU = NAMESPACES['ptu']
+
+
+class TestParseDataHora:
+    """Formatos fixos e sequência de formatos"""
+
+    @pytest.mark.parametrize("texto", [
+        "2025/09/0112:26:00-04",
+        "2025/09/0112:26:00",
+        "2025/09/01 12:26:00",
+        "2025-09-01 12:26:00",
+        "  2025/09/0112:26:00-04\n",
+    ])
+    def test_formatos_fixos(self, texto):
+        assert date_parser.parse_data_hora(texto) == datetime(2025, 9, 1, 12, 26)
+
+    def test_compacta_e_fallback(self):
+        assert date_parser.parse_data_hora("20251031") == datetime(2025, 10, 31)
+        assert date_parser.parse_data_hora("2025/9/1 1:2:3") == datetime(2025, 9, 1, 1, 2, 3)
+        assert date_parser.parse_data_hora("2025-09-0112:26:00") == datetime(2025, 9, 1, 12, 26)
+
+    def test_invalidos(self):
+        assert date_parser.parse_data_hora("2025/02/3012:00:00-03") is None
+        assert date_parser.parse_data_hora("texto") is None
+        assert date_parser.parse_data_hora("") is None
+        assert date_parser.parse_data_hora(None) is None
+
+    def test_lote_preserva_ordem(self):
+        textos = ["2025/09/0112:26:00-04", None, "2025/09/0112:26:00-04", "x", "20250102"]
+        assert date_parser.parse_datas(textos) == [
+            datetime(2025, 9, 1, 12, 26), None, datetime(2025, 9, 1, 12, 26), None, datetime(2025, 1, 2)]
+
+
+class TestDia31:
+    """Detecção e troca do dia 31 e contagem do período"""
+
+    def test_detecta_os_dois_formatos(self):
+        assert date_parser.tem_dia_31("2025/10/3123:59:00-04")
+        assert date_parser.tem_dia_31("20251031")
+        assert not date_parser.tem_dia_31("20250931")  # setembro não tem dia 31
+        assert not date_parser.tem_dia_31(None)
+
+    def test_substitui(self):
+        assert date_parser.substituir_dia_31("2025/10/3123:59:00-04") == "2025/10/3023:59:00-04"
+        assert date_parser.substituir_dia_31("2025/10/31") == "2025/10/30"
+        assert date_parser.substituir_dia_31("20251231") == "20251230"
+        assert date_parser.substituir_dia_31("") == ""
+
+    def test_dias_no_periodo(self):
+        assert date_parser.dias_no_periodo("2025/10/0100:00:00-04", "2025/10/3123:59:00-04") == 31
+        assert date_parser.dias_no_periodo("2025-10-02", "2025/10/31") == 30
+        assert date_parser.dias_no_periodo("", "2025/10/31") is None
+        assert date_parser.data_inicial("2025/02/30") is None
+        assert date_parser.data_inicial("2025/10/3123:59:00-04") == date(2025, 10, 31)
+
+
+class TestInternacaoCurta:
+    """extrair_guias_internacao_curta_para_sinalizacao com as datas lidas em lote"""
+
+    def _guia(self, numero, regime, inicio, fim):
+        return (f"<ptu:guiaInternacao><ptu:nr_Guias><ptu:nr_GuiaTissPrestador>{numero}</ptu:nr_GuiaTissPrestador>"
+                f"</ptu:nr_Guias><ptu:dadosInternacao><ptu:rg_Internacao>{regime}</ptu:rg_Internacao>"
+                f"</ptu:dadosInternacao><ptu:dadosFaturamento><ptu:dt_IniFaturamento>{inicio}</ptu:dt_IniFaturamento>"
+                f"<ptu:dt_FimFaturamento>{fim}</ptu:dt_FimFaturamento></ptu:dadosFaturamento></ptu:guiaInternacao>")
+
+    def test_sinaliza_so_permanencia_curta(self, tmp_path):
+        guias = [
+            self._guia("1", "1", "2025/09/0108:00:00-04", "2025/09/0116:00:00-04"),  # 8h
+            self._guia("2", "1", "2025/09/0108:00:00-04", "2025/09/0308:00:00-04"),  # 2 dias
+            self._guia("3", "2", "2025/09/0108:00:00-04", "2025/09/0109:00:00-04"),  # regime 2
+            self._guia("4", "1", "2025/09/01 08:00:00", "2025/09/01 07:00:00"),      # fim antes do início
+            self._guia("5", "1", "2025/09", "2025/09/0109:00:00-04"),                # data curta
+        ]
+        caminho = tmp_path / "N0051001.051"
+        caminho.write_text(f'<ptu:Tipoguia xmlns:ptu="{PTU}">{"".join(guias)}</ptu:Tipoguia>', encoding="utf-8")
+
+        sinalizadas = xml_parser.extrair_guias_internacao_curta_para_sinalizacao(str(caminho))
+        assert [(g["numero_guia"], g["duracao"]) for g in sinalizadas] == [("1", "8:00:00")]
@@ -0,0 +1,101 @@
+"""
+Testes unitários para distribution_engine.
+
+- Estimativa de esforço (com e sem métricas de volume)
+- LPT + busca local minimizando a maior carga
+- Afinidade por Unimed
+- Estrutura do plano mantida para relatório/organização de arquivos
+"""
+import random
+import time
+
+from src.business.processing import distribution_engine
+
+
+def _fatura(numero, procedimentos, guias=0, unimed=None, valor="0,00"):
+    return {
+        'numero_fatura': numero,
+        'valor_total_documento': valor,
+        'qtd_guias': guias,
+        'qtd_procedimentos': procedimentos,
+        'codigo_unimed_destino': unimed,
+    }
+
+
+class TestEstimarEsforco:
+    """Testes para estimar_esforco"""
+
+    def test_usa_guias_e_procedimentos(self):
+        fatura = _fatura('1', procedimentos=10, guias=2)
+        esperado = 2 * distribution_engine.PESO_GUIA + 10 * distribution_engine.PESO_PROCEDIMENTO
+        assert distribution_engine.estimar_esforco(fatura) == esperado
+
+    def test_sem_metricas_usa_valor(self):
+        assert distribution_engine.estimar_esforco({'valor_total_documento': '150,50'}) == 150.5
+
+
+class TestDistribuirFaturas:
+    """Testes para distribuir_faturas"""
+
+    def test_plano_completo(self):
+        faturas = [_fatura(str(i), procedimentos=i + 1, valor=f"{i},00") for i in range(10)]
+        plano = distribution_engine.distribuir_faturas(faturas, ['ANA', 'JOAO', 'MARIA'])
+
+        assert set(plano) == {'ANA', 'JOAO', 'MARIA'}
+        numeros = sorted(f['numero_fatura'] for d in plano.values() for f in d['faturas'])
+        assert numeros == sorted(str(i) for i in range(10))
+        assert sum(d['total_quantidade'] for d in plano.values()) == 10
+        assert sum(d['total_valor'] for d in plano.values()) == sum(range(10))
+
+    def test_busca_local_melhora_lpt(self):
+        # LPT puro gera 7 x 5; o ótimo é 6 x 6
+        faturas = [_fatura(str(i), procedimentos=p) for i, p in enumerate([3, 3, 2, 2, 2])]
+
+        sem_refino = distribution_engine.distribuir_faturas(faturas, ['A', 'B'], refinar=False, usar_afinidade=False)
+        com_refino = distribution_engine.distribuir_faturas(faturas, ['A', 'B'], usar_afinidade=False)
+
+        assert max(d['total_esforco'] for d in sem_refino.values()) == 7
+        assert max(d['total_esforco'] for d in com_refino.values()) == 6
+
+    def test_afinidade_unimed(self):
+        faturas = [
+            _fatura('1', procedimentos=4, unimed='032'),
+            _fatura('2', procedimentos=2, unimed='032'),
+            _fatura('3', procedimentos=4, unimed='051'),
+            _fatura('4', procedimentos=3, unimed='051'),
+        ]
+
+        com_afinidade = distribution_engine.distribuir_faturas(faturas, ['A', 'B'])
+        sem_afinidade = distribution_engine.distribuir_faturas(faturas, ['A', 'B'], usar_afinidade=False)
+
+        # Mesmo makespan, mas cada auditor fica com uma única Unimed
+        for dados in com_afinidade.values():
+            assert len({f['codigo_unimed_destino'] for f in dados['faturas']}) == 1
+        assert max(d['total_esforco'] for d in com_afinidade.values()) == 7
+        assert any(
+            len({f['codigo_unimed_destino'] for f in dados['faturas']}) == 2
+            for dados in sem_afinidade.values()
+        )
+
+    def test_sem_auditores_ou_faturas(self):
+        assert distribution_engine.distribuir_faturas([], ['A']) == {
+            'A': {'faturas': [], 'total_valor': 0.0, 'total_quantidade': 0, 'total_esforco': 0.0}
+        }
+        assert distribution_engine.distribuir_faturas([_fatura('1', 1)], []) == {}
+
+    def test_volume_grande(self):
+        rng = random.Random(42)
+        faturas = [
+            _fatura(str(i), procedimentos=rng.randint(1, 3000), guias=rng.randint(1, 300),
+                    unimed=str(rng.randint(1, 200)))
+            for i in range(50000)
+        ]
+        auditores = [f"AUDITOR_{i}" for i in range(40)]
+
+        inicio = time.perf_counter()
+        plano = distribution_engine.distribuir_faturas(faturas, auditores)
+        duracao = time.perf_counter() - inicio
+
+        cargas = [d['total_esforco'] for d in plano.values()]
+        assert duracao < 2.0
+        assert (max(cargas) - min(cargas)) / max(cargas) < 0.001
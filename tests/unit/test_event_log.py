@@ -0,0 +1,136 @@
+"""
+Testes para o log em fila e a contagem de eventos por arquivo (logger_config, event_log).
+"""
+import json
+import logging
+import os
+
+import pytest
+from lxml import etree
+
+from src.business.rules.rule_engine import RuleEngine
+from src.infrastructure.logging import logger_config
+from src.infrastructure.logging.event_log import ContadorEventos
+from src.infrastructure.parsers.xml_reader import NAMESPACES
+
+PTU = NAMESPACES['ptu']
+PASTA_REGRAS = os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'config', 'regras')
+
+
+class _Coletor(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.registros = []
+
+    def emit(self, record):
+        self.registros.append(record)
+
+
+@pytest.fixture
+def coletor():
+    logger = logging.getLogger("teste.eventos")
+    handler = _Coletor()
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    yield logger, handler.registros
+    logger.removeHandler(handler)
+
+
+class TestContadorEventos:
+    """Contagens, amostragem e resumo do arquivo"""
+
+    def test_resumo_unico_sem_amostragem(self, coletor):
+        logger, registros = coletor
+        eventos = ContadorEventos(logger, amostra_a_cada=0)
+        eventos.iniciar("N1.051")
+        for _ in range(3):
+            eventos.registrar("regra_aplicada", "R1", "Regra '%s' aplicada.", "R1")
+        eventos.registrar("dia_31", "dt_Execucao", "Corrigindo %s", "x")
+
+        assert eventos.finalizar() == {"regra_aplicada": {"R1": 3}, "dia_31": {"dt_Execucao": 1}}
+        assert len(registros) == 1
+        assert registros[0].getMessage() == \
+            "Arquivo 'N1.051': 4 evento(s) - dia_31: dt_Execucao=1; regra_aplicada: R1=3"
+        assert registros[0].dados["contagens"]["regra_aplicada"] == {"R1": 3}
+        # Contagem zerada para o próximo arquivo
+        assert eventos.finalizar() == {}
+        assert len(registros) == 1
+
+    def test_amostragem_por_chave(self, coletor):
+        logger, registros = coletor
+        eventos = ContadorEventos(logger, amostra_a_cada=2)
+        eventos.iniciar("N1.051")
+        for chave in ("A", "A", "A", "B"):
+            eventos.registrar("rotacao", chave, "Profissional %s", chave)
+
+        assert [(r.getMessage(), r.dados["ocorrencia"]) for r in registros] == \
+            [("Profissional A", 1), ("Profissional A", 3), ("Profissional B", 1)]
+
+
+class TestLoggingEmFila:
+    """setup_logging: handlers atrás da fila e saída JSON-lines"""
+
+    @pytest.fixture(autouse=True)
+    def restaurar_root(self):
+        root = logging.getLogger()
+        nivel, handlers = root.level, list(root.handlers)
+        yield
+        logger_config.parar_logging()
+        root.setLevel(nivel)
+        root.handlers[:] = handlers
+
+    def test_texto_e_jsonl(self, tmp_path):
+        log_texto, log_jsonl = tmp_path / "app.log", tmp_path / "app.jsonl"
+        logger_config.setup_logging(log_file=str(log_texto), jsonl_file=str(log_jsonl))
+        # Uma segunda configuração substitui a anterior (sem handlers duplicados)
+        logger_config.setup_logging(log_file=str(log_texto), jsonl_file=str(log_jsonl))
+
+        logging.getLogger("teste.fila").info("Arquivo %s: %d", "N1.051", 3, extra={'dados': {'evento': 'x'}})
+        logger_config.parar_logging()
+
+        assert log_texto.read_text(encoding="utf-8").count("Arquivo N1.051: 3") == 1
+        linhas = [json.loads(linha) for linha in log_jsonl.read_text(encoding="utf-8").splitlines()]
+        assert [(l["mensagem"], l["logger"], l["evento"]) for l in linhas] == [("Arquivo N1.051: 3", "teste.fila", "x")]
+
+    def test_formatacao_fica_com_o_listener(self):
+        class NaoFormatar:
+            def __str__(self):
+                raise AssertionError("formatado na thread de quem loga")
+
+        handler = logger_config._FilaHandler(None)
+        registro = logging.LogRecord("x", logging.INFO, __file__, 1, "%s", (NaoFormatar(),), None)
+        assert handler.prepare(registro) is registro
+
+
+class TestMotorDeRegras:
+    """Regras aplicadas entram no resumo do arquivo, sem uma linha por ocorrência"""
+
+    def test_resumo_por_arquivo(self):
+        engine = RuleEngine()
+        with open(os.path.join(PASTA_REGRAS, 'intensivista_rotativo.json'), encoding='utf-8') as f:
+            engine.loaded_rules = json.load(f)
+        engine.ordem_schema = None
+        engine.eventos.amostra_a_cada = 0
+        item = ("<ptu:procedimentosExecutados><ptu:procedimentos><ptu:cd_Servico>10104020</ptu:cd_Servico>"
+                "</ptu:procedimentos><ptu:equipe_Profissional><ptu:nm_Profissional>X</ptu:nm_Profissional>"
+                "<ptu:CBO>225125</ptu:CBO><ptu:tp_Participacao>00</ptu:tp_Participacao></ptu:equipe_Profissional>"
+                "</ptu:procedimentosExecutados>")
+        raiz = etree.fromstring(f'<ptu:Tipoguia xmlns:ptu="{PTU}"><ptu:guiaSADT><ptu:dadosBeneficiario>'
+                                f'<ptu:id_Benef>1</ptu:id_Benef></ptu:dadosBeneficiario><ptu:dadosGuia>'
+                                f'{item * 3}</ptu:dadosGuia></ptu:guiaSADT></ptu:Tipoguia>')
+
+        logger = logging.getLogger("src.business.rules.rule_engine")
+        handler, nivel = _Coletor(), logger.level
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+        try:
+            assert engine.apply_rules_to_xml(etree.ElementTree(raiz), file_name="N1.051")
+        finally:
+            logger.removeHandler(handler)
+            logger.setLevel(nivel)
+
+        mensagens = [r for r in handler.registros if r.levelno == logging.INFO]
+        assert len(mensagens) == 1
+        contagens = mensagens[0].dados["contagens"]
+        assert sum(contagens["regra_aplicada"].values()) == 3
+        assert sum(contagens["corrigir_para_intensivista_rotativo"].values()) == 3
@@ -0,0 +1,118 @@
+"""
+Testes unitários para a busca de faturas (fatura_repository).
+
+Usa um SQLite temporário para validar:
+- Criação idempotente do índice de busca
+- Ranking (número exato > prefixo > demais)
+- Paginação e termos curtos
+- Sincronização do índice via triggers
+"""
+import pytest
+
+from src.database import fatura_repository
+from src.database.models_fatura import Fatura
+
+
+@pytest.fixture
+def banco_faturas(banco_sqlite, monkeypatch):
+    """Banco SQLite temporário com algumas faturas"""
+    fabrica = banco_sqlite
+    monkeypatch.setattr(fatura_repository, '_indice_busca_disponivel', None)
+
+    session = fabrica()
+    session.add_all([
+        Fatura(nro_fatura='12345', status='ENVIADA', unimed_nome='CAMPO GRANDE', responsavel='MARIA'),
+        Fatura(nro_fatura='123456', status='PENDENTE', unimed_nome='DOURADOS', responsavel='JOAO'),
+        Fatura(nro_fatura='9912345', status='PENDENTE', unimed_nome='CORUMBA', responsavel='ANA'),
+        Fatura(nro_fatura='55555', status='GLOSADA', unimed_nome='TRES LAGOAS', responsavel='MARIA'),
+    ])
+    session.commit()
+    session.close()
+    return fabrica
+
+
+class TestPesquisarFaturas:
+    """Testes para pesquisar_faturas"""
+
+    def test_indice_idempotente(self, banco_faturas):
+        assert fatura_repository.garantir_indice_busca() is True
+        assert fatura_repository.garantir_indice_busca() is True
+
+    def test_ranking_exato_prefixo_substring(self, banco_faturas):
+        resultado = fatura_repository.pesquisar_faturas('12345')
+        numeros = [f['nro_fatura'] for f in resultado['resultados']]
+        assert resultado['total'] == 3
+        assert numeros == ['12345', '123456', '9912345']
+
+    def test_busca_por_responsavel(self, banco_faturas):
+        resultado = fatura_repository.pesquisar_faturas('maria')
+        assert {f['nro_fatura'] for f in resultado['resultados']} == {'12345', '55555'}
+
+    def test_paginacao(self, banco_faturas):
+        pagina_2 = fatura_repository.pesquisar_faturas('12345', pagina=2, por_pagina=2)
+        assert pagina_2['total'] == 3
+        assert [f['nro_fatura'] for f in pagina_2['resultados']] == ['9912345']
+
+    def test_total_contado_ate_a_proxima_pagina(self, banco_faturas):
+        pagina_1 = fatura_repository.pesquisar_faturas('12345', pagina=1, por_pagina=1)
+        assert (pagina_1['total'], pagina_1['total_exato']) == (2, False)
+        assert [f['nro_fatura'] for f in pagina_1['resultados']] == ['12345']
+
+        pagina_2 = fatura_repository.pesquisar_faturas('12345', pagina=2, por_pagina=1)
+        assert (pagina_2['total'], pagina_2['total_exato']) == (3, True)
+
+    def test_termo_curto_usa_prefixo(self, banco_faturas):
+        resultado = fatura_repository.pesquisar_faturas('12')
+        assert [f['nro_fatura'] for f in resultado['resultados']] == ['12345', '123456']
+
+    def test_termo_vazio(self, banco_faturas):
+        assert fatura_repository.pesquisar_faturas('  ')['total'] == 0
+
+    def test_indice_sincronizado_com_alteracoes(self, banco_faturas):
+        fatura_repository.garantir_indice_busca()
+        session = banco_faturas()
+        fatura = session.query(Fatura).filter_by(nro_fatura='55555').first()
+        fatura.responsavel = 'CARLOS'
+        session.add(Fatura(nro_fatura='77777', status='ENVIADA', responsavel='CARLOS'))
+        session.commit()
+        session.close()
+
+        resultado = fatura_repository.pesquisar_faturas('carlos')
+        assert {f['nro_fatura'] for f in resultado['resultados']} == {'55555', '77777'}
+        assert fatura_repository.pesquisar_faturas('maria')['total'] == 1
+
+    def test_buscar_fatura_parcial(self, banco_faturas):
+        assert fatura_repository.buscar_fatura('991234')['nro_fatura'] == '9912345'
+
+
+class TestImportarLote:
+    """Testes para importar_lote (upsert em massa)"""
+
+    def test_cria_e_atualiza(self, banco_faturas):
+        stats = fatura_repository.importar_lote([
+            {'nro_fatura': '12345', 'status': 'CANCELADA', 'responsavel': 'PEDRO'},
+            {'nro_fatura': '88888', 'status': 'PENDENTE', 'valor': 10.5},
+            {'nro_fatura': '', 'status': 'PENDENTE'},
+            {'nro_fatura': '88888', 'responsavel': 'ANA', 'campo_inexistente': 1},
+        ], origem="Planilha.xlsx")
+
+        assert stats == {'criadas': 1, 'atualizadas': 2, 'erros': 1}
+
+        atualizada = fatura_repository.buscar_fatura('12345')
+        assert atualizada['status'] == 'CANCELADA'
+        assert atualizada['responsavel'] == 'PEDRO'
+        assert atualizada['historico'][0]['acao'] == "Dados atualizados"
+
+        nova = fatura_repository.buscar_fatura('88888')
+        assert nova['responsavel'] == 'ANA'
+        assert nova['valor'] == 10.5
+        assert nova['historico'][0]['acao'] == "Importada de Planilha.xlsx"
+
+    def test_lote_grande_em_blocos(self, banco_faturas, monkeypatch):
+        monkeypatch.setattr(fatura_repository, 'TAMANHO_BLOCO_IMPORTACAO', 7)
+        faturas = [{'nro_fatura': f"L{i:04d}", 'status': 'PENDENTE'} for i in range(50)]
+
+        stats = fatura_repository.importar_lote(faturas)
+
+        assert stats == {'criadas': 50, 'atualizadas': 0, 'erros': 0}
+        assert fatura_repository.get_estatisticas_faturas()['total'] == 54
@@ -0,0 +1,108 @@
+"""
+Testes unitários para a fila distribuída de validação (fila_repository / QueueWorker).
+
+Usa um SQLite temporário (FOR UPDATE é ignorado) para validar:
+- Reserva sem repetição de itens e lease por worker
+- Devolução de itens com lease vencida e limite de tentativas
+- Descarte do resultado de um item que mudou de dono
+- Worker processando um lote inteiro e gerando o relatório de alertas
+
+O comportamento concorrente com SKIP LOCKED é coberto em
+tests/integration/test_queue_worker_postgres.py.
+"""
+import os
+import shutil
+
+from src.business.processing.queue_worker import QueueWorker
+from src.database import fila_repository, job_repository
+
+PASTA_TESTES = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestFilaRepository:
+    """Testes para reserva, lease e conclusão de itens"""
+
+    def test_reserva_sem_repetir(self, banco_sqlite):
+        job_id = fila_repository.enfileirar_lote(['a.051', 'b.051', 'c.051'], '/lote')
+
+        primeiro = fila_repository.reservar_itens('w1', quantidade=2)
+        segundo = fila_repository.reservar_itens('w2', quantidade=2)
+
+        assert [i['caminho'] for i in primeiro] == ['a.051', 'b.051']
+        assert [i['caminho'] for i in segundo] == ['c.051']
+        assert fila_repository.reservar_itens('w3') == []
+        assert job_repository.obter_job(job_id)['status'] == 'EXECUTANDO'
+
+    def test_ignora_jobs_de_outros_tipos_e_cancelados(self, banco_sqlite):
+        job_repository.criar_job('VALIDACAO', ['local.051'], {'caminho_pasta': '/x'})
+        cancelado = fila_repository.enfileirar_lote(['a.051'], '/lote')
+        job_repository.cancelar_job(cancelado)
+
+        assert fila_repository.reservar_itens('w1') == []
+
+    def test_lease_vencida_volta_para_fila(self, banco_sqlite):
+        fila_repository.enfileirar_lote(['a.051'], '/lote')
+        item = fila_repository.reservar_itens('morto', lease_segundos=-1)[0]
+
+        assert fila_repository.liberar_itens_expirados() == (1, [])
+        assert fila_repository.renovar_lease('morto', [item['id']]) == 0
+
+        novo = fila_repository.reservar_itens('vivo')[0]
+        assert novo['id'] == item['id']
+        # O worker antigo não pode mais gravar o resultado
+        assert fila_repository.concluir_item(item['id'], 'morto', 'CONCLUIDO')['aceito'] is False
+        assert fila_repository.concluir_item(item['id'], 'vivo', 'CONCLUIDO')['aceito'] is True
+
+    def test_excesso_de_tentativas_vira_erro(self, banco_sqlite):
+        job_id = fila_repository.enfileirar_lote(['a.051'], '/lote')
+        for _ in range(fila_repository.MAX_TENTATIVAS - 1):
+            assert fila_repository.reservar_itens('w', lease_segundos=-1)
+            assert fila_repository.liberar_itens_expirados() == (1, [])
+        assert fila_repository.reservar_itens('w', lease_segundos=-1)
+
+        # O último item aberto virou ERRO: o job é concluído por quem liberou
+        assert fila_repository.liberar_itens_expirados() == (1, [job_id])
+        assert fila_repository.reservar_itens('w') == []
+        assert job_repository.resumo_job(job_id)['ERRO'] == 1
+        job = job_repository.obter_job(job_id)
+        assert job['status'] == 'CONCLUIDO'
+        assert job['processados'] == 1
+
+    def test_devolver_e_concluir_job(self, banco_sqlite):
+        job_id = fila_repository.enfileirar_lote(['a.051', 'b.051'], '/lote')
+        itens = fila_repository.reservar_itens('w1', quantidade=2)
+        assert fila_repository.devolver_itens('w1', [itens[1]['id']]) == 1
+
+        resultado = fila_repository.concluir_item(itens[0]['id'], 'w1', 'CONCLUIDO',
+                                                  alertas=[{'mensagem': 'm', 'dados': {}}])
+        assert resultado == {'aceito': True, 'job_concluido': False, 'job_id': job_id}
+
+        item = fila_repository.reservar_itens('w2')[0]
+        assert item['caminho'] == 'b.051'
+        assert fila_repository.concluir_item(item['id'], 'w2', 'PULADO')['job_concluido'] is True
+        assert job_repository.obter_job(job_id)['status'] == 'CONCLUIDO'
+        assert list(fila_repository.alertas_do_job(job_id)) == [{'mensagem': 'm', 'dados': {}}]
+
+
+class TestQueueWorker:
+    """Testes do laço do worker"""
+
+    def test_processa_lote_ate_esvaziar(self, banco_sqlite, tmp_path):
+        pasta = tmp_path / "lote"
+        pasta.mkdir()
+        arquivos = []
+        for i in range(3):
+            destino = pasta / f"N000{i}.051"
+            shutil.copy(os.path.join(PASTA_TESTES, "guia_user_request.xml"), destino)
+            with open(destino, "a", encoding="utf-8") as arquivo:
+                arquivo.write(f"<!-- {i} -->")
+            arquivos.append(str(destino))
+        job_id = fila_repository.enfileirar_lote(arquivos, str(pasta))
+
+        worker = QueueWorker(worker_id='teste', lote=2, intervalo_ocioso=0, log_callback=lambda msg: None)
+        estatisticas = worker.executar(sair_quando_vazio=True)
+
+        assert estatisticas['processados'] == 3
+        job = job_repository.obter_job(job_id)
+        assert job['status'] == 'CONCLUIDO'
+        assert job['processados'] == 3
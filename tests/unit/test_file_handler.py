@@ -0,0 +1,131 @@
+"""
+Testes para FileHandler.save_xml_tree: gravação atômica, layout e fsync em lote.
+"""
+import hashlib
+import os
+
+import pytest
+from lxml import etree
+
+from src.infrastructure.files import file_handler as modulo
+from src.infrastructure.files.file_handler import FileHandler
+
+PTU = "http://ptu.unimed.coop.br/schemas/V3_0"
+XML_NO_LAYOUT = (f"<?xml version='1.0' encoding='ISO-8859-1'?>\n"
+                 f"<ptu:guia xmlns:ptu=\"{PTU}\">\n<ptu:item>\n<ptu:cd>1</ptu:cd>\n</ptu:item>\n"
+                 f"<ptu:item>\n<ptu:cd>2</ptu:cd>\n</ptu:item>\n</ptu:guia>\n").encode('iso-8859-1')
+
+
+def _referencia(arvore):
+    """Saída do caminho antigo: indent completo + write"""
+    etree.indent(arvore.getroot(), space="")
+    return etree.tostring(arvore, encoding='ISO-8859-1', xml_declaration=True, pretty_print=True)
+
+
+@pytest.fixture
+def contador_indent(monkeypatch):
+    chamadas = []
+    original = etree.indent
+    monkeypatch.setattr(modulo.etree, 'indent', lambda *a, **k: (chamadas.append(a), original(*a, **k)))
+    return chamadas
+
+
+class TestSaveXmlTree:
+    """Serialização e gravação de save_xml_tree"""
+
+    def test_mesma_saida_que_o_indent_completo(self, tmp_path):
+        for origem in (XML_NO_LAYOUT, b"<a><b>  <c>1</c></b>\n  <d/></a>",
+                       os.path.join(os.path.dirname(__file__), '..', 'guia_user_request.xml')):
+            conteudo = open(origem, 'rb').read() if isinstance(origem, str) else origem
+            arvore = etree.ElementTree(etree.fromstring(conteudo))
+            esperado = _referencia(etree.ElementTree(etree.fromstring(conteudo)))
+
+            destino = tmp_path / 'saida.051'
+            assert FileHandler().save_xml_tree(arvore, str(destino))
+            assert destino.read_bytes() == esperado
+
+    def test_layout_pronto_nao_reindenta(self, tmp_path, contador_indent):
+        arvore = etree.ElementTree(etree.fromstring(XML_NO_LAYOUT))
+        arvore.getroot()[0][0].text = '9'
+
+        assert FileHandler().save_xml_tree(arvore, str(tmp_path / 'A.051'))
+        assert contador_indent == []
+
+        # Elemento inserido pela regra: reindenta
+        etree.SubElement(arvore.getroot()[1], f"{{{PTU}}}novo").text = 'x'
+        assert FileHandler().save_xml_tree(arvore, str(tmp_path / 'A.051'))
+        assert len(contador_indent) == 1
+        assert b"</ptu:cd>\n<ptu:novo>x</ptu:novo>\n</ptu:item>" in (tmp_path / 'A.051').read_bytes()
+
+    def test_conteudo_igual_nao_regrava(self, tmp_path):
+        destino = tmp_path / 'B.051'
+        destino.write_bytes(XML_NO_LAYOUT)
+        os.utime(destino, ns=(1_000_000_000, 1_000_000_000))
+        arvore = etree.ElementTree(etree.fromstring(XML_NO_LAYOUT))
+
+        assert FileHandler().save_xml_tree(arvore, str(destino))
+        assert FileHandler().save_xml_tree(arvore, str(destino),
+                                           hash_original=hashlib.md5(XML_NO_LAYOUT).hexdigest())
+        assert destino.stat().st_mtime_ns == 1_000_000_000
+
+        arvore.getroot()[0][0].text = '7'
+        assert FileHandler().save_xml_tree(arvore, str(destino),
+                                           hash_original=hashlib.md5(XML_NO_LAYOUT).hexdigest())
+        assert b"<ptu:cd>7</ptu:cd>" in destino.read_bytes()
+
+    def test_falha_na_gravacao_preserva_o_original(self, tmp_path, monkeypatch):
+        destino = tmp_path / 'C.051'
+        destino.write_bytes(XML_NO_LAYOUT)
+        os.chmod(destino, 0o640)
+        arvore = etree.ElementTree(etree.fromstring(XML_NO_LAYOUT))
+        arvore.getroot()[0][0].text = '5'
+
+        def falhar(*args):
+            raise OSError("disco cheio")
+        monkeypatch.setattr(modulo.os, 'replace', falhar)
+
+        assert FileHandler().save_xml_tree(arvore, str(destino)) is False
+        assert destino.read_bytes() == XML_NO_LAYOUT
+        assert sorted(os.listdir(tmp_path)) == ['C.051']
+
+        monkeypatch.undo()
+        assert FileHandler().save_xml_tree(arvore, str(destino))
+        assert b"<ptu:cd>5</ptu:cd>" in destino.read_bytes()
+        assert destino.stat().st_mode & 0o777 == 0o640
+
+
+class TestFsyncEmLote:
+    """Modo de fsync agrupado para pastas grandes"""
+
+    def test_fsync_agrupado(self, tmp_path, monkeypatch):
+        sincronizados = []
+        original = modulo._fsync_caminho
+        monkeypatch.setattr(modulo, '_fsync_caminho',
+                            lambda caminho, diretorio=False: (sincronizados.append((caminho, diretorio)),
+                                                              original(caminho, diretorio)))
+        fsync_direto = []
+        monkeypatch.setattr(modulo.os, 'fsync', lambda fd: fsync_direto.append(fd))
+
+        handler = FileHandler()
+        with handler.fsync_em_lote(tamanho_lote=3):
+            for i in range(4):
+                arvore = etree.ElementTree(etree.fromstring(XML_NO_LAYOUT))
+                arvore.getroot()[0][0].text = str(i + 10)
+                assert handler.save_xml_tree(arvore, str(tmp_path / f"F{i}.051"))
+            # Primeiro lote (3 arquivos) já sincronizado; o quarto aguarda a saída do bloco
+            assert [c for c, d in sincronizados if not d] == [str(tmp_path / f"F{i}.051") for i in range(3)]
+
+        arquivos = [c for c, d in sincronizados if not d]
+        pastas = [c for c, d in sincronizados if d]
+        assert arquivos == [str(tmp_path / f"F{i}.051") for i in range(4)]
+        assert pastas == [str(tmp_path)] * 2
+        # Sem fsync por arquivo durante a gravação (só os do lote: 4 arquivos + 2 pastas)
+        assert len(fsync_direto) == 6
+
+        # Fora do bloco: fsync imediato do arquivo e da pasta
+        sincronizados.clear()
+        fsync_direto.clear()
+        arvore.getroot()[0][0].text = '99'
+        assert handler.save_xml_tree(arvore, str(tmp_path / "F0.051"))
+        assert sincronizados == [(str(tmp_path), True)]
+        assert len(fsync_direto) == 2
@@ -0,0 +1,160 @@
+"""
+Testes para o índice de características por arquivo e a reexecução de impacto.
+"""
+import pytest
+from lxml import etree
+
+from src.database import feature_repository
+from src.database.rule_repository import RuleRepository
+from src.business.rules import feature_index
+from src.infrastructure.parsers.xml_reader import NAMESPACES
+
+PTU = NAMESPACES['ptu']
+
+
+def _xml(*procedimentos):
+    itens = "".join(
+        f"<ptu:procedimentosExecutados><ptu:procedimentos><ptu:cd_Servico>{servico}</ptu:cd_Servico>"
+        f"<ptu:tp_Tabela>22</ptu:tp_Tabela></ptu:procedimentos>"
+        f"<ptu:equipe_Profissional><ptu:CBO>{cbo}</ptu:CBO></ptu:equipe_Profissional>"
+        f"</ptu:procedimentosExecutados>"
+        for servico, cbo in procedimentos
+    )
+    return f'<ptu:guia xmlns:ptu="{PTU}">{itens}</ptu:guia>'
+
+
+def _regra(id_regra, servicos, novo_valor):
+    return {
+        'id': id_regra,
+        'descricao': id_regra,
+        'condicoes': {
+            'tipo_elemento': 'procedimentos',
+            'condicao_tag_valor': {'xpath': './ptu:cd_Servico', 'valor_permitido': servicos}
+        },
+        'acao': {'tipo_acao': 'alterar_tag', 'tag_alvo': './ptu:tp_Tabela', 'novo_valor': novo_valor}
+    }
+
+
+@pytest.fixture
+def banco_indice(banco_sqlite):
+    """Banco SQLite temporário para regras, histórico e índice, sem cache de regras entre testes"""
+    RuleRepository.invalidate_cache()
+    yield banco_sqlite
+    RuleRepository.invalidate_cache()
+
+
+@pytest.fixture
+def arquivos_indexados(banco_indice, tmp_path):
+    """Três arquivos com serviços diferentes, indexados"""
+    conteudos = {
+        'A.051': _xml(('10101012', '225125')),
+        'B.051': _xml(('40301630', '225125'), ('10101012', '223505')),
+        'C.051': _xml(('40301630', '251510')),
+    }
+    caminhos = {}
+    for nome, conteudo in conteudos.items():
+        caminho = tmp_path / nome
+        caminho.write_text(conteudo, encoding='utf-8')
+        tipos, valores = feature_index.extrair_caracteristicas_arquivo(str(caminho))
+        assert feature_repository.registrar_features(str(caminho), nome, None, None, tipos, valores)
+        caminhos[nome] = str(caminho)
+    return caminhos
+
+
+class TestFeatureIndex:
+    """Extração e consulta do índice"""
+
+    def test_extracao_em_arvore_e_em_fluxo(self, tmp_path):
+        conteudo = _xml(('10101012', '225125'), ('40301630', ' 223505 '))
+        caminho = tmp_path / 'F.051'
+        caminho.write_text(conteudo, encoding='utf-8')
+
+        em_arvore = feature_index.extrair_caracteristicas(etree.fromstring(conteudo))
+        em_fluxo = feature_index.extrair_caracteristicas_arquivo(str(caminho))
+
+        assert em_arvore == em_fluxo
+        tipos, valores = em_fluxo
+        assert {'guia', 'procedimentos', 'equipe_Profissional'} <= tipos
+        assert valores['cd_Servico'] == {'10101012', '40301630'}
+        assert valores['CBO'] == {'225125', '223505'}
+        assert valores['cd_cnpj'] == set()
+
+    def test_requisitos_da_regra(self):
+        requisitos = feature_index.requisitos_da_regra(_regra('R', ['1', '2'], '18'))
+        assert requisitos == [{'@tipo': {'procedimentos'}, 'cd_Servico': {'1', '2'}}]
+
+        # Campo não indexado: só o tipo de elemento restringe
+        regra = _regra('R', ['1'], '18')
+        regra['condicoes']['condicao_tag_valor']['xpath'] = './ptu:tp_Tabela'
+        assert feature_index.requisitos_da_regra(regra) == [{'@tipo': {'procedimentos'}}]
+
+        # Lista externa: valores da lista carregada
+        regra['condicoes']['condicao_tag_valor'] = {'xpath': './ptu:cd_Servico', 'tipo_comparacao': 'in_lista',
+                                                    'id_lista': 'L'}
+        assert feature_index.requisitos_da_regra(regra, {'L': {'9'}}) == [
+            {'@tipo': {'procedimentos'}, 'cd_Servico': {'9'}}]
+
+        assert feature_index.requisitos_da_regra({**regra, 'ativo': False}) == []
+
+    def test_busca_candidatos(self, arquivos_indexados):
+        por_servico = feature_repository.buscar_candidatos([{'cd_Servico': {'10101012'}}])
+        assert por_servico == sorted([arquivos_indexados['A.051'], arquivos_indexados['B.051']])
+
+        combinado = feature_repository.buscar_candidatos([{'cd_Servico': {'40301630'}, 'CBO': {'251510'}}])
+        assert combinado == [arquivos_indexados['C.051']]
+
+        assert len(feature_repository.buscar_candidatos([{}])) == 3
+
+        # Reindexar substitui os valores
+        tipos, valores = feature_index.extrair_caracteristicas(etree.fromstring(_xml(('99999999', '1'))))
+        feature_repository.registrar_features(arquivos_indexados['A.051'], 'A.051', None, None, tipos, valores)
+        assert feature_repository.buscar_candidatos([{'cd_Servico': {'10101012'}}]) == [arquivos_indexados['B.051']]
+        assert feature_repository.contar_indexados() == 3
+
+
+class TestReexecucaoImpacto:
+    """Reexecução em dry-run só dos arquivos afetados"""
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_reexecuta_so_arquivos_afetados(self, arquivos_indexados, workers):
+        from src.business.processing import impact_replay
+
+        RuleRepository.create_rule(_regra('R_TABELA', ['10101012'], '18'))
+        RuleRepository.update_rule('R_TABELA', {'condicoes': _regra('R_TABELA', ['40301630'], '18')['condicoes']})
+        conteudo_antes = {nome: open(caminho, encoding='utf-8').read() for nome, caminho in arquivos_indexados.items()}
+
+        resumo = impact_replay.reexecutar_impacto('R_TABELA', max_workers=workers, log_callback=lambda msg: None)
+
+        assert resumo['versao_antiga'] == 1
+        assert resumo['versao_atual'] == 2
+        assert resumo['indexados'] == 3
+        # A (antiga casa), B (ambas) e C (nova casa) são candidatos
+        assert resumo['analisados'] == 3
+        por_nome = {r['arquivo']: r for r in resumo['arquivos']}
+        assert por_nome['A.051']['alterado'] is True  # deixa de receber 18
+        assert por_nome['A.051']['diferencas'][0]['antes'] == '18'
+        assert por_nome['A.051']['diferencas'][0]['depois'] == '22'
+        assert por_nome['B.051']['total_diferencas'] == 2  # troca qual procedimento recebe 18
+        assert por_nome['C.051']['diferencas'][0]['depois'] == '18'
+        assert resumo['alterados'] == 3
+
+        # Dry-run: nada gravado
+        for nome, caminho in arquivos_indexados.items():
+            assert open(caminho, encoding='utf-8').read() == conteudo_antes[nome]
+
+    def test_seleciona_subconjunto(self, arquivos_indexados):
+        from src.business.processing import impact_replay
+
+        RuleRepository.create_rule(_regra('R_TABELA', ['10101012'], '18'))
+        RuleRepository.update_rule('R_TABELA', {'acao': _regra('R_TABELA', [], '19')['acao']})
+
+        resumo = impact_replay.reexecutar_impacto('R_TABELA', max_workers=1, log_callback=lambda msg: None)
+
+        assert sorted(r['arquivo'] for r in resumo['arquivos']) == ['A.051', 'B.051']
+        assert all(r['alterado'] for r in resumo['arquivos'])
+
+    def test_sem_historico(self, banco_indice):
+        from src.business.processing import impact_replay
+
+        RuleRepository.create_rule(_regra('R_NOVA', ['1'], '18'))
+        assert impact_replay.reexecutar_impacto('R_NOVA', log_callback=lambda msg: None) is None
@@ -0,0 +1,129 @@
+"""
+Testes para o cache de importação de faturas (importacao_repository).
+
+Usa um SQLite temporário para validar:
+- Reimportação sem extrair nem reler o XML (pelo stat e, se o ZIP mudou de lugar, pelo hash)
+- Reimportação quando os parâmetros da extração mudam
+- Restauração do estado do processador (faturas, guias e plano) sem abrir os ZIPs
+"""
+import os
+import zipfile
+
+import pytest
+
+from src.database import importacao_repository
+from src.infrastructure.parsers import xml_parser
+from src.infrastructure.parsers.xml_reader import NAMESPACES
+from src.workflow_controller import WorkflowController, calculate_file_hash
+
+PTU = NAMESPACES['ptu']
+
+
+def _criar_zip(caminho_zip, numero="123", valor="30000,00"):
+    xml = (f'<ptu:ptuA500 xmlns:ptu="{PTU}"><ptu:cabecalho><ptu:nr_Documento>{numero}</ptu:nr_Documento>'
+           f'<ptu:nr_Competencia>2511</ptu:nr_Competencia></ptu:cabecalho><ptu:Tipoguia><ptu:guiaInternacao>'
+           f'<ptu:nr_Guias><ptu:nr_GuiaTissPrestador>G{numero}</ptu:nr_GuiaTissPrestador></ptu:nr_Guias>'
+           f'<ptu:procedimentosExecutados><ptu:valores><ptu:vl_ServCobrado>{valor}</ptu:vl_ServCobrado>'
+           f'</ptu:valores></ptu:procedimentosExecutados></ptu:guiaInternacao></ptu:Tipoguia></ptu:ptuA500>')
+    with zipfile.ZipFile(caminho_zip, "w") as arquivo_zip:
+        arquivo_zip.writestr(f"N{numero}.051", xml)
+
+
+@pytest.fixture
+def leituras_xml(monkeypatch):
+    """Conta as leituras de XML feitas pela importação"""
+    contador = {'leituras': 0}
+    original = xml_parser.extrair_dados_fatura_xml
+
+    def contar(caminho):
+        contador['leituras'] += 1
+        return original(caminho)
+
+    monkeypatch.setattr(xml_parser, 'extrair_dados_fatura_xml', contar)
+    return contador
+
+
+@pytest.fixture
+def pasta_faturas(tmp_path):
+    pasta = tmp_path / "faturas"
+    pasta.mkdir()
+    _criar_zip(pasta / "F1.zip", "101")
+    _criar_zip(pasta / "F2.zip", "102", valor="100,00")
+    return pasta
+
+
+class TestCacheImportacao:
+    """Reimportação pelo cache"""
+
+    def test_reimportacao_nao_rele_xml(self, banco_sqlite, leituras_xml, pasta_faturas):
+        controller = WorkflowController()
+        assert controller.processar_importacao_faturas(str(pasta_faturas), lambda msg: None)[0]
+        primeira = controller.lista_faturas_processadas
+        assert leituras_xml['leituras'] == 2
+
+        mensagens = []
+        assert controller.processar_importacao_faturas(str(pasta_faturas), mensagens.append)[0]
+        assert leituras_xml['leituras'] == 2
+        assert controller.lista_faturas_processadas == primeira
+        assert sum("cache de importação" in msg for msg in mensagens) == 2
+        assert [g['numero_guia'] for g in controller.guias_relevantes_por_fatura['101']] == ['G101']
+        assert '102' not in controller.guias_relevantes_por_fatura
+        assert primeira[0]['zip_hash'] == calculate_file_hash(str(pasta_faturas / "F1.zip"))
+
+    def test_zip_movido_e_alterado(self, banco_sqlite, leituras_xml, pasta_faturas, tmp_path):
+        controller = WorkflowController()
+        controller.processar_importacao_faturas(str(pasta_faturas), lambda msg: None)
+
+        # Mesmo conteúdo em outra pasta: reconhecido pelo hash
+        outra = tmp_path / "outra"
+        outra.mkdir()
+        os.replace(pasta_faturas / "F1.zip", outra / "F1.zip")
+        assert controller.importar_fatura(str(outra / "F1.zip"), str(outra), str(tmp_path), lambda m: None)
+        assert leituras_xml['leituras'] == 2
+        registro, _ = importacao_repository.buscar_zip(str(outra / "F1.zip"), controller.parametros_importacao)
+        assert registro['dados_fatura']['numero_fatura'] == '101'
+
+        # Conteúdo novo no mesmo caminho: relido
+        _criar_zip(outra / "F1.zip", "201")
+        dados = controller.importar_fatura(str(outra / "F1.zip"), str(outra), str(tmp_path), lambda m: None)
+        assert dados['numero_fatura'] == '201'
+        assert leituras_xml['leituras'] == 3
+
+    def test_parametros_diferentes_reimportam(self, banco_sqlite, leituras_xml, pasta_faturas):
+        WorkflowController().processar_importacao_faturas(str(pasta_faturas), lambda msg: None)
+
+        controller = WorkflowController()
+        controller.VALOR_MINIMO_GUIA = 50.0
+        controller.parametros_importacao = importacao_repository.assinatura_parametros(
+            50.0, controller.codigos_hm_t00_a_ignorar)
+        controller.processar_importacao_faturas(str(pasta_faturas), lambda msg: None)
+        assert leituras_xml['leituras'] == 4
+        assert '102' in controller.guias_relevantes_por_fatura
+
+
+class TestEstadoImportacao:
+    """Restauração do processador sem abrir os ZIPs"""
+
+    def test_restaura_importacao_e_plano(self, banco_sqlite, pasta_faturas, monkeypatch):
+        controller = WorkflowController()
+        controller.processar_importacao_faturas(str(pasta_faturas), lambda msg: None)
+        plano = {'Ana': {'faturas': controller.lista_faturas_processadas[:1], 'total_valor': 1.0}}
+        controller._salvar_estado_importacao(plano)
+
+        def proibido(*args, **kwargs):
+            raise AssertionError("ZIP/XML não deveria ser aberto")
+
+        monkeypatch.setattr(zipfile, 'ZipFile', proibido)
+        monkeypatch.setattr(xml_parser, 'extrair_dados_fatura_xml', proibido)
+
+        restaurado = WorkflowController()
+        assert restaurado.restaurar_estado_importacao(str(pasta_faturas), lambda msg: None)[0]
+        assert restaurado.lista_faturas_processadas == controller.lista_faturas_processadas
+        assert restaurado.guias_relevantes_por_fatura == controller.guias_relevantes_por_fatura
+        assert restaurado.plano_ultima_distribuicao == plano
+        assert restaurado.pasta_faturas_importadas_atual == str(pasta_faturas)
+
+    def test_pasta_sem_estado(self, banco_sqlite, tmp_path):
+        controller = WorkflowController()
+        assert not controller.restaurar_estado_importacao(str(tmp_path), lambda msg: None)[0]
+        assert controller.lista_faturas_processadas == []
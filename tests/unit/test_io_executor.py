@@ -0,0 +1,132 @@
+"""
+Testes unitários para o executor de I/O paralelo e seu uso em file_manager.
+
+- Retentativas apenas para erros transitórios
+- Resumo com vazão e falhas
+- Movimentação e extração de ZIPs em paralelo
+"""
+import errno
+import os
+import zipfile
+
+import pytest
+
+from src.infrastructure.files import file_manager
+from src.infrastructure.files.io_executor import IOExecutor, erro_transitorio, mover_arquivo
+
+
+def _criar_zip(caminho, nome_interno, conteudo=b"<xml/>"):
+    with zipfile.ZipFile(caminho, 'w') as zf:
+        zf.writestr(nome_interno, conteudo)
+    return str(caminho)
+
+
+class TestIOExecutor:
+    """Testes para IOExecutor"""
+
+    def test_retenta_erro_transitorio(self):
+        chamadas = []
+
+        def operacao():
+            chamadas.append(1)
+            if len(chamadas) < 3:
+                raise OSError(errno.EBUSY, "ocupado")
+            return 10
+
+        executor = IOExecutor(tentativas=3, espera_inicial=0)
+        resumo = executor.executar([('arquivo', operacao)])
+
+        assert len(chamadas) == 3
+        assert resumo['sucesso'] == 1
+        assert resumo['bytes'] == 10
+
+    def test_nao_retenta_erro_permanente(self):
+        chamadas = []
+
+        def operacao():
+            chamadas.append(1)
+            raise FileNotFoundError(errno.ENOENT, "sumiu")
+
+        mensagens = []
+        executor = IOExecutor(tentativas=3, espera_inicial=0, log_callback=mensagens.append)
+        resumo = executor.executar([('arquivo', operacao)], descricao="Teste")
+
+        assert len(chamadas) == 1
+        assert resumo['sucesso'] == 0
+        assert resumo['falhas'][0][0] == 'arquivo'
+        assert any("MB/s" in m and "arquivos/s" in m for m in mensagens)
+
+    def test_erro_transitorio(self):
+        assert erro_transitorio(TimeoutError())
+        assert erro_transitorio(OSError(errno.EIO, "io"))
+        assert not erro_transitorio(FileExistsError(errno.EEXIST, "existe"))
+        assert not erro_transitorio(ValueError())
+
+    def test_mover_arquivo_nao_sobrescreve(self, tmp_path):
+        origem = tmp_path / "a.zip"
+        origem.write_bytes(b"12345")
+        destino = tmp_path / "dest"
+        destino.mkdir()
+
+        assert mover_arquivo(str(origem), str(destino)) == 5
+        assert (destino / "a.zip").exists()
+
+        origem.write_bytes(b"novo")
+        with pytest.raises(FileExistsError):
+            mover_arquivo(str(origem), str(destino))
+
+
+class TestFileManagerParalelo:
+    """Testes para organizar_faturas_por_auditor, extrair_xmls_de_lista_zips e fazer_backup_faturas"""
+
+    def test_organizar_faturas_por_auditor(self, tmp_path):
+        origem = tmp_path / "importadas"
+        origem.mkdir()
+        plano = {
+            'ANA SILVA': {'faturas': [
+                {'caminho_zip_original': _criar_zip(origem / f"F{i}.zip", f"F{i}.051")} for i in range(5)
+            ]},
+            'J. SOUZA': {'faturas': [
+                {'caminho_zip_original': _criar_zip(origem / "F9.zip", "F9.051")}
+            ]},
+        }
+
+        resumo = file_manager.organizar_faturas_por_auditor(plano, str(origem), str(tmp_path / "dist"), max_workers=4)
+
+        assert resumo['sucesso'] == 6
+        assert sorted(os.listdir(tmp_path / "dist" / "ANA_SILVA")) == [f"F{i}.zip" for i in range(5)]
+        assert os.listdir(tmp_path / "dist" / "J_SOUZA") == ["F9.zip"]
+        assert not list(origem.glob("*.zip"))
+
+    def test_extrair_xmls_de_lista_zips(self, tmp_path):
+        zips = [_criar_zip(tmp_path / f"F{i}.zip", f"N{i}.051", f"<f{i}/>".encode()) for i in range(4)]
+        zips.append(str(tmp_path / "inexistente.zip"))
+        destino = tmp_path / "xmls"
+
+        resumo = file_manager.extrair_xmls_de_lista_zips(zips, str(destino))
+
+        assert resumo['sucesso'] == 4
+        assert sorted(os.listdir(destino)) == [f"N{i}.051" for i in range(4)]
+        assert (destino / "N2.051").read_bytes() == b"<f2/>"
+
+    def test_fazer_backup_faturas(self, tmp_path):
+        zips = [_criar_zip(tmp_path / f"F{i}.zip", f"F{i}.051") for i in range(3)]
+        backup = tmp_path / "Backup"
+        backup.mkdir()
+        (backup / "F0.zip").write_bytes(b"ja copiado")
+
+        resumo = file_manager.fazer_backup_faturas(zips, str(backup), max_workers=2)
+
+        assert resumo['sucesso'] == 2
+        assert sorted(os.listdir(backup)) == ["F0.zip", "F1.zip", "F2.zip"]
+        assert (backup / "F0.zip").read_bytes() == b"ja copiado"
+        assert all(os.path.exists(z) for z in zips)
+
+    def test_extracao_sanitiza_caminho(self, tmp_path):
+        caminho_zip = _criar_zip(tmp_path / "mal.zip", "../../fora.051")
+        destino = tmp_path / "xmls"
+
+        extraido = file_manager.extrair_xml_fatura_do_zip(caminho_zip, str(destino))
+
+        assert extraido == os.path.join(str(destino), "fora.051")
+        assert os.path.exists(extraido)
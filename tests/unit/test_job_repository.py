@@ -0,0 +1,120 @@
+"""
+Testes unitários para os jobs em lote retomáveis (job_repository).
+
+Usa um SQLite temporário para validar:
+- Criação do job com a lista de arquivos e checkpoint por arquivo
+- Cancelamento (inclusive durante a execução)
+- Retomada da validação a partir do primeiro arquivo pendente
+"""
+import os
+import shutil
+
+import pytest
+
+from src.database import job_repository
+
+PASTA_TESTES = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def banco_jobs(banco_sqlite, tmp_path, monkeypatch):
+    """Banco SQLite temporário, com os spools de alertas dos jobs em tmp_path"""
+    monkeypatch.setattr(job_repository, 'PASTA_JOBS', str(tmp_path / 'jobs'))
+    return banco_sqlite
+
+
+class TestJobRepository:
+    """Testes para criação, checkpoint e cancelamento de jobs"""
+
+    def test_cria_job_com_arquivos_pendentes(self, banco_jobs):
+        job_id = job_repository.criar_job('VALIDACAO', ['a.051', 'b.051'], {'caminho_pasta': '/x'})
+
+        job = job_repository.obter_job(job_id)
+        assert job['status'] == 'PENDENTE'
+        assert job['parametros'] == {'caminho_pasta': '/x'}
+        assert job['alertas_caminho'].endswith(f"job_{job_id}_alertas.jsonl")
+        assert job_repository.arquivos_pendentes(job_id) == [(0, 'a.051'), (1, 'b.051')]
+
+    def test_tipo_invalido(self, banco_jobs):
+        assert job_repository.criar_job('OUTRO', ['a.051'], {}) is None
+
+    def test_checkpoint_por_arquivo(self, banco_jobs):
+        job_id = job_repository.criar_job('HASH', ['a.051', 'b.051', 'c.051'], {})
+        assert job_repository.iniciar_job(job_id)[0]
+
+        assert job_repository.registrar_arquivo(job_id, 0, 'CONCLUIDO', alterado=True)
+        assert job_repository.registrar_arquivo(job_id, 1, 'ERRO', mensagem='falha')
+
+        job = job_repository.obter_job(job_id)
+        assert job['processados'] == 2
+        assert job['ultimo_arquivo'] == 'b.051'
+        assert job_repository.arquivos_pendentes(job_id) == [(2, 'c.051')]
+        resumo = job_repository.resumo_job(job_id)
+        assert (resumo['CONCLUIDO'], resumo['ERRO'], resumo['PENDENTE'], resumo['alterados']) == (1, 1, 1, 1)
+
+    def test_cancelamento_interrompe_checkpoint(self, banco_jobs):
+        job_id = job_repository.criar_job('HASH', ['a.051', 'b.051'], {})
+        job_repository.iniciar_job(job_id)
+
+        assert job_repository.cancelar_job(job_id)[0]
+        assert job_repository.registrar_arquivo(job_id, 0, 'CONCLUIDO') is False
+        assert job_repository.iniciar_job(job_id)[0] is False
+        assert job_repository.cancelar_job(job_id)[0] is False
+
+        job_repository.finalizar_job(job_id, 'CONCLUIDO')
+        assert job_repository.obter_job(job_id)['status'] == 'CANCELADO'
+
+    def test_listar_por_status(self, banco_jobs):
+        primeiro = job_repository.criar_job('HASH', ['a.051'], {})
+        segundo = job_repository.criar_job('HASH', ['b.051'], {})
+        job_repository.finalizar_job(primeiro, 'INTERROMPIDO')
+
+        assert [j['id'] for j in job_repository.listar_jobs()] == [segundo, primeiro]
+        assert [j['id'] for j in job_repository.listar_jobs(status='interrompido')] == [primeiro]
+
+
+class TestRetomadaValidacao:
+    """Testes de WorkflowController.executar_validacao_xmls como job retomável"""
+
+    def test_retoma_sem_reprocessar_concluidos(self, banco_jobs, tmp_path, monkeypatch):
+        from src.workflow_controller import WorkflowController
+
+        pasta = tmp_path / "faturas"
+        pasta.mkdir()
+        for i in range(3):
+            destino = pasta / f"N000{i}.051"
+            shutil.copy(os.path.join(PASTA_TESTES, "guia_user_request.xml"), destino)
+            with open(destino, "a", encoding="utf-8") as arquivo:
+                arquivo.write(f"<!-- {i} -->")  # conteúdo distinto (deduplicação por hash)
+
+        controller = WorkflowController()
+        validar_original = controller.validar_arquivo
+        validados = []
+
+        def validar_e_cair(engine, exec_repo, xml_file, *args, **kwargs):
+            if len(validados) == 1:
+                raise KeyboardInterrupt
+            validados.append(os.path.basename(xml_file))
+            return validar_original(engine, exec_repo, xml_file, *args, **kwargs)
+
+        monkeypatch.setattr(controller, 'validar_arquivo', validar_e_cair)
+        with pytest.raises(KeyboardInterrupt):
+            controller.executar_validacao_xmls(str(pasta), log_callback=lambda msg: None)
+
+        job = job_repository.listar_jobs()[0]
+        assert job['status'] == 'INTERROMPIDO'
+        assert job['processados'] == 1
+
+        def validar(engine, exec_repo, xml_file, *args, **kwargs):
+            validados.append(os.path.basename(xml_file))
+            return validar_original(engine, exec_repo, xml_file, *args, **kwargs)
+
+        monkeypatch.setattr(controller, 'validar_arquivo', validar)
+        sucesso, _ = controller.retomar_job(job['id'], log_callback=lambda msg: None)
+
+        assert sucesso
+        assert sorted(validados) == ["N0000.051", "N0001.051", "N0002.051"]
+        job = job_repository.obter_job(job['id'])
+        assert job['status'] == 'CONCLUIDO'
+        assert job['processados'] == 3
+        assert not os.path.exists(job['alertas_caminho'])
@@ -0,0 +1,178 @@
+"""
+Testes para o agendador de tarefas em segundo plano (job_scheduler).
+"""
+import threading
+
+import pytest
+
+from src.infrastructure.workers.job_scheduler import (CANCELADO, CONCLUIDO, EXECUTANDO, FALHOU,
+                                                      PRIORIDADE_ALTA, PRIORIDADE_BAIXA, AgendadorTarefas,
+                                                      pastas_conflitam, recurso_pasta)
+
+TIMEOUT = 5
+
+
+@pytest.fixture
+def agendador():
+    instancia = AgendadorTarefas(max_threads=2)
+    yield instancia
+    instancia.encerrar(timeout=TIMEOUT)
+
+
+def _bloqueio(agendador, recursos=('bloqueio',)):
+    """Submete uma tarefa que só termina quando o evento retornado for liberado."""
+    liberar = threading.Event()
+    iniciou = threading.Event()
+
+    def esperar():
+        iniciou.set()
+        liberar.wait(TIMEOUT)
+
+    tarefa = agendador.submeter(esperar, nome="bloqueio", recursos=recursos)
+    assert iniciou.wait(TIMEOUT)
+    return tarefa, liberar
+
+
+class TestFila:
+    """Prioridade e limites por recurso"""
+
+    def test_prioridade_e_ordem_de_chegada(self):
+        agendador = AgendadorTarefas(max_threads=1)
+        ordem = []
+        _, liberar = _bloqueio(agendador)
+        for nome, prioridade in (("baixa", PRIORIDADE_BAIXA), ("normal-1", 5), ("alta", PRIORIDADE_ALTA),
+                                 ("normal-2", 5)):
+            agendador.submeter(ordem.append, nome, nome=nome, prioridade=prioridade)
+
+        assert [t['nome'] for t in agendador.pendentes()] == ["alta", "normal-1", "normal-2", "baixa"]
+        liberar.set()
+        assert agendador.aguardar(TIMEOUT)
+        assert ordem == ["alta", "normal-1", "normal-2", "baixa"]
+        agendador.encerrar(timeout=TIMEOUT)
+
+    def test_mesma_pasta_uma_tarefa_por_vez(self, agendador, tmp_path):
+        pasta = recurso_pasta(str(tmp_path))
+        _, liberar = _bloqueio(agendador, recursos=(pasta,))
+        outra_pasta = agendador.submeter(lambda: "livre", recursos=(recurso_pasta(str(tmp_path) + "_x"),))
+        mesma_pasta = agendador.submeter(lambda: "depois", recursos=(pasta,))
+
+        # A tarefa bloqueada pela pasta não segura a que vem atrás
+        assert _esperar_status(outra_pasta, CONCLUIDO)
+        assert mesma_pasta.status != EXECUTANDO and mesma_pasta.iniciada_em is None
+        liberar.set()
+        assert agendador.aguardar(TIMEOUT)
+        assert mesma_pasta.resultado == "depois"
+
+    def test_pasta_e_subpasta_uma_tarefa_por_vez(self, agendador, tmp_path):
+        pasta = recurso_pasta(str(tmp_path))
+        subpasta = recurso_pasta(str(tmp_path / "Correção XML" / "Fulano"))
+        _, liberar = _bloqueio(agendador, recursos=(pasta,))
+        na_subpasta = agendador.submeter(lambda: "depois", recursos=(subpasta,))
+        vizinha = agendador.submeter(lambda: "livre", recursos=(recurso_pasta(str(tmp_path) + "_2"),))
+
+        assert _esperar_status(vizinha, CONCLUIDO)
+        assert na_subpasta.iniciada_em is None
+        liberar.set()
+        assert agendador.aguardar(TIMEOUT)
+        assert na_subpasta.resultado == "depois"
+
+    def test_recurso_pasta_normaliza_caminho(self, tmp_path):
+        assert recurso_pasta(str(tmp_path)) == recurso_pasta(str(tmp_path / "sub" / ".."))
+        assert pastas_conflitam(recurso_pasta(str(tmp_path / "a" / "b")), recurso_pasta(str(tmp_path / "a")))
+        assert not pastas_conflitam(recurso_pasta(str(tmp_path / "a")), recurso_pasta(str(tmp_path / "ab")))
+
+
+class TestCancelamento:
+    """Pendente sai da fila; em execução para no cancel_check"""
+
+    def test_cancelar_pendente(self, agendador):
+        _, liberar = _bloqueio(agendador)
+        executou = []
+        terminadas = []
+        tarefa = agendador.submeter(executou.append, 1, recursos=('bloqueio',), ao_terminar=terminadas.append)
+
+        assert agendador.cancelar(tarefa)
+        liberar.set()
+        assert agendador.aguardar(TIMEOUT)
+        assert tarefa.status == CANCELADO and executou == []
+        assert terminadas == [tarefa]
+        assert not agendador.cancelar(tarefa)
+
+    def test_cancelamento_cooperativo(self, agendador):
+        iniciou = threading.Event()
+
+        def processar(arquivos, log_callback=None, cancel_check=None):
+            feitos = 0
+            for _ in arquivos:
+                iniciou.set()
+                if cancel_check():
+                    break
+                log_callback("arquivo")
+                feitos += 1
+                threading.Event().wait(0.01)
+            return feitos
+
+        tarefa = agendador.submeter(processar, range(10000))
+        assert iniciou.wait(TIMEOUT)
+        agendador.cancelar(tarefa)
+        assert agendador.aguardar(TIMEOUT)
+
+        assert tarefa.status == CANCELADO
+        assert tarefa.resultado < 10000
+        assert len(tarefa.canal.drenar()[0]) == tarefa.resultado
+
+    def test_controller_interrompe_validacao_xsd(self, tmp_path, monkeypatch):
+        from src.infrastructure.files import file_manager
+        from src.workflow_controller import WorkflowController
+
+        for nome in ("a.051", "b.051", "c.051"):
+            (tmp_path / nome).write_text("<a/>")
+        monkeypatch.setattr(file_manager, 'validar_xml_com_xsd', lambda xsd, xml: (True, "OK"))
+        consultas = []
+
+        sucesso, mensagem = WorkflowController().validar_pasta_com_xsd(
+            str(tmp_path), lambda msg: None, cancel_check=lambda: consultas.append(1) or len(consultas) > 2)
+
+        assert not sucesso
+        assert "2 de 2" in mensagem
+
+
+class TestHistorico:
+    """Falhas, tempos e histórico para o dashboard"""
+
+    def test_falha_registra_erro(self, agendador):
+        terminadas = []
+
+        def falhar():
+            raise ValueError("arquivo corrompido")
+
+        tarefa = agendador.submeter(falhar, nome="falha", ao_terminar=terminadas.append)
+        assert agendador.aguardar(TIMEOUT)
+
+        assert tarefa.status == FALHOU
+        assert "ValueError: arquivo corrompido" in tarefa.erro
+        assert agendador.historico()[0]['erro'] == "ValueError: arquivo corrompido"
+        assert terminadas == [tarefa]
+
+    def test_historico_com_tempos(self, agendador):
+        agendador.submeter(lambda: 1, nome="primeira")
+        agendador.aguardar(TIMEOUT)
+        agendador.submeter(lambda: 2, nome="segunda")
+        agendador.aguardar(TIMEOUT)
+
+        historico = agendador.historico()
+        assert [t['nome'] for t in historico] == ["segunda", "primeira"]
+        for tarefa in historico:
+            assert tarefa['status'] == CONCLUIDO
+            assert tarefa['espera_segundos'] >= 0
+            assert tarefa['duracao_segundos'] >= 0
+        assert agendador.pendentes() == [] and agendador.executando() == []
+
+
+def _esperar_status(tarefa, status):
+    evento = threading.Event()
+    for _ in range(TIMEOUT * 100):
+        if tarefa.status == status:
+            return True
+        evento.wait(0.01)
+    return False
@@ -0,0 +1,111 @@
+"""
+Testes para a tabela colunar de procedimentos (procedure_table).
+"""
+import os
+import sys
+from datetime import date
+
+import pytest
+
+from src.infrastructure.parsers.xml_reader import NAMESPACES
+from src.infrastructure.reports import procedure_table
+
+PTU = NAMESPACES['ptu']
+GUIA_SADT = os.path.join(os.path.dirname(__file__), '..', 'guia_user_request.xml')
+
+
+def _fatura(tmp_path, competencia="2511", nome="N0051001.051"):
+    with open(GUIA_SADT, encoding="utf-8") as f:
+        sadt = f.read().replace(f' xmlns:ptu="{PTU}"', '')
+    consulta = ("<ptu:guiaConsulta><ptu:dt_Atendimento>20251030</ptu:dt_Atendimento><ptu:procedimentos>"
+                "<ptu:cd_Servico>10101012</ptu:cd_Servico></ptu:procedimentos><ptu:valores>"
+                "<ptu:vl_ServCobrado>150,00</ptu:vl_ServCobrado></ptu:valores></ptu:guiaConsulta>")
+    caminho = tmp_path / nome
+    caminho.write_text(
+        f'<ptu:ptuA500 xmlns:ptu="{PTU}"><ptu:cabecalho><ptu:nr_Documento>123</ptu:nr_Documento>'
+        f'<ptu:nr_Competencia>{competencia}</ptu:nr_Competencia><ptu:dt_EmissaoDoc>20251201</ptu:dt_EmissaoDoc>'
+        f'</ptu:cabecalho><ptu:Tipoguia>{sadt}{consulta}</ptu:Tipoguia></ptu:ptuA500>', encoding="utf-8")
+    return str(caminho)
+
+
+class TestExtracao:
+    """Linhas por item, sem dependências além do lxml"""
+
+    def test_colunas_por_item(self, tmp_path):
+        colunas = procedure_table.extrair_procedimentos(_fatura(tmp_path))
+
+        assert len(colunas["arquivo"]) == 14
+        assert all(len(valores) == 14 for valores in colunas.values())
+        assert set(colunas["competencia"]) == {"202511"}
+        assert set(colunas["numero_fatura"]) == {"123"}
+        assert colunas["tipo_guia"][0] == "guiaSADT"
+        assert colunas["seq_item"][:2] == [1, 2]
+        assert colunas["dt_execucao"][0] == date(2025, 11, 27)
+        assert colunas["tx_adm_servico"][:2] == [None, 0.22]
+        assert (colunas["id_benef"][0], colunas["cd_prest"][0]) == ("0020010884275", "11099")
+
+    def test_guia_de_consulta_e_uma_linha(self, tmp_path):
+        colunas = procedure_table.extrair_procedimentos(_fatura(tmp_path))
+
+        assert colunas["tipo_guia"][-1] == "guiaConsulta"
+        assert (colunas["cd_servico"][-1], colunas["vl_serv_cobrado"][-1]) == ("10101012", 150.0)
+        assert colunas["dt_execucao"][-1] == date(2025, 10, 30)
+
+    def test_arquivo_ilegivel(self, tmp_path):
+        assert procedure_table.extrair_procedimentos(str(tmp_path / "nao_existe.051")) is None
+
+    def test_colunas_alinhadas_ao_schema(self, tmp_path):
+        colunas = procedure_table.extrair_procedimentos(_fatura(tmp_path))
+
+        assert list(colunas) == [nome for nome, _ in procedure_table.COLUNAS] + ["competencia"]
+        assert colunas["cd_servico"][:2] == ["1900227633", "1900214434"]
+        assert all(isinstance(valor, float) for valor in colunas["vl_serv_cobrado"])
+
+    def test_sem_pyarrow_nada_e_gravado(self, tmp_path, monkeypatch):
+        monkeypatch.setitem(sys.modules, "pyarrow", None)
+        saida = tmp_path / "procedimentos"
+
+        resumo = procedure_table.exportar_faturas([_fatura(tmp_path)], str(saida))
+
+        assert (resumo["exportados"], resumo["erros"]) == (0, 1)
+        assert not saida.exists()
+        assert procedure_table.carregar_procedimentos(str(saida)) is None
+
+
+class TestParquet:
+    """Gravação por competência, exportação incremental e agregações"""
+
+    @pytest.fixture(autouse=True)
+    def dependencias(self):
+        pytest.importorskip("pyarrow")
+        pytest.importorskip("numpy")
+
+    def test_exportacao_incremental(self, tmp_path):
+        arquivo = _fatura(tmp_path)
+        saida = str(tmp_path / "procedimentos")
+
+        assert procedure_table.exportar_faturas([arquivo], saida)["exportados"] == 1
+        assert procedure_table.exportar_faturas([arquivo], saida)["atualizados"] == 1
+        assert os.path.exists(procedure_table.caminho_parquet(saida, "202511", "N0051001.051"))
+
+        # Nova competência: a versão anterior sai da partição antiga
+        _fatura(tmp_path, competencia="2512")
+        procedure_table.exportar_faturas([arquivo], saida, forcar=True)
+        assert not os.path.exists(procedure_table.caminho_parquet(saida, "202511", "N0051001.051"))
+        assert os.path.exists(procedure_table.caminho_parquet(saida, "202512", "N0051001.051"))
+        assert procedure_table.carregar_procedimentos(saida).num_rows == 14
+
+    def test_agregacoes(self, tmp_path):
+        saida = str(tmp_path / "procedimentos")
+        procedure_table.exportar_faturas([_fatura(tmp_path, "2510", "A.051"), _fatura(tmp_path, "2511", "B.051")],
+                                         saida)
+
+        tabela = procedure_table.carregar_procedimentos(saida, competencias=["202511"])
+        assert tabela.num_rows == 14
+        resumo = procedure_table.resumo_por_competencia(procedure_table.carregar_procedimentos(saida))
+        assert [(linha["competencia"], linha["itens"]) for linha in resumo] == [("202510", 14), ("202511", 14)]
+        assert resumo[0]["vl_serv_cobrado"] == pytest.approx(416.10)
+
+        servicos = procedure_table.agregar(tabela, "cd_servico")
+        assert servicos[0] == {"grupo": "10101012", "quantidade": 1, "total": 150.0}
+        assert procedure_table.dividir_por_data(tabela, date(2025, 11, 1)) == {"ate": 1, "depois": 13, "sem_data": 0}
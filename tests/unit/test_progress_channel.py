@@ -0,0 +1,88 @@
+"""
+Testes para o canal de progresso entre worker e interface (progress_channel).
+"""
+import threading
+
+from src.infrastructure.workers.progress_channel import CanalProgresso, formatar_andamento
+
+
+class _Relogio:
+    def __init__(self):
+        self.agora = 100.0
+
+    def __call__(self):
+        return self.agora
+
+
+class TestCanalProgresso:
+    """Linhas em lote, buffer circular e andamento coalescido"""
+
+    def test_drena_linhas_em_ordem(self):
+        canal = CanalProgresso()
+        canal.log("a")
+        canal.log("b")
+
+        assert canal.drenar() == (["a", "b"], 0, None)
+        assert canal.drenar() == ([], 0, None)
+
+    def test_buffer_circular_conta_descartadas(self):
+        canal = CanalProgresso(capacidade=3)
+        for i in range(5):
+            canal.log(str(i))
+
+        assert canal.drenar() == (["2", "3", "4"], 2, None)
+
+    def test_andamento_so_o_mais_recente(self):
+        relogio = _Relogio()
+        canal = CanalProgresso(relogio=relogio)
+        canal.progresso(10, 100)  # retomada: 10 já feitos antes
+        relogio.agora += 10
+        canal.progresso(30, 100)
+        relogio.agora += 10
+        canal.progresso(50, 100)
+
+        _, _, andamento = canal.drenar()
+        assert andamento == {'feitos': 50, 'total': 100, 'taxa': 2.0, 'eta_segundos': 25.0}
+        assert canal.drenar()[2] is None
+        assert formatar_andamento(andamento) == "50/100 arquivo(s) - 2.0/s - restam ~25s"
+        assert formatar_andamento({'feitos': 5, 'total': 5, 'taxa': 0.0, 'eta_segundos': None}) == \
+            "5/5 arquivo(s)"
+
+    def test_varias_threads(self):
+        canal = CanalProgresso(capacidade=10000)
+
+        def produzir(prefixo):
+            for i in range(1000):
+                canal.log(f"{prefixo}{i}")
+
+        threads = [threading.Thread(target=produzir, args=(p,)) for p in "abcd"]
+        for thread in threads:
+            thread.start()
+        coletadas = []
+        while any(thread.is_alive() for thread in threads):
+            coletadas.extend(canal.drenar()[0])
+        for thread in threads:
+            thread.join()
+        coletadas.extend(canal.drenar()[0])
+
+        assert len(coletadas) == 4000
+        assert [linha for linha in coletadas if linha[0] == "a"] == [f"a{i}" for i in range(1000)]
+
+
+class TestAndamentoDoController:
+    """progress_callback informado a cada arquivo"""
+
+    def test_validacao_xsd(self, tmp_path, monkeypatch):
+        from src.infrastructure.files import file_manager
+        from src.workflow_controller import WorkflowController
+
+        for nome in ("a.051", "b.051"):
+            (tmp_path / nome).write_text("<a/>")
+        monkeypatch.setattr(file_manager, 'validar_xml_com_xsd', lambda xsd, xml: (True, "OK"))
+        canal = CanalProgresso()
+
+        sucesso, _ = WorkflowController().validar_pasta_com_xsd(str(tmp_path), canal.log, canal.progresso)
+        linhas, _, andamento = canal.drenar()
+        assert sucesso
+        assert (andamento['feitos'], andamento['total']) == (2, 2)
+        assert linhas[-1].startswith("SUCESSO:")
@@ -0,0 +1,115 @@
+"""
+Testes unitários para o relatório de distribuição (report_generator).
+"""
+import csv
+import gc
+import os
+import sys
+
+import openpyxl
+import pytest
+
+from src.database import fatura_repository
+from src.infrastructure.reports import report_generator
+
+
+@pytest.fixture
+def plano():
+    return {
+        'ANA': {'faturas': [
+            {'numero_fatura': '1001', 'competencia': '2501', 'data_emissao': '20250110',
+             'data_vencimento': '20250210', 'valor_total_documento': '1500,50',
+             'codigo_unimed_destino': '032', 'nome_unimed_destino': 'CAMPO GRANDE'},
+        ]},
+        'JOAO': {'faturas': [
+            {'numero_fatura': '1002', 'competencia': '202501', 'valor_total_documento': '99,90'},
+        ]},
+    }
+
+
+@pytest.fixture
+def sem_efeitos_externos(tmp_path, monkeypatch):
+    """Histórico em pasta temporária e importação ao banco interceptada"""
+    monkeypatch.setattr(report_generator, 'PASTA_HISTORICO_DISTRIBUICAO', str(tmp_path / "historico"))
+    importadas = []
+    monkeypatch.setattr(fatura_repository, 'importar_lote',
+                        lambda faturas, origem: importadas.extend(faturas) or
+                        {'criadas': len(faturas), 'atualizadas': 0, 'erros': 0})
+    return importadas
+
+
+class TestGerarRelatorioDistribuicao:
+    """Testes para gerar_relatorio_distribuicao"""
+
+    def test_gera_excel_historico_e_importacao(self, tmp_path, plano, sem_efeitos_externos):
+        sucesso, caminho = report_generator.gerar_relatorio_distribuicao(plano, str(tmp_path))
+
+        assert sucesso
+        sheet = openpyxl.load_workbook(caminho).active
+        linhas = list(sheet.iter_rows(values_only=True))
+        assert linhas[0] == tuple(report_generator.CABECALHOS_DISTRIBUICAO)
+        assert linhas[1] == ('1001', '202501', '032 - CAMPO GRANDE', '10/01/2025', '10/02/2025', 1500.5, 'ANA')
+        assert sheet.cell(row=2, column=6).number_format == 'R$ #,##0.00'
+        assert sheet.column_dimensions['C'].width == len('032 - CAMPO GRANDE') + 2
+
+        historico = os.listdir(tmp_path / "historico")
+        assert len(historico) == 1 and historico[0].startswith("DISTRIBUICAO_")
+        assert [f['nro_fatura'] for f in sem_efeitos_externos] == ['1001', '1002']
+        assert sem_efeitos_externos[1]['responsavel'] == 'JOAO'
+
+    def test_saida_csv(self, tmp_path, plano, sem_efeitos_externos):
+        report_generator.gerar_relatorio_distribuicao(plano, str(tmp_path), formatos_extras=('csv',))
+
+        with open(tmp_path / "DISTRIBUIÇÃO.csv", encoding='utf-8-sig', newline='') as f:
+            linhas = list(csv.reader(f, delimiter=';'))
+        assert linhas[0] == report_generator.CABECALHOS_DISTRIBUICAO
+        assert linhas[2][0] == '1002'
+        assert linhas[2][5] == '99,90'
+
+    def test_importacao_em_lotes(self, tmp_path, plano, monkeypatch):
+        monkeypatch.setattr(report_generator, 'PASTA_HISTORICO_DISTRIBUICAO', str(tmp_path / "historico"))
+        monkeypatch.setattr(report_generator, 'TAMANHO_LOTE_IMPORTACAO', 1)
+        lotes = []
+        monkeypatch.setattr(fatura_repository, 'importar_lote',
+                            lambda faturas, origem: lotes.append([f['nro_fatura'] for f in faturas]) or
+                            {'criadas': len(faturas), 'atualizadas': 0, 'erros': 0})
+
+        sucesso, _ = report_generator.gerar_relatorio_distribuicao(plano, str(tmp_path))
+
+        assert sucesso
+        assert lotes == [['1001'], ['1002']]
+
+    def test_falha_na_importacao_nao_impede_relatorio(self, tmp_path, plano, monkeypatch):
+        monkeypatch.setattr(report_generator, 'PASTA_HISTORICO_DISTRIBUICAO', str(tmp_path / "historico"))
+        monkeypatch.setattr(report_generator, 'TAMANHO_LOTE_IMPORTACAO', 1)
+        chamadas = []
+
+        def falhar(faturas, origem):
+            chamadas.append(faturas)
+            raise RuntimeError("banco indisponível")
+
+        monkeypatch.setattr(fatura_repository, 'importar_lote', falhar)
+
+        sucesso, caminho = report_generator.gerar_relatorio_distribuicao(plano, str(tmp_path))
+
+        assert sucesso and os.path.exists(caminho)
+        assert len(chamadas) == 1
+
+    def test_falha_ao_salvar_nao_importa(self, tmp_path, plano, monkeypatch):
+        # O openpyxl não consegue fechar a planilha write_only depois de um save que falhou
+        monkeypatch.setattr(sys, 'unraisablehook', lambda _: None)
+        monkeypatch.setattr(report_generator, 'PASTA_HISTORICO_DISTRIBUICAO', str(tmp_path / "historico"))
+        monkeypatch.setattr(report_generator, 'TAMANHO_LOTE_IMPORTACAO', 1)
+        lotes = []
+        monkeypatch.setattr(fatura_repository, 'importar_lote',
+                            lambda faturas, origem: lotes.append(faturas) or {'criadas': len(faturas)})
+
+        # Destino que não pode ser gravado (como o DISTRIBUIÇÃO.xlsx aberto no Excel)
+        (tmp_path / "DISTRIBUIÇÃO.xlsx").mkdir()
+
+        assert report_generator.gerar_relatorio_distribuicao(plano, str(tmp_path)) == (False, None)
+        assert lotes == []
+        gc.collect()
+
+    def test_plano_vazio(self, tmp_path):
+        assert report_generator.gerar_relatorio_distribuicao({}, str(tmp_path)) == (False, None)
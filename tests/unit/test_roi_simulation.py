@@ -0,0 +1,189 @@
+"""
+Testes para a simulação de ROI de regras candidatas em dry-run.
+"""
+import json
+
+import pytest
+
+from src.business.processing import roi_simulation
+from src.infrastructure.parsers.xml_reader import NAMESPACES
+
+PTU = NAMESPACES['ptu']
+
+
+def _procedimento(seq, servico, valor, taxa=None):
+    taxas = f"<ptu:taxas><ptu:tx_AdmServico>{taxa}</ptu:tx_AdmServico></ptu:taxas>" if taxa else "<ptu:taxas/>"
+    return (f"<ptu:procedimentosExecutados><ptu:procedimentos><ptu:seq_item>{seq}</ptu:seq_item>"
+            f"<ptu:tp_Tabela>22</ptu:tp_Tabela><ptu:cd_Servico>{servico}</ptu:cd_Servico></ptu:procedimentos>"
+            f"<ptu:valores><ptu:vl_ServCobrado>{valor}</ptu:vl_ServCobrado></ptu:valores>{taxas}"
+            f"</ptu:procedimentosExecutados>")
+
+
+def _guia(numero, cnes, *procedimentos):
+    return (f"<ptu:guiaSADT><ptu:dadosExecutante><ptu:CNES>{cnes}</ptu:CNES></ptu:dadosExecutante>"
+            f"<ptu:dadosGuia><ptu:nr_Guias><ptu:nr_GuiaTissPrestador>{numero}</ptu:nr_GuiaTissPrestador>"
+            f"</ptu:nr_Guias>{''.join(procedimentos)}</ptu:dadosGuia></ptu:guiaSADT>")
+
+
+def _fatura(*guias):
+    return (f'<ptu:GuiaCobrancaUtilizacao xmlns:ptu="{PTU}"><ptu:arquivoCobrancaUtilizacao><ptu:Tipoguia>'
+            f'{"".join(guias)}</ptu:Tipoguia></ptu:arquivoCobrancaUtilizacao></ptu:GuiaCobrancaUtilizacao>')
+
+
+REGRA_CNES = {
+    'id': 'R_CNES',
+    'descricao': 'CNES inválido',
+    'ativo': False,
+    'metadata_glosa': {'categoria': 'GLOSA_GUIA'},
+    'condicoes': {
+        'tipo_elemento': 'dadosExecutante',
+        'condicao_tag_valor': {'xpath': './ptu:CNES', 'valor_permitido': ['9999999']}
+    },
+    'acao': {'tipo_acao': 'alterar_tag', 'tag_alvo': './ptu:CNES', 'novo_valor': '3018903'}
+}
+
+REGRA_TABELA = {
+    'id': 'R_TABELA',
+    'descricao': 'Tabela do serviço',
+    'ativo': False,
+    'metadata_glosa': {'categoria': 'GLOSA_ITEM'},
+    'condicoes': {
+        'tipo_elemento': 'procedimentos',
+        'condicao_tag_valor': {'xpath': './ptu:cd_Servico', 'valor_permitido': ['10101012']}
+    },
+    'acao': {'tipo_acao': 'alterar_tag', 'tag_alvo': './ptu:tp_Tabela', 'novo_valor': '18'}
+}
+
+REGRA_SEM_VALOR = {
+    'id': 'R_OTIMIZACAO',
+    'descricao': 'Só otimiza',
+    'ativo': False,
+    'metadata_glosa': {'categoria': 'OTIMIZACAO'},
+    'condicoes': {
+        'tipo_elemento': 'procedimentos',
+        'condicao_tag_valor': {'xpath': './ptu:cd_Servico', 'valor_permitido': ['40301630']}
+    },
+    'acao': {'tipo_acao': 'alterar_tag', 'tag_alvo': './ptu:tp_Tabela', 'novo_valor': '00'}
+}
+
+
+@pytest.fixture
+def arquivo_regras(tmp_path):
+    caminho = tmp_path / 'candidatas.json'
+    caminho.write_text(json.dumps([REGRA_CNES, REGRA_TABELA, REGRA_SEM_VALOR]), encoding='utf-8')
+    return str(caminho)
+
+
+@pytest.fixture
+def acervo(tmp_path):
+    """Três faturas: guia com CNES inválido, itens de tabela e um arquivo sem correções"""
+    pasta = tmp_path / 'acervo'
+    (pasta / '2025').mkdir(parents=True)
+    conteudos = {
+        'A.051': _fatura(
+            # Guia salva inteira: o item 10101012 dela não conta separado
+            _guia('100', '9999999', _procedimento(1, '10101012', '50.00', '2.50'),
+                  _procedimento(2, '40301630', '20.00')),
+            _guia('101', '3018903', _procedimento(1, '10101012', '30.00', '1.50'))),
+        '2025/B.051': _fatura(
+            _guia('200', '3018903', _procedimento(1, '10101012', '10.00'), _procedimento(2, '10101012', '5.25'))),
+        'C.051': _fatura(_guia('300', '3018903', _procedimento(1, '99999999', '80.00'))),
+    }
+    for nome, conteudo in conteudos.items():
+        (pasta / nome).write_text(conteudo, encoding='utf-8')
+    (pasta / 'ignorado.txt').write_text('x', encoding='utf-8')
+    return pasta
+
+
+class TestCarregamento:
+    """Leitura das candidatas e do acervo"""
+
+    def test_carrega_candidatas_ativando(self, arquivo_regras):
+        regras = roi_simulation.carregar_regras_candidatas([arquivo_regras])
+        assert [r['id'] for r in regras] == ['R_CNES', 'R_TABELA', 'R_OTIMIZACAO']
+        assert all(r['ativo'] for r in regras)
+
+        filtradas = roi_simulation.carregar_regras_candidatas([arquivo_regras], ids=['R_TABELA', 'R_NENHUMA'])
+        assert [r['id'] for r in filtradas] == ['R_TABELA']
+
+    def test_carrega_do_diretorio_de_config(self):
+        regras = roi_simulation.carregar_regras_candidatas(['regras/outros.json'])
+        assert regras and all(r['ativo'] for r in regras)
+
+    def test_lista_arquivos_recursivo(self, acervo):
+        arquivos = roi_simulation.listar_arquivos([str(acervo)])
+        assert [a.rsplit('/', 1)[-1] for a in arquivos] == ['B.051', 'A.051', 'C.051']
+        assert len(roi_simulation.listar_arquivos([str(acervo)], limite=2)) == 2
+
+
+class TestSimulacao:
+    """Impacto em GlosaGuia/GlosaItem com valores do XML, sem gravar"""
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_impacto_com_valores_reais(self, acervo, arquivo_regras, workers):
+        arquivos = roi_simulation.listar_arquivos([str(acervo)])
+        conteudo_antes = {a: open(a, encoding='utf-8').read() for a in arquivos}
+        candidatas = roi_simulation.carregar_regras_candidatas([arquivo_regras])
+
+        resumo = roi_simulation.simular_roi(arquivos, candidatas, incluir_ativas=False,
+                                            max_workers=workers, log_callback=lambda msg: None)
+
+        totais = resumo['totais']
+        assert totais['arquivos'] == 3
+        assert totais['arquivos_afetados'] == 2
+        assert totais['erros'] == 0
+        # Guia 100 inteira: 50 + 2,50 + 20
+        assert totais['guias'] == 1
+        assert totais['valor_guias'] == pytest.approx(72.5)
+        # Itens: 101/1 (31,50), 200/1 (10) e 200/2 (5,25); 100/1 absorvido pela guia
+        assert totais['itens'] == 3
+        assert totais['valor_itens'] == pytest.approx(46.75)
+        assert totais['itens_absorvidos'] == 1
+        assert totais['valor_total'] == pytest.approx(119.25)
+
+        por_regra = resumo['por_regra']
+        assert por_regra['R_CNES']['valor_total'] == pytest.approx(72.5)
+        assert por_regra['R_TABELA']['correcoes'] == 4
+        assert por_regra['R_TABELA']['itens'] == 3
+        assert por_regra['R_TABELA']['arquivos'] == 2
+        assert por_regra['R_OTIMIZACAO']['sem_valor'] == 1
+        assert por_regra['R_OTIMIZACAO']['valor_total'] == 0
+
+        assert resumo['arquivos'][0]['arquivo'] == 'A.051'
+        assert resumo['vazao']['arquivos_por_segundo'] > 0
+
+        # Dry-run: nada gravado
+        for caminho, conteudo in conteudo_antes.items():
+            assert open(caminho, encoding='utf-8').read() == conteudo
+
+    def test_regra_ativa_nao_e_contada(self, acervo, arquivo_regras, monkeypatch):
+        # Com o conjunto ativo, só as aplicações das candidatas entram no impacto
+        monkeypatch.setattr(roi_simulation, '_criar_motor', lambda candidatas, incluir_ativas: _motor_com(
+            [dict(REGRA_CNES, id='R_ATIVA', ativo=True)] + candidatas))
+        candidatas = roi_simulation.carregar_regras_candidatas([arquivo_regras], ids=['R_TABELA'])
+
+        resumo = roi_simulation.simular_roi(roi_simulation.listar_arquivos([str(acervo)]), candidatas,
+                                            max_workers=1, log_callback=lambda msg: None)
+
+        assert resumo['totais']['guias'] == 0
+        assert resumo['totais']['itens'] == 4
+        assert list(resumo['por_regra']) == ['R_TABELA']
+
+    def test_arquivo_invalido_conta_como_erro(self, tmp_path, arquivo_regras):
+        quebrado = tmp_path / 'X.051'
+        quebrado.write_text('', encoding='utf-8')
+        candidatas = roi_simulation.carregar_regras_candidatas([arquivo_regras])
+
+        resumo = roi_simulation.simular_roi([str(quebrado)], candidatas, incluir_ativas=False,
+                                            max_workers=1, log_callback=lambda msg: None)
+
+        assert resumo['totais']['erros'] == 1
+        assert resumo['totais']['valor_total'] == 0
+
+
+def _motor_com(regras):
+    from src.business.rules.rule_engine import RuleEngine
+    motor = RuleEngine()
+    motor.load_all_rules(use_database=False)
+    motor.loaded_rules = regras
+    return motor
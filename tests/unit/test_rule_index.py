@@ -0,0 +1,213 @@
+"""
+Testes unitários para o índice de regras por campo discriminante (rule_index).
+
+- Extração de guardas (valor_permitido, valor_atual_igual, in_lista, AND/OR)
+- Conjunto de tags escritas por ação
+- Equivalência com a aplicação exaustiva (todas as regras x todos os elementos)
+- Reavaliação quando uma ação altera o campo da guarda
+- Memória de XPath/texto por elemento (acertos e invalidação)
+"""
+import copy
+import os
+
+from lxml import etree
+
+from src.business.rules.rule_engine import RuleEngine
+from src.business.rules.rule_index import ContextoAvaliacao, IndiceElementos, extrair_guarda, nomes_escritos
+from src.infrastructure.parsers.xml_reader import XMLReader
+
+PTU = "http://ptu.unimed.coop.br/schemas/V3_0"
+PASTA_TESTES = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _tag_valor(xpath, **kwargs):
+    return {"condicao_tag_valor": dict(xpath=xpath, **kwargs)}
+
+
+def _guia(*codigos):
+    procedimentos = "".join(
+        f"<ptu:procedimentosExecutados><ptu:procedimentos><ptu:cd_Servico>{c}</ptu:cd_Servico>"
+        f"</ptu:procedimentos></ptu:procedimentosExecutados>"
+        for c in codigos
+    )
+    return etree.ElementTree(etree.fromstring(f'<ptu:guia xmlns:ptu="{PTU}">{procedimentos}</ptu:guia>'))
+
+
+def _aplicar_exaustivo(engine, xml_tree):
+    """Algoritmo original: avalia toda regra em todo elemento do tipo."""
+    raiz = xml_tree.getroot()
+    alterado = False
+    for regra in engine.loaded_rules:
+        try:
+            condicoes = regra.get("condicoes", {})
+            tipo = condicoes.get("tipo_elemento")
+            alvos = engine.xml_reader.find_elements_by_xpath(raiz, f".//ptu:{tipo}") if tipo else [raiz]
+            for elemento in alvos:
+                if engine._evaluate_condition(elemento, condicoes) and engine._apply_action(elemento, regra.get("acao", {})):
+                    alterado = True
+        except Exception:
+            continue
+    # Mesma passada final de ordenação pelo XSD de apply_rules_to_xml
+    if engine.ordem_schema is not None and engine.ordem_schema.ordenar(raiz):
+        alterado = True
+    return alterado
+
+
+class TestExtrairGuarda:
+    """Testes para extrair_guarda e nomes_escritos"""
+
+    def test_valor_permitido_lista(self):
+        guarda = extrair_guarda(_tag_valor("./ptu:cd_Servico", valor_permitido=["1", 2]))
+        assert guarda.valores == {"1", "2"}
+        assert guarda.dependencias == {"cd_Servico"}
+
+    def test_valor_permitido_string_nao_indexa(self):
+        # 'in' numa string é busca de substring, não igualdade
+        assert extrair_guarda(_tag_valor("./ptu:cd_Servico", valor_permitido="123")) is None
+
+    def test_comparacoes_sem_igualdade(self):
+        assert extrair_guarda(_tag_valor("./ptu:x", tipo_comparacao="contem", valor_permitido=["1"])) is None
+        assert extrair_guarda(_tag_valor("./ptu:x", tipo_comparacao="not_in_lista", id_lista="l")) is None
+
+    def test_and_escolhe_menor_conjunto(self):
+        condicao = {"condicao_multipla": {"tipo": "AND", "sub_condicoes": [
+            _tag_valor("./ptu:a", tipo_comparacao="in_lista", id_lista="lista"),
+            _tag_valor("./ptu:b", valor_permitido=["1", "2", "3"]),
+            _tag_valor("./ptu:c", tipo_comparacao="valor_atual_igual", valor_atual=7),
+        ]}}
+        guarda = extrair_guarda(condicao)
+        assert guarda.xpath == "./ptu:c"
+        assert guarda.valores == {"7"}
+
+    def test_or_mesmo_xpath_une_valores(self):
+        condicao = {"condicao_multipla": {"tipo": "OR", "sub_condicoes": [
+            _tag_valor("./ptu:a", valor_permitido=["1"]),
+            _tag_valor("./ptu:a", tipo_comparacao="valor_atual_igual", valor_atual="2"),
+        ]}}
+        assert extrair_guarda(condicao).valores == {"1", "2"}
+
+    def test_or_sem_guarda_em_todos_os_ramos(self):
+        condicao = {"condicao_multipla": {"tipo": "OR", "sub_condicoes": [
+            _tag_valor("./ptu:a", valor_permitido=["1"]),
+            _tag_valor("./ptu:a", tipo_comparacao="existe"),
+        ]}}
+        assert extrair_guarda(condicao) is None
+
+    def test_xpath_com_curinga_nao_indexa(self):
+        assert extrair_guarda(_tag_valor("./ptu:*", valor_permitido=["1"])) is None
+
+    def test_nomes_escritos(self):
+        assert nomes_escritos({"tipo_acao": "gerar_alerta"}) == frozenset()
+        assert nomes_escritos({"tipo_acao": "alterar_tag", "tag_alvo": "./ptu:a/ptu:b"}) == {"a", "b"}
+        assert nomes_escritos({"tipo_acao": "remover_tag_inteira", "tag_alvo": "./ptu:a"}) is None
+        assert nomes_escritos({"tipo_acao": "multiplas_acoes", "sub_acoes": [
+            {"tipo_acao": "alterar_tag", "tag_alvo": "./ptu:a"},
+            {"tipo_acao": "reordenar_elementos_filhos"},
+        ]}) is None
+
+
+class TestIndiceElementos:
+    """Testes para IndiceElementos"""
+
+    def test_candidatos_em_ordem_de_documento(self):
+        arvore = _guia("3", "1", "2", "1", "9")
+        indice = IndiceElementos(arvore.getroot(), XMLReader())
+        guarda = extrair_guarda(_tag_valor("./ptu:procedimentos/ptu:cd_Servico", valor_permitido=["1", "9"]))
+
+        assert list(indice.candidatos("procedimentosExecutados", guarda, {})) == [1, 3, 4]
+
+    def test_invalidacao_por_nome(self):
+        arvore = _guia("1", "2")
+        indice = IndiceElementos(arvore.getroot(), XMLReader())
+        guarda = extrair_guarda(_tag_valor("./ptu:procedimentos/ptu:cd_Servico", valor_permitido=["2"]))
+        assert list(indice.candidatos("procedimentosExecutados", guarda, {})) == [1]
+
+        arvore.getroot().find(f".//{{{PTU}}}cd_Servico").text = "2"
+        indice.invalidar(frozenset({"nm_Profissional"}))
+        assert list(indice.candidatos("procedimentosExecutados", guarda, {})) == [1]
+
+        indice.invalidar(frozenset({"cd_Servico"}))
+        assert list(indice.candidatos("procedimentosExecutados", guarda, {})) == [0, 1]
+
+
+class TestContextoAvaliacao:
+    """Testes para ContextoAvaliacao"""
+
+    def test_memoriza_nos_e_texto(self):
+        arvore = _guia(" 10101012 ")
+        elemento = arvore.getroot()[0]
+        contexto = ContextoAvaliacao(XMLReader())
+
+        assert contexto.texto(elemento, "./ptu:procedimentos/ptu:cd_Servico") == "10101012"
+        assert contexto.texto(elemento, "./ptu:procedimentos/ptu:cd_Servico") == "10101012"
+        assert len(contexto.nos(elemento, "./ptu:procedimentos/ptu:cd_Servico")) == 1
+        assert contexto.nos(elemento, "./ptu:procedimentos/ptu:tp_Tabela") == []
+
+        assert contexto.estatisticas() == {'consultas': 4, 'acertos': 2, 'taxa_acerto': 0.5}
+
+    def test_invalida_apenas_xpaths_afetados(self):
+        arvore = _guia("1")
+        elemento = arvore.getroot()[0]
+        contexto = ContextoAvaliacao(XMLReader())
+        contexto.texto(elemento, "./ptu:procedimentos/ptu:cd_Servico")
+        contexto.nos(elemento, "./ptu:procedimentos")
+
+        elemento.find(f".//{{{PTU}}}cd_Servico").text = "2"
+        contexto.invalidar(frozenset({"cd_Servico"}))
+
+        assert contexto.texto(elemento, "./ptu:procedimentos/ptu:cd_Servico") == "2"
+        contexto.nos(elemento, "./ptu:procedimentos")
+        assert contexto.acertos == 1
+
+    def test_regras_compartilham_memoria(self):
+        regra = {"condicoes": {"tipo_elemento": "procedimentosExecutados",
+                               **_tag_valor("./ptu:procedimentos/ptu:cd_Servico", tipo_comparacao="contem", valor="9")},
+                 "acao": {"tipo_acao": "gerar_alerta"}}
+        engine = RuleEngine()
+        engine.loaded_rules = [dict(regra, id=f"R{i}") for i in range(5)]
+
+        engine.apply_rules_to_xml(_guia("1", "2", "3"))
+        engine.alertas.clear()
+
+        # 3 elementos x 5 regras x (nós + texto): só a primeira regra executa o XPath
+        assert engine.estatisticas_memo == {'consultas': 30, 'acertos': 24}
+        assert engine._contexto_avaliacao is None
+
+
+class TestAplicacaoIndexada:
+    """Testes de apply_rules_to_xml com o índice"""
+
+    def test_reavalia_quando_acao_altera_guarda(self):
+        # R1 troca 1 -> 2 e R2 (guarda em '2') precisa enxergar a alteração
+        engine = RuleEngine()
+        engine.loaded_rules = [
+            {"id": "R1", "condicoes": {"tipo_elemento": "procedimentosExecutados",
+                                       **_tag_valor("./ptu:procedimentos/ptu:cd_Servico", valor_permitido=["1"])},
+             "acao": {"tipo_acao": "alterar_tag", "tag_alvo": "./ptu:procedimentos/ptu:cd_Servico", "novo_valor": "2"}},
+            {"id": "R2", "condicoes": {"tipo_elemento": "procedimentosExecutados",
+                                       **_tag_valor("./ptu:procedimentos/ptu:cd_Servico", valor_permitido=["2"])},
+             "acao": {"tipo_acao": "alterar_tag", "tag_alvo": "./ptu:procedimentos/ptu:cd_Servico", "novo_valor": "3"}},
+        ]
+        arvore = _guia("1", "5", "2")
+
+        assert engine.apply_rules_to_xml(arvore) is True
+        codigos = [e.text for e in arvore.getroot().iter(f"{{{PTU}}}cd_Servico")]
+        assert codigos == ["3", "5", "3"]
+
+    def test_equivalente_ao_exaustivo(self):
+        caminho = os.path.join(PASTA_TESTES, "guia_user_request.xml")
+        original = etree.parse(caminho)
+        raiz = original.getroot()
+        procedimentos = raiz.findall(f".//{{{PTU}}}procedimentosExecutados")
+        # Multiplica os itens para exercitar o índice com várias posições
+        for i in range(40):
+            raiz.findall(f".//{{{PTU}}}procedimentosExecutados")[0].getparent().append(
+                copy.deepcopy(procedimentos[i % len(procedimentos)]))
+
+        indexado, exaustivo = RuleEngine(), RuleEngine()
+        indexado.load_all_rules()
+        exaustivo.load_all_rules()
+        arvore_a, arvore_b = copy.deepcopy(original), copy.deepcopy(original)
+
+        assert indexado.apply_rules_to_xml(arvore_a) == _aplicar_exaustivo(exaustivo, arvore_b)
+        assert etree.tostring(arvore_a) == etree.tostring(arvore_b)
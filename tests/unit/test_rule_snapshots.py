@@ -0,0 +1,107 @@
+"""
+Testes para os snapshots versionados de regras e a troca a quente no RuleEngine.
+"""
+import pytest
+from lxml import etree
+
+from src.database.rule_repository import RuleRepository
+from src.infrastructure.parsers.xml_reader import NAMESPACES
+
+PTU = NAMESPACES['ptu']
+XML_GUIA = (f'<ptu:guia xmlns:ptu="{PTU}"><ptu:procedimentosExecutados><ptu:procedimentos>'
+            f'<ptu:cd_Servico>10101012</ptu:cd_Servico><ptu:tp_Tabela>22</ptu:tp_Tabela>'
+            f'</ptu:procedimentos></ptu:procedimentosExecutados></ptu:guia>')
+
+
+def _regra(id_regra, valor, prioridade=100):
+    return {
+        'id': id_regra,
+        'descricao': f'Teste {id_regra}',
+        'prioridade': prioridade,
+        'condicoes': {
+            'tipo_elemento': 'procedimentos',
+            'condicao_tag_valor': {'xpath': './ptu:cd_Servico', 'valor_permitido': ['10101012']}
+        },
+        'acao': {'tipo_acao': 'alterar_tag', 'tag_alvo': './ptu:tp_Tabela', 'novo_valor': valor}
+    }
+
+
+@pytest.fixture
+def banco_regras(banco_sqlite):
+    """Banco SQLite temporário para regras e snapshots, sem cache de regras entre testes"""
+    RuleRepository.invalidate_cache()
+    yield banco_sqlite
+    RuleRepository.invalidate_cache()
+
+
+def _tp_tabela(engine):
+    tree = etree.ElementTree(etree.fromstring(XML_GUIA))
+    engine.apply_rules_to_xml(tree)
+    return tree.find(f'.//{{{PTU}}}tp_Tabela').text
+
+
+class TestSnapshots:
+    """Publicação de snapshots no repositório"""
+
+    def test_versao_monotonica_e_idempotente(self, banco_regras):
+        RuleRepository.create_rule(_regra('R_A', '18', prioridade=1))
+        v1 = RuleRepository.get_latest_snapshot_version()
+        RuleRepository.create_rule(_regra('R_B', '19', prioridade=2))
+        v2 = RuleRepository.get_latest_snapshot_version()
+
+        assert v2 == v1 + 1
+        # Conjunto inalterado: não cria nova versão
+        assert RuleRepository.publish_snapshot() == v2
+
+        snapshot = RuleRepository.get_snapshot()
+        assert [item['regra']['id'] for item in snapshot['regras']] == ['R_A', 'R_B']
+        assert RuleRepository.get_snapshot(v1)['regras'][0]['regra']['id'] == 'R_A'
+
+    def test_toggle_publica_nova_versao(self, banco_regras):
+        RuleRepository.create_rule(_regra('R_A', '18'))
+        antes = RuleRepository.get_latest_snapshot_version()
+
+        assert RuleRepository.toggle_rule('R_A', False)
+        assert RuleRepository.get_latest_snapshot_version() == antes + 1
+        assert RuleRepository.get_snapshot()['regras'] == []
+
+
+class TestTrocaAQuente:
+    """RuleEngine adota novos snapshots entre arquivos"""
+
+    def test_engine_troca_regras_entre_arquivos(self, banco_regras):
+        from src.business.rules.rule_engine import RuleEngine
+
+        RuleRepository.create_rule(_regra('R_A', '18', prioridade=1))
+        RuleRepository.create_rule(_regra('R_B', '98', prioridade=2))
+        engine = RuleEngine()
+        assert engine.load_all_rules()
+        engine.intervalo_verificacao_regras = 0
+        versao_inicial = engine.versao_regras
+        compilada_a = engine._regras_compiladas[0]
+
+        assert _tp_tabela(engine) == '98'
+
+        RuleRepository.update_rule('R_B', {'acao': _regra('R_B', '00')['acao']}, motivo='teste')
+        assert _tp_tabela(engine) == '00'
+        assert engine.versao_regras == versao_inicial + 1
+        # Só a regra alterada foi recompilada
+        assert engine._regras_compiladas[0] is compilada_a
+
+        RuleRepository.toggle_rule('R_B', False)
+        assert _tp_tabela(engine) == '18'
+        assert [r['id'] for r in engine.loaded_rules] == ['R_A']
+
+    def test_intervalo_de_verificacao(self, banco_regras):
+        from src.business.rules.rule_engine import RuleEngine
+
+        RuleRepository.create_rule(_regra('R_A', '18'))
+        engine = RuleEngine()
+        assert engine.load_all_rules()
+        engine.intervalo_verificacao_regras = 3600
+
+        RuleRepository.update_rule('R_A', {'acao': _regra('R_A', '00')['acao']})
+        assert engine.atualizar_regras() is False
+        assert _tp_tabela(engine) == '18'
+        assert engine.atualizar_regras(forcar=True) is True
+        assert _tp_tabela(engine) == '00'
@@ -4,6 +4,7 @@ Testes para SafeBatchProcessor - error handling robusto.
 import pytest
 import tempfile
 import os
+import sys
 from pathlib import Path
 from lxml import etree
 
@@ -208,3 +209,115 @@ class TestSafeBatchProcessing:
             for f in temp_files:
                 if os.path.exists(f):
                     os.unlink(f)
+
+
+XML_VALIDO = """<?xml version="1.0" encoding="UTF-8"?>
+<ans:mensagemTISS xmlns:ans="http://www.ans.gov.br/padroes/tiss/schemas" xmlns:ptu="http://unimedbh.com.br/PTU">
+    <ans:prestadorParaOperadora/>
+</ans:mensagemTISS>"""
+
+
+@pytest.fixture
+def lote_supervisionado(tmp_path, monkeypatch):
+    """
+    Cria arquivos cujo nome define o comportamento patológico no worker:
+    'lento' (trava), 'guloso' (aloca memória sem limite), 'queda' (derruba o
+    worker só na primeira vez), 'alerta' (regra gera um alerta).
+    """
+    from src.business.processing import safe_batch_processor
+
+    original = safe_batch_processor.process_file_safe
+    marcador_queda = tmp_path / "ja_caiu"
+
+    def process_file_patologico(file_path, rule_engine, xml_reader=None):
+        nome = Path(file_path).name
+        if nome.startswith("lento"):
+            import time
+            time.sleep(60)
+        elif nome.startswith("guloso"):
+            blocos = []
+            while True:
+                blocos.append(bytearray(50 * 1024 * 1024))
+        elif nome.startswith("queda") and not marcador_queda.exists():
+            marcador_queda.touch()
+            os._exit(3)
+        resultado = original(file_path, rule_engine, xml_reader)
+        if nome.startswith("alerta"):
+            rule_engine.alertas.append({'mensagem': 'Procedimento removido', 'dados': {'arquivo': nome}})
+            rule_engine.eventos.iniciar(nome)
+            rule_engine.eventos.registrar("alerta", "R1")
+            rule_engine.eventos.finalizar()
+        return resultado
+
+    monkeypatch.setattr(safe_batch_processor, "process_file_safe", process_file_patologico)
+
+    def criar(*nomes):
+        caminhos = []
+        for nome in nomes:
+            caminho = tmp_path / f"{nome}.xml"
+            caminho.write_text(XML_VALIDO, encoding="utf-8")
+            caminhos.append(str(caminho))
+        return caminhos
+    return criar
+
+
+class TestSupervisaoWorkers:
+    """Timeout, limite de memória e isolamento de falhas por arquivo"""
+
+    def test_timeout_vai_para_quarentena(self, rule_engine, lote_supervisionado):
+        from src.business.processing.safe_batch_processor import process_batch
+
+        arquivos = lote_supervisionado("ok1", "lento", "ok2")
+        summary = process_batch(arquivos, rule_engine, timeout=0.5, max_workers=2)
+
+        assert summary['success'] == 2
+        assert summary['errors'] == 1
+        assert [q['file'] for q in summary['quarantine']] == ["lento.xml"]
+        assert summary['quarantine'][0]['attempts'] == 2
+        assert "Timeout" in summary['quarantine'][0]['error']
+        assert [r['file_name'] for r in summary['results']] == ["ok1.xml", "ok2.xml"]
+
+    @pytest.mark.skipif(not sys.platform.startswith("linux"), reason="RLIMIT_AS só é aplicado no Linux")
+    def test_limite_de_memoria(self, rule_engine, lote_supervisionado):
+        from src.business.processing.safe_batch_processor import process_batch
+
+        arquivos = lote_supervisionado("guloso", "ok")
+        summary = process_batch(arquivos, rule_engine, memory_limit_mb=200, max_workers=1)
+
+        assert summary['success'] == 1
+        assert [q['file'] for q in summary['quarantine']] == ["guloso.xml"]
+        assert "memória" in summary['quarantine'][0]['error']
+
+    def test_queda_do_worker_e_repetida(self, rule_engine, lote_supervisionado, tmp_path):
+        from src.business.processing.safe_batch_processor import process_batch, save_error_report
+
+        arquivos = lote_supervisionado("queda", "ok")
+        summary = process_batch(arquivos, rule_engine, max_workers=1)
+
+        assert summary['success'] == 2
+        assert summary['quarantine'] == []
+        stats = {s['file']: s for s in summary['file_stats']}
+        assert stats["queda.xml"]['attempts'] == 2
+        assert stats["ok.xml"]['attempts'] == 1
+        assert all(s['duration'] >= 0 and s['peak_memory_mb'] > 0 for s in stats.values())
+
+        relatorio = tmp_path / "relatorio.json"
+        save_error_report(summary, str(relatorio))
+        import json
+        dados = json.loads(relatorio.read_text(encoding="utf-8"))
+        assert len(dados['files']) == 2
+        assert dados['quarantine'] == []
+
+    def test_alertas_dos_workers_voltam_ao_engine(self, rule_engine, lote_supervisionado):
+        from src.business.processing.safe_batch_processor import process_batch
+
+        rule_engine.alertas.clear()
+        arquivos = lote_supervisionado("alerta1", "ok", "alerta2")
+        summary = process_batch(arquivos, rule_engine, max_workers=2)
+
+        assert summary['success'] == 3
+        assert summary['alerts'] == 2
+        assert summary['events'] == {'alerta': {'R1': 2}}
+        assert sorted(a['dados']['arquivo'] for a in rule_engine.alertas) == ["alerta1.xml", "alerta2.xml"]
+        assert [r['alerts'] for r in summary['results']] == [1, 0, 1]
+        rule_engine.alertas.clear()
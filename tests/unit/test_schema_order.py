@@ -0,0 +1,156 @@
+"""
+Testes para a ordenação dos elementos pelo XSD (schema_order).
+"""
+import os
+
+import pytest
+from lxml import etree
+
+from src.business.rules import schema_order
+from src.business.rules.rule_engine import REGRA_ORDEM_SCHEMA, RuleEngine
+from src.infrastructure.files.change_journal import DiarioAlteracoes
+from src.infrastructure.parsers.xml_reader import NAMESPACES
+
+PTU = NAMESPACES['ptu']
+PASTA_TESTES = os.path.join(os.path.dirname(__file__), '..')
+
+# Fora de ordem nos dois tipos de guia (a ordem correta difere entre SADT e honorários)
+EQUIPE = ("<ptu:equipe_Profissional><ptu:CBO>225125</ptu:CBO><ptu:nm_Profissional>FULANO</ptu:nm_Profissional>"
+          "<ptu:cdCnpjCpf><ptu:cd_cpf>1</ptu:cd_cpf></ptu:cdCnpjCpf><ptu:tp_Participacao>00</ptu:tp_Participacao>"
+          "</ptu:equipe_Profissional>")
+
+
+def _guia(tipo):
+    return (f"<ptu:{tipo}><ptu:dadosGuia><ptu:procedimentosExecutados>{EQUIPE}"
+            f"<ptu:dt_Execucao>2025-01-01</ptu:dt_Execucao></ptu:procedimentosExecutados></ptu:dadosGuia></ptu:{tipo}>")
+
+
+def _documento(*guias):
+    return etree.fromstring(f'<ptu:Tipoguia xmlns:ptu="{PTU}">{"".join(guias)}</ptu:Tipoguia>')
+
+
+def _nomes(elemento):
+    return [etree.QName(filho).localname for filho in elemento if isinstance(filho.tag, str)]
+
+
+@pytest.fixture(scope="module")
+def ordem():
+    return schema_order.carregar_ordem_schema()
+
+
+class TestCompilacao:
+    """Tabelas compiladas do XSD"""
+
+    def test_ordem_por_tipo(self, ordem):
+        def sequencia(tipo):
+            tabela = ordem.tipos[tipo]
+            return [etree.QName(tag).localname for tag in sorted(tabela, key=lambda tag: tabela[tag][0])]
+
+        assert sequencia("ct_profissionalEquipe") == [
+            "tp_Participacao", "Prestador", "cdCnpjCpf", "nm_Profissional", "dadosConselho", "CBO"]
+        assert sequencia("ct_profissionalEquipeHonorario") == [
+            "tp_Participacao", "Prestador", "nm_Profissional", "cdCnpjCpf", "dadosConselho", "CBO"]
+        assert sequencia("ct_dadosAuditoria") == [
+            "nm_MedicoAuditor", "nr_CrmAuditor", "cd_UFCRM", "nm_EnfAuditor", "nr_CorenAuditor", "cd_UFCoren"]
+
+    def test_cache_por_processo(self, ordem):
+        assert schema_order.carregar_ordem_schema() is ordem
+        assert schema_order.carregar_ordem_schema("/nao/existe.xsd") is None
+
+
+class TestOrdenar:
+    """Passada única de reordenação"""
+
+    def test_ordem_depende_do_contexto(self, ordem):
+        raiz = _documento(_guia("guiaSADT"), _guia("guiaHonorarios"))
+
+        assert ordem.ordenar(raiz) == 4  # duas equipes e dois procedimentosExecutados
+        sadt, honorarios = raiz.iterfind(f".//{{{PTU}}}equipe_Profissional")
+        assert _nomes(sadt) == ["tp_Participacao", "cdCnpjCpf", "nm_Profissional", "CBO"]
+        assert _nomes(honorarios) == ["tp_Participacao", "nm_Profissional", "cdCnpjCpf", "CBO"]
+        assert _nomes(raiz.find(f".//{{{PTU}}}procedimentosExecutados")) == ["dt_Execucao", "equipe_Profissional"]
+        assert ordem.ordenar(raiz) == 0
+
+    def test_documento_em_ordem_nao_muda(self, ordem):
+        arvore = etree.parse(os.path.join(PASTA_TESTES, "guia_user_request.xml"))
+        original = etree.tostring(arvore)
+
+        assert ordem.ordenar(arvore.getroot()) == 0
+        assert etree.tostring(arvore) == original
+
+    def test_repeticoes_mantem_a_ordem(self, ordem):
+        raiz = _documento(_guia("guiaSADT"))
+        dados_guia = raiz.find(f".//{{{PTU}}}dadosGuia")
+        segundo = etree.fromstring(etree.tostring(dados_guia[0]))
+        segundo.find(f"{{{PTU}}}dt_Execucao").text = "2025-01-02"
+        dados_guia.append(segundo)
+        etree.SubElement(dados_guia, f"{{{PTU}}}nr_Ver_TISS").text = "4.01.00"
+
+        ordem.ordenar(raiz)
+        assert _nomes(dados_guia) == ["nr_Ver_TISS", "procedimentosExecutados", "procedimentosExecutados"]
+        assert [p.findtext(f"{{{PTU}}}dt_Execucao") for p in dados_guia[1:]] == ["2025-01-01", "2025-01-02"]
+
+    def test_filho_desconhecido_nao_reordena_o_pai(self, ordem):
+        raiz = _documento(_guia("guiaSADT"))
+        equipe = raiz.find(f".//{{{PTU}}}equipe_Profissional")
+        etree.SubElement(equipe, f"{{{PTU}}}tag_Inventada")
+        equipe.append(etree.Comment("comentário"))
+
+        ordem.ordenar(raiz)
+        assert _nomes(equipe)[:4] == ["CBO", "nm_Profissional", "cdCnpjCpf", "tp_Participacao"]
+
+
+class TestMotor:
+    """Passada aplicada pelo RuleEngine depois das regras"""
+
+    def test_apply_rules_ordena_e_registra_no_diario(self):
+        engine = RuleEngine()
+        engine.loaded_rules = []
+        arvore = etree.ElementTree(_documento(_guia("guiaHonorarios")))
+        original = etree.tostring(arvore)
+
+        assert engine.apply_rules_to_xml(arvore)
+        assert [entrada['regra'] for entrada in engine.diario] == [REGRA_ORDEM_SCHEMA] * 2
+
+        DiarioAlteracoes.from_dict(engine.diario.to_dict()).desfazer(arvore)
+        assert etree.tostring(arvore) == original
+
+    def test_sem_ordem_schema(self):
+        engine = RuleEngine()
+        engine.loaded_rules = []
+        engine.ordem_schema = None
+
+        assert not engine.apply_rules_to_xml(etree.ElementTree(_documento(_guia("guiaSADT"))))
+
+
+class TestMigracao:
+    """Regras REGRA_ORDEM_* já migradas para o banco são desativadas"""
+
+    @staticmethod
+    def _regra(id_regra, tipo_acao):
+        return {'id': id_regra, 'descricao': id_regra,
+                'condicoes': {'tipo_elemento': 'equipe_Profissional'},
+                'acao': {'tipo_acao': tipo_acao, 'tag_alvo': './ptu:CBO', 'novo_valor': '225125'}}
+
+    def test_regras_de_ordem_nao_carregam_mais(self, banco_sqlite, tmp_path):
+        from src.database import rule_migrator
+        from src.database.rule_repository import RuleRepository
+
+        RuleRepository.invalidate_cache()
+        RuleRepository.create_rule(self._regra("REGRA_ORDEM_EQUIPE_PARA_CONSULTA", "reordenar_elementos_filhos"))
+        RuleRepository.create_rule(self._regra("R_MANTIDA", "alterar_tag"))
+        config_vazia = tmp_path / "config"
+        config_vazia.mkdir()
+
+        assert rule_migrator.run_migration(str(config_vazia))['rules_retired'] == 1
+        historico = RuleRepository.get_rule_history("REGRA_ORDEM_EQUIPE_PARA_CONSULTA")
+        assert [h.motivo for h in historico] == [rule_migrator.MOTIVO_ORDEM_SCHEMA]
+
+        engine = RuleEngine()
+        assert engine.load_all_rules()
+        assert [regra['id'] for regra in engine.loaded_rules] == ["R_MANTIDA"]
+
+        # Reativada por um administrador: a migração não desativa de novo
+        assert RuleRepository.toggle_rule("REGRA_ORDEM_EQUIPE_PARA_CONSULTA", True)
+        assert rule_migrator.run_migration(str(config_vazia))['rules_retired'] == 0
+        RuleRepository.invalidate_cache()
@@ -0,0 +1,90 @@
+"""
+Testes unitários para a aplicação de regras em fluxo (streaming_engine).
+
+- Mesmo resultado (forma canônica) que apply_rules_to_xml + save_xml_tree
+- Regras sobre a própria guia e regras de documento no passo final
+- Arquivo sem alterações não é regravado
+"""
+import copy
+import os
+
+from lxml import etree
+
+from src.business.rules.rule_engine import RuleEngine
+from src.infrastructure.files.file_handler import FileHandler
+
+PTU = "http://ptu.unimed.coop.br/schemas/V3_0"
+PASTA_TESTES = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _q(tag):
+    return f"{{{PTU}}}{tag}"
+
+
+def _gravar_fatura(caminho, guias):
+    raiz = etree.Element(_q("GuiaCobrancaUtilizacao"), nsmap={"ptu": PTU})
+    cabecalho = etree.SubElement(raiz, _q("cabecalho"))
+    etree.SubElement(cabecalho, _q("nrVerTra_PTU")).text = "03"
+    tipo_guia = etree.SubElement(etree.SubElement(raiz, _q("arquivoCobrancaUtilizacao")), _q("Tipoguia"))
+    for guia in guias:
+        tipo_guia.append(copy.deepcopy(guia))
+    etree.SubElement(raiz, _q("hash")).text = "0" * 32
+    etree.ElementTree(raiz).write(str(caminho), encoding="ISO-8859-1", xml_declaration=True)
+    return str(caminho)
+
+
+def _canonico(caminho):
+    return etree.tostring(etree.parse(str(caminho)), method="c14n")
+
+
+def _regra(id_regra, tipo, tag_alvo, novo_valor):
+    return {"id": id_regra, "condicoes": {"tipo_elemento": tipo},
+            "acao": {"tipo_acao": "alterar_tag", "tag_alvo": tag_alvo, "novo_valor": novo_valor}}
+
+
+class TestAplicarRegrasEmFluxo:
+    """Testes para RuleEngine.apply_rules_streaming"""
+
+    def test_equivalente_ao_modo_em_memoria(self, tmp_path):
+        guia = etree.parse(os.path.join(PASTA_TESTES, "guia_user_request.xml")).getroot()
+        entrada = _gravar_fatura(tmp_path / "F1.051", [guia] * 4)
+
+        em_memoria, em_fluxo = RuleEngine(), RuleEngine()
+        em_memoria.load_all_rules()
+        em_fluxo.load_all_rules()
+
+        arvore = em_memoria.xml_reader.load_xml_tree(entrada)
+        assert em_memoria.apply_rules_to_xml(arvore)
+        FileHandler().save_xml_tree(arvore, str(tmp_path / "memoria.051"))
+
+        assert em_fluxo.apply_rules_streaming(entrada, str(tmp_path / "fluxo.051"))
+        assert _canonico(tmp_path / "fluxo.051") == _canonico(tmp_path / "memoria.051")
+
+    def test_regras_de_guia_e_de_documento(self, tmp_path):
+        guia = etree.fromstring(f'<ptu:guiaSADT xmlns:ptu="{PTU}"><ptu:nr_Guia>1</ptu:nr_Guia></ptu:guiaSADT>')
+        entrada = _gravar_fatura(tmp_path / "F2.051", [guia] * 3)
+
+        engine = RuleEngine()
+        engine.loaded_rules = [
+            _regra("GUIA", "guiaSADT", "./ptu:nr_Guia", "9"),
+            _regra("DOC", "cabecalho", "./ptu:nrVerTra_PTU", "04"),
+        ]
+
+        assert engine.apply_rules_streaming(entrada) is True
+
+        raiz = etree.parse(entrada).getroot()
+        assert [e.text for e in raiz.iter(_q("nr_Guia"))] == ["9", "9", "9"]
+        assert raiz.find(f"{_q('cabecalho')}/{_q('nrVerTra_PTU')}").text == "04"
+        assert raiz.find(_q("hash")).text == "0" * 32
+
+    def test_sem_alteracao_nao_regrava(self, tmp_path):
+        guia = etree.fromstring(f'<ptu:guiaSADT xmlns:ptu="{PTU}"><ptu:nr_Guia>1</ptu:nr_Guia></ptu:guiaSADT>')
+        entrada = _gravar_fatura(tmp_path / "F3.051", [guia])
+        original = open(entrada, "rb").read()
+
+        engine = RuleEngine()
+        engine.loaded_rules = [_regra("NADA", "guiaSADT", "./ptu:inexistente", "1")]
+
+        assert engine.apply_rules_streaming(entrada) is False
+        assert open(entrada, "rb").read() == original
+        assert os.listdir(tmp_path) == ["F3.051"]
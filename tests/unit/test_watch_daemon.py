@@ -0,0 +1,218 @@
+"""
+Testes unitários para o monitoramento de pastas (FolderWatcher / WatchDaemon).
+
+- Debounce: arquivo só é entregue depois de estável e completo
+- ZIP parcial não é entregue
+- Arquivos ignorados/entregues não voltam sem alteração
+- inotify e polling entregam o mesmo resultado
+- Daemon: importação -> validação -> XSD -> hash, com deduplicação
+- Daemon: .051 sem ZIP no Backup conta como pulado
+- Daemon: relatório de alertas por arquivo e spool esvaziado
+"""
+import os
+import shutil
+import time
+import zipfile
+
+import openpyxl
+import pytest
+
+from src.infrastructure.files import file_manager
+from src.infrastructure.files.folder_watcher import FolderWatcher, arquivo_completo
+
+PASTA_TESTES = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+XML_TESTE = os.path.join(PASTA_TESTES, "guia_user_request.xml")
+# Fatura com <GuiaCobrancaUtilizacao>, necessária para o cálculo do hash
+XML_FATURA = os.path.join(PASTA_TESTES, "test_taxa_obs_00.xml")
+
+
+def _criar_zip(caminho_zip, nome_interno="N0001.051", xml=XML_TESTE):
+    with zipfile.ZipFile(caminho_zip, "w", zipfile.ZIP_DEFLATED) as arquivo_zip:
+        arquivo_zip.write(xml, nome_interno)
+
+
+def _coletar_ate(watcher, quantidade, limite=5.0):
+    prontos = []
+    fim = time.monotonic() + limite
+    while len(prontos) < quantidade and time.monotonic() < fim:
+        prontos.extend(watcher.coletar(timeout=0.05))
+    return prontos
+
+
+@pytest.fixture(params=[True, False], ids=["inotify", "polling"])
+def usar_inotify(request):
+    return request.param
+
+
+class TestFolderWatcher:
+    """Testes para FolderWatcher"""
+
+    def test_entrega_arquivo_estavel(self, tmp_path, usar_inotify):
+        watcher = FolderWatcher([(str(tmp_path), (".zip",), False)], debounce_segundos=0.2,
+                                intervalo_varredura=0.1, usar_inotify=usar_inotify)
+        try:
+            _criar_zip(tmp_path / "F1.zip")
+            (tmp_path / "ignorado.txt").write_text("x")
+
+            assert _coletar_ate(watcher, 1) == [str(tmp_path / "F1.zip")]
+            # Sem alteração não é entregue de novo
+            assert _coletar_ate(watcher, 1, limite=0.5) == []
+        finally:
+            watcher.fechar()
+
+    def test_zip_parcial_aguarda(self, tmp_path, usar_inotify):
+        watcher = FolderWatcher([(str(tmp_path), (".zip",), False)], debounce_segundos=0.1,
+                                intervalo_varredura=0.1, usar_inotify=usar_inotify)
+        try:
+            _criar_zip(tmp_path / "completo.zip")
+            conteudo = (tmp_path / "completo.zip").read_bytes()
+            parcial = tmp_path / "F2.zip"
+            parcial.write_bytes(conteudo[: len(conteudo) // 2])
+
+            assert _coletar_ate(watcher, 2, limite=0.6) == [str(tmp_path / "completo.zip")]
+
+            parcial.write_bytes(conteudo)  # cópia concluída
+            assert _coletar_ate(watcher, 1) == [str(parcial)]
+        finally:
+            watcher.fechar()
+
+    def test_recursivo_e_ignorar(self, tmp_path, usar_inotify):
+        raiz = tmp_path / "Correção XML"
+        raiz.mkdir()
+        watcher = FolderWatcher([(str(raiz), (".051",), True)], debounce_segundos=0.1,
+                                intervalo_varredura=0.1, usar_inotify=usar_inotify)
+        try:
+            (raiz / "Ana").mkdir()
+            destino = raiz / "Ana" / "N1.051"
+            shutil.copy(XML_TESTE, destino)
+            watcher.ignorar(str(destino))
+            assert _coletar_ate(watcher, 1, limite=0.5) == []
+
+            with open(destino, "a", encoding="utf-8") as arquivo:
+                arquivo.write("<!-- editado -->")
+            assert _coletar_ate(watcher, 1) == [str(destino)]
+        finally:
+            watcher.fechar()
+
+    def test_arquivo_completo(self, tmp_path):
+        xml = tmp_path / "a.051"
+        xml.write_text("<a><b>")
+        assert arquivo_completo(str(xml))
+        xml.write_text("<a><b")
+        assert not arquivo_completo(str(xml))
+
+
+class TestWatchDaemon:
+    """Testes das etapas do WatchDaemon"""
+
+    def test_importa_valida_e_recria_zip(self, banco_sqlite, tmp_path, monkeypatch):
+        from src.business.processing.watch_daemon import WatchDaemon
+
+        # Os XMLs de teste não seguem o XSD completo do PTU
+        monkeypatch.setattr(file_manager, 'validar_xml_com_xsd', lambda xsd, xml: (True, "OK"))
+        entrada = tmp_path / "entrada"
+        entrada.mkdir()
+        _criar_zip(entrada / "N0001.zip", xml=XML_FATURA)
+
+        daemon = WatchDaemon(str(entrada), debounce_segundos=0.1, usar_inotify=False,
+                             log_callback=lambda msg: None)
+        assert daemon.iniciar()
+        try:
+            assert daemon.processar(str(entrada / "N0001.zip")) == 'CONCLUIDO'
+            assert (entrada / "Backup" / "N0001.zip").exists()
+            assert (entrada / "Correção XML" / "Monitor" / "N0001.051").exists()
+            assert (entrada / "Validacao_CMB" / "N0001.zip").exists()
+            assert len(daemon.controller.lista_faturas_processadas) == 1
+
+            # Mesmo ZIP de novo: deduplicado pelo índice de hashes
+            assert daemon.processar(str(entrada / "N0001.zip")) == 'PULADO'
+        finally:
+            daemon.encerrar()
+
+    def test_xsd_invalido_nao_recria_zip(self, banco_sqlite, tmp_path, monkeypatch):
+        from src.business.processing.watch_daemon import WatchDaemon
+
+        monkeypatch.setattr(file_manager, 'validar_xml_com_xsd', lambda xsd, xml: (False, "erro"))
+        entrada = tmp_path / "entrada"
+        entrada.mkdir()
+        _criar_zip(entrada / "N0002.zip", "N0002.051")
+
+        daemon = WatchDaemon(str(entrada), usar_inotify=False, log_callback=lambda msg: None)
+        assert daemon.iniciar()
+        try:
+            assert daemon.processar(str(entrada / "N0002.zip")) == 'ERRO'
+            assert not (entrada / "Validacao_CMB" / "N0002.zip").exists()
+        finally:
+            daemon.encerrar()
+
+    def test_051_sem_backup_e_pulado(self, banco_sqlite, tmp_path, monkeypatch):
+        from src.business.processing.watch_daemon import WatchDaemon
+
+        monkeypatch.setattr(file_manager, 'validar_xml_com_xsd', lambda xsd, xml: (True, "OK"))
+        entrada = tmp_path / "entrada"
+        entrada.mkdir()
+        daemon = WatchDaemon(str(entrada), debounce_segundos=0.1, intervalo_varredura=0.1,
+                             usar_inotify=False, log_callback=lambda msg: None)
+        assert daemon.iniciar()
+        xml = os.path.join(daemon.pasta_correcao, "N0005.051")
+        shutil.copy(XML_FATURA, xml)
+        try:
+            assert daemon.processar(xml) == 'PULADO'
+        finally:
+            daemon.encerrar()
+        assert not (entrada / "Validacao_CMB" / "N0005.zip").exists()
+        os.remove(xml)
+
+        # No laço, entra nos pulados (fora das métricas de processados)
+        daemon = WatchDaemon(str(entrada), debounce_segundos=0.1, intervalo_varredura=0.1,
+                             usar_inotify=False, log_callback=lambda msg: None)
+        shutil.copy(XML_FATURA, os.path.join(daemon.pasta_correcao, "N0006.051"))
+        resultado = daemon.executar(duracao=2.0)
+        assert (resultado['pulados'], resultado['processados']) == (1, 0)
+
+    def test_alertas_por_arquivo(self, banco_sqlite, tmp_path, monkeypatch):
+        from src.business.processing.watch_daemon import WatchDaemon
+
+        monkeypatch.setattr(file_manager, 'validar_xml_com_xsd', lambda xsd, xml: (False, "erro"))
+        entrada = tmp_path / "entrada"
+        entrada.mkdir()
+        daemon = WatchDaemon(str(entrada), usar_inotify=False, log_callback=lambda msg: None)
+        assert daemon.iniciar()
+
+        def validar_com_alerta(engine, exec_repo, caminho, nome, log, **kwargs):
+            engine.alertas.append({'mensagem': 'Procedimento removido', 'dados': {'arquivo': nome}})
+            return 'CONCLUIDO', True, None, None
+
+        monkeypatch.setattr(daemon.controller, 'validar_arquivo', validar_com_alerta)
+        xml = daemon.pasta_correcao + os.sep + "N0004.051"
+        shutil.copy(XML_TESTE, xml)
+        try:
+            daemon.processar(xml)
+            daemon.processar(xml)
+        finally:
+            daemon.encerrar()
+
+        relatorio = os.path.join(daemon.pasta_correcao, "ALERTAS_REMOCAO_N0004.xlsx")
+        assert os.path.exists(relatorio)
+        assert len(daemon.engine.alertas) == 0
+        linhas = list(openpyxl.load_workbook(relatorio).active.iter_rows(values_only=True))
+        assert linhas[1:] == [("N0004.051", None, None, None, "Procedimento removido")]
+
+    def test_laco_com_metricas(self, banco_sqlite, tmp_path):
+        from src.business.processing.watch_daemon import WatchDaemon
+
+        entrada = tmp_path / "entrada"
+        entrada.mkdir()
+        _criar_zip(entrada / "N0003.zip", "N0003.051")
+        metricas = tmp_path / "metricas.json"
+
+        daemon = WatchDaemon(str(entrada), debounce_segundos=0.1, intervalo_varredura=0.1,
+                             usar_inotify=False, caminho_metricas=str(metricas),
+                             log_callback=lambda msg: None)
+        resultado = daemon.executar(duracao=3.0)
+
+        assert resultado['detectados'] == 1
+        assert resultado['processados'] + resultado['erros'] == 1
+        assert resultado['fila'] == 0
+        assert resultado['latencia_max_s'] >= resultado['latencia_media_s'] > 0
+        assert metricas.exists()
@@ -0,0 +1,136 @@
+"""
+Interface CLI para gerenciar jobs em lote (validação e atualização de hash).
+
+Permite listar jobs, retomar um job interrompido, cancelar um job e
+publicar um lote na fila distribuída (consumida por tools/queue_worker.py).
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.database import db_manager, fila_repository, job_repository
+from src.database.models import Base
+
+
+def _garantir_tabelas():
+    """Cria as tabelas de jobs caso o app ainda não tenha sido aberto após a atualização."""
+    Base.metadata.create_all(db_manager.engine)
+
+
+def cmd_list(args):
+    """Lista os jobs"""
+    jobs = job_repository.listar_jobs(status=args.status, limite=args.limit)
+
+    if not jobs:
+        print("✅ Nenhum job encontrado")
+        return
+
+    print(f"\n📋 Jobs ({len(jobs)}):")
+    print("=" * 90)
+    print(f"{'ID':>5}  {'Tipo':<10} {'Status':<13} {'Progresso':>11}  {'Checkpoint':<20} Último arquivo")
+    print("-" * 90)
+    for job in jobs:
+        progresso = f"{job['processados']}/{job['total_arquivos']}"
+        ultimo = Path(job['ultimo_arquivo']).name if job['ultimo_arquivo'] else "-"
+        print(f"{job['id']:>5}  {job['tipo']:<10} {job['status']:<13} {progresso:>11}  "
+              f"{job['checkpoint_em'] or '-':<20} {ultimo}")
+    print()
+
+    retomaveis = [job['id'] for job in jobs if job['status'] in job_repository.STATUS_RETOMAVEIS]
+    if retomaveis:
+        print(f"💡 Retomáveis: {', '.join(map(str, retomaveis))} (use: resume <id>)")
+
+
+def cmd_resume(args):
+    """Retoma um job interrompido"""
+    # Import tardio: o controller carrega dados de Unimeds e regras
+    from src.workflow_controller import WorkflowController
+
+    job = job_repository.obter_job(args.job_id)
+    if not job:
+        print(f"❓ Job {args.job_id} não encontrado")
+        sys.exit(1)
+
+    controller = WorkflowController(user_id=job['user_id'])
+    sucesso, mensagem = controller.retomar_job(args.job_id)
+
+    if sucesso:
+        print(f"✅ {mensagem}")
+    else:
+        print(f"❌ {mensagem}")
+        sys.exit(1)
+
+
+def cmd_cancel(args):
+    """Cancela um job"""
+    sucesso, mensagem = job_repository.cancelar_job(args.job_id)
+
+    if sucesso:
+        print(f"🚫 {mensagem}")
+    else:
+        print(f"❌ {mensagem}")
+        sys.exit(1)
+
+
+def cmd_enqueue(args):
+    """Publica os .051 de uma pasta na fila distribuída"""
+    from src.infrastructure.files import file_manager
+
+    pasta = str(Path(args.pasta).resolve())
+    arquivos = file_manager.listar_arquivos_051(pasta)
+    if not arquivos:
+        print(f"❓ Nenhum arquivo .051 em {pasta}")
+        sys.exit(1)
+
+    job_id = fila_repository.enfileirar_lote(sorted(arquivos), pasta)
+    if job_id is None:
+        print("❌ Erro ao publicar o lote")
+        sys.exit(1)
+    print(f"✅ Job {job_id}: {len(arquivos)} arquivo(s) na fila")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='CLI para gerenciar jobs em lote do AuditPlus v2.0'
+    )
+
+    subparsers = parser.add_subparsers(dest='command', help='Comandos disponíveis')
+
+    # Comando: list
+    parser_list = subparsers.add_parser('list', help='Lista os jobs')
+    parser_list.add_argument('--status', help='Filtra pelo status (ex: INTERROMPIDO)')
+    parser_list.add_argument('--limit', type=int, default=50, help='Número de jobs (padrão: 50)')
+    parser_list.set_defaults(func=cmd_list)
+
+    # Comando: resume
+    parser_resume = subparsers.add_parser('resume', help='Retoma um job interrompido')
+    parser_resume.add_argument('job_id', type=int, help='ID do job')
+    parser_resume.set_defaults(func=cmd_resume)
+
+    # Comando: cancel
+    parser_cancel = subparsers.add_parser('cancel', help='Cancela um job')
+    parser_cancel.add_argument('job_id', type=int, help='ID do job')
+    parser_cancel.set_defaults(func=cmd_cancel)
+
+    # Comando: enqueue
+    parser_enqueue = subparsers.add_parser('enqueue', help='Publica uma pasta na fila distribuída')
+    parser_enqueue.add_argument('pasta', help='Pasta com os .051 (acessível por todos os workers)')
+    parser_enqueue.set_defaults(func=cmd_enqueue)
+
+    args = parser.parse_args()
+
+    if not args.command:
+        parser.print_help()
+        return
+
+    _garantir_tabelas()
+
+    # Executar comando
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
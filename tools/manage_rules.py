@@ -8,11 +8,25 @@ import sys
 from pathlib import Path
 
 # Adicionar src ao path
-sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.business.rules.rule_config_manager import RuleConfigManager
 
 
+def _publicar_no_banco():
+    """
+    Sincroniza os JSONs com o banco e publica um novo snapshot de regras.
+    Motores em execução adotam a nova versão no próximo arquivo.
+    """
+    from src.database.rule_migrator import run_migration
+    stats = run_migration()
+    versao = (stats or {}).get('snapshot_version')
+    if versao:
+        print(f"   🔄 Snapshot de regras publicado: v{versao}")
+    else:
+        print("   ⚠️  Não foi possível publicar o snapshot no banco (ver log)")
+
+
 def cmd_disable(args):
     """Desabilita uma regra"""
     manager = RuleConfigManager()
@@ -29,6 +43,7 @@ def cmd_disable(args):
         print(f"   Arquivo: {args.file}")
         if args.reason:
             print(f"   Motivo: {args.reason}")
+        _publicar_no_banco()
     else:
         print(f"❌ Erro ao desabilitar regra {args.rule_id}")
         sys.exit(1)
@@ -47,6 +62,7 @@ def cmd_enable(args):
     if success:
         print(f"✅ Regra {args.rule_id} habilitada com sucesso!")
         print(f"   Arquivo: {args.file}")
+        _publicar_no_banco()
     else:
         print(f"❌ Erro ao habilitar regra {args.rule_id}")
         sys.exit(1)
@@ -154,6 +170,7 @@ def cmd_rollback(args):
     if success:
         print(f"✅ Rollback realizado com sucesso!")
         print(f"   {args.file} restaurado para versão {args.timestamp}")
+        _publicar_no_banco()
     else:
         print(f"❌ Erro ao fazer rollback")
         sys.exit(1)
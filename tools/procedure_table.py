@@ -0,0 +1,113 @@
+"""
+Interface CLI da tabela colunar de procedimentos (Parquet por competência).
+
+Exporta os .051 processados (só os alterados desde a última exportação) e
+responde às análises mais comuns lendo apenas o Parquet. Requer pyarrow e
+numpy (pip install pyarrow numpy).
+
+Exemplos:
+
+    python tools/procedure_table.py exportar "/faturas/2025"
+    python tools/procedure_table.py resumo
+    python tools/procedure_table.py servicos --competencia 202510 --competencia 202511 --top 30
+    python tools/procedure_table.py corte 2025-11-20
+"""
+import argparse
+import sys
+from datetime import date
+from pathlib import Path
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.infrastructure.reports import procedure_table
+
+
+def _carregar(args, colunas):
+    tabela = procedure_table.carregar_procedimentos(args.pasta, args.competencia, colunas)
+    if tabela is None or tabela.num_rows == 0:
+        print("❓ Nenhum procedimento exportado (use o comando 'exportar')")
+        sys.exit(1)
+    return tabela
+
+
+def cmd_exportar(args):
+    """Extrai e grava os .051 das pastas"""
+    from src.business.processing.roi_simulation import listar_arquivos
+
+    arquivos = listar_arquivos(args.pastas)
+    if not arquivos:
+        print("❌ Nenhum arquivo .051 encontrado")
+        sys.exit(1)
+    resumo = procedure_table.exportar_faturas(arquivos, args.pasta, forcar=args.forcar,
+                                              log_callback=print if args.verbose else None)
+    print(f"✅ {resumo['exportados']} fatura(s) exportada(s) ({resumo['linhas']} procedimentos), "
+          f"{resumo['atualizados']} já atualizada(s), {resumo['erros']} erro(s)")
+    if resumo['erros']:
+        sys.exit(1)
+
+
+def cmd_resumo(args):
+    """Itens e valores por competência"""
+    tabela = _carregar(args, ["vl_serv_cobrado", "tx_adm_servico", "competencia"])
+    print(f"\n{'Competência':<14} {'Itens':>10} {'Cobrado (R$)':>16} {'Taxa adm. (R$)':>16}")
+    print("-" * 60)
+    for linha in procedure_table.resumo_por_competencia(tabela):
+        print(f"{linha['competencia']:<14} {linha['itens']:>10} {linha['vl_serv_cobrado']:>16,.2f} "
+              f"{linha['tx_adm_servico']:>16,.2f}")
+
+
+def cmd_servicos(args):
+    """Serviços com maior valor cobrado"""
+    tabela = _carregar(args, ["cd_servico", "vl_serv_cobrado"])
+    print(f"\n{'#':<4} {'Serviço':<14} {'Itens':>10} {'Cobrado (R$)':>16}")
+    print("-" * 48)
+    for i, linha in enumerate(procedure_table.agregar(tabela, "cd_servico")[:args.top], 1):
+        print(f"{i:<4} {str(linha['grupo']):<14} {linha['quantidade']:>10} {linha['total']:>16,.2f}")
+
+
+def cmd_corte(args):
+    """Itens executados até/depois de uma data"""
+    tabela = _carregar(args, ["dt_execucao"])
+    divisao = procedure_table.dividir_por_data(tabela, date.fromisoformat(args.data))
+    print(f"\n📋 Até {args.data}: {divisao['ate']} | Depois: {divisao['depois']} | Sem data: {divisao['sem_data']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='CLI da tabela de procedimentos do AuditPlus v2.0'
+    )
+    parser.add_argument('--pasta', help=f'Pasta do Parquet (padrão: {procedure_table.PASTA_PROCEDIMENTOS})')
+
+    subparsers = parser.add_subparsers(dest='command', help='Comandos disponíveis')
+
+    # Comando: exportar
+    parser_exportar = subparsers.add_parser('exportar', help='Exporta os .051 para Parquet')
+    parser_exportar.add_argument('pastas', nargs='+', help='Pastas (recursivo) ou arquivos .051')
+    parser_exportar.add_argument('--forcar', action='store_true', help='Reexporta mesmo sem alteração')
+    parser_exportar.add_argument('-v', '--verbose', action='store_true', help='Mostra cada fatura exportada')
+    parser_exportar.set_defaults(func=cmd_exportar)
+
+    # Análises: filtro opcional de competências
+    for nome, ajuda, funcao in (('resumo', 'Itens e valores por competência', cmd_resumo),
+                                ('servicos', 'Serviços com maior valor cobrado', cmd_servicos),
+                                ('corte', 'Itens até/depois de uma data', cmd_corte)):
+        sub = subparsers.add_parser(nome, help=ajuda)
+        sub.add_argument('--competencia', action='append', metavar='AAAAMM', help='Filtra competências')
+        sub.set_defaults(func=funcao)
+        if nome == 'servicos':
+            sub.add_argument('--top', type=int, default=20, help='Quantidade de serviços (padrão: 20)')
+        elif nome == 'corte':
+            sub.add_argument('data', help='Data de corte (AAAA-MM-DD, inclusiva)')
+
+    args = parser.parse_args()
+
+    if not args.command:
+        parser.print_help()
+        return
+
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Worker headless da fila distribuída de validação.
+
+Execute um worker por máquina, todas apontando para o mesmo PostgreSQL
+(DB_PROVIDER=postgresql no .env). Os lotes são publicados com:
+
+    python tools/manage_jobs.py enqueue <pasta_de_rede>
+"""
+import argparse
+import logging
+import signal
+import sys
+from pathlib import Path
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.business.processing.queue_worker import QueueWorker
+from src.database import db_manager, fila_repository
+from src.database.models import Base
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Worker da fila distribuída de validação do AuditPlus v2.0'
+    )
+    parser.add_argument('--worker-id', help='Identificador do worker (padrão: host:pid)')
+    parser.add_argument('--lote', type=int, default=1, help='Itens reservados por consulta (padrão: 1)')
+    parser.add_argument('--lease', type=int, default=fila_repository.LEASE_PADRAO_SEGUNDOS,
+                        help=f'Validade da reserva em segundos (padrão: {fila_repository.LEASE_PADRAO_SEGUNDOS})')
+    parser.add_argument('--intervalo', type=float, default=5.0,
+                        help='Espera em segundos quando a fila está vazia (padrão: 5)')
+    parser.add_argument('--max-itens', type=int, help='Encerra após processar N itens')
+    parser.add_argument('--sair-quando-vazio', action='store_true', help='Encerra quando a fila esvaziar')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    Base.metadata.create_all(db_manager.engine)
+
+    worker = QueueWorker(worker_id=args.worker_id, lote=args.lote, lease_segundos=args.lease,
+                         intervalo_ocioso=args.intervalo, log_callback=print)
+
+    # Parada ordenada: conclui o item atual e devolve as reservas restantes
+    signal.signal(signal.SIGINT, lambda *_: worker.parar())
+    signal.signal(signal.SIGTERM, lambda *_: worker.parar())
+
+    estatisticas = worker.executar(max_itens=args.max_itens, sair_quando_vazio=args.sair_quando_vazio)
+    print(f"✅ {estatisticas['processados']} item(ns) processado(s), "
+          f"{estatisticas['modificados']} modificado(s), {estatisticas['erros']} erro(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Reexecução de impacto de uma regra alterada (dry-run).
+
+Compara a versão anterior da regra (histórico) com a atual, apenas nos
+arquivos indexados em que ela pode casar, sem gravar nada.
+
+Exemplos:
+
+    python tools/replay_rule_impact.py REGRA_CPF_PRESTADOR_9134 --saida impacto.json
+    python tools/replay_rule_impact.py REGRA_CPF_PRESTADOR_9134 --versao 3 --workers 8
+    python tools/replay_rule_impact.py --indexar "/faturas/Correção XML/Ana"
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.database import db_manager
+from src.database.models import Base
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Reexecução de impacto de regras do AuditPlus v2.0'
+    )
+    parser.add_argument('rule_id', nargs='?', help='ID da regra alterada')
+    parser.add_argument('--versao', type=int, help='Versão anterior a comparar (padrão: a última do histórico)')
+    parser.add_argument('--workers', type=int, help='Processos paralelos (padrão: núcleos disponíveis)')
+    parser.add_argument('--saida', help='Arquivo JSON com o resumo por arquivo')
+    parser.add_argument('--indexar', action='append', default=[], metavar='PASTA',
+                        help='Indexa os .051 da pasta antes (arquivos validados antes do índice)')
+    args = parser.parse_args()
+
+    if not args.rule_id and not args.indexar:
+        parser.error('informe o ID da regra e/ou --indexar PASTA')
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(name)s: %(message)s')
+    Base.metadata.create_all(db_manager.engine)
+
+    from src.business.processing import impact_replay
+
+    for pasta in args.indexar:
+        impact_replay.indexar_pasta(pasta, log_callback=print)
+
+    if not args.rule_id:
+        return
+
+    resumo = impact_replay.reexecutar_impacto(args.rule_id, versao=args.versao, max_workers=args.workers,
+                                              log_callback=print)
+    if resumo is None:
+        print(f"❌ Não foi possível montar a diferença da regra {args.rule_id} (ver log)")
+        sys.exit(1)
+
+    print(f"\n📊 {resumo['rule_id']} v{resumo['versao_antiga']} -> v{resumo['versao_atual']}")
+    print(f"   Indexados: {resumo['indexados']} | Candidatos: {resumo['candidatos']} | "
+          f"Analisados: {resumo['analisados']} | Alterados: {resumo['alterados']} | Erros: {resumo['erros']}")
+    for arquivo in resumo['arquivos']:
+        if not arquivo['alterado']:
+            continue
+        print(f"   📄 {arquivo['arquivo']}: {arquivo['total_diferencas']} diferença(s)")
+        for diferenca in arquivo['diferencas'][:5]:
+            print(f"      {diferenca['caminho']}: {diferenca['antes']!r} -> {diferenca['depois']!r}")
+
+    if args.saida:
+        impact_replay.salvar_relatorio(resumo, args.saida)
+        print(f"\n✅ Relatório salvo em {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
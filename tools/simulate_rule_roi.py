@@ -0,0 +1,72 @@
+"""
+Simulação de ROI de regras candidatas (dry-run) sobre o acervo histórico.
+
+Aplica as regras candidatas aos .051 das pastas informadas, sem gravar nada,
+e estima guias/itens salvos e o valor protegido (R$) com os valores do XML.
+
+Exemplos:
+
+    python tools/simulate_rule_roi.py "/faturas/2025" --regras regras/cnes.json
+    python tools/simulate_rule_roi.py "/faturas" --regras regras/outros.json --regra REGRA_X --workers 8
+    python tools/simulate_rule_roi.py "/faturas" --regras candidatas.json --isoladas --saida roi.json
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Simulação de ROI de regras candidatas do AuditPlus v2.0'
+    )
+    parser.add_argument('pastas', nargs='+', help='Pastas (recursivo) ou arquivos .051 do acervo')
+    parser.add_argument('--regras', action='append', required=True, metavar='ARQUIVO',
+                        help='JSON de regras candidatas (caminho ou relativo a src/config)')
+    parser.add_argument('--regra', action='append', metavar='ID',
+                        help='Simula apenas estas regras do(s) arquivo(s) (padrão: todas)')
+    parser.add_argument('--isoladas', action='store_true',
+                        help='Não aplica as regras já ativas antes das candidatas')
+    parser.add_argument('--workers', type=int, help='Processos paralelos (padrão: núcleos disponíveis)')
+    parser.add_argument('--limite', type=int, help='Máximo de arquivos do acervo')
+    parser.add_argument('--saida', help='Arquivo JSON com o resumo completo')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(name)s: %(message)s')
+
+    from src.business.processing import roi_simulation
+
+    candidatas = roi_simulation.carregar_regras_candidatas(args.regras, args.regra)
+    if not candidatas:
+        print("❌ Nenhuma regra candidata carregada")
+        sys.exit(1)
+    arquivos = roi_simulation.listar_arquivos(args.pastas, args.limite)
+    if not arquivos:
+        print("❌ Nenhum arquivo .051 encontrado")
+        sys.exit(1)
+
+    resumo = roi_simulation.simular_roi(arquivos, candidatas, incluir_ativas=not args.isoladas,
+                                        max_workers=args.workers, log_callback=print)
+
+    totais = resumo['totais']
+    vazao = resumo['vazao']
+    print(f"\n📊 {totais['arquivos']} arquivo(s) | Afetados: {totais['arquivos_afetados']} | Erros: {totais['erros']}")
+    print(f"   Guias salvas: {totais['guias']} (R$ {totais['valor_guias']:,.2f}) | "
+          f"Itens: {totais['itens']} (R$ {totais['valor_itens']:,.2f}) | Total: R$ {totais['valor_total']:,.2f}")
+    print(f"   Vazão: {vazao['arquivos_por_segundo']} arquivos/s, {vazao['mb_por_segundo']} MB/s "
+          f"({vazao['duracao']}s, {resumo['workers']} processo(s))")
+    for id_regra, dados in sorted(resumo['por_regra'].items(), key=lambda item: -item[1]['valor_total']):
+        print(f"   📋 {id_regra} [{dados['categoria']}]: {dados['correcoes']} correção(ões) em "
+              f"{dados['arquivos']} arquivo(s), {dados['guias']} guia(s), {dados['itens']} item(ns), "
+              f"R$ {dados['valor_total']:,.2f}")
+
+    if args.saida:
+        roi_simulation.salvar_relatorio(resumo, args.saida)
+        print(f"\n✅ Relatório salvo em {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
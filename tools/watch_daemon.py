@@ -0,0 +1,57 @@
+"""
+Daemon de monitoramento de pastas (importação -> validação -> XSD -> hash).
+
+Exemplo:
+
+    python tools/watch_daemon.py /faturas/entrada --auditor "Monitor" --metricas /faturas/metricas.json
+"""
+import argparse
+import logging
+import signal
+import sys
+from pathlib import Path
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.business.processing.watch_daemon import WatchDaemon
+from src.database import db_manager
+from src.database.models import Base
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Monitoramento de pastas do AuditPlus v2.0'
+    )
+    parser.add_argument('pasta', help='Pasta de importação (onde chegam os ZIPs)')
+    parser.add_argument('--auditor', default='Monitor',
+                        help='Subpasta de "Correção XML" para os .051 importados (padrão: Monitor)')
+    parser.add_argument('--debounce', type=float, default=2.0,
+                        help='Segundos sem alteração para considerar o arquivo completo (padrão: 2)')
+    parser.add_argument('--varredura', type=float, default=30.0,
+                        help='Intervalo da varredura completa em segundos (padrão: 30)')
+    parser.add_argument('--polling', action='store_true', help='Não usar inotify (só varredura)')
+    parser.add_argument('--metricas', help='Arquivo JSON com métricas de fila e latência')
+    parser.add_argument('--intervalo-metricas', type=float, default=30.0,
+                        help='Intervalo de gravação das métricas em segundos (padrão: 30)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    Base.metadata.create_all(db_manager.engine)
+
+    daemon = WatchDaemon(args.pasta, nome_auditor=args.auditor, debounce_segundos=args.debounce,
+                         intervalo_varredura=args.varredura, usar_inotify=not args.polling,
+                         caminho_metricas=args.metricas, intervalo_metricas=args.intervalo_metricas,
+                         log_callback=print)
+
+    # Parada ordenada: conclui os arquivos já na fila
+    signal.signal(signal.SIGINT, lambda *_: daemon.parar())
+    signal.signal(signal.SIGTERM, lambda *_: daemon.parar())
+
+    metricas = daemon.executar()
+    print(f"✅ Encerrado: {metricas['processados']} processado(s), {metricas['pulados']} pulado(s), "
+          f"{metricas['erros']} erro(s); latência média {metricas['latencia_media_s']}s")
+
+
+if __name__ == '__main__':
+    main()
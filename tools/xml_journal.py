@@ -0,0 +1,80 @@
+"""
+Interface CLI para os diários de alterações dos .051 (pasta Diarios).
+
+Mostra as diferenças que a validação fez em um arquivo e reverte o arquivo
+ao conteúdo anterior, sem cópia de backup do XML.
+
+Exemplos:
+
+    python tools/xml_journal.py diff "/faturas/2025/N0051001.051"
+    python tools/xml_journal.py rollback "/faturas/2025/N0051001.051"
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.infrastructure.files import change_journal
+from src.infrastructure.files.file_handler import FileHandler
+
+
+def _carregar(arquivo):
+    caminho = change_journal.caminho_diario(arquivo)
+    if not os.path.exists(caminho):
+        print(f"❓ Nenhum diário de alterações para {arquivo}")
+        sys.exit(1)
+    diario, extras = change_journal.DiarioAlteracoes.carregar(caminho)
+    return caminho, diario, extras
+
+
+def cmd_diff(args):
+    """Lista as alterações registradas"""
+    _, diario, extras = _carregar(args.arquivo)
+    execucao = extras.get('execucao')
+    print(f"\n📋 {len(diario)} alteração(ões) em {Path(args.arquivo).name}"
+          + (f" (execução {execucao})" if execucao is not None else ""))
+    for linha in diario.linhas_diff():
+        print(f"   {linha}")
+
+
+def cmd_rollback(args):
+    """Reverte o arquivo e remove o diário"""
+    caminho, diario, _ = _carregar(args.arquivo)
+    if not FileHandler().reverter_com_diario(args.arquivo, diario):
+        print(f"❌ Não foi possível reverter {args.arquivo}")
+        sys.exit(1)
+    os.remove(caminho)
+    print(f"✅ {len(diario)} alteração(ões) revertida(s) em {Path(args.arquivo).name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='CLI dos diários de alterações do AuditPlus v2.0'
+    )
+
+    subparsers = parser.add_subparsers(dest='command', help='Comandos disponíveis')
+
+    # Comando: diff
+    parser_diff = subparsers.add_parser('diff', help='Mostra as alterações feitas no arquivo')
+    parser_diff.add_argument('arquivo', help='Arquivo .051')
+    parser_diff.set_defaults(func=cmd_diff)
+
+    # Comando: rollback
+    parser_rollback = subparsers.add_parser('rollback', help='Reverte o arquivo ao conteúdo original')
+    parser_rollback.add_argument('arquivo', help='Arquivo .051')
+    parser_rollback.set_defaults(func=cmd_rollback)
+
+    args = parser.parse_args()
+
+    if not args.command:
+        parser.print_help()
+        return
+
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()